@@ -18,10 +18,13 @@ import numpy,pandas
 import _fasttrips
 
 from .Error       import ConfigurationError
-from .Logger      import FastTripsLogger, setupLogging
+from .Logger      import FastTripsLogger, setupLogging, setDebugLog, isDebugEnabled, debugDataFrames
+from .Logger      import DEBUG_LOG_FULL, DEBUG_LOG_OPTIONS
+from .OutputWriter import OutputWriter
 from .Passenger   import Passenger
 from .PathSet     import PathSet
 from .Performance import Performance
+from .StageTimer  import StageTimer
 from .Stop        import Stop
 from .TAZ         import TAZ
 from .Transfer    import Transfer
@@ -42,6 +45,14 @@ class Assignment:
     #: (Hmm naming conventions are a bit awkward here)
     CONFIGURATION_OUTPUT_FILE       = 'ft_output_config.txt'
 
+    #: Recorded for the pathfinder benchmark: the vehicle trip stop times sent to the C++ extension.
+    #: See :py:attr:`Assignment.RECORD_PATHFINDER_BENCHMARK`.
+    OUTPUT_BENCHMARK_STOP_TIMES_FILE    = 'ft_benchmark_stop_times.txt'
+    #: Recorded for the pathfinder benchmark: the pathfinding parameters sent to the C++ extension
+    OUTPUT_BENCHMARK_PARAMETERS_FILE    = 'ft_benchmark_parameters.txt'
+    #: Recorded for the pathfinder benchmark: the path specification for each trip
+    OUTPUT_BENCHMARK_PATH_SPECS_FILE    = 'ft_benchmark_path_specs.txt'
+
     #: Configuration: Input network directory
     INPUT_NETWORK_DIR               = None
     #: Configuration: Input demand directory
@@ -82,8 +93,8 @@ class Assignment:
     #: departure time will be checked.  A :py:class:`datetime.timedelta` instance.
     TIME_WINDOW                     = None
 
-    #: Configuration: Create skims flag. This is specific to the travel demand models
-    #: (not working in this version). Boolean.
+    #: Configuration: Create skims flag. This is specific to the travel demand models.
+    #: If true, :py:meth:`Skim.create_skims` creates the skims after the assignment. Boolean.
     CREATE_SKIMS                    = None
 
     #: Configuration: Beginning of the time period for which the skim is required.
@@ -94,6 +105,27 @@ class Assignment:
     #: (specify as 'HH:MM'). A :py:class:`datetime.datetime` instance.
     SKIM_END_TIME                   = None
 
+    #: Configuration: Length of the departure time slices between :py:attr:`Assignment.SKIM_START_TIME`
+    #: and :py:attr:`Assignment.SKIM_END_TIME`.  The skims are for departing at the start of each slice.
+    #: A :py:class:`datetime.timedelta` instance.
+    SKIM_TIME_SLICE                 = None
+
+    #: Configuration: User class for which to skim.  Along with the purpose and demand modes below,
+    #: this determines the path weights used.  String.
+    SKIM_USER_CLASS                 = None
+
+    #: Configuration: Purpose for which to skim.  String.
+    SKIM_PURPOSE                    = None
+
+    #: Configuration: Access demand mode for which to skim.  String.
+    SKIM_ACCESS_MODE                = None
+
+    #: Configuration: Transit demand mode for which to skim.  String.
+    SKIM_TRANSIT_MODE               = None
+
+    #: Configuration: Egress demand mode for which to skim.  String.
+    SKIM_EGRESS_MODE                = None
+
     #: Route choice configuration: Max number of paths in a pathset.
     #: Used in conjuntion with :py:attr:`Assignment.MIN_PATH_PROBABILITY`
     MAX_NUM_PATHS                   = None
@@ -128,6 +160,12 @@ class Assignment:
     #: Debug mode: only run this number of trips, -1 to run all. Int.
     DEBUG_NUM_TRIPS                 = -1
 
+    #: Debug logging: one of :py:data:`fasttrips.Logger.DEBUG_LOG_OPTIONS`.  ``full`` logs everything,
+    #: ``sampled`` logs the dataframes in the iteration loop the first time and every
+    #: :py:data:`fasttrips.Logger.DEBUG_SAMPLE_INTERVAL` times after that, and ``off`` skips debug
+    #: messages (and formatting them) entirely.  String.
+    DEBUG_LOG                       = DEBUG_LOG_FULL
+
     #: Skip these passengers
     SKIP_PERSON_IDS                 = None
 
@@ -152,6 +190,11 @@ class Assignment:
     bump_wait                       = {}
     bump_wait_df                    = None
 
+    #: Simulation: (trip_id_num, stop_sequence) row index for the vehicle trips table, from
+    #: :py:meth:`Trip.make_trip_stop_index`.  Rebuilt when passengers are put on vehicles and used
+    #: for capacity bumping, since the vehicle trips rows don't move until the trip times are updated.
+    veh_trips_index                 = None
+
     #: Simulation: bump one stop at a time (slower, more accurate)
     #:
     #: When addressing capacity constraints in simulation, we look at all the (trip, stop)-pairs
@@ -175,6 +218,54 @@ class Assignment:
     #: How many Simulation Iterations should we do before going back to path-finding?
     MAX_SIMULATION_ITERS            = 10
 
+    #: Configuration: After the first simulation iteration, only update passenger board and alight times
+    #: for the vehicle trip-stops whose times moved in :py:meth:`Trip.update_trip_times`, and only re-evaluate
+    #: missed transfers for the paths using them.  Boolean.
+    INCREMENTAL_SIM_TIMES           = True
+
+    #: Configuration: Directory in which to cache the prepared input network, so runs with the same
+    #: network files and network configuration skip reading and preparing it.  See
+    #: :py:class:`fasttrips.NetworkCache`.  None to not cache.
+    NETWORK_CACHE_DIR               = None
+
+    #: Configuration: Validate the input GTFS with transitfeed after reading it.  This is thorough
+    #: but slow for large networks, and requires transitfeed.  Boolean.
+    VALIDATE_GTFS                   = False
+
+    #: Configuration: Format for the pathset, chosen path and vehicle trip outputs written each iteration,
+    #: one of :py:attr:`Util.OUTPUT_FORMATS`.  :py:attr:`Util.OUTPUT_FORMAT_NPZ` writes binary files
+    #: for each iteration, which is faster for large runs; read them with :py:meth:`Util.read_dataframe_npz`.
+    OUTPUT_FORMAT                   = Util.OUTPUT_FORMAT_CSV
+
+    #: Configuration: Write the outputs written every iteration on a background thread, so the assignment
+    #: doesn't wait for them.  Boolean.
+    ASYNC_OUTPUT                    = True
+
+    #: Configuration: Maximum megabytes of output dataframe copies waiting for the background writer.
+    #: When this is reached, the assignment waits for the writer.  Float.
+    ASYNC_OUTPUT_MAX_MB             = 1024.0
+
+    #: Configuration: Fraction of the passenger trips whose pathfinding performance is written to
+    #: :py:attr:`Performance.OUTPUT_PERFORMANCE_FILE` each iteration.  The summary in
+    #: :py:attr:`Performance.OUTPUT_PERFORMANCE_SUMMARY_FILE` always covers every trip.  Float; 0 to not write it.
+    PERFORMANCE_SAMPLE_FRACTION     = 1.0
+
+    #: Configuration: Write binary checkpoints of the pathfinding results along with the csv files, for
+    #: fast reloading by :py:attr:`Assignment.PATHFINDING_TYPE_READ_FILE`.  Boolean.
+    PATHSET_CHECKPOINT              = True
+
+    #: Configuration: Names (or slash-separated paths) of the :py:class:`StageTimer` stages to run
+    #: under :py:mod:`cProfile`.  List of strings.
+    PROFILE_STAGES                  = []
+
+    #: Configuration: Record the inputs to the C++ extension for the first pathfinding iteration, for
+    #: replaying with the standalone pathfinder benchmark, ``src/benchmark_pathfinder.cpp``.  Boolean.
+    RECORD_PATHFINDER_BENCHMARK     = False
+
+    #: The :py:class:`OutputWriter` for the outputs written every iteration.  Set up by
+    #: :py:meth:`Assignment.assign_paths`; writes synchronously otherwise.
+    OUTPUT_WRITER                   = OutputWriter()
+
     #: Column names for simulation
     SIM_COL_PAX_BOARD_TIME          = 'board_time'       #: Board time on the transit vehicle
     SIM_COL_PAX_ALIGHT_TIME         = 'alight_time'      #: Alight time from the transit vehicle
@@ -191,6 +282,8 @@ class Assignment:
     SIM_COL_PAX_BUMPSTOP_BOARDED    = 'bumpstop_boarded' #: 1 if lucky enough to board at an at- or over-capacity stop
     SIM_COL_PAX_DISTANCE            = "distance"         #: Link distance in miles
     SIM_COL_PAX_COST                = 'sim_cost'         #: Link cost. (Cannot be `cost` because it collides with TAZ.DRIVE_ACCESS_COLUMN_COST)
+    SIM_COL_PAX_WEIGHT_GROUP        = 'weight_group'     #: Weight group for link cost; see :py:meth:`PathSet.compile_weights`
+    SIM_COL_PAX_STATIC_COST         = 'sim_static_cost'  #: Time-invariant part of link cost, calculated once per pathset
     SIM_COL_PAX_LNPS                = 'ln_PS'            #: log(PathSize)
     SIM_COL_PAX_PROBABILITY         = 'probability'      #: Probability of this path
     SIM_COL_PAX_LOGSUM              = 'logsum'           #: Logsum of all paths
@@ -241,18 +334,35 @@ class Assignment:
                       'simulation'                      :'True',
                       'output_pathset_per_sim_iter'     :'False',
                       'output_passenger_trajectories'   :'True',
+                      'output_format'                   :Util.OUTPUT_FORMAT_CSV,
+                      'async_output'                    :'True',
+                      'async_output_max_mb'             :1024.0,
+                      'performance_sample_fraction'     :1.0,
+                      'pathset_checkpoint'              :'True',
+                      'profile_stages'                  :'[]',
+                      'record_pathfinder_benchmark'     :'False',
                       'create_skims'                    :'False',
                       'skim_start_time'                 :'5:00',
                       'skim_end_time'                   :'10:00',
+                      'skim_time_slice'                 :30,
+                      'skim_user_class'                 :'all',
+                      'skim_purpose'                    :'other',
+                      'skim_access_mode'                :'walk',
+                      'skim_transit_mode'               :'transit',
+                      'skim_egress_mode'                :'walk',
                       'capacity_constraint'             :'False',
                       'skip_person_ids'                 :'None',
                       'trace_person_ids'                :'None',
                       'debug_trace_only'                :'False',
                       'debug_num_trips'                 :-1,
+                      'debug_log'                       :DEBUG_LOG_FULL,
                       'prepend_route_id_to_trip_id'     :'False',
                       'number_of_processes'             :0,
                       'bump_buffer'                     :5,
                       'bump_one_at_a_time'              :'False',
+                      'incremental_sim_times'           :'True',
+                      'network_cache_dir'               :'None',
+                      'validate_gtfs'                   :'False',
                       # pathfinding
                       'max_num_paths'                   :-1,
                       'min_path_probability'            :0.005,
@@ -287,16 +397,55 @@ class Assignment:
                                                    parser.get       ('fasttrips','skim_start_time'),'%H:%M')
         Assignment.SKIM_END_TIME   = datetime.datetime.strptime(
                                                    parser.get       ('fasttrips','skim_end_time'),'%H:%M')
+        Assignment.SKIM_TIME_SLICE = datetime.timedelta(
+                                         minutes = parser.getfloat  ('fasttrips','skim_time_slice'))
+        Assignment.SKIM_USER_CLASS               = parser.get       ('fasttrips','skim_user_class')
+        Assignment.SKIM_PURPOSE                  = parser.get       ('fasttrips','skim_purpose')
+        Assignment.SKIM_ACCESS_MODE              = parser.get       ('fasttrips','skim_access_mode')
+        Assignment.SKIM_TRANSIT_MODE             = parser.get       ('fasttrips','skim_transit_mode')
+        Assignment.SKIM_EGRESS_MODE              = parser.get       ('fasttrips','skim_egress_mode')
         Assignment.CAPACITY_CONSTRAINT           = parser.getboolean('fasttrips','capacity_constraint')
         Assignment.SKIP_PERSON_IDS          = eval(parser.get       ('fasttrips','skip_person_ids'))
         Assignment.TRACE_PERSON_IDS         = eval(parser.get       ('fasttrips','trace_person_ids'))
         Assignment.DEBUG_TRACE_ONLY              = parser.getboolean('fasttrips','debug_trace_only')
         Assignment.DEBUG_NUM_TRIPS               = parser.getint    ('fasttrips','debug_num_trips')
+        Assignment.DEBUG_LOG                     = parser.get       ('fasttrips','debug_log')
         Assignment.PREPEND_ROUTE_ID_TO_TRIP_ID   = parser.getboolean('fasttrips','prepend_route_id_to_trip_id')
         Assignment.NUMBER_OF_PROCESSES           = parser.getint    ('fasttrips','number_of_processes')
         Assignment.BUMP_BUFFER = datetime.timedelta(
                                          minutes = parser.getfloat  ('fasttrips','bump_buffer'))
         Assignment.BUMP_ONE_AT_A_TIME            = parser.getboolean('fasttrips','bump_one_at_a_time')
+        Assignment.INCREMENTAL_SIM_TIMES         = parser.getboolean('fasttrips','incremental_sim_times')
+        Assignment.NETWORK_CACHE_DIR        = eval(parser.get       ('fasttrips','network_cache_dir'))
+        Assignment.VALIDATE_GTFS                 = parser.getboolean('fasttrips','validate_gtfs')
+        Assignment.OUTPUT_FORMAT                 = parser.get       ('fasttrips','output_format')
+        Assignment.ASYNC_OUTPUT                  = parser.getboolean('fasttrips','async_output')
+        Assignment.ASYNC_OUTPUT_MAX_MB           = parser.getfloat  ('fasttrips','async_output_max_mb')
+        Assignment.PATHSET_CHECKPOINT            = parser.getboolean('fasttrips','pathset_checkpoint')
+        Assignment.PERFORMANCE_SAMPLE_FRACTION   = parser.getfloat  ('fasttrips','performance_sample_fraction')
+        Assignment.PROFILE_STAGES           = eval(parser.get       ('fasttrips','profile_stages'))
+        Assignment.RECORD_PATHFINDER_BENCHMARK   = parser.getboolean('fasttrips','record_pathfinder_benchmark')
+        if Assignment.CREATE_SKIMS and Assignment.SKIM_TIME_SLICE.total_seconds() <= 0:
+            msg = "skim_time_slice must be positive; got %f" % (Assignment.SKIM_TIME_SLICE.total_seconds()/60.0)
+            FastTripsLogger.fatal(msg)
+            raise ConfigurationError(Assignment.CONFIGURATION_FILE, msg)
+        if Assignment.PERFORMANCE_SAMPLE_FRACTION < 0 or Assignment.PERFORMANCE_SAMPLE_FRACTION > 1:
+            msg = "performance_sample_fraction must be between 0 and 1; got %f" % Assignment.PERFORMANCE_SAMPLE_FRACTION
+            FastTripsLogger.fatal(msg)
+            raise ConfigurationError(Assignment.CONFIGURATION_FILE, msg)
+        if type(Assignment.PROFILE_STAGES) != list:
+            msg = "profile_stages must be a list of stage names; got %s" % str(Assignment.PROFILE_STAGES)
+            FastTripsLogger.fatal(msg)
+            raise ConfigurationError(Assignment.CONFIGURATION_FILE, msg)
+        if Assignment.OUTPUT_FORMAT not in Util.OUTPUT_FORMATS:
+            msg = "output_format %s not supported; expected one of %s" % (Assignment.OUTPUT_FORMAT, str(Util.OUTPUT_FORMATS))
+            FastTripsLogger.fatal(msg)
+            raise ConfigurationError(Assignment.CONFIGURATION_FILE, msg)
+        if Assignment.DEBUG_LOG not in DEBUG_LOG_OPTIONS:
+            msg = "debug_log %s not supported; expected one of %s" % (Assignment.DEBUG_LOG, str(DEBUG_LOG_OPTIONS))
+            FastTripsLogger.fatal(msg)
+            raise ConfigurationError(Assignment.CONFIGURATION_FILE, msg)
+        setDebugLog(Assignment.DEBUG_LOG)
 
         # pathfinding
         Assignment.MAX_NUM_PATHS                 = parser.getint    ('pathfinding','max_num_paths')
@@ -351,15 +500,32 @@ class Assignment:
         parser.set('fasttrips','create_skims',                  'True' if Assignment.CREATE_SKIMS else 'False')
         parser.set('fasttrips','skim_start_time',               Assignment.SKIM_START_TIME.strftime('%H:%M'))
         parser.set('fasttrips','skim_end_time',                 Assignment.SKIM_END_TIME.strftime('%H:%M'))
+        parser.set('fasttrips','skim_time_slice',               '%f' % (Assignment.SKIM_TIME_SLICE.total_seconds()/60.0))
+        parser.set('fasttrips','skim_user_class',               Assignment.SKIM_USER_CLASS)
+        parser.set('fasttrips','skim_purpose',                  Assignment.SKIM_PURPOSE)
+        parser.set('fasttrips','skim_access_mode',              Assignment.SKIM_ACCESS_MODE)
+        parser.set('fasttrips','skim_transit_mode',             Assignment.SKIM_TRANSIT_MODE)
+        parser.set('fasttrips','skim_egress_mode',              Assignment.SKIM_EGRESS_MODE)
         parser.set('fasttrips','capacity_constraint',           'True' if Assignment.CAPACITY_CONSTRAINT else 'False')
         parser.set('fasttrips','skip_person_ids',               '%s' % str(Assignment.SKIP_PERSON_IDS))
         parser.set('fasttrips','trace_person_ids',              '%s' % str(Assignment.TRACE_PERSON_IDS))
         parser.set('fasttrips','debug_trace_only',              'True' if Assignment.DEBUG_TRACE_ONLY else 'False')
         parser.set('fasttrips','debug_num_trips',               '%d' % Assignment.DEBUG_NUM_TRIPS)
+        parser.set('fasttrips','debug_log',                     Assignment.DEBUG_LOG)
         parser.set('fasttrips','prepend_route_id_to_trip_id',   'True' if Assignment.PREPEND_ROUTE_ID_TO_TRIP_ID else 'False')
         parser.set('fasttrips','number_of_processes',           '%d' % Assignment.NUMBER_OF_PROCESSES)
         parser.set('fasttrips','bump_buffer',                   '%f' % (Assignment.BUMP_BUFFER.total_seconds()/60.0))
         parser.set('fasttrips','bump_one_at_a_time',            'True' if Assignment.BUMP_ONE_AT_A_TIME else 'False')
+        parser.set('fasttrips','incremental_sim_times',         'True' if Assignment.INCREMENTAL_SIM_TIMES else 'False')
+        parser.set('fasttrips','network_cache_dir',             '%s' % repr(Assignment.NETWORK_CACHE_DIR))
+        parser.set('fasttrips','validate_gtfs',                 'True' if Assignment.VALIDATE_GTFS else 'False')
+        parser.set('fasttrips','output_format',                 Assignment.OUTPUT_FORMAT)
+        parser.set('fasttrips','async_output',                  'True' if Assignment.ASYNC_OUTPUT else 'False')
+        parser.set('fasttrips','async_output_max_mb',           '%f' % Assignment.ASYNC_OUTPUT_MAX_MB)
+        parser.set('fasttrips','pathset_checkpoint',            'True' if Assignment.PATHSET_CHECKPOINT else 'False')
+        parser.set('fasttrips','performance_sample_fraction',   '%f' % Assignment.PERFORMANCE_SAMPLE_FRACTION)
+        parser.set('fasttrips','profile_stages',                '%s' % str(Assignment.PROFILE_STAGES))
+        parser.set('fasttrips','record_pathfinder_benchmark',   'True' if Assignment.RECORD_PATHFINDER_BENCHMARK else 'False')
 
         #pathfinding
         parser.add_section('pathfinding')
@@ -381,12 +547,12 @@ class Assignment:
         output_file.close()
 
     @staticmethod
-    def initialize_fasttrips_extension(process_number, output_dir, stop_times_df):
+    def get_fasttrips_extension_stop_times(stop_times_df):
         """
-        Initialize the C++ fasttrips extension by passing it the network supply.
+        Returns the vehicle trip stop times as the C++ fasttrips extension takes them: a tuple of
+        an int32 array with columns trip id num, stop sequence, stop id num, and a float64 array with
+        columns arrival time, departure time (in minutes after midnight) and overcap.
         """
-        FastTripsLogger.debug("Initializing fasttrips extension for process number %d" % process_number)
-
         # this may not be set yet if it is iter1
         overcap_col = Trip.SIM_COL_VEH_OVERCAP
         if Assignment.MSA_RESULTS:
@@ -399,21 +565,76 @@ class Assignment:
         FastTripsLogger.debug("initialize_fasttrips_extension() STOPTIMES_COLUMN_DEPARTURE_TIME_MIN len: %d mean: %f" % \
                               (len(stop_times_df), stop_times_df[Trip.STOPTIMES_COLUMN_DEPARTURE_TIME_MIN].mean()))
 
-        _fasttrips.initialize_supply(output_dir, process_number,
-                                     stop_times_df[[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
-                                                    Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,
-                                                    Trip.STOPTIMES_COLUMN_STOP_ID_NUM]].as_matrix().astype('int32'),
-                                     stop_times_df[[Trip.STOPTIMES_COLUMN_ARRIVAL_TIME_MIN,
-                                                    Trip.STOPTIMES_COLUMN_DEPARTURE_TIME_MIN,
-                                                    overcap_col]].as_matrix().astype('float64'))
-
-        _fasttrips.initialize_parameters(Assignment.TIME_WINDOW.total_seconds()/60.0,
-                                         Assignment.BUMP_BUFFER.total_seconds()/60.0,
-                                         Assignment.STOCH_PATHSET_SIZE,
-                                         Assignment.STOCH_DISPERSION,
-                                         Assignment.STOCH_MAX_STOP_PROCESS_COUNT,
-                                         Assignment.MAX_NUM_PATHS,
-                                         Assignment.MIN_PATH_PROBABILITY)
+        return (stop_times_df[[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
+                               Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,
+                               Trip.STOPTIMES_COLUMN_STOP_ID_NUM]].as_matrix().astype('int32'),
+                stop_times_df[[Trip.STOPTIMES_COLUMN_ARRIVAL_TIME_MIN,
+                               Trip.STOPTIMES_COLUMN_DEPARTURE_TIME_MIN,
+                               overcap_col]].as_matrix().astype('float64'))
+
+    @staticmethod
+    def get_fasttrips_extension_parameters():
+        """
+        Returns the pathfinding parameters as the C++ fasttrips extension takes them, a list of (name, value)
+        in the order of the arguments to ``_fasttrips.initialize_parameters``.
+        """
+        return [("time_window",                  Assignment.TIME_WINDOW.total_seconds()/60.0),
+                ("bump_buffer",                  Assignment.BUMP_BUFFER.total_seconds()/60.0),
+                ("stoch_pathset_size",           Assignment.STOCH_PATHSET_SIZE),
+                ("stoch_dispersion",             Assignment.STOCH_DISPERSION),
+                ("stoch_max_stop_process_count", Assignment.STOCH_MAX_STOP_PROCESS_COUNT),
+                ("max_num_paths",                Assignment.MAX_NUM_PATHS),
+                ("min_path_probability",         Assignment.MIN_PATH_PROBABILITY)]
+
+    @staticmethod
+    def initialize_fasttrips_extension(process_number, output_dir, stop_times_df):
+        """
+        Initialize the C++ fasttrips extension by passing it the network supply.
+        """
+        FastTripsLogger.debug("Initializing fasttrips extension for process number %d" % process_number)
+
+        (stoptime_index, stoptime_times) = Assignment.get_fasttrips_extension_stop_times(stop_times_df)
+        _fasttrips.initialize_supply(output_dir, process_number, stoptime_index, stoptime_times)
+
+        _fasttrips.initialize_parameters(*[value for (name, value) in Assignment.get_fasttrips_extension_parameters()])
+
+    @staticmethod
+    def write_pathfinder_benchmark(output_dir, stop_times_df, pathsets, hyperpath):
+        """
+        Writes the inputs to the C++ extension for finding the given *pathsets* -- the vehicle trip stop times, the
+        pathfinding parameters and the path specifications -- to :py:attr:`Assignment.OUTPUT_BENCHMARK_STOP_TIMES_FILE`,
+        :py:attr:`Assignment.OUTPUT_BENCHMARK_PARAMETERS_FILE` and :py:attr:`Assignment.OUTPUT_BENCHMARK_PATH_SPECS_FILE`
+        in *output_dir*, next to the intermediate files with the rest of the supply.  The standalone pathfinder
+        benchmark, ``src/benchmark_pathfinder.cpp``, replays them.
+
+        Doubles are written with 17 significant digits so they read back exactly.
+        """
+        (stoptime_index, stoptime_times) = Assignment.get_fasttrips_extension_stop_times(stop_times_df)
+        stop_times_file = os.path.join(output_dir, Assignment.OUTPUT_BENCHMARK_STOP_TIMES_FILE)
+        numpy.savetxt(stop_times_file, numpy.hstack([stoptime_index, stoptime_times]),
+                      fmt=["%d","%d","%d","%.17g","%.17g","%.17g"], delimiter=" ", comments="",
+                      header="trip_id_num stop_sequence stop_id_num arrival_time_min departure_time_min overcap")
+
+        params_file = os.path.join(output_dir, Assignment.OUTPUT_BENCHMARK_PARAMETERS_FILE)
+        params_out  = open(params_file, "w")
+        params_out.write("param_name param_value\n")
+        for (name, value) in Assignment.get_fasttrips_extension_parameters():
+            params_out.write("%s %.17g\n" % (name, value))
+        params_out.close()
+
+        path_spec_cols = ["person_id_num", "trip_list_id_num", "hyperpath", "user_class", "purpose",
+                          "access_mode", "transit_mode", "egress_mode", "o_taz_num", "d_taz_num", "outbound", "pref_time_min"]
+        path_specs     = []
+        for pathset in pathsets:
+            path_specs.append([pathset.person_id_num, pathset.trip_list_id_num, 1 if hyperpath else 0,
+                               pathset.user_class, pathset.purpose, pathset.access_mode, pathset.transit_mode, pathset.egress_mode,
+                               pathset.o_taz_num, pathset.d_taz_num, 1 if pathset.outbound() else 0, float(pathset.pref_time_min)])
+        path_specs_df   = pandas.DataFrame(path_specs, columns=path_spec_cols)
+        path_specs_file = os.path.join(output_dir, Assignment.OUTPUT_BENCHMARK_PATH_SPECS_FILE)
+        path_specs_df.to_csv(path_specs_file, sep=" ", index=False, float_format="%.17g")
+
+        FastTripsLogger.info("Wrote pathfinder benchmark inputs for %d path specifications to %s, %s and %s" %
+                             (len(path_specs_df), stop_times_file, params_file, path_specs_file))
 
     @staticmethod
     def set_fasttrips_bump_wait(bump_wait_df):
@@ -467,7 +688,8 @@ class Assignment:
                 columns.remove(optional_col)
 
         veh_trips_df["iteration"] = iteration
-        Util.write_dataframe(veh_trips_df[columns], "veh_trips_df", os.path.join(output_dir, "veh_trips.csv"), append=(iteration>0))
+        Assignment.OUTPUT_WRITER.write_dataframe(veh_trips_df[columns], "veh_trips_df", os.path.join(output_dir, "veh_trips.csv"), append=(iteration>0),
+                                                 output_format=Assignment.OUTPUT_FORMAT, partition="iter%03d" % iteration)
         veh_trips_df.drop("iteration", axis=1, inplace=True)
 
     @staticmethod
@@ -475,12 +697,13 @@ class Assignment:
         """
         Merge the given new pathset paths and links into the existing
         """
-        FastTripsLogger.debug("merge_pathsets():     pathset_paths_df len=%d head=\n%s" % (len(    pathset_paths_df),     pathset_paths_df.head().to_string()))
-        FastTripsLogger.debug("merge_pathsets(): new_pathset_paths_df len=%d head=\n%s" % (len(new_pathset_paths_df), new_pathset_paths_df.head().to_string()))
-        FastTripsLogger.debug("merge_pathsets() dtypes=\n%s" % str(pathset_paths_df.dtypes))
-        FastTripsLogger.debug("merge_pathsets():     pathset_links_df len=%d head=\n%s" % (len(    pathset_links_df),     pathset_links_df.head().to_string()))
-        FastTripsLogger.debug("merge_pathsets(): new_pathset_links_df len=%d head=\n%s" % (len(new_pathset_links_df), new_pathset_links_df.head().to_string()))
-        FastTripsLogger.debug("merge_pathsets() dtypes=\n%s" % str(pathset_links_df.dtypes))
+        if debugDataFrames("merge_pathsets"):
+            FastTripsLogger.debug("merge_pathsets():     pathset_paths_df len=%d head=\n%s" % (len(    pathset_paths_df),     pathset_paths_df.head().to_string()))
+            FastTripsLogger.debug("merge_pathsets(): new_pathset_paths_df len=%d head=\n%s" % (len(new_pathset_paths_df), new_pathset_paths_df.head().to_string()))
+            FastTripsLogger.debug("merge_pathsets() dtypes=\n%s" % str(pathset_paths_df.dtypes))
+            FastTripsLogger.debug("merge_pathsets():     pathset_links_df len=%d head=\n%s" % (len(    pathset_links_df),     pathset_links_df.head().to_string()))
+            FastTripsLogger.debug("merge_pathsets(): new_pathset_links_df len=%d head=\n%s" % (len(new_pathset_links_df), new_pathset_links_df.head().to_string()))
+            FastTripsLogger.debug("merge_pathsets() dtypes=\n%s" % str(pathset_links_df.dtypes))
 
         # TODO: This might be inefficient...
 
@@ -510,8 +733,9 @@ class Assignment:
         pathset_links_df = pandas.concat([pathset_links_df, new_pathset_links_df], axis=0)
         FastTripsLogger.debug("Concatenated so pathset_links_df has %d rows" % len(pathset_links_df))
 
-        FastTripsLogger.debug("merge_pathsets():     pathset_paths_df len=%d head=\n%s\ntail=\n%s" % (len(pathset_paths_df), pathset_paths_df.head().to_string(),pathset_paths_df.tail().to_string()))
-        FastTripsLogger.debug("merge_pathsets():     pathset_links_df len=%d head=\n%s\ntail=\n%s" % (len(pathset_links_df), pathset_links_df.head().to_string(),pathset_links_df.tail().to_string()))
+        if debugDataFrames("merge_pathsets result"):
+            FastTripsLogger.debug("merge_pathsets():     pathset_paths_df len=%d head=\n%s\ntail=\n%s" % (len(pathset_paths_df), pathset_paths_df.head().to_string(),pathset_paths_df.tail().to_string()))
+            FastTripsLogger.debug("merge_pathsets():     pathset_links_df len=%d head=\n%s\ntail=\n%s" % (len(pathset_links_df), pathset_links_df.head().to_string(),pathset_links_df.tail().to_string()))
 
         # done with this
         pathfind_trip_list_df.drop(["new"], axis=1, inplace=True)
@@ -531,6 +755,9 @@ class Assignment:
         """
         Assignment.write_configuration(output_dir)
 
+        # outputs written every iteration go through this
+        Assignment.OUTPUT_WRITER = OutputWriter(Assignment.ASYNC_OUTPUT, int(Assignment.ASYNC_OUTPUT_MAX_MB*1024*1024))
+
         # write the initial load profile, iteration 0
         veh_trips_df     = FT.trips.get_full_trips()
         pathset_paths_df = None
@@ -541,49 +768,68 @@ class Assignment:
 
         for iteration in range(1,Assignment.ITERATION_FLAG+1):
             FastTripsLogger.info("***************************** ITERATION %d **************************************" % iteration)
+            StageTimer.iteration = iteration
 
             if (Assignment.PATHFINDING_TYPE == Assignment.PATHFINDING_TYPE_READ_FILE) and (iteration == 1):
                 FastTripsLogger.info("Reading paths from file")
-                (new_pathset_paths_df, new_pathset_links_df) = FT.passengers.read_passenger_pathsets(output_dir, include_asgn=False)
+                with StageTimer.stage("read passenger pathsets"):
+                    (new_pathset_paths_df, new_pathset_links_df) = FT.passengers.read_passenger_pathsets(output_dir, include_asgn=False)
+                    StageTimer.set_num_rows(len(new_pathset_links_df))
                 num_paths_found = Assignment.number_of_pathsets(new_pathset_paths_df)
 
             else:
-                num_paths_found = Assignment.generate_pathsets(FT, pathset_paths_df, veh_trips_df, output_dir, iteration)
-                (new_pathset_paths_df, new_pathset_links_df) = FT.passengers.setup_passenger_pathsets(iteration, FT.stops,
-                                                                                                      FT.trips.trip_id_df, FT.trips.trips_df, FT.routes.modes_df,
-                                                                                                      FT.transfers, FT.tazs, Assignment.PREPEND_ROUTE_ID_TO_TRIP_ID)
+                with StageTimer.stage("generate pathsets"):
+                    num_paths_found = Assignment.generate_pathsets(FT, pathset_paths_df, veh_trips_df, output_dir, iteration)
+                    StageTimer.set_num_rows(num_paths_found)
+                with StageTimer.stage("setup passenger pathsets"):
+                    (new_pathset_paths_df, new_pathset_links_df) = FT.passengers.setup_passenger_pathsets(iteration, FT.stops,
+                                                                                                          FT.trips.trip_id_df, FT.trips.trips_df, FT.routes.modes_df,
+                                                                                                          FT.transfers, FT.tazs, Assignment.PREPEND_ROUTE_ID_TO_TRIP_ID)
+                    StageTimer.set_num_rows(len(new_pathset_links_df))
                 # write pathfinding results to special PF results file
-                Passenger.write_paths(output_dir, 0, 0, new_pathset_paths_df, False, Assignment.OUTPUT_PATHSET_PER_SIM_ITER)
-                Passenger.write_paths(output_dir, 0, 0, new_pathset_links_df, True,  Assignment.OUTPUT_PATHSET_PER_SIM_ITER)
+                with StageTimer.stage("write pathfinding results", num_rows=len(new_pathset_links_df)):
+                    Passenger.write_paths(output_dir, 0, 0, new_pathset_paths_df, False, Assignment.OUTPUT_PATHSET_PER_SIM_ITER)
+                    Passenger.write_paths(output_dir, 0, 0, new_pathset_links_df, True,  Assignment.OUTPUT_PATHSET_PER_SIM_ITER)
 
                 # write performance info right away in case we crash, quit, etc
                 FT.performance.write(output_dir, iteration)
 
+            # the time-invariant part of the link costs only needs calculating once for the new pathsets
+            with StageTimer.stage("set static link cost", num_rows=len(new_pathset_links_df)):
+                new_pathset_links_df = PathSet.set_static_link_cost(new_pathset_links_df, FT.passengers.trip_list_df,
+                                                                    FT.transfers.transfers_df, FT.tazs.walk_df, FT.tazs.drive_df)
+
             if Assignment.PATHFINDING_EVERYONE:
                 pathset_paths_df = new_pathset_paths_df
                 pathset_links_df = new_pathset_links_df
             else:
-                (pathset_paths_df, pathset_links_df) = Assignment.merge_pathsets(FT.passengers.pathfind_trip_list_df, pathset_paths_df, pathset_links_df, new_pathset_paths_df, new_pathset_links_df)
+                with StageTimer.stage("merge pathsets"):
+                    (pathset_paths_df, pathset_links_df) = Assignment.merge_pathsets(FT.passengers.pathfind_trip_list_df, pathset_paths_df, pathset_links_df, new_pathset_paths_df, new_pathset_links_df)
+                    StageTimer.set_num_rows(len(pathset_links_df))
                 num_paths_found = Assignment.number_of_pathsets(pathset_paths_df)
 
             if Assignment.SIMULATION:
                 FastTripsLogger.info("****************************** SIMULATING *****************************")
-                (num_passengers_arrived, pathset_paths_df, pathset_links_df, veh_trips_df) = \
-                    Assignment.simulate(FT, output_dir, iteration, pathset_paths_df, pathset_links_df, veh_trips_df)
+                with StageTimer.stage("simulate", num_rows=len(pathset_links_df)):
+                    (num_passengers_arrived, pathset_paths_df, pathset_links_df, veh_trips_df) = \
+                        Assignment.simulate(FT, output_dir, iteration, pathset_paths_df, pathset_links_df, veh_trips_df)
             else:
                 # if we're not simulating, we can still calculate costs and choose paths
                 FastTripsLogger.info("****************************** CHOOSING PATHS WITHOUT SIMULATING *****************************")
 
-                (num_passengers_arrived, pathset_paths_df, pathset_links_df) = \
-                    Assignment.choose_paths_without_simulation(FT, output_dir, iteration, pathset_paths_df, pathset_links_df, veh_trips_df)
+                with StageTimer.stage("choose paths without simulation", num_rows=len(pathset_links_df)):
+                    (num_passengers_arrived, pathset_paths_df, pathset_links_df) = \
+                        Assignment.choose_paths_without_simulation(FT, output_dir, iteration, pathset_paths_df, pathset_links_df, veh_trips_df)
 
             # Set new schedule
             FT.trips.stop_times_df = veh_trips_df
 
-            Assignment.write_vehicle_trips(output_dir, iteration, veh_trips_df)
+            with StageTimer.stage("write vehicle trips", num_rows=len(veh_trips_df)):
+                Assignment.write_vehicle_trips(output_dir, iteration, veh_trips_df)
 
             if Assignment.OUTPUT_PASSENGER_TRAJECTORIES:
-                PathSet.write_path_times(Passenger.get_chosen_links(pathset_links_df), output_dir)
+                with StageTimer.stage("write path times"):
+                    PathSet.write_path_times(Passenger.get_chosen_links(pathset_links_df), output_dir)
 
             # capacity gap stuff
             num_bumped_passengers = num_paths_found - num_passengers_arrived
@@ -598,18 +844,27 @@ class Assignment:
             FastTripsLogger.info("  MISSED PASSENGERS:         %10d" % num_bumped_passengers)
             FastTripsLogger.info("  CAPACITY GAP:              %10.5f" % capacity_gap)
 
+            # write the stage timings so far in case we crash, quit, etc
+            StageTimer.write(output_dir)
+
             if False and capacity_gap < 0.001:
                 break
 
         # end for loop
 
+        # wait for the outputs to be written
+        with StageTimer.stage("wait for output writer"):
+            Assignment.OUTPUT_WRITER.close()
+        Assignment.OUTPUT_WRITER = OutputWriter()
+
     @staticmethod
     def filter_trip_list_to_not_arrived(trip_list_df, pathset_paths_df):
         """
         Filter the given trip list to only those that have not arrived according to *pathset_paths_df*.
         """
-        FastTripsLogger.debug("filter_trip_list_to_not_arrived(): trip_list_df len=%d head()=\n%s"  % (len(trip_list_df), trip_list_df.head().to_string()))
-        FastTripsLogger.debug("filter_trip_list_to_not_arrived(): pathset_paths_df len=%d head()=\n%s"  % (len(pathset_paths_df), pathset_paths_df.head().to_string()))
+        if debugDataFrames("filter_trip_list_to_not_arrived"):
+            FastTripsLogger.debug("filter_trip_list_to_not_arrived(): trip_list_df len=%d head()=\n%s"  % (len(trip_list_df), trip_list_df.head().to_string()))
+            FastTripsLogger.debug("filter_trip_list_to_not_arrived(): pathset_paths_df len=%d head()=\n%s"  % (len(pathset_paths_df), pathset_paths_df.head().to_string()))
 
         # filter to only the chosen paths
         chosen_paths_df = pathset_paths_df.loc[pathset_paths_df[Assignment.SIM_COL_PAX_CHOSEN] >= 0, [Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, Assignment.SIM_COL_PAX_CHOSEN]]
@@ -623,7 +878,8 @@ class Assignment:
         # remove chosen column
         trip_list_df_to_return.drop([Assignment.SIM_COL_PAX_CHOSEN], axis=1, inplace=True)
 
-        FastTripsLogger.debug("filter_trip_list_to_not_arrived(): trip_list_df_to_return len=%d head()=\n%s"  % (len(trip_list_df_to_return), trip_list_df_to_return.head().to_string()))
+        if debugDataFrames("filter_trip_list_to_not_arrived result"):
+            FastTripsLogger.debug("filter_trip_list_to_not_arrived(): trip_list_df_to_return len=%d head()=\n%s"  % (len(trip_list_df_to_return), trip_list_df_to_return.head().to_string()))
         return trip_list_df_to_return
 
     @staticmethod
@@ -655,6 +911,9 @@ class Assignment:
             if Assignment.SKIP_PERSON_IDS and len(Assignment.SKIP_PERSON_IDS) > 0:
                 FT.passengers.trip_list_df = FT.passengers.trip_list_df.loc[~FT.passengers.trip_list_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.SKIP_PERSON_IDS)]
 
+            # columnar storage for the pathsets we'll find
+            FT.passengers.create_pathset_store()
+
         # these are the trips for which we'll find paths
         FT.passengers.pathfind_trip_list_df = FT.passengers.trip_list_df
 
@@ -672,6 +931,7 @@ class Assignment:
         FastTripsLogger.info("Finding pathsets for %d trips" % est_paths_to_find)
         if est_paths_to_find == 0:
             return 0
+        FT.performance.reserve(est_paths_to_find)
 
         info_freq           = pow(10, int(math.log(est_paths_to_find+1,10)-2))
         if info_freq < 1: info_freq = 1
@@ -690,21 +950,32 @@ class Assignment:
             if num_processes > 1:
                 todo_queue      = multiprocessing.Queue()
                 done_queue      = multiprocessing.Queue()
-                for process_idx in range(1, 1+num_processes):
-                    FastTripsLogger.info("Starting worker process %2d" % process_idx)
-                    process_dict[process_idx] = {
-                        "process":multiprocessing.Process(target=find_trip_based_paths_process_worker,
-                            args=(iteration, process_idx, Assignment.INPUT_NETWORK_DIR, Assignment.INPUT_DEMAND_DIR,
-                                  Assignment.OUTPUT_DIR, todo_queue, done_queue,
-                                  Assignment.PATHFINDING_TYPE==Assignment.PATHFINDING_TYPE_STOCHASTIC,
-                                  Assignment.bump_wait_df, veh_trips_df)),
-                        "alive":True,
-                        "done":False
-                    }
-                    process_dict[process_idx]["process"].start()
+                # a worker forked while the output writer thread holds a lock would hang on it, so
+                # wait for the dataframe being written, but not the rest of the queue
+                Assignment.OUTPUT_WRITER.pause()
+                try:
+                    for process_idx in range(1, 1+num_processes):
+                        FastTripsLogger.info("Starting worker process %2d" % process_idx)
+                        process_dict[process_idx] = {
+                            "process":multiprocessing.Process(target=find_trip_based_paths_process_worker,
+                                args=(iteration, process_idx, Assignment.INPUT_NETWORK_DIR, Assignment.INPUT_DEMAND_DIR,
+                                      Assignment.OUTPUT_DIR, todo_queue, done_queue,
+                                      Assignment.PATHFINDING_TYPE==Assignment.PATHFINDING_TYPE_STOCHASTIC,
+                                      Assignment.bump_wait_df, veh_trips_df)),
+                            "alive":True,
+                            "done":False
+                        }
+                        process_dict[process_idx]["process"].start()
+                finally:
+                    Assignment.OUTPUT_WRITER.resume()
             else:
                 Assignment.initialize_fasttrips_extension(0, output_dir, veh_trips_df)
 
+            # the pathsets to record for the pathfinder benchmark
+            benchmark_pathsets    = None
+            if Assignment.RECORD_PATHFINDER_BENCHMARK and iteration == 1:
+                benchmark_pathsets = []
+
             # process tasks or send tasks to workers for processing
             num_paths_found_prev  = 0
             num_paths_found_now   = 0
@@ -717,15 +988,12 @@ class Assignment:
 
                 if Assignment.DEBUG_TRACE_ONLY and not trace_person: continue
 
-                # first iteration -- create path objects
-                if iteration==1:
-                    trip_pathset = PathSet(path_dict)
-                    FT.passengers.add_pathset(trip_list_id, trip_pathset)
-                else:
-                    trip_pathset = FT.passengers.get_pathset(trip_list_id)
+                trip_pathset = FT.passengers.get_pathset(trip_list_id)
 
                 if not trip_pathset.goes_somewhere(): continue
 
+                if benchmark_pathsets is not None: benchmark_pathsets.append(trip_pathset)
+
                 # find pathsets for everyone -- dwell times have changed
                 # if iteration > 1 and trip_list_id not in Assignment.bumped_trip_list_nums:
                 #    num_paths_found_prev += 1
@@ -738,11 +1006,11 @@ class Assignment:
                         FastTripsLogger.debug("Tracing assignment of person_id %s" % str(person_id))
 
                     # do the work
-                    (pathdict, perf_dict) = \
+                    (results, perf_dict) = \
                         Assignment.find_trip_based_pathset(iteration, trip_pathset,
                                                         Assignment.PATHFINDING_TYPE==Assignment.PATHFINDING_TYPE_STOCHASTIC,
                                                         trace=trace_person)
-                    trip_pathset.pathdict = pathdict
+                    trip_pathset.set_results(results, Assignment.PATHFINDING_TYPE==Assignment.PATHFINDING_TYPE_STOCHASTIC)
                     FT.performance.add_info(iteration, person_id, trip_list_id, perf_dict)
 
                     if trip_pathset.path_found():
@@ -756,6 +1024,10 @@ class Assignment:
                                              int( (time_elapsed.total_seconds() % 3600) / 60),
                                              time_elapsed.total_seconds() % 60))
 
+            if benchmark_pathsets is not None:
+                Assignment.write_pathfinder_benchmark(output_dir, veh_trips_df, benchmark_pathsets,
+                                                      Assignment.PATHFINDING_TYPE==Assignment.PATHFINDING_TYPE_STOCHASTIC)
+
             # multiprocessing follow-up
             if num_processes > 1:
                 # we're done, let each process know
@@ -763,7 +1035,7 @@ class Assignment:
                     todo_queue.put('DONE')
 
                 # get results
-                done_procs = 0  # where done means not alive
+                done_procs = 0  # where done means reported done, or not alive with nothing left on the queue
                 while done_procs < len(process_dict):
 
                     try:
@@ -774,16 +1046,14 @@ class Assignment:
                         if result[1] == "DONE":
                             FastTripsLogger.debug("Received done from process %d" % worker_num)
                             process_dict[worker_num]["done"] = True
+                            # the worker's performance records, in bulk
+                            FT.performance.add_records(result[2])
                         elif result[1] == "STARTING":
                             process_dict[worker_num]["working_on"] = (result[2],result[3])
                         elif result[1] == "COMPLETED":
                             trip_list_id    = result[2]
                             pathset         = FT.passengers.get_pathset(trip_list_id)
-                            pathset.pathdict= result[3]
-                            perf_dict       = result[4]
-                            person_id       = FT.passengers.get_person_id(trip_list_id)
-
-                            FT.performance.add_info(iteration, person_id, trip_list_id, perf_dict)
+                            pathset.set_results(result[3], Assignment.PATHFINDING_TYPE==Assignment.PATHFINDING_TYPE_STOCHASTIC)
 
                             if pathset.path_found():
                                 num_paths_found_now += 1
@@ -812,7 +1082,13 @@ class Assignment:
                         if process_dict[process_idx]["alive"] and not process_dict[process_idx]["process"].is_alive():
                             FastTripsLogger.debug("Process %d is not alive" % process_idx)
                             process_dict[process_idx]["alive"] = False
-                            done_procs += 1
+
+                    # workers exit right after putting DONE (with their performance records) on the queue, so a
+                    # worker that's not alive may still have results to read.  Check the queue after checking
+                    # the workers: what a dead worker put on it is there by then.
+                    queue_empty = done_queue.empty()
+                    done_procs  = len([process_idx for process_idx in process_dict.keys()
+                                       if process_dict[process_idx]["done"] or (not process_dict[process_idx]["alive"] and queue_empty)])
 
                 # join up my processes
                 for process_idx in process_dict.keys():
@@ -862,10 +1138,12 @@ class Assignment:
         Will do so either backwards (destination to origin) if :py:attr:`PathSet.direction` is :py:attr:`PathSet.DIR_OUTBOUND`
         or forwards (origin to destination) if :py:attr:`PathSet.direction` is :py:attr:`PathSet.DIR_INBOUND`.
 
-        Returns (pathdict,
+        Returns (results,
                  performance_dict)
 
-        Where pathdict maps {pathnum:{PATH_KEY_COST:cost, PATH_KEY_PROBABILITY:probability, PATH_KEY_STATES:[state list]}}
+        Where results is the tuple of numpy arrays (ret_ints, ret_doubles, path_costs) returned by the extension.
+        These are kept as-is in the :py:class:`PathSetStore`; use :py:meth:`PathSet.pathdict_from_results` to
+        convert them to a pathdict.
 
         Where performance_dict includes:
                  number of label iterations,
@@ -876,7 +1154,7 @@ class Assignment:
         :param iteration: The pathfinding iteration we're on
         :type  iteration: int
         :param pathset:   the path to fill in
-        :type  pathset:   a :py:class:`PathSet` instance
+        :type  pathset:   a :py:class:`PathSetView` instance
         :param hyperpath: pass True to use a stochastic hyperpath-finding algorithm, otherwise a deterministic shortest path
                           search algorithm will be use.
         :type  hyperpath: boolean
@@ -897,62 +1175,6 @@ class Assignment:
                                  1 if trace else 0)
         # FastTripsLogger.debug("C++ extension complete")
         # FastTripsLogger.debug("Finished finding path for person %s trip list id num %d" % (pathset.person_id, pathset.trip_list_id_num))
-        pathdict = {}
-        row_num  = 0
-
-        for path_num in range(path_costs.shape[0]):
-
-            pathdict[path_num] = {}
-            pathdict[path_num][PathSet.PATH_KEY_COST       ] = path_costs[path_num, 0]
-            pathdict[path_num][PathSet.PATH_KEY_PROBABILITY] = path_costs[path_num, 1]
-            # List of (stop_id, stop_state)
-            pathdict[path_num][PathSet.PATH_KEY_STATES     ] = []
-
-            # print "path_num %d" % path_num
-
-            # while we have unprocessed rows and the row is still relevant for this path_num
-            while (row_num < ret_ints.shape[0]) and (ret_ints[row_num, 0] == path_num):
-                # print row_num
-
-                mode = ret_ints[row_num,2]
-                # todo
-                if mode == -100:
-                    mode = PathSet.STATE_MODE_ACCESS
-                elif mode == -101:
-                    mode = PathSet.STATE_MODE_EGRESS
-                elif mode == -102:
-                    mode = PathSet.STATE_MODE_TRANSFER
-                elif mode == -103:
-                    mode = Passenger.MODE_GENERIC_TRANSIT_NUM
-
-                if hyperpath:
-                    pathdict[path_num][PathSet.PATH_KEY_STATES].append( (ret_ints[row_num, 1], [
-                        ret_doubles[row_num,0],                                                          # label,
-                        Util.SIMULATION_DAY_START + datetime.timedelta(minutes=ret_doubles[row_num,1]),  # departure/arrival time
-                        mode,                                                                            # departure/arrival mode
-                        ret_ints[row_num,3],                                                             # trip id
-                        ret_ints[row_num,4],                                                             # successor/predecessor
-                        ret_ints[row_num,5],                                                             # sequence
-                        ret_ints[row_num,6],                                                             # sequence succ/pred
-                        datetime.timedelta(minutes=ret_doubles[row_num,2]),                              # link time
-                        ret_doubles[row_num,3],                                                          # cost
-                        Util.SIMULATION_DAY_START + datetime.timedelta(minutes=ret_doubles[row_num,4])   # arrival/departure time
-                    ] ) )
-                else:
-                    pathdict[path_num][PathSet.PATH_KEY_STATES].append( (ret_ints[row_num, 1], [
-                        datetime.timedelta(minutes=ret_doubles[row_num,0]),                              # label,
-                        Util.SIMULATION_DAY_START + datetime.timedelta(minutes=ret_doubles[row_num,1]),  # departure/arrival time
-                        mode,                                                                            # departure/arrival mode
-                        ret_ints[row_num,3],                                                             # trip id
-                        ret_ints[row_num,4],                                                             # successor/predecessor
-                        ret_ints[row_num,5],                                                             # sequence
-                        ret_ints[row_num,6],                                                             # sequence succ/pred
-                        datetime.timedelta(minutes=ret_doubles[row_num,2]),                              # link time
-                        datetime.timedelta(minutes=ret_doubles[row_num,3]),                              # cost
-                        Util.SIMULATION_DAY_START + datetime.timedelta(minutes=ret_doubles[row_num,4])   # arrival/departure time
-                    ] ) )
-                row_num += 1
-
         perf_dict = { \
             Performance.PERFORMANCE_COLUMN_PROCESS_NUM           : process_num,
             Performance.PERFORMANCE_COLUMN_LABEL_ITERATIONS      : label_iterations,
@@ -964,7 +1186,7 @@ class Assignment:
             Performance.PERFORMANCE_COLUMN_WORKING_SET_BYTES     : bytes_workingset,
             Performance.PERFORMANCE_COLUMN_PRIVATE_USAGE_BYTES   : bytes_privateusage
         }
-        return (pathdict, perf_dict)
+        return ((ret_ints, ret_doubles, path_costs), perf_dict)
 
     @staticmethod
     def find_passenger_vehicle_times(pathset_links_df, veh_trips_df):
@@ -981,7 +1203,7 @@ class Assignment:
 
         Returns the same dataframe but with four additional columns (replacing them if they're already there).
         """
-        if len(Assignment.TRACE_PERSON_IDS) > 0:
+        if len(Assignment.TRACE_PERSON_IDS) > 0 and isDebugEnabled():
             FastTripsLogger.debug("find_passenger_vehicle_times(): input pathset_links_df len=%d\n%s" % \
                                   (len(pathset_links_df), pathset_links_df.loc[pathset_links_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS)].to_string()))
 
@@ -993,7 +1215,8 @@ class Assignment:
             pathset_links_df.drop([Assignment.SIM_COL_PAX_OVERCAP_FRAC], axis=1, inplace=True)
 
         # FastTripsLogger.debug("pathset_links_df:\n%s\n" % pathset_links_df.head().to_string())
-        FastTripsLogger.debug("veh_trips_df:\n%s\n" % veh_trips_df.head().to_string())
+        if debugDataFrames("find_passenger_vehicle_times"):
+            FastTripsLogger.debug("veh_trips_df:\n%s\n" % veh_trips_df.head().to_string())
 
         veh_trip_cols = [Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
                          Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,
@@ -1038,11 +1261,68 @@ class Assignment:
                                '%s_A' % Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,
                                '%s_B' % Trip.STOPTIMES_COLUMN_STOP_SEQUENCE], axis=1, inplace=True)
 
-        if len(Assignment.TRACE_PERSON_IDS) > 0:
+        if len(Assignment.TRACE_PERSON_IDS) > 0 and isDebugEnabled():
             FastTripsLogger.debug("find_passenger_vehicle_times(): output pathset_links_df len=%d\n%s" % \
                                   (len(pathset_links_df), pathset_links_df.loc[pathset_links_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS)].to_string()))
         return pathset_links_df
 
+    @staticmethod
+    def update_passenger_vehicle_times(pathset_links_df, veh_trips_df, changed_trip_stops_df):
+        """
+        Incremental version of :py:meth:`Assignment.find_passenger_vehicle_times`, for when the board and alight times
+        have already been set and only the vehicle trip-stops in *changed_trip_stops_df* (from :py:meth:`Trip.update_trip_times`)
+        have moved since.
+
+        Only the trip links boarding or alighting at those trip-stops get a new :py:attr:`Assignment.SIM_COL_PAX_BOARD_TIME`
+        or :py:attr:`Assignment.SIM_COL_PAX_ALIGHT_TIME`, looked up with :py:meth:`Trip.lookup_trip_stop_rows` rather than merged.
+        The overcap columns are left alone since vehicle times don't affect them.
+
+        Returns (pathset_links_df, changed_links) where changed_links is a boolean array, True for the links with new times.
+        """
+        trip_stop_index = Trip.make_trip_stop_index(veh_trips_df)
+        changed_rows    = Trip.lookup_trip_stop_rows(trip_stop_index,
+                                                     changed_trip_stops_df[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM  ].values,
+                                                     changed_trip_stops_df[Trip.STOPTIMES_COLUMN_STOP_SEQUENCE].values)
+        # one extra element at the end for rows that aren't found (-1)
+        changed         = numpy.zeros(trip_stop_index["num_rows"]+1, dtype=numpy.bool_)
+        changed[changed_rows] = True
+        changed[-1]     = False
+
+        trip_link       = pandas.notnull(pathset_links_df[Trip.TRIPS_COLUMN_TRIP_ID_NUM]).values
+        link_trip_nums  = numpy.where(trip_link, pathset_links_df[Trip.TRIPS_COLUMN_TRIP_ID_NUM].values, -1)
+        board_rows      = Trip.lookup_trip_stop_rows(trip_stop_index, link_trip_nums, numpy.where(trip_link, pathset_links_df["A_seq"].values, -1))
+        alight_rows     = Trip.lookup_trip_stop_rows(trip_stop_index, link_trip_nums, numpy.where(trip_link, pathset_links_df["B_seq"].values, -1))
+        moved_board     = changed[board_rows]
+        moved_alight    = changed[alight_rows]
+
+        # same as the merge in find_passenger_vehicle_times(): the stop id must match too
+        veh_stop_id_nums = veh_trips_df[Trip.STOPTIMES_COLUMN_STOP_ID_NUM].values
+        if moved_board.any():
+            rows = board_rows[moved_board]
+            pathset_links_df.loc[moved_board, Assignment.SIM_COL_PAX_BOARD_TIME] = \
+                numpy.where(veh_stop_id_nums[rows] == pathset_links_df["A_id_num"].values[moved_board],
+                            veh_trips_df[Trip.STOPTIMES_COLUMN_DEPARTURE_TIME].values[rows], numpy.datetime64("NaT"))
+        if moved_alight.any():
+            rows = alight_rows[moved_alight]
+            pathset_links_df.loc[moved_alight, Assignment.SIM_COL_PAX_ALIGHT_TIME] = \
+                numpy.where(veh_stop_id_nums[rows] == pathset_links_df["B_id_num"].values[moved_alight],
+                            veh_trips_df[Trip.STOPTIMES_COLUMN_ARRIVAL_TIME].values[rows], numpy.datetime64("NaT"))
+
+        # find_passenger_vehicle_times() replaces these columns, putting them last; keep the same column order for the outputs
+        move_cols = [Assignment.SIM_COL_PAX_BOARD_TIME, Trip.SIM_COL_VEH_OVERCAP]
+        if Assignment.SIM_COL_PAX_OVERCAP_FRAC in list(veh_trips_df.columns.values) and \
+           Assignment.SIM_COL_PAX_OVERCAP_FRAC in list(pathset_links_df.columns.values):
+            move_cols.append(Assignment.SIM_COL_PAX_OVERCAP_FRAC)
+        elif Assignment.SIM_COL_PAX_OVERCAP_FRAC in list(pathset_links_df.columns.values):
+            pathset_links_df.drop([Assignment.SIM_COL_PAX_OVERCAP_FRAC], axis=1, inplace=True)
+        move_cols.append(Assignment.SIM_COL_PAX_ALIGHT_TIME)
+        for colname in move_cols:
+            pathset_links_df[colname] = pathset_links_df.pop(colname)
+
+        FastTripsLogger.info("          update_passenger_vehicle_times updated %d board times and %d alight times" % \
+                             (moved_board.sum(), moved_alight.sum()))
+        return (pathset_links_df, moved_board | moved_alight)
+
     @staticmethod
     def put_passengers_on_vehicles(iteration, bump_iter, pathset_paths_df, pathset_links_df, veh_trips_df):
         """
@@ -1052,93 +1332,63 @@ class Assignment:
           - :py:attr:`Trip.SIM_COL_VEH_BOARDS`
           - :py:attr:`Trip.SIM_COL_VEH_ALIGHTS`
           - :py:attr:`Trip.SIM_COL_VEH_ONBOARD`
+          - :py:attr:`Trip.SIM_COL_VEH_MSA_BOARDS`, :py:attr:`Trip.SIM_COL_VEH_MSA_ALIGHTS` (when *bump_iter* is 0)
+          - :py:attr:`Trip.SIM_COL_VEH_MSA_ONBOARD`
+
+        The columns are set in place using the row index in :py:attr:`Assignment.veh_trips_index`, so the row
+        order of veh_trips_df is unchanged.
         """
-        # drop these -- we'll set them
-        if Trip.SIM_COL_VEH_BOARDS in list(veh_trips_df.columns.values):
-            veh_trips_df.drop([Trip.SIM_COL_VEH_BOARDS,
-                               Trip.SIM_COL_VEH_ALIGHTS,
-                               Trip.SIM_COL_VEH_ONBOARD], axis=1, inplace=True)
+        veh_loaded_df = veh_trips_df
 
-        veh_trips_df_len = len(veh_trips_df)
+        # the rows of veh_loaded_df stay put until the trip times are updated, so only index them at the start
+        if bump_iter==0 or type(Assignment.veh_trips_index) == type(None) or \
+           Assignment.veh_trips_index["num_rows"] != len(veh_loaded_df):
+            # missing vehicle attributes are zero (e.g. no dwell formula)
+            veh_loaded_df.fillna(value=0, inplace=True)
+            Assignment.veh_trips_index = Trip.make_trip_stop_index(veh_loaded_df)
+        trip_stop_index = Assignment.veh_trips_index
 
         passengers_df = Passenger.get_chosen_links(pathset_links_df)
 
-        # Group to boards by counting trip_list_id_nums for a (trip_id, A_id as stop_id)
-        passenger_trips_boards = passengers_df.loc[passengers_df[Assignment.SIM_COL_PAX_BUMP_ITER]==-1,  # unbumped passengers
-                                                   [Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
-                                                    Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,'A_id_num','A_seq']].groupby([Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,'A_id_num','A_seq']).count()
-        passenger_trips_boards.index.names = [Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
-                                              Trip.STOPTIMES_COLUMN_STOP_ID_NUM,
-                                              Trip.STOPTIMES_COLUMN_STOP_SEQUENCE]
-
-        # And alights by counting path_ids for a (trip_id, B_id as stop_id)
-        passenger_trips_alights = passengers_df.loc[passengers_df[Assignment.SIM_COL_PAX_BUMP_ITER]==-1,
-                                                    [Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
-                                                     Trip.TRIPS_COLUMN_TRIP_ID_NUM,'B_id_num','B_seq']].groupby([Trip.TRIPS_COLUMN_TRIP_ID_NUM,'B_id_num','B_seq']).count()
-        passenger_trips_alights.index.names = [Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
-                                               Trip.STOPTIMES_COLUMN_STOP_ID_NUM,
-                                               Trip.STOPTIMES_COLUMN_STOP_SEQUENCE]
-
-        # Join them to the transit vehicle trips so we can put people on vehicles (boards)
-        veh_loaded_df = pandas.merge(left        = veh_trips_df,
-                                     right       = passenger_trips_boards,
-                                     left_on     = [Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
-                                                    Trip.STOPTIMES_COLUMN_STOP_ID_NUM,
-                                                    Trip.STOPTIMES_COLUMN_STOP_SEQUENCE],
-                                     right_index = True,
-                                     how         = 'left')
-        veh_loaded_df.rename(columns={Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM:Trip.SIM_COL_VEH_BOARDS}, inplace=True)
-
-
-        # Join for alights
-        veh_loaded_df = pandas.merge(left        = veh_loaded_df,
-                                     right       = passenger_trips_alights,
-                                    left_on      = [Trip.TRIPS_COLUMN_TRIP_ID_NUM,
-                                                    Trip.STOPTIMES_COLUMN_STOP_ID_NUM,
-                                                    Trip.STOPTIMES_COLUMN_STOP_SEQUENCE],
-                                    right_index  = True,
-                                    how          ='left')
-        veh_loaded_df.rename(columns={Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM:Trip.SIM_COL_VEH_ALIGHTS}, inplace=True)
-        veh_loaded_df.fillna(value=0, inplace=True)
-        assert(len(veh_loaded_df)==veh_trips_df_len)
-
-        # these are ints, not floats
-        veh_loaded_df[[Trip.SIM_COL_VEH_BOARDS, Trip.SIM_COL_VEH_ALIGHTS]] = \
-            veh_loaded_df[[Trip.SIM_COL_VEH_BOARDS, Trip.SIM_COL_VEH_ALIGHTS]].astype(int)
+        # unbumped passengers on trip links
+        passengers_df = passengers_df.loc[(passengers_df[Assignment.SIM_COL_PAX_BUMP_ITER]==-1)&
+                                          (pandas.notnull(passengers_df[Trip.TRIPS_COLUMN_TRIP_ID_NUM])),
+                                          [Trip.TRIPS_COLUMN_TRIP_ID_NUM,'A_seq','B_seq']]
+
+        # Boards are counted at (trip_id, A_seq) and alights at (trip_id, B_seq)
+        board_rows  = Trip.lookup_trip_stop_rows(trip_stop_index, passengers_df[Trip.TRIPS_COLUMN_TRIP_ID_NUM].values, passengers_df['A_seq'].values)
+        alight_rows = Trip.lookup_trip_stop_rows(trip_stop_index, passengers_df[Trip.TRIPS_COLUMN_TRIP_ID_NUM].values, passengers_df['B_seq'].values)
+        boards      = numpy.bincount(board_rows [board_rows >=0], minlength=trip_stop_index["num_rows"])
+        alights     = numpy.bincount(alight_rows[alight_rows>=0], minlength=trip_stop_index["num_rows"])
+
+        veh_loaded_df[Trip.SIM_COL_VEH_BOARDS ] = boards
+        veh_loaded_df[Trip.SIM_COL_VEH_ALIGHTS] = alights
 
         # MSA the boards and alights
         # TODO figure out how this works with the multiple levels of iterations
+        msa_boards  = veh_loaded_df[Trip.SIM_COL_VEH_MSA_BOARDS ].values
+        msa_alights = veh_loaded_df[Trip.SIM_COL_VEH_MSA_ALIGHTS].values
         if bump_iter==0:
-            msa_lambda = 1.0/iteration
-            veh_loaded_df[Trip.SIM_COL_VEH_MSA_BOARDS ] = msa_lambda*veh_loaded_df[Trip.SIM_COL_VEH_BOARDS ] + (1.0-msa_lambda)*veh_loaded_df[Trip.SIM_COL_VEH_MSA_BOARDS ]
-            veh_loaded_df[Trip.SIM_COL_VEH_MSA_ALIGHTS] = msa_lambda*veh_loaded_df[Trip.SIM_COL_VEH_ALIGHTS] + (1.0-msa_lambda)*veh_loaded_df[Trip.SIM_COL_VEH_MSA_ALIGHTS]
-
-        veh_loaded_df.set_index([Trip.TRIPS_COLUMN_TRIP_ID_NUM,Trip.STOPTIMES_COLUMN_STOP_SEQUENCE],inplace=True)
-        veh_loaded_df[Trip.SIM_COL_VEH_ONBOARD    ] = veh_loaded_df[Trip.SIM_COL_VEH_BOARDS    ] - veh_loaded_df[Trip.SIM_COL_VEH_ALIGHTS    ]
-        veh_loaded_df[Trip.SIM_COL_VEH_MSA_ONBOARD] = veh_loaded_df[Trip.SIM_COL_VEH_MSA_BOARDS] - veh_loaded_df[Trip.SIM_COL_VEH_MSA_ALIGHTS]
+            msa_lambda  = 1.0/iteration
+            msa_boards  = msa_lambda*boards  + (1.0-msa_lambda)*msa_boards
+            msa_alights = msa_lambda*alights + (1.0-msa_lambda)*msa_alights
+            veh_loaded_df[Trip.SIM_COL_VEH_MSA_BOARDS ] = msa_boards
+            veh_loaded_df[Trip.SIM_COL_VEH_MSA_ALIGHTS] = msa_alights
 
         # on board is the cumulative sum of boards - alights
-        trips_cumsum = veh_loaded_df[[Trip.SIM_COL_VEH_ONBOARD, Trip.SIM_COL_VEH_MSA_ONBOARD]].groupby(level=[0]).cumsum()
-        veh_loaded_df.drop([Trip.SIM_COL_VEH_ONBOARD, Trip.SIM_COL_VEH_MSA_ONBOARD], axis=1, inplace=True) # replace with cumsum
-        veh_loaded_df = pandas.merge(left        = veh_loaded_df,
-                                     right       = trips_cumsum,
-                                     left_index  = True,
-                                     right_index = True,
-                                     how         = 'left')
-
-        assert(len(veh_loaded_df)==veh_trips_df_len)
-        # print veh_trips_df.loc[5123368]
-        veh_loaded_df.reset_index(inplace=True)
-
-        FastTripsLogger.debug("veh_loaded_df with onboard>0: (showing head)\n" + \
-                              veh_loaded_df.loc[veh_loaded_df[Trip.SIM_COL_VEH_ONBOARD]>0].head().to_string(formatters=\
-               {Trip.STOPTIMES_COLUMN_ARRIVAL_TIME   :Util.datetime64_formatter,
-                Trip.STOPTIMES_COLUMN_DEPARTURE_TIME :Util.datetime64_formatter}))
+        veh_loaded_df[Trip.SIM_COL_VEH_ONBOARD    ] = Trip.trip_stop_cumsum(trip_stop_index, boards - alights)
+        veh_loaded_df[Trip.SIM_COL_VEH_MSA_ONBOARD] = Trip.trip_stop_cumsum(trip_stop_index, msa_boards - msa_alights)
+
+        if debugDataFrames("put_passengers_on_vehicles"):
+            FastTripsLogger.debug("veh_loaded_df with onboard>0: (showing head)\n" + \
+                                  veh_loaded_df.loc[veh_loaded_df[Trip.SIM_COL_VEH_ONBOARD]>0].head().to_string(formatters=\
+                   {Trip.STOPTIMES_COLUMN_ARRIVAL_TIME   :Util.datetime64_formatter,
+                    Trip.STOPTIMES_COLUMN_DEPARTURE_TIME :Util.datetime64_formatter}))
 
         return veh_loaded_df
 
     @staticmethod
-    def flag_missed_transfers(pathset_paths_df, pathset_links_df):
+    def flag_missed_transfers(pathset_paths_df, pathset_links_df, changed_links=None):
         """
         Given passenger pathset links with the vehicle board_time and alight_time attached to trip links,
         this method will add columns to determine if there are missed transfers.
@@ -1169,7 +1419,57 @@ class Assignment:
 
         The column, :py:attr:`AssignmentSIM_COL_PAX_MISSED_XFER`, is also added to *pathset_paths_df*.
 
+        If *changed_links* (a boolean array, e.g. from :py:meth:`Assignment.update_passenger_vehicle_times`) is passed and these
+        columns are already set, then only the paths including a changed link (or a link whose times will be moved back a day)
+        are re-evaluated.
+
         """
+        if type(changed_links) != type(None) and \
+           Assignment.SIM_COL_PAX_ALIGHT_DELAY_MIN in list(pathset_links_df.columns.values) and \
+           Assignment.SIM_COL_MISSED_XFER in list(pathset_paths_df.columns.values):
+
+            # these get moved back a day below so their paths need redoing too
+            redo_links  = changed_links | \
+                ((pathset_links_df[Assignment.SIM_COL_PAX_ALIGHT_TIME]-pathset_links_df[Passenger.PF_COL_PAX_B_TIME])/numpy.timedelta64(1, 'm') > 22*60).values
+
+            # path keys from trip_list_id_num, pathnum
+            path_factor = int(max(pathset_links_df[Passenger.PF_COL_PATH_NUM].max(), pathset_paths_df[Passenger.PF_COL_PATH_NUM].max())) + 1
+            link_keys   = pathset_links_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values.astype(numpy.int64)*path_factor + \
+                          pathset_links_df[Passenger.PF_COL_PATH_NUM].values.astype(numpy.int64)
+            path_keys   = pathset_paths_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values.astype(numpy.int64)*path_factor + \
+                          pathset_paths_df[Passenger.PF_COL_PATH_NUM].values.astype(numpy.int64)
+            redo_keys   = numpy.unique(link_keys[redo_links])
+            redo_links  = numpy.in1d(link_keys, redo_keys)
+            redo_paths  = numpy.in1d(path_keys, redo_keys)
+
+            FastTripsLogger.info("          flag_missed_transfers re-evaluating %d of %d paths" % (redo_paths.sum(), len(pathset_paths_df)))
+            if redo_links.any():
+                (redo_paths_df, redo_links_df) = Assignment.flag_missed_transfers(pathset_paths_df.loc[redo_paths].copy(),
+                                                                                  pathset_links_df.loc[redo_links].copy())
+                # merges keep the row order, so put them back in place
+                for colname in [Assignment.SIM_COL_PAX_BOARD_TIME,
+                                Assignment.SIM_COL_PAX_ALIGHT_TIME,
+                                Assignment.SIM_COL_PAX_ALIGHT_DELAY_MIN,
+                                Assignment.SIM_COL_PAX_A_TIME,
+                                Assignment.SIM_COL_PAX_B_TIME,
+                                Assignment.SIM_COL_PAX_LINK_TIME,
+                                Assignment.SIM_COL_PAX_WAIT_TIME,
+                                Assignment.SIM_COL_MISSED_XFER]:
+                    pathset_links_df.loc[redo_links, colname] = redo_links_df[colname].values
+                pathset_paths_df.loc[redo_paths, Assignment.SIM_COL_MISSED_XFER] = redo_paths_df[Assignment.SIM_COL_MISSED_XFER].values
+
+            # the full pass replaces these columns, putting them last; keep the same column order for the outputs
+            for colname in [Assignment.SIM_COL_PAX_ALIGHT_DELAY_MIN,
+                            Assignment.SIM_COL_PAX_A_TIME,
+                            Assignment.SIM_COL_PAX_B_TIME,
+                            Assignment.SIM_COL_PAX_LINK_TIME,
+                            Assignment.SIM_COL_PAX_WAIT_TIME,
+                            Assignment.SIM_COL_MISSED_XFER]:
+                pathset_links_df[colname] = pathset_links_df.pop(colname)
+            pathset_paths_df[Assignment.SIM_COL_MISSED_XFER] = pathset_paths_df.pop(Assignment.SIM_COL_MISSED_XFER)
+
+            return (pathset_paths_df, pathset_links_df)
+
         # Drop these, we'll set them again
         if Assignment.SIM_COL_PAX_ALIGHT_DELAY_MIN in list(pathset_links_df.columns.values):
             pathset_links_df.drop([Assignment.SIM_COL_PAX_ALIGHT_DELAY_MIN,
@@ -1180,7 +1480,8 @@ class Assignment:
                                    Assignment.SIM_COL_MISSED_XFER], axis=1, inplace=True)
 
         # Set alight delay (min)
-        FastTripsLogger.debug("flag_missed_transfers() pathset_links_df (%d):\n%s" % (len(pathset_links_df), pathset_links_df.head().to_string()))
+        if debugDataFrames("flag_missed_transfers"):
+            FastTripsLogger.debug("flag_missed_transfers() pathset_links_df (%d):\n%s" % (len(pathset_links_df), pathset_links_df.head().to_string()))
         pathset_links_df[Assignment.SIM_COL_PAX_ALIGHT_DELAY_MIN] = 0.0
         pathset_links_df.loc[pandas.notnull(pathset_links_df[Trip.TRIPS_COLUMN_TRIP_ID_NUM]), Assignment.SIM_COL_PAX_ALIGHT_DELAY_MIN] = \
             ((pathset_links_df[Assignment.SIM_COL_PAX_ALIGHT_TIME]-pathset_links_df[Passenger.PF_COL_PAX_B_TIME])/numpy.timedelta64(1, 'm'))
@@ -1193,7 +1494,7 @@ class Assignment:
 
         max_alight_delay_min = pathset_links_df[Assignment.SIM_COL_PAX_ALIGHT_DELAY_MIN].max()
         FastTripsLogger.debug("Biggest alight_delay = %f" % max_alight_delay_min)
-        if max_alight_delay_min > 0:
+        if max_alight_delay_min > 0 and debugDataFrames("flag_missed_transfers alight delay"):
             FastTripsLogger.debug("\n%s" % pathset_links_df.sort_values(by=Assignment.SIM_COL_PAX_ALIGHT_DELAY_MIN, ascending=False).head().to_string())
 
         # For trips, alight_time is the new B_time
@@ -1208,7 +1509,8 @@ class Assignment:
         # Add it to passenger trips.  Now A time is set for links after trip links (note this will never be a trip link)
         pathset_links_df = pandas.merge(left=pathset_links_df, right=next_trips, how="left", on=[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, Passenger.PF_COL_PATH_NUM, Passenger.PF_COL_LINK_NUM])
 
-        FastTripsLogger.debug(str(pathset_links_df.dtypes))
+        if debugDataFrames("flag_missed_transfers dtypes"):
+            FastTripsLogger.debug(str(pathset_links_df.dtypes))
 
         # Set the new B time for those links -- link time for access/egress/xfer is travel time since wait times are in trip links
         pathset_links_df[Assignment.SIM_COL_PAX_B_TIME] = pathset_links_df[Assignment.SIM_COL_PAX_A_TIME] + pathset_links_df[Passenger.PF_COL_LINK_TIME]
@@ -1260,242 +1562,271 @@ class Assignment:
             pathset_paths_df.drop([Assignment.SIM_COL_MISSED_XFER], axis=1, inplace=True)
 
         pathset_paths_df = pandas.merge(left=pathset_paths_df, right=pathset_links_df_grouped.reset_index()[[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, Passenger.PF_COL_PATH_NUM, Assignment.SIM_COL_MISSED_XFER]], how="left")
-        FastTripsLogger.debug("flag_missed_transfers() pathset_paths_df (%d):\n%s" % (len(pathset_paths_df), pathset_paths_df.head(30).to_string()))
+        if debugDataFrames("flag_missed_transfers result"):
+            FastTripsLogger.debug("flag_missed_transfers() pathset_paths_df (%d):\n%s" % (len(pathset_paths_df), pathset_paths_df.head(30).to_string()))
 
         return (pathset_paths_df, pathset_links_df)
 
     @staticmethod
-    def flag_bump_overcap_passengers(iteration, simulation_iteration, bump_iter, pathset_paths_df, pathset_links_df, veh_loaded_df):
+    def flag_bump_overcap_passengers(iteration, simulation_iteration, pathset_paths_df, pathset_links_df, veh_loaded_df):
         """
         Check if we have boards on over-capacity vehicles.  Mark them and mark the boards.
 
         If :py:attr:`Assignment.CAPACITY_CONSTRAINT`, then bump off overcapacity passengers.
 
-        The process is:
+        *veh_loaded_df* must have just been loaded by :py:meth:`Assignment.put_passengers_on_vehicles`, which
+        builds :py:attr:`Assignment.veh_trips_index`.  The trip links in *pathset_links_df* are indexed against the
+        vehicle trip-stops once, and bumping is then done in rounds on numpy arrays; each round only touches the links
+        boarding at its bump stops and the vehicle trips whose loads change, rather than re-merging the link table.
+
+        Each round (numbered in :py:attr:`Assignment.SIM_COL_PAX_BUMP_ITER`) is:
 
-        1) Look at which vehicle links are over capacity, adding columns named :py:attr:`Trip.SIM_COL_VEH_OVERCAP`
-           and py:attr:`Trip.SIM_COL_VEH_OVERCAP_FRAC` to *veh_loaded_df*
+        1) Vehicle trip-stops with :py:attr:`Trip.SIM_COL_VEH_OVERCAP` of zero are at capacity, so chosen links boarding
+           there are marked :py:attr:`Assignment.SIM_COL_PAX_BUMPSTOP_BOARDED` = 1
 
-        2) Look at the stops where the first people board after we're at capacity (impossible boards) if any
+        2) Look at the stops where the first people board after we're at capacity (impossible boards) if any.
+           If :py:attr:`Assignment.BUMP_ONE_AT_A_TIME`, select the first such stop by arrival time (ties broken by
+           trip_id_num and stop sequence).  Otherwise, select the first such stop for each vehicle trip.
+           Since bumping only lowers vehicle loads, the one-at-a-time stops are found by a single sweep of
+           the trip-stops in arrival time order.
 
-        3) If :py:attr:`Assignment.BUMP_ONE_AT_A_TIME`, select the first such stop by arrival time
-           Otherwise, select the first such stop for each vehicle trip
+        3) If not :py:attr:`Assignment.CAPACITY_CONSTRAINT`, we're done.
 
-        4) Join these stops to pathset_links_df, so pathset_links_df now has column Assignment.SIM_COL_PAX_OVERCAP_FRAC
+        4) Figure out which passenger trips are actually getting bumped.  Some people can get on at these stops, but not all, so let the first
+           ones that arrive at the stop get on and bump the rest.  Bumped paths and unchosen paths boarding at the bump stops get
+           :py:attr:`Assignmment.SIM_COL_PAX_BUMP_ITER` set to the round, and the first arrival at each bump stop is added to
+           :py:attr:`Assignment.bump_wait_df`.
 
-        5) If not :py:attr:`Assignment.CAPACITY_CONSTRAINT`, return (and drop the column named :py:attr:`Trip.SIM_COL_VEH_OVERCAP` from veh_loaded_df)
+        5) Take the bumped chosen paths off their vehicles, updating the load of those vehicle trips only.
+           If no chosen paths were bumped, we're done.
 
-        6) Figure out which passenger trips are actually getting bumped.  Some people can get on at these stops, but not all, so let the first
-           ones that arrive at the stop get on and filter to the ones we'll actually bump.  Update the column named :py:attr:`Assignmment.SIM_COL_PAX_BUMP_ITER`.
-           If non-negative, this represents the iteration the passenger got bumped.
+        Updates columns :py:attr:`Trip.SIM_COL_VEH_BOARDS`, :py:attr:`Trip.SIM_COL_VEH_ALIGHTS`, :py:attr:`Trip.SIM_COL_VEH_ONBOARD`
+        and :py:attr:`Trip.SIM_COL_VEH_OVERCAP` of *veh_loaded_df*, and :py:attr:`Assignment.SIM_COL_PAX_BUMP_ITER` and
+        :py:attr:`Assignment.SIM_COL_PAX_BUMPSTOP_BOARDED` of *pathset_links_df*.  If no vehicles are left over capacity,
+        *veh_loaded_df* also gets :py:attr:`Assignment.SIM_COL_PAX_OVERCAP_FRAC`, which
+        :py:meth:`Assignment.find_passenger_vehicle_times` joins to the passenger links.
 
         Return (chosen_paths_bumped, pathset_paths_df, pathset_links_df, veh_loaded_df)
         """
-
-        # 1) Look at which vehicle links are over capacity
-        # overcap = how many people are problematic
-        # overcap_frac = what percentage of boards are problematic
-        veh_loaded_df[Trip.SIM_COL_VEH_OVERCAP           ] = veh_loaded_df[Trip.SIM_COL_VEH_ONBOARD] - veh_loaded_df[Trip.VEHICLES_COLUMN_TOTAL_CAPACITY]
-        veh_loaded_df[Assignment.SIM_COL_PAX_OVERCAP_FRAC] = 0.0
-
-        # Keep negatives - that means we have space
-        # veh_loaded_df.loc[veh_loaded_df[Trip.SIM_COL_VEH_OVERCAP]<0, Trip.SIM_COL_VEH_OVERCAP           ] = 0  # negatives - don't care, set to zero
-        veh_loaded_df.loc[veh_loaded_df[Trip.SIM_COL_VEH_BOARDS ]>0, Assignment.SIM_COL_PAX_OVERCAP_FRAC] = veh_loaded_df[Trip.SIM_COL_VEH_OVERCAP]/veh_loaded_df[Trip.SIM_COL_VEH_BOARDS]
+        trip_stop_index = Assignment.veh_trips_index
+        num_veh         = trip_stop_index["num_rows"]
+        order           = trip_stop_index["order"]
+        trip_start      = trip_stop_index["trip_start"]
+        trip_len        = trip_stop_index["trip_len"]
+
+        # vehicle trip-stop state, in veh_loaded_df row order
+        veh_trip_nums   = veh_loaded_df[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM].values.astype(numpy.int64)
+        boards          = veh_loaded_df[Trip.SIM_COL_VEH_BOARDS ].values.astype(numpy.int64)
+        alights         = veh_loaded_df[Trip.SIM_COL_VEH_ALIGHTS].values.astype(numpy.int64)
+        onboard         = veh_loaded_df[Trip.SIM_COL_VEH_ONBOARD].values.astype(numpy.int64)
+        capacity        = veh_loaded_df[Trip.VEHICLES_COLUMN_TOTAL_CAPACITY].values
+        # overcap = how many people are problematic.  Keep negatives - that means we have space
+        overcap         = onboard - capacity
 
         # only need to do this once
         # TODO: figure out MSA with iteration/simulation_iteration/bump_iter
-        if iteration==1 and simulation_iteration==0 and bump_iter==0:
-            veh_loaded_df[Trip.SIM_COL_VEH_MSA_OVERCAP] = veh_loaded_df[Trip.SIM_COL_VEH_MSA_ONBOARD] - veh_loaded_df[Trip.VEHICLES_COLUMN_TOTAL_CAPACITY]
-            veh_loaded_df.loc[veh_loaded_df[Trip.SIM_COL_VEH_MSA_OVERCAP]<0, Trip.SIM_COL_VEH_MSA_OVERCAP] = 0  # negatives - don't care, set to zero
-
-        # These are the trips/stops AT capacity -- first, make sure it's clear they successfully boarded
-        atcap_df = veh_loaded_df.loc[veh_loaded_df[Trip.SIM_COL_VEH_OVERCAP] == 0]
-        FastTripsLogger.debug("flag_bump_overcap_passengers() %d vehicle trip/stops at capacity: (showing head)\n%s" % \
-                              (len(atcap_df), atcap_df.head().to_string()))
-
-        # Join pathset links to atcap_df; now passenger links alighting at a bump stop will have Trip.STOPTIMES_COLUMN_STOP_SEQUENCE set
-        pathset_links_df = pandas.merge(left    =pathset_links_df,
-                                        left_on =[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM, "A_seq"],
-                                        right   =atcap_df[[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM, Trip.STOPTIMES_COLUMN_STOP_SEQUENCE]],
-                                        right_on=[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM, Trip.STOPTIMES_COLUMN_STOP_SEQUENCE],
-                                        how     ="left")
-
-        # these folks boarded
-        pathset_links_df.loc[(pandas.notnull(pathset_links_df[Trip.STOPTIMES_COLUMN_STOP_SEQUENCE])) & \
-                             (pathset_links_df[Assignment.SIM_COL_PAX_CHOSEN]>=0), Assignment.SIM_COL_PAX_BUMPSTOP_BOARDED] = 1
-
-        FastTripsLogger.debug("flag_bump_overcap_passengers() pathset_links_df chosen, at capacity\n%s" % # pathset_links_df.head().to_string())
-            pathset_links_df.loc[ (pandas.notnull(pathset_links_df[Trip.STOPTIMES_COLUMN_STOP_SEQUENCE])) & \
-                                  (pathset_links_df[Assignment.SIM_COL_PAX_CHOSEN]>=0) ].to_string())
-        pathset_links_df.drop(Trip.STOPTIMES_COLUMN_STOP_SEQUENCE, axis=1, inplace=True)
-
-        # These are trips/stops over capacity
-        overcap_df = veh_loaded_df.loc[veh_loaded_df[Trip.SIM_COL_VEH_OVERCAP] > 0]
-        FastTripsLogger.debug("flag_bump_overcap_passengers() %d vehicle trip/stops over capacity: (showing head)\n%s" % \
-                              (len(overcap_df), overcap_df.head().to_string()))
-
-        # If none, we're done
-        if len(overcap_df) == 0:
-            FastTripsLogger.info("          No over-capacity vehicles")
-            return (0, pathset_paths_df, pathset_links_df, veh_loaded_df)
-
-        # 2) Look at the trip-stops where the *first people* board after we're at capacity (impossible boards) if any
-        bump_stops_df = overcap_df.groupby([Trip.STOPTIMES_COLUMN_TRIP_ID]).aggregate('first').reset_index()
-        FastTripsLogger.debug("flag_bump_overcap_passengers() bump_stops_df iter=%d sim_iter=%d bump_iter=%d (%d rows, showing head):\n%s" %
-                              (iteration, simulation_iteration, bump_iter, len(bump_stops_df), bump_stops_df.head().to_string()))
-
-
-        if Assignment.CAPACITY_CONSTRAINT:
-            # One stop at a time -- slower but more accurate
-            # 3) If Assignment.BUMP_ONE_AT_A_TIME, select the first such stop by arrival time
-            #    Otherwise, select the first such stop for each vehicle trip
-            if Assignment.BUMP_ONE_AT_A_TIME:
-                bump_stops_df.sort_values(by=[Trip.STOPTIMES_COLUMN_ARRIVAL_TIME], inplace=True)
-                bump_stops_df = bump_stops_df.iloc[:1]
-
-            FastTripsLogger.info("          Need to bump %d passengers from %d trip-stops" % (bump_stops_df.overcap.sum(), len(bump_stops_df)))
-
-        # debug -- see the whole trip
-        if True:
-            FastTripsLogger.debug("flag_bump_overcap_passengers() Trips with bump stops:\n%s\n" % \
-                pandas.merge(
-                    left=veh_loaded_df[[Trip.STOPTIMES_COLUMN_TRIP_ID,
-                                        Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
-                                        Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,
-                                        Trip.STOPTIMES_COLUMN_STOP_ID,
-                                        Trip.STOPTIMES_COLUMN_STOP_ID_NUM,
-                                        Trip.VEHICLES_COLUMN_TOTAL_CAPACITY,
-                                        Trip.SIM_COL_VEH_BOARDS,
-                                        Trip.SIM_COL_VEH_ALIGHTS,
-                                        Trip.SIM_COL_VEH_ONBOARD,
-                                        Trip.SIM_COL_VEH_OVERCAP,
-                                        Assignment.SIM_COL_PAX_OVERCAP_FRAC]],
-                    right=bump_stops_df[[Trip.STOPTIMES_COLUMN_TRIP_ID]],
-                    how='inner').to_string())
-
-        # 4) Join these stops to pathset_links_df, so pathset_links_df now has column Assignment.SIM_COL_PAX_OVERCAP_FRAC
-        pathset_links_df = Assignment.find_passenger_vehicle_times(pathset_links_df, veh_loaded_df)
-
-        # 5) If not Assignment.CAPACITY_CONSTRAINT, return (and drop the column named Trip.SIM_COL_VEH_OVERCAP from veh_loaded_df)
-        #    (If we're not actually bumping passengers, we're done; the pathset_links_df have overcap and overcap_frac information)
-        if not Assignment.CAPACITY_CONSTRAINT:
+        if iteration==1 and simulation_iteration==0:
+            msa_overcap = veh_loaded_df[Trip.SIM_COL_VEH_MSA_ONBOARD].values - capacity
+            veh_loaded_df[Trip.SIM_COL_VEH_MSA_OVERCAP] = numpy.where(msa_overcap < 0, 0, msa_overcap)  # negatives - don't care, set to zero
+
+        # passenger link state, in pathset_links_df row order
+        num_links       = len(pathset_links_df)
+        trip_link       = pandas.notnull(pathset_links_df[Trip.TRIPS_COLUMN_TRIP_ID_NUM]).values
+        link_trip_nums  = numpy.where(trip_link, pathset_links_df[Trip.TRIPS_COLUMN_TRIP_ID_NUM].values, -1).astype(numpy.int64)
+        board_row       = Trip.lookup_trip_stop_rows(trip_stop_index, link_trip_nums,
+                                                     numpy.where(trip_link, pathset_links_df["A_seq"].values, -1))
+        alight_row      = Trip.lookup_trip_stop_rows(trip_stop_index, link_trip_nums,
+                                                     numpy.where(trip_link, pathset_links_df["B_seq"].values, -1))
+        chosen          = (pathset_links_df[Assignment.SIM_COL_PAX_CHOSEN]>=0).values
+        link_bump_iter  = pathset_links_df[Assignment.SIM_COL_PAX_BUMP_ITER].values.copy()
+        # links counted in the vehicle loads by put_passengers_on_vehicles()
+        loaded          = chosen & (link_bump_iter==-1) & trip_link
+
+        # index links by path and by boarding trip-stop so a round only visits the links it needs
+        pathnums        = pathset_links_df[Passenger.PF_COL_PATH_NUM].values.astype(numpy.int64)
+        path_keys       = pathset_links_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values.astype(numpy.int64)*(int(pathnums.max())+1 if num_links > 0 else 1) + pathnums
+        path_code       = pandas.factorize(path_keys)[0]
+        (path_links, path_links_start, path_links_count) = Util.group_positions(path_code, int(path_code.max())+1 if num_links > 0 else 0)
+        (stop_links, stop_links_start, stop_links_count) = Util.group_positions(board_row, num_veh)
+
+        # round each link was last a bump candidate and the outcome (1 boarded, 0 bumped)
+        link_bump_round    = numpy.zeros(num_links, dtype=numpy.int64) - 1
+        link_bump_boarded  = numpy.zeros(num_links, dtype=numpy.int64)
+        # which trip-stops are at capacity, and the last round they were so (or -1)
+        is_atcap           = (overcap == 0)
+        last_atcap_round   = numpy.zeros(num_veh, dtype=numpy.int64) - 1
+
+        bump_one_at_a_time = Assignment.CAPACITY_CONSTRAINT and Assignment.BUMP_ONE_AT_A_TIME
+        if bump_one_at_a_time:
+            arrival_times  = veh_loaded_df[Trip.STOPTIMES_COLUMN_ARRIVAL_TIME].values.astype("datetime64[ns]").astype(numpy.int64)
+            time_order     = numpy.lexsort((veh_loaded_df[Trip.STOPTIMES_COLUMN_STOP_SEQUENCE].values, veh_trip_nums, arrival_times))
+            time_pos       = 0
+
+        new_bump_waits      = []
+        chosen_paths_bumped = 0
+        bump_iter           = 0
+        no_overcap          = False
+
+        while True:
+            # 2) Look at the trip-stops where the *first people* board after we're at capacity
+            if bump_one_at_a_time:
+                # bumping only lowers loads, so the stops already swept never go over capacity again
+                while time_pos < num_veh:
+                    overcap_pos = numpy.flatnonzero(overcap[time_order[time_pos:time_pos+1024]] > 0)
+                    if len(overcap_pos) > 0:
+                        time_pos += overcap_pos[0]
+                        break
+                    time_pos += 1024
+                bump_rows = time_order[time_pos:time_pos+1]
+            else:
+                is_overcap = overcap > 0
+                bump_rows  = numpy.flatnonzero(is_overcap & (Trip.trip_stop_cumsum(trip_stop_index, is_overcap.astype(numpy.int64)) == 1))
+
+            # If none, we're done
+            if len(bump_rows) == 0:
+                FastTripsLogger.info("          No over-capacity vehicles")
+                no_overcap = True
+                break
+
+            if debugDataFrames("flag_bump_overcap_passengers"):
+                FastTripsLogger.debug("flag_bump_overcap_passengers() bump stops iter=%d sim_iter=%d bump_iter=%d (%d rows, showing head):\n%s" %
+                                      (iteration, simulation_iteration, bump_iter, len(bump_rows),
+                                       veh_loaded_df.iloc[bump_rows[:5]][[Trip.STOPTIMES_COLUMN_TRIP_ID,
+                                                                          Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,
+                                                                          Trip.STOPTIMES_COLUMN_STOP_ID,
+                                                                          Trip.VEHICLES_COLUMN_TOTAL_CAPACITY]].to_string()))
+
+            # 3) If we're not actually bumping passengers, we're done
+            if not Assignment.CAPACITY_CONSTRAINT:
+                break
+
+            FastTripsLogger.info("          Need to bump %d passengers from %d trip-stops" % (overcap[bump_rows].sum(), len(bump_rows)))
+
+            # 4) unbumped links boarding at the bump stops
+            bumpstop_links = stop_links[Util.concatenate_ranges(stop_links_start[bump_rows], stop_links_count[bump_rows])]
+            bumpstop_links = bumpstop_links[link_bump_iter[bumpstop_links] < 0]
+            # unchosen bump candidates (to hedge against future choosing of paths with at-capacity links)
+            unchosen_links = bumpstop_links[~chosen[bumpstop_links]]
+            bumpstop_links = bumpstop_links[ chosen[bumpstop_links]]
+
+            bumpstop_boards = pathset_links_df.iloc[bumpstop_links][[Assignment.SIM_COL_PAX_A_TIME,
+                                                                     Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
+                                                                     "A_seq", "A_id_num",
+                                                                     Passenger.PF_COL_PAX_A_TIME,
+                                                                     Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM]].reset_index(drop=True)
+            bumpstop_boards["link_pos"] = bumpstop_links
+            bumpstop_boards[Trip.SIM_COL_VEH_OVERCAP] = overcap[board_row[bumpstop_links]]
+
+            # bump off later arrivals, later trip_list_num
+            bumpstop_boards.sort_values(by=[ \
+                Assignment.SIM_COL_PAX_A_TIME, # I think this is correct
+                Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
+                "A_seq",
+                Passenger.PF_COL_PAX_A_TIME,
+                Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM],
+                ascending=[True, True, True, False, False], inplace=True)
+
+            # For each trip_id, stop_seq, stop_id, we want the first *overcap* rows
+            bump_index = bumpstop_boards.groupby([Trip.STOPTIMES_COLUMN_TRIP_ID_NUM, "A_seq", "A_id_num"]).cumcount().values
+            bumped     = bump_index < bumpstop_boards[Trip.SIM_COL_VEH_OVERCAP].values
+            board_pos  = bumpstop_boards["link_pos"].values
+            link_bump_round  [board_pos] = bump_iter
+            link_bump_boarded[board_pos] = numpy.where(bumped, 0, 1)
+
+            new_bump_wait = bumpstop_boards[[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM, "A_seq", "A_id_num",
+                                             Passenger.PF_COL_PAX_A_TIME]].groupby([Trip.STOPTIMES_COLUMN_TRIP_ID_NUM, "A_seq", "A_id_num"]).first()
+            new_bump_wait.reset_index(drop=False, inplace=True)
+            new_bump_wait.rename(columns={"A_seq"   :Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,
+                                          "A_id_num":Trip.STOPTIMES_COLUMN_STOP_ID_NUM}, inplace=True)
+            new_bump_waits.append(new_bump_wait)
+
+            # Kick out the bumped passengers, plus unchosen paths that board here
+            bumped_paths   = numpy.unique(path_code[board_pos[bumped]])
+            bump_paths     = numpy.union1d(bumped_paths, path_code[unchosen_links])
+            bumped_links   = path_links[Util.concatenate_ranges(path_links_start[bumped_paths], path_links_count[bumped_paths])]
+            link_bump_iter[path_links[Util.concatenate_ranges(path_links_start[bump_paths], path_links_count[bump_paths])]] = bump_iter
+
+            FastTripsLogger.info("        -> completed loop bump_iter %d and bumped %d chosen paths" % (bump_iter, len(bumped_paths)))
+            chosen_paths_bumped += len(bumped_paths)
+            if len(bumped_paths) == 0:
+                break
 
+            # 5) take them off the vehicles and update the load for those vehicle trips
+            bumped_links       = bumped_links[loaded[bumped_links]]
+            loaded[bumped_links] = False
+            off_board_rows     = board_row [bumped_links]
+            off_board_rows     = off_board_rows [off_board_rows >=0]
+            off_alight_rows    = alight_row[bumped_links]
+            off_alight_rows    = off_alight_rows[off_alight_rows>=0]
+            numpy.subtract.at(boards,  off_board_rows,  1)
+            numpy.subtract.at(alights, off_alight_rows, 1)
+
+            trips              = numpy.unique(veh_trip_nums[numpy.concatenate([off_board_rows, off_alight_rows])])
+            rows               = order[Util.concatenate_ranges(trip_start[trips], trip_len[trips])]
+            net_boards         = boards[rows] - alights[rows]
+            trip_onboard       = numpy.cumsum(net_boards)
+            trip_first         = numpy.repeat(numpy.cumsum(trip_len[trips]) - trip_len[trips], trip_len[trips])
+            onboard[rows]      = trip_onboard - (trip_onboard[trip_first] - net_boards[trip_first])
+            overcap[rows]      = onboard[rows] - capacity[rows]
+
+            # 1) at capacity status for the next round
+            now_atcap          = (overcap[rows] == 0)
+            last_atcap_round[rows[is_atcap[rows] & ~now_atcap]] = bump_iter
+            is_atcap[rows]     = now_atcap
+
+            bump_iter += 1
+
+        # the at capacity stops were marked each round through the last one
+        last_atcap_round[is_atcap] = bump_iter
+
+        veh_loaded_df[Trip.SIM_COL_VEH_BOARDS ] = boards
+        veh_loaded_df[Trip.SIM_COL_VEH_ALIGHTS] = alights
+        veh_loaded_df[Trip.SIM_COL_VEH_ONBOARD] = onboard
+        veh_loaded_df[Trip.SIM_COL_VEH_OVERCAP] = overcap
+
+        # overcap_frac = what percentage of boards are problematic.  This is only kept if no vehicles are
+        # over capacity, so that find_passenger_vehicle_times() passes it on to the passenger links
+        if no_overcap:
+            overcap_frac = numpy.zeros(num_veh, dtype=numpy.float64)
+            numpy.true_divide(overcap, boards, out=overcap_frac, where=boards>0)
+            veh_loaded_df[Assignment.SIM_COL_PAX_OVERCAP_FRAC] = overcap_frac
+        elif Assignment.SIM_COL_PAX_OVERCAP_FRAC in list(veh_loaded_df.columns.values):
             veh_loaded_df.drop(Assignment.SIM_COL_PAX_OVERCAP_FRAC, axis=1, inplace=True)
-            return (0, pathset_paths_df, pathset_links_df, veh_loaded_df)
-
-        # join pathset links to bump_stops_df; now passenger links alighting at a bump stop will have Trip.STOPTIMES_COLUMN_STOP_SEQUENCE set
-        pathset_links_df = pandas.merge(left    =pathset_links_df,
-                                        left_on =[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM, "A_seq"],
-                                        right   =bump_stops_df[[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM, Trip.STOPTIMES_COLUMN_STOP_SEQUENCE]],
-                                        right_on=[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM, Trip.STOPTIMES_COLUMN_STOP_SEQUENCE],
-                                        how     ="left")
-        FastTripsLogger.debug("flag_bump_overcap_passengers() pathset_links_df (%d rows, showing head):\n%s" % (len(pathset_links_df), pathset_links_df.head().to_string()))
-
-        # bump candidates: boarding at bump stops, chosen paths, unbumped and overcap
-        bumpstop_boards = pathset_links_df.loc[pandas.notnull(pathset_links_df[Trip.STOPTIMES_COLUMN_STOP_SEQUENCE])&        # board at bump_stops_df stop
-                                               (pathset_links_df[Assignment.SIM_COL_PAX_CHOSEN]                 >=0)&        # chosen
-                                               (pathset_links_df[Assignment.SIM_COL_PAX_BUMP_ITER]              < 0)].copy() # unbumped
-        # unchosen bump candidates (to hedge against future choosing of paths with at-capacity links)
-        unchosen_atcap_boards = pathset_links_df.loc[(pandas.notnull(pathset_links_df[Trip.STOPTIMES_COLUMN_STOP_SEQUENCE]))&    # board at bump_stops_df stop
-                                                     (pathset_links_df[Assignment.SIM_COL_PAX_CHOSEN]                    <0)&    # path not chosen (yet)
-                                                     (pathset_links_df[Assignment.SIM_COL_PAX_BUMP_ITER]                 <0)]    # unbumped
-
-        # bump off later arrivals, later trip_list_num
-        bumpstop_boards.sort_values(by=[ \
-            Assignment.SIM_COL_PAX_A_TIME, # I think this is correct
-            Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
-            "A_seq",
-            Passenger.PF_COL_PAX_A_TIME,
-            Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM],
-            ascending=[True, True, True, False, False], inplace=True)
-        bumpstop_boards.reset_index(drop=True, inplace=True)
-
-        # For each trip_id, stop_seq, stop_id, we want the first *overcap* rows
-        # group to trip_id, stop_seq, stop_id and count off
-        bpb_count = bumpstop_boards.groupby([Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
-                                             "A_seq",
-                                             "A_id_num"]).cumcount()
-        bpb_count.name = 'bump_index'
-
-        # Add the bump index to our passenger-paths/stops
-        bumpstop_boards = pandas.concat([bumpstop_boards, bpb_count], axis=1)
-
-        # 1 mean boarded, 0 means we got bumped
-        bumpstop_boards["new_bumpstop_boarded"] = 1
-        bumpstop_boards.loc[ bumpstop_boards["bump_index"] < bumpstop_boards[Trip.SIM_COL_VEH_OVERCAP], "new_bumpstop_boarded"] = 0  # these folks got bumped
-
-        FastTripsLogger.debug("flag_bump_overcap_passengers() bumpstop_boards (%d rows, showing head):\n%s" % 
-                              (len(bumpstop_boards), bumpstop_boards.head(50).to_string()))
-
-        # filter to unique passengers/paths who got bumped
-        bump_paths = bumpstop_boards.loc[ bumpstop_boards["new_bumpstop_boarded"] == 0,
-            [Passenger.TRIP_LIST_COLUMN_PERSON_ID, Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, Passenger.PF_COL_PATH_NUM]].drop_duplicates()
-        chosen_paths_bumped = len(bump_paths)
-
-        # if we have unchosen paths that board here, add those too
-        if len(unchosen_atcap_boards) > 0:
-
-            FastTripsLogger.debug("flag_bump_overcap_passengers() unchosen_atcap_boards (%d rows, showing head):\n%s" % \
-                (len(unchosen_atcap_boards), unchosen_atcap_boards.head().to_string()))
-            unchosen_atcap_boards = unchosen_atcap_boards[[Passenger.TRIP_LIST_COLUMN_PERSON_ID,
-                                                           Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
-                                                           Passenger.PF_COL_PATH_NUM]].drop_duplicates()
-            bump_paths = pandas.concat([bump_paths, unchosen_atcap_boards], axis=0)
-
-        bump_paths['bump_iter_new'] = bump_iter
-
-        FastTripsLogger.debug("flag_bump_overcap_passengers() bump_paths (%d rows, showing head):\n%s" % \
-            (len(bump_paths), bump_paths.head().to_string()))
-
-        # Kick out the bumped passengers -- update bump_iter on all pathset_links_df
-        pathset_links_df = pandas.merge(left =pathset_links_df, right=bump_paths, how  ="left")
-        pathset_links_df.loc[ pandas.notnull(pathset_links_df['bump_iter_new']), Assignment.SIM_COL_PAX_BUMP_ITER] = pathset_links_df['bump_iter_new']
-
-        # Keep record of if they boarded at a bumpstop
-        pathset_links_df = pandas.merge(left=pathset_links_df,
-                                        right=bumpstop_boards[[Passenger.TRIP_LIST_COLUMN_PERSON_ID,
-                                                               Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
-                                                               Passenger.PF_COL_PATH_NUM,
-                                                               Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
-                                                               "A_seq","new_bumpstop_boarded"]],
-                                        how="left")
-        pathset_links_df.loc[ pandas.notnull(pathset_links_df['new_bumpstop_boarded']), Assignment.SIM_COL_PAX_BUMPSTOP_BOARDED] = pathset_links_df["new_bumpstop_boarded"]
-
-        new_bump_wait = bumpstop_boards[[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
-                                           Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,
-                                           "A_id_num",
-                                           Passenger.PF_COL_PAX_A_TIME]].groupby( \
-                        [Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,"A_id_num"]).first()
-        new_bump_wait.reset_index(drop=False, inplace=True)
-        new_bump_wait.rename(columns={"A_id_num":Trip.STOPTIMES_COLUMN_STOP_ID_NUM}, inplace=True)
-
-        FastTripsLogger.debug("new_bump_wait (%d rows, showing head):\n%s" %
-            (len(new_bump_wait), new_bump_wait.head().to_string(formatters=\
-           {Passenger.PF_COL_PAX_A_TIME:Util.datetime64_formatter})))
 
-        # incorporate it into the bump wait df
-        if type(Assignment.bump_wait_df) == type(None):
-            Assignment.bump_wait_df = new_bump_wait
-        else:
-            Assignment.bump_wait_df = pandas.concat([Assignment.bump_wait_df, new_bump_wait], axis=0)
+        pathset_links_df[Assignment.SIM_COL_PAX_BUMP_ITER] = link_bump_iter
 
-            FastTripsLogger.debug("flag_bump_overcap_passengers() bump_wait_df (%d rows, showing head):\n%s" %
-                (len(Assignment.bump_wait_df), Assignment.bump_wait_df.head().to_string()))
+        # Keep record of if they boarded at a bumpstop: the at capacity mark and the bump outcome
+        # happen in round order, and within a round, the bump outcome comes second
+        link_atcap_round   = numpy.where(chosen & (board_row >= 0), last_atcap_round[numpy.maximum(board_row, 0)], -1)
+        set_bump_boarded   = (link_bump_round >= 0) & (link_bump_round >= link_atcap_round)
+        set_atcap_boarded  = (link_atcap_round >= 0) & ~set_bump_boarded
+        # the column is there even if nobody boarded at a bump stop
+        if Assignment.SIM_COL_PAX_BUMPSTOP_BOARDED in list(pathset_links_df.columns.values):
+            bumpstop_boarded = pathset_links_df[Assignment.SIM_COL_PAX_BUMPSTOP_BOARDED].values.astype(numpy.float64)
+        else:
+            bumpstop_boarded = numpy.zeros(num_links, dtype=numpy.float64) + numpy.NaN
+        bumpstop_boarded[set_atcap_boarded] = 1
+        bumpstop_boarded[set_bump_boarded ] = link_bump_boarded[set_bump_boarded]
+        pathset_links_df[Assignment.SIM_COL_PAX_BUMPSTOP_BOARDED] = bumpstop_boarded
 
+        # incorporate it into the bump wait df
+        if len(new_bump_waits) > 0:
+            new_bump_wait = pandas.concat(new_bump_waits, axis=0)
+            if debugDataFrames("flag_bump_overcap_passengers new_bump_wait"):
+                FastTripsLogger.debug("new_bump_wait (%d rows, showing head):\n%s" %
+                    (len(new_bump_wait), new_bump_wait.head().to_string(formatters=\
+                   {Passenger.PF_COL_PAX_A_TIME:Util.datetime64_formatter})))
+
+            if type(Assignment.bump_wait_df) == type(None):
+                Assignment.bump_wait_df = new_bump_wait
+            else:
+                Assignment.bump_wait_df = pandas.concat([Assignment.bump_wait_df, new_bump_wait], axis=0)
             Assignment.bump_wait_df.drop_duplicates(subset=[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
                                                             Trip.STOPTIMES_COLUMN_STOP_SEQUENCE], inplace=True)
 
-        # drop unnecessary columns before returning
-        pathset_links_df.drop([ \
-            Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,  # adding this
-            'bump_iter_new',
-            'new_bumpstop_boarded'
-            ], axis=1, inplace=True)
-
-        veh_loaded_df.drop(Assignment.SIM_COL_PAX_OVERCAP_FRAC, axis=1, inplace=True)
-
-        FastTripsLogger.debug("flag_bump_overcap_passengers(): return pathset_links_df.head():\n%s\n" % pathset_links_df.head().to_string())
-        FastTripsLogger.debug("flag_bump_overcap_passengers(): return veh_loaded_df.head():\n%s\n" % veh_loaded_df.head().to_string())
+        if debugDataFrames("flag_bump_overcap_passengers result"):
+            FastTripsLogger.debug("flag_bump_overcap_passengers(): return pathset_links_df.head():\n%s\n" % pathset_links_df.head().to_string())
+            FastTripsLogger.debug("flag_bump_overcap_passengers(): return veh_loaded_df.head():\n%s\n" % veh_loaded_df.head().to_string())
 
         return (chosen_paths_bumped, pathset_paths_df, pathset_links_df, veh_loaded_df)
 
@@ -1511,7 +1842,8 @@ class Assignment:
         FastTripsLogger.info("  Step 1. Find out board/alight times for all pathset links from vehicle times")
 
         # could do this just to chosen path links but let's do this to the whole pathset
-        pathset_links_df = Assignment.find_passenger_vehicle_times(pathset_links_df, veh_trips_df)
+        with StageTimer.stage("find passenger vehicle times", num_rows=len(pathset_links_df)):
+            pathset_links_df = Assignment.find_passenger_vehicle_times(pathset_links_df, veh_trips_df)
 
         # instead of flag_missed_transfers(), set these to pathfinding results
         pathset_links_df[Assignment.SIM_COL_PAX_ALIGHT_DELAY_MIN] = 0
@@ -1523,34 +1855,40 @@ class Assignment:
 
         ######################################################################################################
         FastTripsLogger.info("  Step 2. Calculate costs and probabilities for all pathset paths")
-        (pathset_paths_df, pathset_links_df) = PathSet.calculate_cost(
-            iteration, simulation_iteration, Assignment.STOCH_DISPERSION,
-            pathset_paths_df, pathset_links_df, FT.passengers.trip_list_df,
-            FT.transfers.transfers_df, FT.tazs.walk_df, FT.tazs.drive_df, veh_trips_df, FT.stops)
+        with StageTimer.stage("calculate cost", num_rows=len(pathset_links_df)):
+            (pathset_paths_df, pathset_links_df) = PathSet.calculate_cost(
+                iteration, simulation_iteration, Assignment.STOCH_DISPERSION,
+                pathset_paths_df, pathset_links_df, FT.passengers.trip_list_df,
+                FT.transfers.transfers_df, FT.tazs.walk_df, FT.tazs.drive_df, veh_trips_df, FT.stops)
 
         ######################################################################################################
         FastTripsLogger.info("  Step 3. Choose a path for each passenger from their pathset")
 
         # Choose path for each passenger -- pathset_paths_df and pathset_links_df will now have
         # SIM_COL_PAX_CHOSEN >=0 for chosen paths/path links
-        (num_passengers_arrived, num_chosen, pathset_paths_df, pathset_links_df) = Passenger.choose_paths(
-            True,  # choose for everyone
-            iteration, simulation_iteration,
-            pathset_paths_df, pathset_links_df)
+        with StageTimer.stage("choose paths", num_rows=len(pathset_paths_df)):
+            (num_passengers_arrived, num_chosen, pathset_paths_df, pathset_links_df) = Passenger.choose_paths(
+                True,  # choose for everyone
+                iteration, simulation_iteration,
+                pathset_paths_df, pathset_links_df)
 
         # Write the pathsets
-        Passenger.write_paths(output_dir, iteration, simulation_iteration, pathset_paths_df, False, Assignment.OUTPUT_PATHSET_PER_SIM_ITER)
-        Passenger.write_paths(output_dir, iteration, simulation_iteration, pathset_links_df, True,  Assignment.OUTPUT_PATHSET_PER_SIM_ITER)
+        with StageTimer.stage("write pathsets", num_rows=len(pathset_links_df)):
+            Passenger.write_paths(output_dir, iteration, simulation_iteration, pathset_paths_df, False, Assignment.OUTPUT_PATHSET_PER_SIM_ITER)
+            Passenger.write_paths(output_dir, iteration, simulation_iteration, PathSet.drop_static_link_cost(pathset_links_df, inplace=False),
+                                  True, Assignment.OUTPUT_PATHSET_PER_SIM_ITER)
 
         # write the final chosen paths for this iteration
-        chosen_links_df = Passenger.get_chosen_links(pathset_links_df)
+        chosen_links_df = PathSet.drop_static_link_cost(Passenger.get_chosen_links(pathset_links_df))
         chosen_links_df["iteration"] = iteration
-        Util.write_dataframe(chosen_links_df, "chosen_links_df", os.path.join(output_dir, "chosenpaths_links.csv"), append=(iteration>1))
+        Assignment.OUTPUT_WRITER.write_dataframe(chosen_links_df, "chosen_links_df", os.path.join(output_dir, "chosenpaths_links.csv"), append=(iteration>1),
+                                                 output_format=Assignment.OUTPUT_FORMAT, partition="iter%03d" % iteration)
         chosen_links_df.drop(["iteration"], axis=1, inplace=True)
 
         chosen_paths_df = Passenger.get_chosen_links(pathset_paths_df)
         chosen_paths_df["iteration"] = iteration
-        Util.write_dataframe(chosen_paths_df, "chosen_paths_df", os.path.join(output_dir, "chosenpaths_paths.csv"), append=(iteration>1))
+        Assignment.OUTPUT_WRITER.write_dataframe(chosen_paths_df, "chosen_paths_df", os.path.join(output_dir, "chosenpaths_paths.csv"), append=(iteration>1),
+                                                 output_format=Assignment.OUTPUT_FORMAT, partition="iter%03d" % iteration)
         chosen_paths_df.drop(["iteration"], axis=1, inplace=True)
 
         return (num_passengers_arrived, pathset_paths_df, pathset_links_df)
@@ -1565,10 +1903,11 @@ class Assignment:
         """
         simulation_iteration   = 0
         num_passengers_arrived = 0 # will get returned from choose_paths
+        changed_trip_stops_df  = None # vehicle trip-stops with new times from the last simulation iteration
 
         while True:
             FastTripsLogger.info("Simulation Iteration %d" % simulation_iteration)
-            for trace_pax in Assignment.TRACE_PERSON_IDS:
+            for trace_pax in (Assignment.TRACE_PERSON_IDS if isDebugEnabled() else []):
                 FastTripsLogger.debug("Initial pathset_links_df for %s\n%s" % \
                    (str(trace_pax), pathset_links_df.loc[pathset_links_df.person_id==trace_pax].to_string()))
 
@@ -1579,90 +1918,94 @@ class Assignment:
             FastTripsLogger.info("  Step 1. Find out board/alight times for all pathset links from vehicle times")
 
             # could do this just to chosen path links but let's do this to the whole pathset
-            pathset_links_df = Assignment.find_passenger_vehicle_times(pathset_links_df, veh_trips_df)
+            changed_links = None
+            with StageTimer.stage("find passenger vehicle times", num_rows=len(pathset_links_df)):
+                if type(changed_trip_stops_df) == type(None):
+                    pathset_links_df = Assignment.find_passenger_vehicle_times(pathset_links_df, veh_trips_df)
+                else:
+                    # only the trip-stops that moved since the last simulation iteration
+                    (pathset_links_df, changed_links) = Assignment.update_passenger_vehicle_times(pathset_links_df, veh_trips_df, changed_trip_stops_df)
 
             ######################################################################################################
             FastTripsLogger.info("  Step 2. Flag missed transfer links and paths in the pathsets")
-            (pathset_paths_df, pathset_links_df) = Assignment.flag_missed_transfers(pathset_paths_df, pathset_links_df)
+            with StageTimer.stage("flag missed transfers", num_rows=len(pathset_links_df)):
+                (pathset_paths_df, pathset_links_df) = Assignment.flag_missed_transfers(pathset_paths_df, pathset_links_df, changed_links)
 
             ######################################################################################################
             FastTripsLogger.info("  Step 3. Calculate costs and probabilities for all pathset paths")
-            (pathset_paths_df, pathset_links_df) = PathSet.calculate_cost(
-                iteration, simulation_iteration, Assignment.STOCH_DISPERSION,
-                pathset_paths_df, pathset_links_df, FT.passengers.trip_list_df,
-                FT.transfers.transfers_df, FT.tazs.walk_df, FT.tazs.drive_df, veh_trips_df, FT.stops)
+            with StageTimer.stage("calculate cost", num_rows=len(pathset_links_df)):
+                (pathset_paths_df, pathset_links_df) = PathSet.calculate_cost(
+                    iteration, simulation_iteration, Assignment.STOCH_DISPERSION,
+                    pathset_paths_df, pathset_links_df, FT.passengers.trip_list_df,
+                    FT.transfers.transfers_df, FT.tazs.walk_df, FT.tazs.drive_df, veh_trips_df, FT.stops)
 
             ######################################################################################################
             FastTripsLogger.info("  Step 4. Choose a path for each passenger from their pathset")
 
             # Choose path for each passenger -- pathset_paths_df and pathset_links_df will now have
             # SIM_COL_PAX_CHOSEN >=0 for chosen paths/path links
-            (num_passengers_arrived, num_chosen, pathset_paths_df, pathset_links_df) = Passenger.choose_paths(
-                Assignment.PATHFINDING_EVERYONE and simulation_iteration==0,  # choose for everyone if we just re-found all paths
-                iteration, simulation_iteration,
-                pathset_paths_df, pathset_links_df)
+            with StageTimer.stage("choose paths", num_rows=len(pathset_paths_df)):
+                (num_passengers_arrived, num_chosen, pathset_paths_df, pathset_links_df) = Passenger.choose_paths(
+                    Assignment.PATHFINDING_EVERYONE and simulation_iteration==0,  # choose for everyone if we just re-found all paths
+                    iteration, simulation_iteration,
+                    pathset_paths_df, pathset_links_df)
 
             ######################################################################################################
             FastTripsLogger.info("  Step 5. Put passenger paths on transit vehicles to get vehicle boards/alights/load")
 
             # no one is bumped yet
-            bump_iter = 0
             pathset_links_df[Assignment.SIM_COL_PAX_OVERCAP_FRAC] = numpy.NaN
 
             if simulation_iteration==0:
                 # For those we just found paths for, no one is bumped or going on overcap vehicles yet
                 pathset_links_df.loc[pathset_links_df[Passenger.PF_COL_PF_ITERATION]==iteration, Assignment.SIM_COL_PAX_BUMP_ITER ] = -1
 
-            while True: # loop for capacity constraint
-
-                # Put passengers on vehicles, updating the vehicle's boards, alights, onboard
-                veh_trips_df = Assignment.put_passengers_on_vehicles(iteration, bump_iter, pathset_paths_df, pathset_links_df, veh_trips_df)
-
-                if not FT.trips.has_capacity_configured():
-                    # We can't do anything about capacity
-                    break
+            # Put passengers on vehicles, updating the vehicle's boards, alights, onboard
+            with StageTimer.stage("put passengers on vehicles", num_rows=len(pathset_links_df)):
+                veh_trips_df = Assignment.put_passengers_on_vehicles(iteration, 0, pathset_paths_df, pathset_links_df, veh_trips_df)
 
-                else:
-                    ######################################################################################################
-                    FastTripsLogger.info("  Step 6. Capacity constraints on transit vehicles.")
-
-                    if bump_iter == 0:
-                        FastTripsLogger.info("          Bumping one at a time? %s" % ("true" if Assignment.BUMP_ONE_AT_A_TIME else "false"))
+            # If capacity isn't configured, we can't do anything about capacity
+            if FT.trips.has_capacity_configured():
+                ######################################################################################################
+                FastTripsLogger.info("  Step 6. Capacity constraints on transit vehicles.")
+                FastTripsLogger.info("          Bumping one at a time? %s" % ("true" if Assignment.BUMP_ONE_AT_A_TIME else "false"))
 
-                    # This needs to run at this point because the arrival times for the passengers are accurate here
+                # This needs to run at this point because the arrival times for the passengers are accurate here
+                with StageTimer.stage("flag bump overcap passengers", num_rows=len(pathset_links_df)):
                     (chosen_paths_bumped, pathset_paths_df, pathset_links_df, veh_trips_df) = \
-                        Assignment.flag_bump_overcap_passengers(iteration, simulation_iteration, bump_iter,
+                        Assignment.flag_bump_overcap_passengers(iteration, simulation_iteration,
                                                                 pathset_paths_df, pathset_links_df, veh_trips_df)
 
+                FastTripsLogger.info("        -> bumped %d chosen paths" % chosen_paths_bumped)
 
-                    FastTripsLogger.info("        -> completed loop bump_iter %d and bumped %d chosen paths" % (bump_iter, chosen_paths_bumped))
-
-                    if chosen_paths_bumped == 0:
-                        # do one final update of overcap to passengers
-                        pathset_links_df = Assignment.find_passenger_vehicle_times(pathset_links_df, veh_trips_df)
-                        break
-
-                    bump_iter += 1
-
+                # do one final update of overcap to passengers
+                with StageTimer.stage("find passenger vehicle times", num_rows=len(pathset_links_df)):
+                    pathset_links_df = Assignment.find_passenger_vehicle_times(pathset_links_df, veh_trips_df)
 
             if type(Assignment.bump_wait_df) == pandas.DataFrame and len(Assignment.bump_wait_df) > 0:
                 Assignment.bump_wait_df[Passenger.PF_COL_PAX_A_TIME_MIN] = \
                     Assignment.bump_wait_df[Passenger.PF_COL_PAX_A_TIME].map(lambda x: (60.0*x.hour) + x.minute + (x.second/60.0))
 
-            if type(Assignment.bump_wait_df) == pandas.DataFrame and len(Assignment.bump_wait_df) > 0:
+            if type(Assignment.bump_wait_df) == pandas.DataFrame and len(Assignment.bump_wait_df) > 0 and debugDataFrames("simulate bump_wait_df"):
                 FastTripsLogger.debug("Bump_wait_df:\n%s" % Assignment.bump_wait_df.to_string(formatters=\
                     {Passenger.PF_COL_PAX_A_TIME :Util.datetime64_formatter}))
 
             ######################################################################################################
             FastTripsLogger.info("  Step 7. Update dwell and travel times for transit vehicles")
             # update the trip times -- accel/decel rates + stops affect travel times, and boards/alights affect dwell times
-            veh_trips_df   = Trip.update_trip_times(veh_trips_df, Assignment.MSA_RESULTS)
+            with StageTimer.stage("update trip times", num_rows=len(veh_trips_df)):
+                if Assignment.INCREMENTAL_SIM_TIMES:
+                    (veh_trips_df, changed_trip_stops_df) = Trip.update_trip_times(veh_trips_df, Assignment.MSA_RESULTS, changed_trip_stops=True)
+                else:
+                    veh_trips_df   = Trip.update_trip_times(veh_trips_df, Assignment.MSA_RESULTS)
 
             ######################################################################################################
             if Assignment.OUTPUT_PATHSET_PER_SIM_ITER:
                 FastTripsLogger.info("  Step 8. Write pathsets (paths and links)")
-                Passenger.write_paths(output_dir, iteration, simulation_iteration, pathset_paths_df, False, Assignment.OUTPUT_PATHSET_PER_SIM_ITER)
-                Passenger.write_paths(output_dir, iteration, simulation_iteration, pathset_links_df, True,  Assignment.OUTPUT_PATHSET_PER_SIM_ITER)
+                with StageTimer.stage("write pathsets", num_rows=len(pathset_links_df)):
+                    Passenger.write_paths(output_dir, iteration, simulation_iteration, pathset_paths_df, False, Assignment.OUTPUT_PATHSET_PER_SIM_ITER)
+                    Passenger.write_paths(output_dir, iteration, simulation_iteration, PathSet.drop_static_link_cost(pathset_links_df, inplace=False),
+                                          True, Assignment.OUTPUT_PATHSET_PER_SIM_ITER)
 
             simulation_iteration += 1
 
@@ -1676,18 +2019,22 @@ class Assignment:
 
         # Write the pathsets (if we haven't been already)
         if Assignment.OUTPUT_PATHSET_PER_SIM_ITER == False:
-            Passenger.write_paths(output_dir, iteration, simulation_iteration, pathset_paths_df, False, Assignment.OUTPUT_PATHSET_PER_SIM_ITER)
-            Passenger.write_paths(output_dir, iteration, simulation_iteration, pathset_links_df, True,  Assignment.OUTPUT_PATHSET_PER_SIM_ITER)
+            with StageTimer.stage("write pathsets", num_rows=len(pathset_links_df)):
+                Passenger.write_paths(output_dir, iteration, simulation_iteration, pathset_paths_df, False, Assignment.OUTPUT_PATHSET_PER_SIM_ITER)
+                Passenger.write_paths(output_dir, iteration, simulation_iteration, PathSet.drop_static_link_cost(pathset_links_df, inplace=False),
+                                      True, Assignment.OUTPUT_PATHSET_PER_SIM_ITER)
 
         # write the final chosen paths for this iteration
-        chosen_links_df = Passenger.get_chosen_links(pathset_links_df)
+        chosen_links_df = PathSet.drop_static_link_cost(Passenger.get_chosen_links(pathset_links_df))
         chosen_links_df["iteration"] = iteration
-        Util.write_dataframe(chosen_links_df, "chosen_links_df", os.path.join(output_dir, "chosenpaths_links.csv"), append=(iteration>1))
+        Assignment.OUTPUT_WRITER.write_dataframe(chosen_links_df, "chosen_links_df", os.path.join(output_dir, "chosenpaths_links.csv"), append=(iteration>1),
+                                                 output_format=Assignment.OUTPUT_FORMAT, partition="iter%03d" % iteration)
         chosen_links_df.drop(["iteration"], axis=1, inplace=True)
 
         chosen_paths_df = Passenger.get_chosen_links(pathset_paths_df)
         chosen_paths_df["iteration"] = iteration
-        Util.write_dataframe(chosen_paths_df, "chosen_paths_df", os.path.join(output_dir, "chosenpaths_paths.csv"), append=(iteration>1))
+        Assignment.OUTPUT_WRITER.write_dataframe(chosen_paths_df, "chosen_paths_df", os.path.join(output_dir, "chosenpaths_paths.csv"), append=(iteration>1),
+                                                 output_format=Assignment.OUTPUT_FORMAT, partition="iter%03d" % iteration)
         chosen_paths_df.drop(["iteration"], axis=1, inplace=True)
 
         return (num_passengers_arrived, pathset_paths_df, pathset_links_df, veh_trips_df)
@@ -1723,18 +2070,22 @@ def find_trip_based_paths_process_worker(iteration, worker_num, input_network_di
     if iteration > 1:
         Assignment.set_fasttrips_bump_wait(bump_wait_df)
 
+    # recorded here and sent with DONE rather than with each result
+    performance = Performance()
+
     while True:
         # go through my queue -- check if we're done
         todo = todo_pathset_queue.get()
         if todo == 'DONE':
-            done_queue.put( (worker_num, 'DONE') )
+            done_queue.put( (worker_num, 'DONE', performance.get_records()) )
             FastTripsLogger.debug("Received DONE from the todo_pathset_queue")
             return
 
         # do the work
         pathset = todo
 
-        FastTripsLogger.info("Processing person %20s path %d" % (pathset.person_id, pathset.trip_list_id_num))
+        if isDebugEnabled():
+            FastTripsLogger.debug("Processing person %20s path %d" % (pathset.person_id, pathset.trip_list_id_num))
         # communicate it to the parent
         done_queue.put( (worker_num, "STARTING", pathset.person_id, pathset.trip_list_id_num ))
 
@@ -1744,8 +2095,9 @@ def find_trip_based_paths_process_worker(iteration, worker_num, input_network_di
             trace_person = True
 
         try:
-            (pathdict, perf_dict) = Assignment.find_trip_based_pathset(iteration, pathset, hyperpath, trace=trace_person)
-            done_queue.put( (worker_num, "COMPLETED", pathset.trip_list_id_num, pathdict, perf_dict) )
+            (results, perf_dict) = Assignment.find_trip_based_pathset(iteration, pathset, hyperpath, trace=trace_person)
+            performance.add_info(iteration, pathset.person_id, pathset.trip_list_id_num, perf_dict)
+            done_queue.put( (worker_num, "COMPLETED", pathset.trip_list_id_num, results) )
         except:
             FastTripsLogger.exception("Exception")
             # call it a day
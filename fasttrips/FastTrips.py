@@ -15,13 +15,16 @@ __license__   = """
 import os
 from operator import attrgetter
 import pandas
-import transitfeed
 
 from .Assignment  import Assignment
+from .GTFSReader  import GTFSReader
 from .Logger      import FastTripsLogger, setupLogging
+from .NetworkCache import NetworkCache
 from .Passenger   import Passenger
 from .Performance import Performance
 from .Route       import Route
+from .Skim        import Skim
+from .StageTimer  import StageTimer
 from .Stop        import Stop
 from .TAZ         import TAZ
 from .Transfer    import Transfer
@@ -84,7 +87,7 @@ class FastTrips:
         #: string representing directory in which to write our output
         Assignment.OUTPUT_DIR        = output_dir
 
-        #: transitfeed schedule instance.  See https://github.com/google/transitfeed
+        #: :py:class:`fasttrips.GTFSReader` instance for the input network GTFS
         self.gtfs_schedule      = None
 
         # setup logging
@@ -102,43 +105,74 @@ class FastTrips:
         """
         Reads in the input network and demand files and initializes the relevant data structures.
         """
+        with StageTimer.stage("read input files"):
+            self.read_network_files()
+            self.read_demand_files()
+
+    def read_network_files(self):
+        """
+        Reads in the input network files, or the network cache if configured and up to date.
+        """
+        # Use the cached network if we have it
+        network_cache = None
+        if Assignment.NETWORK_CACHE_DIR:
+            network_cache = NetworkCache(Assignment.NETWORK_CACHE_DIR, Assignment.INPUT_NETWORK_DIR)
+            with StageTimer.stage("load network cache"):
+                if network_cache.load(self, Assignment.OUTPUT_DIR):
+                    return
+
         # Read the gtfs files first
         FastTripsLogger.info("Reading GTFS schedule")
-        loader             = transitfeed.Loader(Assignment.INPUT_NETWORK_DIR, memory_db=True)
-        self.gtfs_schedule = loader.Load()
+        with StageTimer.stage("read gtfs"):
+            self.gtfs_schedule = GTFSReader(Assignment.INPUT_NETWORK_DIR)
 
-        if False:
+        if Assignment.VALIDATE_GTFS:
             # Validate the GTFS
-            FastTripsLogger.info("Validating GTFS schedule")
-            self.gtfs_schedule.Validate()
-            FastTripsLogger.info("Done validating GTFS schedule")
+            with StageTimer.stage("validate gtfs"):
+                self.gtfs_schedule.validate_with_transitfeed()
 
-        # Required: Trips, Routes, Stops, Stop Times, Agency, Calendar
-        # Optional: Transfers, Shapes, Calendar Dates...
+        # Required: Trips, Routes, Stops, Stop Times, Calendar
+        # Optional: Agency, Transfers, Fare Attributes, Fare Rules
 
         # Read routes, agencies
-        self.routes = Route(Assignment.INPUT_NETWORK_DIR, Assignment.OUTPUT_DIR,
-                            self.gtfs_schedule, Util.SIMULATION_DAY)
+        with StageTimer.stage("read routes"):
+            self.routes = Route(Assignment.INPUT_NETWORK_DIR, Assignment.OUTPUT_DIR,
+                                self.gtfs_schedule, Util.SIMULATION_DAY)
 
         # Read Stops (gtfs-required)
-        self.stops = Stop(Assignment.INPUT_NETWORK_DIR, Assignment.OUTPUT_DIR,
-                          self.gtfs_schedule)
+        with StageTimer.stage("read stops"):
+            self.stops = Stop(Assignment.INPUT_NETWORK_DIR, Assignment.OUTPUT_DIR,
+                              self.gtfs_schedule)
 
         # Read Transfers
-        self.transfers = Transfer(Assignment.INPUT_NETWORK_DIR, Assignment.OUTPUT_DIR,
-                                  self.gtfs_schedule)
+        with StageTimer.stage("read transfers"):
+            self.transfers = Transfer(Assignment.INPUT_NETWORK_DIR, Assignment.OUTPUT_DIR,
+                                      self.gtfs_schedule)
 
         # Read trips, vehicles, calendar and stoptimes
-        self.trips = Trip(Assignment.INPUT_NETWORK_DIR, Assignment.OUTPUT_DIR,
-                          self.gtfs_schedule, Util.SIMULATION_DAY,
-                          self.stops, self.routes, Assignment.PREPEND_ROUTE_ID_TO_TRIP_ID)
+        with StageTimer.stage("read trips"):
+            self.trips = Trip(Assignment.INPUT_NETWORK_DIR, Assignment.OUTPUT_DIR,
+                              self.gtfs_schedule, Util.SIMULATION_DAY,
+                              self.stops, self.routes, Assignment.PREPEND_ROUTE_ID_TO_TRIP_ID)
+            StageTimer.set_num_rows(len(self.trips.stop_times_df))
 
         # read the TAZs into a TAZ instance
-        self.tazs = TAZ(Assignment.INPUT_NETWORK_DIR, Assignment.OUTPUT_DIR, Util.SIMULATION_DAY,
-                        self.stops, self.transfers, self.routes)
+        with StageTimer.stage("read tazs"):
+            self.tazs = TAZ(Assignment.INPUT_NETWORK_DIR, Assignment.OUTPUT_DIR, Util.SIMULATION_DAY,
+                            self.stops, self.transfers, self.routes)
+
+        if network_cache:
+            with StageTimer.stage("save network cache"):
+                network_cache.save(self, Assignment.OUTPUT_DIR)
 
+    def read_demand_files(self):
+        """
+        Reads in the input demand files.  The network must be read first.
+        """
         # Read the demand int passenger_id -> passenger instance
-        self.passengers = Passenger(Assignment.INPUT_DEMAND_DIR, Assignment.OUTPUT_DIR, Util.SIMULATION_DAY, self.stops, self.routes, Assignment.CAPACITY_CONSTRAINT)
+        with StageTimer.stage("read demand"):
+            self.passengers = Passenger(Assignment.INPUT_DEMAND_DIR, Assignment.OUTPUT_DIR, Util.SIMULATION_DAY, self.stops, self.routes, Assignment.CAPACITY_CONSTRAINT)
+            StageTimer.set_num_rows(len(self.passengers.trip_list_df))
 
     def run_assignment(self, output_dir):
 
@@ -148,3 +182,16 @@ class FastTrips:
         # Do it!
         Assignment.assign_paths(output_dir, self)
 
+        if Assignment.CREATE_SKIMS:
+            self.run_skimming(output_dir)
+
+        StageTimer.write(output_dir)
+
+    def run_skimming(self, output_dir):
+        """
+        Creates the transit skims with :py:meth:`Skim.create_skims`.  This runs after the assignment if
+        :py:attr:`Assignment.CREATE_SKIMS` is set, but the input files just need to be read first.
+        """
+        with StageTimer.stage("create skims"):
+            Skim.create_skims(output_dir, self)
+
@@ -0,0 +1,243 @@
+__copyright__ = "Copyright 2016 Contributing Entities"
+__license__   = """
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import os
+
+import numpy
+import pandas
+
+from .Error  import ConfigurationError, NetworkInputError
+from .Logger import FastTripsLogger
+
+class GTFSReader(object):
+    """
+    GTFS Reader class.
+
+    Reads the `GTFS <https://developers.google.com/transit/gtfs/reference>`_ text files that fast-trips uses
+    directly into :py:class:`pandas.DataFrame` instances with explicit column types, rather than building a
+    `transitfeed <https://github.com/google/transitfeed>`_ object for every row.
+
+    Only what fast-trips relies upon is validated: required files and columns are present, numeric
+    columns are numeric, and identifiers are present and unique.  A full transitfeed validation can be
+    run with :py:meth:`GTFSReader.validate_with_transitfeed`.
+    """
+
+    #: Column type for strings and identifiers
+    TYPE_STR        = "str"
+    #: Column type for integers.  These will be floats if there are blanks.
+    TYPE_INT        = "int"
+    #: Column type for floats
+    TYPE_FLOAT      = "float"
+
+    #: GTFS files read, with the GTFS columns kept and their types.  Other columns are ignored.
+    GTFS_FIELDS     = {
+        "agency.txt"         :[("agency_id",            TYPE_STR),
+                               ("agency_name",          TYPE_STR),
+                               ("agency_url",           TYPE_STR),
+                               ("agency_timezone",      TYPE_STR),
+                               ("agency_lang",          TYPE_STR),
+                               ("agency_phone",         TYPE_STR),
+                               ("agency_fare_url",      TYPE_STR)],
+        "stops.txt"          :[("stop_id",              TYPE_STR),
+                               ("stop_code",            TYPE_STR),
+                               ("stop_name",            TYPE_STR),
+                               ("stop_desc",            TYPE_STR),
+                               ("stop_lat",             TYPE_FLOAT),
+                               ("stop_lon",             TYPE_FLOAT),
+                               ("zone_id",              TYPE_STR),
+                               ("stop_url",             TYPE_STR),
+                               ("location_type",        TYPE_INT),
+                               ("parent_station",       TYPE_STR),
+                               ("stop_timezone",        TYPE_STR),
+                               ("wheelchair_boarding",  TYPE_INT)],
+        "routes.txt"         :[("route_id",             TYPE_STR),
+                               ("agency_id",            TYPE_STR),
+                               ("route_short_name",     TYPE_STR),
+                               ("route_long_name",      TYPE_STR),
+                               ("route_desc",           TYPE_STR),
+                               ("route_type",           TYPE_INT),
+                               ("route_url",            TYPE_STR),
+                               ("route_color",          TYPE_STR),
+                               ("route_text_color",     TYPE_STR)],
+        "trips.txt"          :[("route_id",             TYPE_STR),
+                               ("service_id",           TYPE_STR),
+                               ("trip_id",              TYPE_STR),
+                               ("trip_headsign",        TYPE_STR),
+                               ("trip_short_name",      TYPE_STR),
+                               ("direction_id",         TYPE_INT),
+                               ("block_id",             TYPE_STR),
+                               ("shape_id",             TYPE_STR),
+                               ("wheelchair_accessible",TYPE_INT),
+                               ("bikes_allowed",        TYPE_INT)],
+        "stop_times.txt"     :[("trip_id",              TYPE_STR),
+                               ("arrival_time",         TYPE_STR),
+                               ("departure_time",       TYPE_STR),
+                               ("stop_id",              TYPE_STR),
+                               ("stop_sequence",        TYPE_INT),
+                               ("stop_headsign",        TYPE_STR),
+                               ("pickup_type",          TYPE_INT),
+                               ("drop_off_type",        TYPE_INT),
+                               ("shape_dist_traveled",  TYPE_FLOAT),
+                               ("timepoint",            TYPE_INT)],
+        "calendar.txt"       :[("service_id",           TYPE_STR),
+                               ("monday",               TYPE_INT),
+                               ("tuesday",              TYPE_INT),
+                               ("wednesday",            TYPE_INT),
+                               ("thursday",             TYPE_INT),
+                               ("friday",               TYPE_INT),
+                               ("saturday",             TYPE_INT),
+                               ("sunday",               TYPE_INT),
+                               ("start_date",           TYPE_STR),
+                               ("end_date",             TYPE_STR)],
+        "transfers.txt"      :[("from_stop_id",         TYPE_STR),
+                               ("to_stop_id",           TYPE_STR),
+                               ("transfer_type",        TYPE_INT),
+                               ("min_transfer_time",    TYPE_FLOAT)],
+        "fare_attributes.txt":[("fare_id",              TYPE_STR),
+                               ("price",                TYPE_FLOAT),
+                               ("currency_type",        TYPE_STR),
+                               ("payment_method",       TYPE_INT),
+                               ("transfers",            TYPE_INT),
+                               ("transfer_duration",    TYPE_FLOAT)],
+        "fare_rules.txt"     :[("fare_id",              TYPE_STR),
+                               ("route_id",             TYPE_STR),
+                               ("origin_id",            TYPE_STR),
+                               ("destination_id",       TYPE_STR),
+                               ("contains_id",          TYPE_STR)]
+    }
+
+    #: Required GTFS files, with the columns fast-trips needs from them.  Other files are optional.
+    REQUIRED_FIELDS = {
+        "stops.txt"          :["stop_id", "stop_lat", "stop_lon"],
+        "routes.txt"         :["route_id"],
+        "trips.txt"          :["route_id", "service_id", "trip_id"],
+        "stop_times.txt"     :["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"],
+        "calendar.txt"       :["service_id", "start_date", "end_date"]
+    }
+
+    #: Required columns for optional GTFS files, if they're present.
+    OPTIONAL_FILE_REQUIRED_FIELDS = {
+        "agency.txt"         :[],
+        "transfers.txt"      :["from_stop_id", "to_stop_id"],
+        "fare_attributes.txt":["fare_id", "price"],
+        "fare_rules.txt"     :["fare_id"]
+    }
+
+    #: Columns that must be unique within their GTFS file
+    UNIQUE_FIELDS   = {
+        "stops.txt"          :["stop_id"],
+        "routes.txt"         :["route_id"],
+        "trips.txt"          :["trip_id"],
+        "stop_times.txt"     :["trip_id", "stop_sequence"],
+        "calendar.txt"       :["service_id"],
+        "fare_attributes.txt":["fare_id"]
+    }
+
+    def __init__(self, input_dir):
+        """
+        Constructor.  Checks that the required GTFS files are in *input_dir*; they're read by
+        :py:meth:`GTFSReader.read_table` as they're needed.
+        """
+        self.input_dir = input_dir
+
+        for filename in sorted(GTFSReader.REQUIRED_FIELDS.keys()):
+            if not os.path.exists(os.path.join(self.input_dir, filename)):
+                error_msg = "Required GTFS file %s not found in %s" % (filename, self.input_dir)
+                FastTripsLogger.fatal(error_msg)
+                raise NetworkInputError(filename, error_msg)
+
+    def read_table(self, filename):
+        """
+        Reads the given GTFS file (one of :py:attr:`GTFSReader.GTFS_FIELDS`) and returns a :py:class:`pandas.DataFrame`
+        with the GTFS columns present in the file.  String columns have no null values except for blanks.
+        Integer columns with blanks are floats.
+
+        If an optional file isn't present, returns an empty :py:class:`pandas.DataFrame`.
+        Raises :py:class:`NetworkInputError` if the file doesn't have what fast-trips needs.
+        """
+        full_path       = os.path.join(self.input_dir, filename)
+        required_fields = GTFSReader.REQUIRED_FIELDS.get(filename, GTFSReader.OPTIONAL_FILE_REQUIRED_FIELDS.get(filename, []))
+        if not os.path.exists(full_path):
+            return pandas.DataFrame(columns=required_fields)
+
+        # GTFS headers may have spaces or a byte order mark; map the header as written to the GTFS column name
+        field_types = dict(GTFSReader.GTFS_FIELDS[filename])
+        header      = list(pandas.read_csv(full_path, nrows=0).columns.values)
+        usecols     = []
+        dtypes      = {}
+        renames     = {}
+        for raw_colname in header:
+            colname = raw_colname.replace("\xef\xbb\xbf","").strip()
+            if colname not in field_types: continue
+            usecols.append(raw_colname)
+            dtypes [raw_colname] = object if field_types[colname] == GTFSReader.TYPE_STR else numpy.float64
+            renames[raw_colname] = colname
+
+        missing_fields = [field for field in required_fields if field not in renames.values()]
+        if len(missing_fields) > 0:
+            error_msg = "Required columns %s not found in %s" % (str(missing_fields), full_path)
+            FastTripsLogger.fatal(error_msg)
+            raise NetworkInputError(filename, error_msg)
+
+        # only blanks are null -- ids like "NA" are ids
+        try:
+            table_df = pandas.read_csv(full_path, usecols=usecols, dtype=dtypes, skipinitialspace=True,
+                                       keep_default_na=False, na_values=[""])
+        except ValueError as e:
+            error_msg = "Error reading %s: %s" % (full_path, str(e))
+            FastTripsLogger.fatal(error_msg)
+            raise NetworkInputError(filename, error_msg)
+        table_df.rename(columns=renames, inplace=True)
+
+        # integers are integers if they can be
+        for colname in list(table_df.columns.values):
+            if field_types[colname] == GTFSReader.TYPE_INT and pandas.notnull(table_df[colname]).all():
+                table_df[colname] = table_df[colname].astype(numpy.int64)
+
+        # required columns need values
+        for colname in required_fields:
+            null_count = pandas.isnull(table_df[colname]).sum()
+            if null_count > 0:
+                error_msg = "Found %d rows with blank %s in %s" % (null_count, colname, full_path)
+                FastTripsLogger.fatal(error_msg)
+                raise NetworkInputError(filename, error_msg)
+
+        if filename in GTFSReader.UNIQUE_FIELDS:
+            duplicated = table_df.duplicated(subset=GTFSReader.UNIQUE_FIELDS[filename])
+            if duplicated.sum() > 0:
+                error_msg = "Found %d duplicate %s in %s" % (duplicated.sum(), str(GTFSReader.UNIQUE_FIELDS[filename]), full_path)
+                FastTripsLogger.fatal(error_msg)
+                FastTripsLogger.fatal("\nDuplicates:\n%s" % str(table_df.loc[duplicated].head(20)))
+                raise NetworkInputError(filename, error_msg)
+
+        FastTripsLogger.debug("Read %s\n%s\n%s" % (full_path, str(table_df.head()), str(table_df.dtypes)))
+        return table_df
+
+    def validate_with_transitfeed(self):
+        """
+        Loads and validates the GTFS with `transitfeed <https://github.com/google/transitfeed>`_, which is
+        thorough but slow for large feeds.  transitfeed is only required for this.
+        """
+        try:
+            import transitfeed
+        except ImportError:
+            error_msg = "GTFS validation requires transitfeed, which isn't installed"
+            FastTripsLogger.fatal(error_msg)
+            raise ConfigurationError(self.input_dir, error_msg)
+
+        FastTripsLogger.info("Validating GTFS schedule")
+        loader        = transitfeed.Loader(self.input_dir, memory_db=True)
+        gtfs_schedule = loader.Load()
+        gtfs_schedule.Validate()
+        FastTripsLogger.info("Done validating GTFS schedule")
@@ -15,11 +15,29 @@ __license__   = """
 
 import logging, multiprocessing
 
-__all__ = ['FastTripsLogger', 'setupLogging']
+__all__ = ['FastTripsLogger', 'setupLogging', 'setDebugLog', 'isDebugEnabled', 'debugDataFrames']
 
 #: This is the instance of :py:class:`Logger` that gets used for all dta logging needs!
 FastTripsLogger = multiprocessing.get_logger()
 
+#: Debug log setting: log all the debug messages.  See :py:func:`setDebugLog`.
+DEBUG_LOG_FULL          = 'full'
+#: Debug log setting: log the debug messages, but the dataframes checked with :py:func:`debugDataFrames`
+#: only for a sample of the calls at each place.
+DEBUG_LOG_SAMPLED       = 'sampled'
+#: Debug log setting: no debug messages, and don't spend time formatting them.
+DEBUG_LOG_OFF           = 'off'
+#: Debug log settings
+DEBUG_LOG_OPTIONS       = [DEBUG_LOG_FULL, DEBUG_LOG_SAMPLED, DEBUG_LOG_OFF]
+
+#: For :py:data:`DEBUG_LOG_SAMPLED`, the dataframes at each place are logged the first time and then every this many times.
+DEBUG_SAMPLE_INTERVAL   = 10
+
+#: The current debug log setting
+debug_log               = DEBUG_LOG_FULL
+#: For :py:data:`DEBUG_LOG_SAMPLED`, the number of calls to :py:func:`debugDataFrames` so far for each place
+debug_dataframes_calls  = {}
+
 def setupLogging(infoLogFilename, debugLogFilename, logToConsole=True, append=False):
     """
     Sets up the logger.
@@ -36,7 +54,7 @@ def setupLogging(infoLogFilename, debugLogFilename, logToConsole=True, append=Fa
         FastTripsLogger.removeHandler(h)
 
     # create a logger
-    FastTripsLogger.setLevel(logging.DEBUG)
+    FastTripsLogger.setLevel(logging.INFO if debug_log == DEBUG_LOG_OFF else logging.DEBUG)
 
     if infoLogFilename:
         infologhandler = logging.StreamHandler(open(infoLogFilename, 'a' if append else 'w'))
@@ -59,3 +77,38 @@ def setupLogging(infoLogFilename, debugLogFilename, logToConsole=True, append=Fa
         FastTripsLogger.addHandler(consolehandler)
     FastTripsLogToConsole = logToConsole
 
+def setDebugLog(new_debug_log):
+    """
+    Sets how much goes into the debug log, one of :py:data:`DEBUG_LOG_OPTIONS`.
+
+    With :py:data:`DEBUG_LOG_OFF`, the logger level is INFO so debug messages are dropped, and
+    :py:func:`isDebugEnabled` and :py:func:`debugDataFrames` return False so the messages guarded
+    by them aren't formatted at all.
+    """
+    global debug_log, debug_dataframes_calls
+    debug_log              = new_debug_log
+    debug_dataframes_calls = {}
+    FastTripsLogger.setLevel(logging.INFO if debug_log == DEBUG_LOG_OFF else logging.DEBUG)
+
+def isDebugEnabled():
+    """
+    Returns True if debug messages are logged.  Use this to skip formatting debug messages that are
+    expensive to build, e.g. those for traced persons.
+    """
+    return FastTripsLogger.isEnabledFor(logging.DEBUG)
+
+def debugDataFrames(place):
+    """
+    Returns True if the dataframes (heads, dtypes, etc) at *place* should be formatted and logged at debug level.
+    *place* names the place in the code, usually the method name.  With :py:data:`DEBUG_LOG_SAMPLED`, this is
+    True the first time for each place and then every :py:data:`DEBUG_SAMPLE_INTERVAL` times.  e.g.::
+
+        if debugDataFrames("merge_pathsets"):
+            FastTripsLogger.debug("merge_pathsets(): pathset_paths_df head=\n%s" % pathset_paths_df.head().to_string())
+    """
+    if not FastTripsLogger.isEnabledFor(logging.DEBUG): return False
+    if debug_log != DEBUG_LOG_SAMPLED: return True
+
+    num_calls = debug_dataframes_calls.get(place, 0)
+    debug_dataframes_calls[place] = num_calls + 1
+    return (num_calls % DEBUG_SAMPLE_INTERVAL) == 0
@@ -0,0 +1,173 @@
+__copyright__ = "Copyright 2016 Contributing Entities"
+__license__   = """
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import cPickle,hashlib,os,shutil,sys
+import numpy,pandas
+
+from .Assignment import Assignment
+from .Logger     import FastTripsLogger
+from .Passenger  import Passenger
+from .PathSet    import PathSet
+from .Route      import Route
+from .Stop       import Stop
+from .TAZ        import TAZ
+from .Transfer   import Transfer
+from .Trip       import Trip
+from .Util       import Util
+
+class NetworkCache(object):
+    """
+    Cache of the prepared input network.
+
+    Reading the network (:py:class:`Route`, :py:class:`Stop`, :py:class:`Transfer`, :py:class:`Trip` and
+    :py:class:`TAZ`) means parsing the GTFS and fast-trips network files, assigning numeric ids,
+    expanding access and egress links and writing the intermediate files for the C++ extension.
+    None of that depends upon the demand, so for runs that change only the demand or the parameters,
+    the prepared instances are pickled (so their :py:class:`pandas.DataFrame` instances are stored as binary
+    column blocks) into a subdirectory of the cache directory along with the extension files.
+
+    The subdirectory is named by a hash of the input network files and the configuration that affects the
+    network, so changing any of them means the network is read and prepared again.
+    """
+    #: Bump this when the prepared network changes so existing caches are not used
+    CACHE_VERSION           = 1
+
+    #: File within the cache subdirectory with the pickled network instances
+    NETWORK_FILE            = "network.pkl"
+
+    #: Intermediate files written to the output directory while preparing the network.  These are inputs
+    #: to the C++ extension and the output, so they're cached and copied back.
+    EXTENSION_FILES         = [Route.OUTPUT_ROUTE_ID_NUM_FILE,
+                               Route.OUTPUT_MODE_NUM_FILE,
+                               Stop.OUTPUT_STOP_ID_NUM_FILE,
+                               Trip.OUTPUT_TRIP_ID_NUM_FILE,
+                               Trip.OUTPUT_TRIPINFO_FILE,
+                               Transfer.OUTPUT_TRANSFERS_FILE,
+                               TAZ.OUTPUT_ACCESS_EGRESS_FILE]
+
+    #: Files in the network directory that don't affect the network, so they're left out of the hash.
+    #: The demand may be in the network directory, and the configuration that matters is hashed separately.
+    IGNORED_INPUT_FILES     = [Assignment.CONFIGURATION_FILE,
+                               Assignment.CONFIGURATION_FUNCTIONS_FILE,
+                               PathSet.WEIGHTS_FILE,
+                               Passenger.INPUT_HOUSEHOLDS_FILE,
+                               Passenger.INPUT_PERSONS_FILE,
+                               Passenger.INPUT_TRIP_LIST_FILE]
+
+    #: Attributes of :py:class:`fasttrips.FastTrips` that are cached
+    NETWORK_ATTRIBUTES      = ["routes", "stops", "transfers", "trips", "tazs"]
+
+    #: Block size for hashing input files
+    HASH_BLOCK_SIZE         = 1024*1024
+
+    def __init__(self, cache_dir, input_network_dir):
+        """
+        Constructor.  Hashes the files in *input_network_dir* along with the network configuration
+        in :py:class:`Assignment` to determine the cache subdirectory.
+        """
+        #: The top-level cache directory
+        self.cache_dir = cache_dir
+
+        key_hash = hashlib.sha1()
+        key_hash.update("version %d python %s pandas %s numpy %s\n" %
+                        (NetworkCache.CACHE_VERSION, sys.version, pandas.__version__, numpy.__version__))
+        key_hash.update("prepend_route_id_to_trip_id %s simulation_day %s\n" %
+                        (str(Assignment.PREPEND_ROUTE_ID_TO_TRIP_ID), str(Util.SIMULATION_DAY)))
+
+        for filename in sorted(os.listdir(input_network_dir)):
+            full_path = os.path.join(input_network_dir, filename)
+            if not os.path.isfile(full_path): continue
+            if filename in NetworkCache.IGNORED_INPUT_FILES: continue
+
+            key_hash.update("file %s\n" % filename)
+            with open(full_path, 'rb') as input_file:
+                while True:
+                    block = input_file.read(NetworkCache.HASH_BLOCK_SIZE)
+                    if not block: break
+                    key_hash.update(block)
+
+        #: Hash of the network inputs, and the name of the subdirectory for this network
+        self.key = key_hash.hexdigest()
+
+        #: The cache subdirectory for this network
+        self.network_cache_dir = os.path.join(self.cache_dir, self.key)
+
+    def load(self, FT, output_dir):
+        """
+        If this network is cached, sets the network attributes of the given :py:class:`fasttrips.FastTrips`
+        instance (:py:attr:`NetworkCache.NETWORK_ATTRIBUTES`) from the cache, copies the extension files into
+        *output_dir* and returns True.  Otherwise, returns False.
+        """
+        network_file = os.path.join(self.network_cache_dir, NetworkCache.NETWORK_FILE)
+        if not os.path.exists(network_file):
+            FastTripsLogger.info("No cached network found in %s" % self.network_cache_dir)
+            return False
+
+        try:
+            with open(network_file, 'rb') as input_file:
+                network = cPickle.load(input_file)
+        except Exception as e:
+            FastTripsLogger.warn("Failed to read cached network %s: %s.  Reading the network." % (network_file, str(e)))
+            return False
+
+        for attr in NetworkCache.NETWORK_ATTRIBUTES:
+            network_obj = network[attr]
+            # intermediate files go to this run's output directory
+            if hasattr(network_obj, "output_dir"):
+                network_obj.output_dir = output_dir
+            setattr(FT, attr, network_obj)
+
+        for filename in NetworkCache.EXTENSION_FILES:
+            # transfers aren't written if there are none
+            if not os.path.exists(os.path.join(self.network_cache_dir, filename)): continue
+            shutil.copyfile(os.path.join(self.network_cache_dir, filename), os.path.join(output_dir, filename))
+
+        FastTripsLogger.info("Read cached network from %s" % self.network_cache_dir)
+        return True
+
+    def save(self, FT, output_dir):
+        """
+        Caches the network attributes of the given :py:class:`fasttrips.FastTrips` instance and the extension
+        files in *output_dir*.  This should be called right after the network is read.
+
+        The files are written to a temporary directory that's renamed to the cache subdirectory, so a
+        partially written cache is never read.
+        """
+        if os.path.exists(self.network_cache_dir):
+            return
+
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        temp_dir = "%s.tmp%d" % (self.network_cache_dir, os.getpid())
+        if os.path.exists(temp_dir):
+            shutil.rmtree(temp_dir)
+        os.mkdir(temp_dir)
+
+        network = dict((attr, getattr(FT, attr)) for attr in NetworkCache.NETWORK_ATTRIBUTES)
+        with open(os.path.join(temp_dir, NetworkCache.NETWORK_FILE), 'wb') as output_file:
+            cPickle.dump(network, output_file, cPickle.HIGHEST_PROTOCOL)
+
+        for filename in NetworkCache.EXTENSION_FILES:
+            if not os.path.exists(os.path.join(output_dir, filename)): continue
+            shutil.copyfile(os.path.join(output_dir, filename), os.path.join(temp_dir, filename))
+
+        try:
+            os.rename(temp_dir, self.network_cache_dir)
+        except OSError:
+            # another run cached the same network first
+            shutil.rmtree(temp_dir)
+            return
+
+        FastTripsLogger.info("Cached network to %s" % self.network_cache_dir)
@@ -0,0 +1,225 @@
+__copyright__ = "Copyright 2016 Contributing Entities"
+__license__   = """
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import Queue,os,threading,time,traceback
+
+from .Error  import UnexpectedError
+from .Logger import FastTripsLogger
+from .Util   import Util
+
+class OutputWriter(object):
+    """
+    Output Writer class.
+
+    Writes the outputs that are written every iteration (pathsets, chosen paths, vehicle trips and performance)
+    with :py:meth:`Util.write_dataframe` or :py:meth:`Util.write_dataframe_columns`.  If asynchronous, each dataframe is copied when it's handed over
+    and written on a background thread in the order given, so formatting and disk I/O overlap with the
+    assignment.  The copies waiting to be written are capped at a number of bytes; callers wait for the
+    writer if they'd exceed it.
+
+    :py:meth:`OutputWriter.flush` must be called at the end of the run to wait for the writes, check
+    that the files were written and report the time saved.
+
+    The writer thread must not be writing when the process forks, since a child forked while the thread holds
+    a lock (the logging lock, or a file's) would hang on it.  Call :py:meth:`OutputWriter.pause` before
+    starting :py:class:`multiprocessing.Process` workers and :py:meth:`OutputWriter.resume` once they've started.
+    """
+    #: Queue item telling the writer thread to stop
+    STOP_WRITER     = None
+
+    def __init__(self, asynchronous=False, max_queued_bytes=0):
+        """
+        Constructor.  If *asynchronous*, starts the writer thread.
+        """
+        #: Write on a background thread?
+        self.asynchronous       = asynchronous
+        #: Maximum bytes of dataframe copies waiting to be written.  A single dataframe is queued
+        #: regardless of its size if nothing else is waiting.
+        self.max_queued_bytes   = max_queued_bytes
+
+        #: Bytes of dataframe copies waiting to be written, guarded by :py:attr:`OutputWriter.condition`
+        self.queued_bytes       = 0
+        self.condition          = threading.Condition()
+        self.queue              = Queue.Queue()
+        #: Held by the writer thread while it handles a queued dataframe, and by :py:meth:`OutputWriter.pause`
+        self.write_lock         = threading.Lock()
+
+        #: Number of dataframes written
+        self.num_written        = 0
+        #: Seconds spent writing
+        self.write_seconds      = 0.0
+        #: Seconds callers spent copying dataframes and waiting for the writer
+        self.wait_seconds       = 0.0
+        #: Files that should exist once the queue is flushed
+        self.output_files       = []
+        #: Error from the writer thread, reported by :py:meth:`OutputWriter.flush`
+        self.error              = None
+
+        self.thread             = None
+        self.start_thread()
+
+    def start_thread(self):
+        """
+        Starts the writer thread if asynchronous and it's not running.
+        """
+        if self.asynchronous and self.thread is None:
+            self.thread = threading.Thread(target=self.write_queued_dataframes, name="OutputWriter")
+            self.thread.daemon = True
+            self.thread.start()
+
+    def stop_thread(self):
+        """
+        Waits for the queued dataframes to be written and stops the writer thread, if it's running.
+        Dataframes handed over while it's stopped are written right away.
+        """
+        if self.thread:
+            start_time = time.time()
+            self.queue.put(OutputWriter.STOP_WRITER)
+            self.thread.join()
+            self.thread = None
+            self.wait_seconds += time.time() - start_time
+        self.check_error()
+
+    def pause(self):
+        """
+        Waits for the writer thread to finish the dataframe it's writing, if any, and keeps it from starting
+        another until :py:meth:`OutputWriter.resume`.  The rest of the queue is left waiting.
+        """
+        start_time = time.time()
+        self.write_lock.acquire()
+        self.wait_seconds += time.time() - start_time
+
+    def resume(self):
+        """
+        Lets the writer thread continue after :py:meth:`OutputWriter.pause`.
+        """
+        self.write_lock.release()
+
+    def write_dataframe(self, df, name, output_file, **kwargs):
+        """
+        Writes the dataframe via :py:meth:`Util.write_dataframe` with the given arguments, or queues a copy
+        of it to be written if asynchronous.  The caller may modify *df* as soon as this returns.
+        """
+        if kwargs.get("output_format", Util.OUTPUT_FORMAT_CSV) == Util.OUTPUT_FORMAT_NPZ:
+            expected_file = Util.get_npz_filename(output_file, kwargs.get("partition"))
+        else:
+            expected_file = output_file
+        self.write(Util.write_dataframe, df, name, output_file, expected_file, **kwargs)
+
+    def write_dataframe_columns(self, df, name, output_dir):
+        """
+        Writes the dataframe via :py:meth:`Util.write_dataframe_columns`, or queues a copy of it to be
+        written if asynchronous.
+        """
+        self.write(Util.write_dataframe_columns, df, name, output_dir, output_dir)
+
+    def write(self, write_func, df, name, output_file, expected_file, **kwargs):
+        """
+        Calls `write_func(df, name, output_file, **kwargs)`, or queues a copy of *df* for the writer thread
+        to do so if asynchronous.  *expected_file* should exist once it's written.
+        """
+        self.output_files.append(expected_file)
+
+        if self.thread is None:
+            start_time = time.time()
+            write_func(df, name, output_file, **kwargs)
+            self.write_seconds += time.time() - start_time
+            self.num_written   += 1
+            return
+
+        self.check_error()
+
+        start_time = time.time()
+        df_copy    = df.copy()
+        df_bytes   = df_copy.memory_usage(index=True, deep=True).sum()
+
+        self.condition.acquire()
+        try:
+            while self.queued_bytes > 0 and self.queued_bytes + df_bytes > self.max_queued_bytes:
+                self.condition.wait()
+            self.queued_bytes += df_bytes
+        finally:
+            self.condition.release()
+
+        self.queue.put( (write_func, df_copy, df_bytes, name, output_file, kwargs) )
+        self.wait_seconds += time.time() - start_time
+
+    def write_queued_dataframes(self):
+        """
+        Writer thread: writes the queued dataframes in order until told to stop.
+        """
+        while True:
+            queue_item = self.queue.get()
+            with self.write_lock:
+                if queue_item is OutputWriter.STOP_WRITER:
+                    self.queue.task_done()
+                    return
+                self.write_queued_dataframe(*queue_item)
+                self.queue.task_done()
+
+    def write_queued_dataframe(self, write_func, df, df_bytes, name, output_file, kwargs):
+        """
+        Writer thread: writes one queued dataframe and releases its bytes.
+        """
+        start_time = time.time()
+        try:
+            # once one fails, skip the rest so appended files aren't left missing a piece
+            if self.error is None:
+                write_func(df, name, output_file, **kwargs)
+                self.num_written += 1
+        except:
+            self.error = "Failed to write %s to %s:\n%s" % (name, output_file, traceback.format_exc())
+            FastTripsLogger.error(self.error)
+
+        self.write_seconds += time.time() - start_time
+        del df
+
+        self.condition.acquire()
+        self.queued_bytes -= df_bytes
+        self.condition.notify_all()
+        self.condition.release()
+
+    def check_error(self):
+        """
+        Raises :py:class:`UnexpectedError` if the writer thread failed to write something.
+        """
+        if self.error is not None:
+            raise UnexpectedError(self.error)
+
+    def flush(self):
+        """
+        Waits for the queued dataframes to be written and checks that all the output files exist.
+        Logs the time spent writing and, if asynchronous, how much of that the assignment didn't wait for.
+        """
+        start_time = time.time()
+        self.queue.join()
+        self.wait_seconds += time.time() - start_time
+        self.check_error()
+
+        missing_files = [output_file for output_file in set(self.output_files) if not os.path.exists(output_file)]
+        if len(missing_files) > 0:
+            raise UnexpectedError("Output files not written: %s" % str(sorted(missing_files)))
+
+        if self.asynchronous:
+            FastTripsLogger.info("Wrote %d output dataframes in %.1f sec on the output writer thread; waited %.1f sec for it => saved %.1f sec" %
+                                 (self.num_written, self.write_seconds, self.wait_seconds, self.write_seconds - self.wait_seconds))
+        else:
+            FastTripsLogger.info("Wrote %d output dataframes in %.1f sec" % (self.num_written, self.write_seconds))
+
+    def close(self):
+        """
+        Flushes the writer and stops the writer thread.
+        """
+        self.flush()
+        self.stop_thread()
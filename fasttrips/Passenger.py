@@ -17,7 +17,7 @@ import numpy
 import pandas
 
 from .Error  import DemandInputErorr
-from .Logger import FastTripsLogger
+from .Logger import FastTripsLogger, isDebugEnabled, debugDataFrames
 from .Route  import Route
 from .Stop   import Stop
 from .TAZ    import TAZ
@@ -105,6 +105,27 @@ class Passenger:
     #: Trip list column: Value of time. Float.
     TRIP_LIST_COLUMN_VOT                        = "vot"
 
+    #: Trip list columns read as strings rather than letting pandas guess
+    TRIP_LIST_STRING_COLUMNS                    = [TRIP_LIST_COLUMN_PERSON_ID,
+                                                   TRIP_LIST_COLUMN_PERSON_TRIP_ID,
+                                                   TRIP_LIST_COLUMN_ORIGIN_TAZ_ID,
+                                                   TRIP_LIST_COLUMN_DESTINATION_TAZ_ID,
+                                                   TRIP_LIST_COLUMN_MODE,
+                                                   TRIP_LIST_COLUMN_PURPOSE,
+                                                   TRIP_LIST_COLUMN_DEPARTURE_TIME,
+                                                   TRIP_LIST_COLUMN_ARRIVAL_TIME,
+                                                   TRIP_LIST_COLUMN_TIME_TARGET]
+    #: Trip list string columns with few distinct values, stored as :py:class:`pandas.Categorical`
+    TRIP_LIST_CATEGORICAL_COLUMNS               = [TRIP_LIST_COLUMN_MODE,
+                                                   TRIP_LIST_COLUMN_PURPOSE,
+                                                   TRIP_LIST_COLUMN_TIME_TARGET,
+                                                   TRIP_LIST_COLUMN_ACCESS_MODE,
+                                                   TRIP_LIST_COLUMN_TRANSIT_MODE,
+                                                   TRIP_LIST_COLUMN_EGRESS_MODE,
+                                                   TRIP_LIST_COLUMN_USER_CLASS]
+    #: Number of trip list rows read and prepared at a time, to bound the memory used reading large trip lists
+    TRIP_LIST_CHUNK_SIZE                        = 500000
+
     #: Column names from pathfinding
     PF_COL_PF_ITERATION             = 'pf_iteration' #: iteration during which this path was found
     PF_COL_PAX_A_TIME               = 'pf_A_time'    #: time path-finder thinks passenger arrived at A
@@ -127,6 +148,10 @@ class Passenger:
     PF_PATHS_CSV                    = r"pathsfound_paths.csv"
     PF_LINKS_CSV                    = r"pathsfound_links.csv"
 
+    #: pathfinding results, binary checkpoint versions.  See :py:meth:`Util.write_dataframe_columns`.
+    PF_PATHS_CHECKPOINT             = r"pathsfound_paths.checkpoint"
+    PF_LINKS_CHECKPOINT             = r"pathsfound_links.checkpoint"
+
     #: results - PathSets
     PATHSET_PATHS_CSV               = r"pathset_paths.csv"
     PATHSET_LINKS_CSV               = r"pathset_links.csv"
@@ -142,43 +167,19 @@ class Passenger:
         FastTripsLogger.info("-------- Reading demand --------")
         FastTripsLogger.info("Capacity constraint? %x" % capacity_constraint )
 
-        self.trip_list_df  = pandas.read_csv(os.path.join(input_dir, Passenger.INPUT_TRIP_LIST_FILE),
-                                             dtype={Passenger.TRIP_LIST_COLUMN_PERSON_ID         :object,
-                                                    Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID    :object,
-                                                    Passenger.TRIP_LIST_COLUMN_ORIGIN_TAZ_ID     :object,
-                                                    Passenger.TRIP_LIST_COLUMN_DESTINATION_TAZ_ID:object})
-        trip_list_cols     = list(self.trip_list_df.columns.values)
+        trip_list_file     = os.path.join(input_dir, Passenger.INPUT_TRIP_LIST_FILE)
+        trip_list_cols     = list(pandas.read_csv(trip_list_file, nrows=0).columns.values)
 
         assert(Passenger.TRIP_LIST_COLUMN_PERSON_ID          in trip_list_cols)
         assert(Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID     in trip_list_cols)
         assert(Passenger.TRIP_LIST_COLUMN_ORIGIN_TAZ_ID      in trip_list_cols)
         assert(Passenger.TRIP_LIST_COLUMN_DESTINATION_TAZ_ID in trip_list_cols)
 
-        FastTripsLogger.debug("=========== TRIP LIST ===========\n" + str(self.trip_list_df.head()))
-        FastTripsLogger.debug("\n"+str(self.trip_list_df.index.dtype)+"\n"+str(self.trip_list_df.dtypes))
-        FastTripsLogger.info("Read %7d %15s from %25s" %
-                             (len(self.trip_list_df), "person trips", Passenger.INPUT_TRIP_LIST_FILE))
-
-        # Error on missing person ids or person_trip_ids
-        missing_person_ids = self.trip_list_df[pandas.isnull(self.trip_list_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID])|
-                                               pandas.isnull(self.trip_list_df[Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID])]
-        if len(missing_person_ids)>0:
-            error_msg = "Missing person_id or person_trip_id fields:\n%s\n" % str(missing_person_ids)
-            error_msg += "Use 0 for person_id for trips without corresponding person."
-            FastTripsLogger.fatal(error_msg)
-            raise DemandInputErorr(Passenger.INPUT_TRIP_LIST_FILE, error_msg)
-
-        # Drop (warn) on missing origins or destinations
-        missing_ods = self.trip_list_df[ pandas.isnull(self.trip_list_df[Passenger.TRIP_LIST_COLUMN_ORIGIN_TAZ_ID])|
-                                         pandas.isnull(self.trip_list_df[Passenger.TRIP_LIST_COLUMN_DESTINATION_TAZ_ID]) ]
-        if len(missing_ods)>0:
-            FastTripsLogger.warn("Missing origin or destination for the following trips. Dropping.\n%s" % str(missing_ods))
-            self.trip_list_df = self.trip_list_df.loc[ pandas.notnull(self.trip_list_df[Passenger.TRIP_LIST_COLUMN_ORIGIN_TAZ_ID     ])&
-                                                       pandas.notnull(self.trip_list_df[Passenger.TRIP_LIST_COLUMN_DESTINATION_TAZ_ID]) ].reset_index(drop=True)
-            FastTripsLogger.warn("=> Have %d person trips" % len(self.trip_list_df))
-
-        non_zero_person_ids = len(self.trip_list_df.loc[self.trip_list_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID]!="0"])
-        if non_zero_person_ids > 0 and os.path.exists(os.path.join(input_dir, Passenger.INPUT_PERSONS_FILE)):
+        # person and household attributes are only used if the trip list has persons
+        self.persons_df     = pandas.DataFrame()
+        self.households_df  = pandas.DataFrame()
+        if os.path.exists(os.path.join(input_dir, Passenger.INPUT_PERSONS_FILE)) and \
+           Passenger.trip_list_has_persons(trip_list_file):
 
             self.persons_df     = pandas.read_csv(os.path.join(input_dir, Passenger.INPUT_PERSONS_FILE),
                                                   dtype={Passenger.PERSONS_COLUMN_PERSON_ID:object})
@@ -187,7 +188,6 @@ class Passenger:
                                                           numeric_newcolname=Passenger.PERSONS_COLUMN_PERSON_ID_NUM)
             self.persons_df     = pandas.merge(left=self.persons_df, right=self.persons_id_df,
                                                how="left")
-            persons_cols        = list(self.persons_df.columns.values)
 
             FastTripsLogger.debug("=========== PERSONS ===========\n" + str(self.persons_df.head()))
             FastTripsLogger.debug("\n"+str(self.persons_df.index.dtype)+"\n"+str(self.persons_df.dtypes))
@@ -195,56 +195,145 @@ class Passenger:
                                  (len(self.persons_df), "persons", Passenger.INPUT_PERSONS_FILE))
 
             self.households_df  = pandas.read_csv(os.path.join(input_dir, Passenger.INPUT_HOUSEHOLDS_FILE))
-            household_cols      = list(self.households_df.columns.values)
 
             FastTripsLogger.debug("=========== HOUSEHOLDS ===========\n" + str(self.households_df.head()))
             FastTripsLogger.debug("\n"+str(self.households_df.index.dtype)+"\n"+str(self.households_df.dtypes))
             FastTripsLogger.info("Read %7d %15s from %25s" %
                                  (len(self.households_df), "households", Passenger.INPUT_HOUSEHOLDS_FILE))
-        else:
-            self.persons_df     = pandas.DataFrame()
-            self.households_df  = pandas.DataFrame()
+
+        # Read and prepare the trip list a chunk at a time so only one chunk is ever in its wide, untyped form
+        trip_list_dtypes   = dict((colname, object) for colname in Passenger.TRIP_LIST_STRING_COLUMNS if colname in trip_list_cols)
+        trip_list_chunks   = []
+        num_read           = 0
+        num_trips          = 0
+        for trip_list_chunk_df in pandas.read_csv(trip_list_file, dtype=trip_list_dtypes, chunksize=Passenger.TRIP_LIST_CHUNK_SIZE):
+            num_read          += len(trip_list_chunk_df)
+            (trip_list_chunk_df, num_trips) = self.prepare_trip_list_chunk(trip_list_chunk_df, num_trips, stops)
+            trip_list_chunks.append(trip_list_chunk_df)
+            FastTripsLogger.debug("Read %d person trips; mem_use=%s" % (num_read, Util.get_process_mem_use_str()))
+
+        self.trip_list_df = Passenger.concat_categorical(trip_list_chunks, Passenger.TRIP_LIST_CATEGORICAL_COLUMNS)
+        del trip_list_chunks
+
+        FastTripsLogger.debug("=========== TRIP LIST ===========\n" + str(self.trip_list_df.head()))
+        FastTripsLogger.debug("\n"+str(self.trip_list_df.index.dtype)+"\n"+str(self.trip_list_df.dtypes))
+        FastTripsLogger.info("Read %7d %15s from %25s" %
+                             (num_read, "person trips", Passenger.INPUT_TRIP_LIST_FILE))
+        FastTripsLogger.info("=> Have %d person trips; trip list uses %.1f MB, peak memory use %s" %
+                             (len(self.trip_list_df), self.trip_list_df.memory_usage(index=True).sum()/(1024.0*1024.0),
+                              Util.get_process_peak_mem_use_str()))
 
         # make sure that each tuple TRIP_LIST_COLUMN_PERSON_ID, TRIP_LIST_COLUMN_PERSON_TRIP_ID is unique
-        self.trip_list_df["ID_dupes"] = self.trip_list_df.duplicated(subset=[Passenger.TRIP_LIST_COLUMN_PERSON_ID,
-                                                                             Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID],
-                                                                     keep=False)
-        if self.trip_list_df["ID_dupes"].sum() > 0:
+        id_dupes = self.trip_list_df.duplicated(subset=[Passenger.TRIP_LIST_COLUMN_PERSON_ID,
+                                                        Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID],
+                                                keep=False)
+        if id_dupes.sum() > 0:
             error_msg = "Duplicate IDs (%s, %s) found:\n%s" % \
                 (Passenger.TRIP_LIST_COLUMN_PERSON_ID,
                  Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
-                 self.trip_list_df.loc[self.trip_list_df["ID_dupes"]==True].to_string())
+                 self.trip_list_df.loc[id_dupes].to_string())
             FastTripsLogger.fatal(error_msg)
             raise DemandInputErorr(Passenger.INPUT_TRIP_LIST_FILE, error_msg)
 
-        # Create unique numeric index
-        self.trip_list_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM] = self.trip_list_df.index + 1
+        from .PathSet import PathSet
 
-        # datetime version
-        self.trip_list_df[Passenger.TRIP_LIST_COLUMN_ARRIVAL_TIME] = \
-            self.trip_list_df[Passenger.TRIP_LIST_COLUMN_ARRIVAL_TIME].map(lambda x: Util.read_time(x))
-        self.trip_list_df[Passenger.TRIP_LIST_COLUMN_DEPARTURE_TIME] = \
-            self.trip_list_df[Passenger.TRIP_LIST_COLUMN_DEPARTURE_TIME].map(lambda x: Util.read_time(x))
+        # Verify that PathSet has all the configuration for these user classes + transit modes + access modes + egress modes
+        # => Figure out unique user class + mode combinations
+        self.modes_df = self.trip_list_df[[Passenger.TRIP_LIST_COLUMN_USER_CLASS,
+                                           Passenger.TRIP_LIST_COLUMN_PURPOSE,
+                                           Passenger.TRIP_LIST_COLUMN_TRANSIT_MODE,
+                                           Passenger.TRIP_LIST_COLUMN_ACCESS_MODE,
+                                           Passenger.TRIP_LIST_COLUMN_EGRESS_MODE]].drop_duplicates()
+        # column by column; DataFrame.astype() of categoricals fails on older pandas
+        self.modes_df = self.modes_df.apply(lambda column: column.astype(object))
+        self.modes_df = self.modes_df.set_index([Passenger.TRIP_LIST_COLUMN_USER_CLASS, Passenger.TRIP_LIST_COLUMN_PURPOSE])
+        # stack - so before we have three columns: transit_mode, access_mode, egress_mode
+        # after, we have two columns: demand_mode_type and the value, demand_mode
+        self.modes_df               = self.modes_df.stack().to_frame()
+        self.modes_df.index.names   = [Passenger.TRIP_LIST_COLUMN_USER_CLASS, Passenger.TRIP_LIST_COLUMN_PURPOSE, PathSet.WEIGHTS_COLUMN_DEMAND_MODE_TYPE]
+        self.modes_df.columns       = [PathSet.WEIGHTS_COLUMN_DEMAND_MODE]
+        self.modes_df.reset_index(inplace=True)
+        self.modes_df.drop_duplicates(inplace=True)
+        # fix demand_mode_type since transit_mode is just transit, etc
+        self.modes_df[PathSet.WEIGHTS_COLUMN_DEMAND_MODE_TYPE] = self.modes_df[PathSet.WEIGHTS_COLUMN_DEMAND_MODE_TYPE].apply(lambda x: x[:-5])
+        FastTripsLogger.debug("Demand mode types by class & purpose: \n%s" % str(self.modes_df))
+
+        # Make sure we have all the weights required for these user_class/mode combinations
+        self.trip_list_df = PathSet.verify_weight_config(self.modes_df, output_dir, routes, capacity_constraint, self.trip_list_df)
+
+        FastTripsLogger.info("Have %d person trips" % len(self.trip_list_df))
+        FastTripsLogger.debug("Final trip_list_df\n"+str(self.trip_list_df.index.dtype)+"\n"+str(self.trip_list_df.dtypes))
+        FastTripsLogger.debug("\n"+self.trip_list_df.head().to_string())
 
-        # float version
-        self.trip_list_df[Passenger.TRIP_LIST_COLUMN_ARRIVAL_TIME_MIN] = \
-            self.trip_list_df[Passenger.TRIP_LIST_COLUMN_ARRIVAL_TIME].map(lambda x: \
-                60*x.time().hour + x.time().minute + x.time().second/60.0 )
-        self.trip_list_df[Passenger.TRIP_LIST_COLUMN_DEPARTURE_TIME_MIN] = \
-            self.trip_list_df[Passenger.TRIP_LIST_COLUMN_DEPARTURE_TIME].map(lambda x: \
-                60*x.time().hour + x.time().minute + x.time().second/60.0 )
+        #: :py:class:`PathSetStore` instance with the path sets for the trips in the trip list
+        self.pathset_store = None
 
-        # TODO: validate fields?
+    @staticmethod
+    def trip_list_has_persons(trip_list_file):
+        """
+        Returns True if any trip in the given trip list file has a person ID other than "0".
+        Only the person ID column is read, and only until one is found.
+        """
+        for person_ids_df in pandas.read_csv(trip_list_file, usecols=[Passenger.TRIP_LIST_COLUMN_PERSON_ID],
+                                             dtype={Passenger.TRIP_LIST_COLUMN_PERSON_ID:object},
+                                             chunksize=Passenger.TRIP_LIST_CHUNK_SIZE):
+            if (person_ids_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID]!="0").any():
+                return True
+        return False
+
+    def prepare_trip_list_chunk(self, trip_list_df, num_prev_trips, stops):
+        """
+        Validates the given chunk of the trip list and adds the fast-trips columns: the unique numeric trip
+        list ID (starting after *num_prev_trips*), the departure and arrival times, person and household
+        attributes, numeric TAZ IDs, access/transit/egress modes and user class.
+
+        Returns the prepared chunk, without the trips that were dropped with a warning, and the number of
+        trip list IDs used so far.
+        """
+        from .PathSet import PathSet
+
+        # Error on missing person ids or person_trip_ids
+        missing_person_ids = trip_list_df[pandas.isnull(trip_list_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID])|
+                                          pandas.isnull(trip_list_df[Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID])]
+        if len(missing_person_ids)>0:
+            error_msg = "Missing person_id or person_trip_id fields:\n%s\n" % str(missing_person_ids)
+            error_msg += "Use 0 for person_id for trips without corresponding person."
+            FastTripsLogger.fatal(error_msg)
+            raise DemandInputErorr(Passenger.INPUT_TRIP_LIST_FILE, error_msg)
+
+        # Drop (warn) on missing origins or destinations
+        missing_ods = trip_list_df[ pandas.isnull(trip_list_df[Passenger.TRIP_LIST_COLUMN_ORIGIN_TAZ_ID])|
+                                    pandas.isnull(trip_list_df[Passenger.TRIP_LIST_COLUMN_DESTINATION_TAZ_ID]) ]
+        if len(missing_ods)>0:
+            FastTripsLogger.warn("Missing origin or destination for the following trips. Dropping.\n%s" % str(missing_ods))
+            trip_list_df = trip_list_df.loc[ pandas.notnull(trip_list_df[Passenger.TRIP_LIST_COLUMN_ORIGIN_TAZ_ID     ])&
+                                             pandas.notnull(trip_list_df[Passenger.TRIP_LIST_COLUMN_DESTINATION_TAZ_ID]) ]
+        trip_list_df = trip_list_df.reset_index(drop=True)
+
+        # Create unique numeric index
+        trip_list_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM] = trip_list_df.index + num_prev_trips + 1
+        num_trips = num_prev_trips + len(trip_list_df)
+
+        # datetime and float versions
+        for (time_colname, time_min_colname) in [(Passenger.TRIP_LIST_COLUMN_ARRIVAL_TIME,   Passenger.TRIP_LIST_COLUMN_ARRIVAL_TIME_MIN),
+                                                 (Passenger.TRIP_LIST_COLUMN_DEPARTURE_TIME, Passenger.TRIP_LIST_COLUMN_DEPARTURE_TIME_MIN)]:
+            try:
+                (trip_list_df[time_colname], trip_list_df[time_min_colname]) = \
+                    Util.read_times(trip_list_df[time_colname].values, with_minutes=True)
+            except ValueError as e:
+                error_msg = "Failed to read %s: %s" % (time_colname, str(e))
+                FastTripsLogger.fatal(error_msg)
+                raise DemandInputErorr(Passenger.INPUT_TRIP_LIST_FILE, error_msg)
 
         if len(self.persons_df) > 0:
             # Join trips to persons
-            self.trip_list_df = pandas.merge(left=self.trip_list_df, right=self.persons_df,
-                                             how='left',
-                                             on=Passenger.TRIP_LIST_COLUMN_PERSON_ID)
+            trip_list_df = pandas.merge(left=trip_list_df, right=self.persons_df,
+                                        how='left',
+                                        on=Passenger.TRIP_LIST_COLUMN_PERSON_ID)
 
             # are any null?
-            no_person_ids = self.trip_list_df.loc[ pandas.isnull(self.trip_list_df[Passenger.PERSONS_COLUMN_PERSON_ID_NUM])&
-                                                   (self.trip_list_df[Passenger.PERSONS_COLUMN_PERSON_ID]!="0")]
+            no_person_ids = trip_list_df.loc[ pandas.isnull(trip_list_df[Passenger.PERSONS_COLUMN_PERSON_ID_NUM])&
+                                              (trip_list_df[Passenger.PERSONS_COLUMN_PERSON_ID]!="0")]
             if len(no_person_ids) > 0:
                 error_msg = "Even though a person list is given, failed to find person information for %d trips" % len(no_person_ids)
                 FastTripsLogger.fatal(error_msg)
@@ -252,114 +341,109 @@ class Passenger:
                 raise DemandInputErorr(Passenger.INPUT_TRIP_LIST_FILE, error_msg)
 
             # And then to households
-            self.trip_list_df = pandas.merge(left=self.trip_list_df, right=self.households_df,
-                                             how='left',
-                                             on=Passenger.PERSONS_COLUMN_HOUSEHOLD_ID)
+            trip_list_df = pandas.merge(left=trip_list_df, right=self.households_df,
+                                        how='left',
+                                        on=Passenger.PERSONS_COLUMN_HOUSEHOLD_ID)
         else:
             # Give each passenger a unique person ID num
-            self.trip_list_df[Passenger.PERSONS_COLUMN_PERSON_ID_NUM] = self.trip_list_df.index + 1
+            trip_list_df[Passenger.PERSONS_COLUMN_PERSON_ID_NUM] = trip_list_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM]
 
         # add TAZ numeric ids (stored in the stop mapping)
-        self.trip_list_df = stops.add_numeric_stop_id(self.trip_list_df,
+        trip_list_df = stops.add_numeric_stop_id(trip_list_df,
             id_colname        =Passenger.TRIP_LIST_COLUMN_ORIGIN_TAZ_ID,
             numeric_newcolname=Passenger.TRIP_LIST_COLUMN_ORIGIN_TAZ_ID_NUM,
             warn              =True,
             warn_msg          ="TAZ numbers configured as origins in demand file are not found in the network")
-        self.trip_list_df = stops.add_numeric_stop_id(self.trip_list_df,
+        trip_list_df = stops.add_numeric_stop_id(trip_list_df,
             id_colname        =Passenger.TRIP_LIST_COLUMN_DESTINATION_TAZ_ID,
             numeric_newcolname=Passenger.TRIP_LIST_COLUMN_DESTINATION_TAZ_ID_NUM,
             warn              =True,
             warn_msg          ="TAZ numbers configured as destinations in demand file are not found in the network")
-        # trips with invalid TAZs have been dropped
-        FastTripsLogger.debug("Have %d person trips" % len(self.trip_list_df))
 
         # figure out modes:
-        if Passenger.TRIP_LIST_COLUMN_MODE not in trip_list_cols:
+        if Passenger.TRIP_LIST_COLUMN_MODE not in trip_list_df.columns.values:
             # default to generic walk-transit-walk
-            self.trip_list_df[Passenger.TRIP_LIST_COLUMN_MODE] = Passenger.MODE_GENERIC_TRANSIT
-            self.trip_list_df['mode_dash_count'] = 0
-
-        else:
-            # count the dashes in the mode
-            self.trip_list_df['mode_dash_count'] = self.trip_list_df[Passenger.TRIP_LIST_COLUMN_MODE]\
-                .map(lambda x: x.count('-'))
+            trip_list_df[Passenger.TRIP_LIST_COLUMN_MODE] = Passenger.MODE_GENERIC_TRANSIT
+
+        # split the distinct modes rather than every trip's mode
+        (mode_codes, modes) = pandas.factorize(trip_list_df[Passenger.TRIP_LIST_COLUMN_MODE].values)
+        access_modes  = numpy.empty(len(modes), dtype=object)
+        transit_modes = numpy.empty(len(modes), dtype=object)
+        egress_modes  = numpy.empty(len(modes), dtype=object)
+        bad_modes     = []
+        for mode_num in range(len(modes)):
+            mode_parts = str(modes[mode_num]).split('-')
+            if len(mode_parts) == 3:
+                (access_modes[mode_num], transit_modes[mode_num], egress_modes[mode_num]) = mode_parts
+            elif modes[mode_num] == Passenger.MODE_GENERIC_TRANSIT:
+                # Take care of the transit generic
+                access_modes [mode_num] = "%s" % TAZ.ACCESS_EGRESS_MODES[0]
+                transit_modes[mode_num] = Passenger.MODE_GENERIC_TRANSIT
+                egress_modes [mode_num] = "%s" % TAZ.ACCESS_EGRESS_MODES[0]
+            else:
+                bad_modes.append(modes[mode_num])
 
         # The only modes allowed are access-transit-egress or MODE_GENERIC_TRANSIT
-        bad_mode_df = self.trip_list_df.loc[((self.trip_list_df['mode_dash_count']!=2)&
-                                             ((self.trip_list_df['mode_dash_count']!=0)|
-                                              (self.trip_list_df[Passenger.TRIP_LIST_COLUMN_MODE]!=Passenger.MODE_GENERIC_TRANSIT)))]
-        if len(bad_mode_df) > 0:
+        if (mode_codes < 0).any() or len(bad_modes) > 0:
+            bad_mode_df = trip_list_df.loc[pandas.isnull(trip_list_df[Passenger.TRIP_LIST_COLUMN_MODE])|
+                                           trip_list_df[Passenger.TRIP_LIST_COLUMN_MODE].isin(bad_modes)]
             FastTripsLogger.fatal("Could not understand column '%s' in the following: \n%s" %
                                   (Passenger.TRIP_LIST_COLUMN_MODE,
-                                   bad_mode_df[[Passenger.TRIP_LIST_COLUMN_MODE,'mode_dash_count']].to_string()))
+                                   bad_mode_df[[Passenger.TRIP_LIST_COLUMN_MODE]].to_string()))
             sys.exit(2)
 
-        # Take care of the transit generic
-        self.trip_list_df.loc[self.trip_list_df['mode_dash_count']==0,
-                              Passenger.TRIP_LIST_COLUMN_TRANSIT_MODE] = Passenger.MODE_GENERIC_TRANSIT
-        self.trip_list_df.loc[self.trip_list_df['mode_dash_count']==0,
-                              Passenger.TRIP_LIST_COLUMN_ACCESS_MODE ] = "%s" % TAZ.ACCESS_EGRESS_MODES[0]
-        self.trip_list_df.loc[self.trip_list_df['mode_dash_count']==0,
-                              Passenger.TRIP_LIST_COLUMN_EGRESS_MODE ] = "%s" % TAZ.ACCESS_EGRESS_MODES[0]
-
-        # Take care of the access-transit-egress
-        self.trip_list_df.loc[self.trip_list_df['mode_dash_count']==2,
-                              Passenger.TRIP_LIST_COLUMN_ACCESS_MODE] = self.trip_list_df[Passenger.TRIP_LIST_COLUMN_MODE]\
-            .map(lambda x: "%s" % x[:x.find('-')])
-        self.trip_list_df.loc[self.trip_list_df['mode_dash_count']==2,
-                              Passenger.TRIP_LIST_COLUMN_TRANSIT_MODE] = self.trip_list_df[Passenger.TRIP_LIST_COLUMN_MODE]\
-            .map(lambda x: x[x.find('-')+1:x.rfind('-')])
-        self.trip_list_df.loc[self.trip_list_df['mode_dash_count']==2,
-                              Passenger.TRIP_LIST_COLUMN_EGRESS_MODE] = self.trip_list_df[Passenger.TRIP_LIST_COLUMN_MODE]\
-            .map(lambda x: "%s" % x[x.rfind('-')+1:])
-
-        # We're done with mode_dash_count, thanks for your service
-        self.trip_list_df.drop('mode_dash_count', axis=1, inplace=True) # replace with cumsum
+        trip_list_df[Passenger.TRIP_LIST_COLUMN_ACCESS_MODE ] = access_modes [mode_codes]
+        trip_list_df[Passenger.TRIP_LIST_COLUMN_TRANSIT_MODE] = transit_modes[mode_codes]
+        trip_list_df[Passenger.TRIP_LIST_COLUMN_EGRESS_MODE ] = egress_modes [mode_codes]
 
         # Set the user class for each trip
-        from .PathSet import PathSet
-        PathSet.set_user_class(self.trip_list_df, Passenger.TRIP_LIST_COLUMN_USER_CLASS)
+        if len(trip_list_df) > 0:
+            PathSet.set_user_class(trip_list_df, Passenger.TRIP_LIST_COLUMN_USER_CLASS)
+        else:
+            trip_list_df[Passenger.TRIP_LIST_COLUMN_USER_CLASS] = ""
 
-        # Verify that PathSet has all the configuration for these user classes + transit modes + access modes + egress modes
-        # => Figure out unique user class + mode combinations
-        self.modes_df = self.trip_list_df[[Passenger.TRIP_LIST_COLUMN_USER_CLASS,
-                                           Passenger.TRIP_LIST_COLUMN_PURPOSE,
-                                           Passenger.TRIP_LIST_COLUMN_TRANSIT_MODE,
-                                           Passenger.TRIP_LIST_COLUMN_ACCESS_MODE,
-                                           Passenger.TRIP_LIST_COLUMN_EGRESS_MODE]].set_index([Passenger.TRIP_LIST_COLUMN_USER_CLASS, Passenger.TRIP_LIST_COLUMN_PURPOSE])
-        # stack - so before we have three columns: transit_mode, access_mode, egress_mode
-        # after, we have two columns: demand_mode_type and the value, demand_mode
-        self.modes_df               = self.modes_df.stack().to_frame()
-        self.modes_df.index.names   = [Passenger.TRIP_LIST_COLUMN_USER_CLASS, Passenger.TRIP_LIST_COLUMN_PURPOSE, PathSet.WEIGHTS_COLUMN_DEMAND_MODE_TYPE]
-        self.modes_df.columns       = [PathSet.WEIGHTS_COLUMN_DEMAND_MODE]
-        self.modes_df.reset_index(inplace=True)
-        self.modes_df.drop_duplicates(inplace=True)
-        # fix demand_mode_type since transit_mode is just transit, etc
-        self.modes_df[PathSet.WEIGHTS_COLUMN_DEMAND_MODE_TYPE] = self.modes_df[PathSet.WEIGHTS_COLUMN_DEMAND_MODE_TYPE].apply(lambda x: x[:-5])
-        FastTripsLogger.debug("Demand mode types by class & purpose: \n%s" % str(self.modes_df))
+        # encode the few distinct strings
+        for colname in Passenger.TRIP_LIST_CATEGORICAL_COLUMNS:
+            if colname in trip_list_df.columns.values:
+                trip_list_df[colname] = trip_list_df[colname].astype("category")
 
-        # Make sure we have all the weights required for these user_class/mode combinations
-        self.trip_list_df = PathSet.verify_weight_config(self.modes_df, output_dir, routes, capacity_constraint, self.trip_list_df)
+        return (trip_list_df, num_trips)
 
-        FastTripsLogger.info("Have %d person trips" % len(self.trip_list_df))
-        FastTripsLogger.debug("Final trip_list_df\n"+str(self.trip_list_df.index.dtype)+"\n"+str(self.trip_list_df.dtypes))
-        FastTripsLogger.debug("\n"+self.trip_list_df.head().to_string())
+    @staticmethod
+    def concat_categorical(dataframes, categorical_colnames):
+        """
+        Concatenates the given list of :py:class:`pandas.DataFrame` instances, with a new index.  The columns
+        in *categorical_colnames* are categorical in each, with differing categories; they're recoded to the
+        union of the categories (in the order found) so the result's columns are categorical as well.
+        """
+        for colname in categorical_colnames:
+            if colname not in dataframes[0].columns.values: continue
+
+            categories = []
+            known      = set()
+            for dataframe in dataframes:
+                for category in dataframe[colname].cat.categories:
+                    if category in known: continue
+                    categories.append(category)
+                    known.add(category)
 
-        #: Maps trip list ID num to :py:class:`PathSet` instance
-        self.id_to_pathset = collections.OrderedDict()
+            for dataframe in dataframes:
+                dataframe[colname] = dataframe[colname].cat.set_categories(categories)
 
-    def add_pathset(self, trip_list_id, pathset):
+        return pandas.concat(dataframes, axis=0, ignore_index=True)
+
+    def create_pathset_store(self):
         """
-        Stores this path set for the trip_list_id.
+        Creates the :py:class:`PathSetStore` for the trips in :py:attr:`Passenger.trip_list_df`.
         """
-        self.id_to_pathset[trip_list_id] = pathset
+        from .PathSetStore import PathSetStore
+        self.pathset_store = PathSetStore(self.trip_list_df)
 
     def get_pathset(self, trip_list_id):
         """
-        Retrieves a stored path set for the given trip_list_id
+        Retrieves a stored path set for the given trip_list_id, as a :py:class:`PathSetView`.
         """
-        # print self.id_to_path
-        return self.id_to_pathset[trip_list_id]
+        return self.pathset_store.get_view(trip_list_id)
 
     def get_person_id(self, trip_list_id):
         return self.trip_list_df.loc[self.trip_list_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM]==trip_list_id, Passenger.TRIP_LIST_COLUMN_PERSON_ID].iloc[0]
@@ -369,6 +453,9 @@ class Passenger:
         """
         Reads the dataframes described in :py:meth:`Passenger.setup_passenger_pathsets` and returns them.
 
+        If not *include_asgn* and the binary checkpoints :py:attr:`Passenger.PF_PATHS_CHECKPOINT` and
+        :py:attr:`Passenger.PF_LINKS_CHECKPOINT` are at least as new as the csv files, those are read instead.
+
         :param pathset_dir: Location of csv files to read
         :type pathset_dir: string
         :param include_asgn: If true, read from files called :py:attr:`Passenger.PF_PATHS_CSV` and :py:attr:`Passenger.PF_LINKS_CSV`.
@@ -378,13 +465,21 @@ class Passenger:
                  for documentation on the passenger paths :py:class:`pandas.DataFrame`
         :rtype: a tuple of (:py:class:`pandas.DataFrame`, :py:class:`pandas.DataFrame`)
         """
+        if not include_asgn and Passenger.pathset_checkpoint_is_current(pathset_dir):
+            pathset_paths_df = Util.read_dataframe_columns(os.path.join(pathset_dir, Passenger.PF_PATHS_CHECKPOINT))
+            pathset_links_df = Util.read_dataframe_columns(os.path.join(pathset_dir, Passenger.PF_LINKS_CHECKPOINT))
+            if debugDataFrames("read_passenger_pathsets"):
+                FastTripsLogger.debug("pathset_links_df.dtypes=\n%s" % str(pathset_links_df.dtypes))
+            return (pathset_paths_df, pathset_links_df)
+
         # read existing paths
         paths_file = os.path.join(pathset_dir, Passenger.PATHSET_PATHS_CSV if include_asgn else Passenger.PF_PATHS_CSV)
         pathset_paths_df = pandas.read_csv(paths_file,
                                            dtype={Passenger.TRIP_LIST_COLUMN_PERSON_ID     :object,
                                                   Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID:object})
         FastTripsLogger.info("Read %s" % paths_file)
-        FastTripsLogger.debug("pathset_paths_df.dtypes=\n%s" % str(pathset_paths_df.dtypes))
+        if debugDataFrames("read_passenger_pathsets"):
+            FastTripsLogger.debug("pathset_paths_df.dtypes=\n%s" % str(pathset_paths_df.dtypes))
 
         from .Assignment import Assignment
 
@@ -409,7 +504,7 @@ class Passenger:
 
         # convert time strings to datetimes
         for date_col in date_cols:
-            pathset_links_df[date_col] = pathset_links_df[date_col].map(lambda x: Util.read_time(x))
+            pathset_links_df[date_col] = Util.read_times(pathset_links_df[date_col].values)
 
         # convert time duration columns to time durations
         link_cols = list(pathset_links_df.columns.values)
@@ -442,16 +537,33 @@ class Passenger:
                                    "%s min" % Assignment.SIM_COL_PAX_WAIT_TIME], axis=1, inplace=True)
 
         FastTripsLogger.info("Read %s" % links_file)
-        FastTripsLogger.debug("pathset_links_df head=\n%s" % str(pathset_links_df.head()))
-        FastTripsLogger.debug("pathset_links_df.dtypes=\n%s" % str(pathset_links_df.dtypes))
+        if debugDataFrames("read_passenger_pathsets links"):
+            FastTripsLogger.debug("pathset_links_df head=\n%s" % str(pathset_links_df.head()))
+            FastTripsLogger.debug("pathset_links_df.dtypes=\n%s" % str(pathset_links_df.dtypes))
 
         return (pathset_paths_df, pathset_links_df)
 
+    @staticmethod
+    def pathset_checkpoint_is_current(pathset_dir):
+        """
+        Returns True if the pathfinding results checkpoints in *pathset_dir* exist and are at least as new as
+        the csv versions, so the csv files haven't been edited since.
+        """
+        for (csv_file, checkpoint_dir) in [(Passenger.PF_PATHS_CSV, Passenger.PF_PATHS_CHECKPOINT),
+                                           (Passenger.PF_LINKS_CSV, Passenger.PF_LINKS_CHECKPOINT)]:
+            schema_file = os.path.join(pathset_dir, checkpoint_dir, Util.COLUMNS_SCHEMA_FILE)
+            if not os.path.exists(schema_file):
+                return False
+            csv_file = os.path.join(pathset_dir, csv_file)
+            if os.path.exists(csv_file) and os.path.getmtime(csv_file) > os.path.getmtime(schema_file):
+                FastTripsLogger.info("%s is newer than %s; not using the checkpoint" % (csv_file, checkpoint_dir))
+                return False
+        return True
 
     def setup_passenger_pathsets(self, iteration, stops, trip_id_df, trips_df, modes_df, 
                                  transfers, tazs, prepend_route_id_to_trip_id):
         """
-        Converts pathfinding results (which is stored in each Passenger :py:class:`PathSet`) into two
+        Converts pathfinding results (which are stored in :py:attr:`Passenger.pathset_store`) into two
         :py:class:`pandas.DataFrame` instances.
 
         Returns two :py:class:`pandas.DataFrame` instances: pathset_paths_df and pathset_links_df.
@@ -510,19 +622,26 @@ class Passenger:
         ==============  ===============  =====================================================================================================
 
         """
-        from .PathSet import PathSet
+        from .PathSet      import PathSet
+        from .PathSetStore import PathSetView
         pathlist = []
         linklist = []
 
-        trip_list_id_nums = self.pathfind_trip_list_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].tolist()
+        FastTripsLogger.info("PathSetStore after pathfinding: %s" % self.pathset_store.memory_usage_str())
 
-        for trip_list_id,pathset in self.id_to_pathset.iteritems():
-            # only process if we just did pathfinding for this person trip
-            if trip_list_id not in trip_list_id_nums: continue
+        # only process if we just did pathfinding for this person trip
+        store_idxs = numpy.sort(self.pathset_store.indices(self.pathfind_trip_list_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values))
+
+        for store_idx in store_idxs:
+            pathset      = PathSetView(self.pathset_store, store_idx)
+            trip_list_id = pathset.trip_list_id_num
 
             if not pathset.goes_somewhere():   continue
             if not pathset.path_found():       continue
 
+            # decode the stored results once
+            pathdict = pathset.pathdict
+
             for pathnum in range(pathset.num_paths()):
                 # OUTBOUND passengers have states like this:
                 #    stop:          label    departure   dep_mode  successor linktime
@@ -556,7 +675,7 @@ class Passenger:
                 prev_linkmode = None
                 prev_state_id = None
 
-                state_list = pathset.pathdict[pathnum][PathSet.PATH_KEY_STATES]
+                state_list = pathdict[pathnum][PathSet.PATH_KEY_STATES]
                 if not pathset.outbound(): state_list = list(reversed(state_list))
 
                 pathlist.append([\
@@ -567,8 +686,8 @@ class Passenger:
                     pathset.mode,
                     iteration,
                     pathnum,
-                    pathset.pathdict[pathnum][PathSet.PATH_KEY_COST],
-                    pathset.pathdict[pathnum][PathSet.PATH_KEY_PROBABILITY]
+                    pathdict[pathnum][PathSet.PATH_KEY_COST],
+                    pathdict[pathnum][PathSet.PATH_KEY_PROBABILITY]
                 ])
 
                 link_num   = 0
@@ -690,7 +809,8 @@ class Passenger:
         pathset_links_df.drop(["%s_x" % Route.ROUTES_COLUMN_MODE_NUM,
                                "%s_y" % Route.ROUTES_COLUMN_MODE_NUM], axis=1, inplace=True)
         # verify it's always set
-        FastTripsLogger.debug("Have %d links with no mode number set" % len(pathset_links_df.loc[ pandas.isnull(pathset_links_df[Route.ROUTES_COLUMN_MODE_NUM]) ]))
+        if isDebugEnabled():
+            FastTripsLogger.debug("Have %d links with no mode number set" % len(pathset_links_df.loc[ pandas.isnull(pathset_links_df[Route.ROUTES_COLUMN_MODE_NUM]) ]))
 
         # get supply mode
         pathset_links_df = pandas.merge(left=pathset_links_df, right=modes_df[[Route.ROUTES_COLUMN_MODE_NUM, Route.ROUTES_COLUMN_MODE]], how="left")
@@ -736,15 +856,26 @@ class Passenger:
     @staticmethod
     def write_paths(output_dir, iteration, simulation_iteration, pathset_df, links, output_pathset_per_sim_iter):
         """
-        Write either pathset paths (if links=False) or pathset links (if links=True) as the case may be
+        Write either pathset paths (if links=False) or pathset links (if links=True) as the case may be.
+
+        The pathfinding result is always CSV since :py:meth:`Passenger.read_passenger_pathsets` reads it,
+        plus a binary checkpoint if :py:attr:`Assignment.PATHSET_CHECKPOINT`;
+        the others are in the :py:attr:`Assignment.OUTPUT_FORMAT` format.
         """
+        from .Assignment import Assignment
+
         # if iteration == 0, then this is the pathfinding result
         if iteration==0:
-            Util.write_dataframe(df=pathset_df,
-                                 name="pathset_links_df" if links else "pathset_paths_df",
-                                 output_file=os.path.join(output_dir, Passenger.PF_LINKS_CSV if links else Passenger.PF_PATHS_CSV),
-                                 append=False,
-                                 keep_duration_columns=True)
+            Assignment.OUTPUT_WRITER.write_dataframe(df=pathset_df,
+                                                     name="pathset_links_df" if links else "pathset_paths_df",
+                                                     output_file=os.path.join(output_dir, Passenger.PF_LINKS_CSV if links else Passenger.PF_PATHS_CSV),
+                                                     append=False,
+                                                     keep_duration_columns=True)
+            # after the csv, so it's newer
+            if Assignment.PATHSET_CHECKPOINT:
+                Assignment.OUTPUT_WRITER.write_dataframe_columns(pathset_df,
+                                                                 "pathset_links_df" if links else "pathset_paths_df",
+                                                                 os.path.join(output_dir, Passenger.PF_LINKS_CHECKPOINT if links else Passenger.PF_PATHS_CHECKPOINT))
             return
 
         # otherwise, add columns and write it
@@ -755,14 +886,18 @@ class Passenger:
         do_append = True
         # but sometimes we ovewrite
         if output_pathset_per_sim_iter:
-            if (iteration == 1) and (simulation_iter == 0): do_append = False
+            if (iteration == 1) and (simulation_iteration == 0): do_append = False
+            partition = "iter%03d_sim%03d" % (iteration, simulation_iteration)
         else:
             if iteration == 1: do_append = False
-
-        Util.write_dataframe(pathset_df,
-                             "pathset_links_df" if links else "pathset_paths_df",
-                             os.path.join(output_dir, Passenger.PATHSET_LINKS_CSV if links else Passenger.PATHSET_PATHS_CSV),
-                             append=do_append)
+            partition = "iter%03d" % iteration
+
+        Assignment.OUTPUT_WRITER.write_dataframe(pathset_df,
+                                                 "pathset_links_df" if links else "pathset_paths_df",
+                                                 os.path.join(output_dir, Passenger.PATHSET_LINKS_CSV if links else Passenger.PATHSET_PATHS_CSV),
+                                                 append=do_append,
+                                                 output_format=Assignment.OUTPUT_FORMAT,
+                                                 partition=partition)
         pathset_df.drop(["iteration","simulation_iteration"], axis=1, inplace=True)
 
 
@@ -802,104 +937,117 @@ class Passenger:
             #     # do the same to links
             #     rejected_paths.groupby([Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, Passenger.PF_COL_PATH_NUM])
 
-        # group to passenger trips
-        pathset_paths_df_grouped = pathset_paths_df[[Passenger.TRIP_LIST_COLUMN_PERSON_ID,
-                                                     Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
-                                                     Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
-                                                     Assignment.SIM_COL_PAX_CHOSEN]].groupby([Passenger.TRIP_LIST_COLUMN_PERSON_ID,Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
-                                                                                              Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM]).aggregate("max").reset_index()
-        # if there's no chosen AND one of the unchosen options is choosable then we can choose
-        num_rejected = len(pathset_paths_df_grouped.loc[ pathset_paths_df_grouped[Assignment.SIM_COL_PAX_CHOSEN]==Assignment.CHOSEN_REJECTED       ])  # everything is rejected
-        num_unchosen = len(pathset_paths_df_grouped.loc[ pathset_paths_df_grouped[Assignment.SIM_COL_PAX_CHOSEN]==Assignment.CHOSEN_NOT_CHOSEN_YET ])
-        num_chosen   = len(pathset_paths_df_grouped) - num_rejected - num_unchosen
+        # If we have no pathsets, there's nothing to do
+        if len(pathset_paths_df) == 0:
+            return (0, 0, pathset_paths_df, pathset_links_df)
+
+        # make pathsets contiguous by trip_list_id_num; stable so paths stay in pathset order within each trip
+        trip_list_id_num = pathset_paths_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values
+        path_order       = numpy.argsort(trip_list_id_num, kind="mergesort")
+        sorted_trip_ids  = trip_list_id_num[path_order]
+        trip_starts      = numpy.flatnonzero(numpy.concatenate(([True], sorted_trip_ids[1:] != sorted_trip_ids[:-1])))
+        trip_counts      = numpy.diff(numpy.append(trip_starts, len(path_order)))
+        num_trips        = len(trip_starts)
+        # trip index for each path in sorted order, and each path's position within its pathset
+        path_trip_idx    = numpy.repeat(numpy.arange(num_trips), trip_counts)
+        path_pos_in_trip = numpy.arange(len(path_order)) - trip_starts[path_trip_idx]
+
+        # passenger trip chosen status is the max of its paths
+        chosen      = pathset_paths_df[Assignment.SIM_COL_PAX_CHOSEN].values[path_order]
+        trip_chosen = numpy.maximum.reduceat(chosen, trip_starts)
 
-        # count how many passenger trips have pathsets with valid paths (logsum > 0) AND no path chosen (chosen < 0)
-        pax_choose_df = pathset_paths_df_grouped.loc[ pathset_paths_df_grouped[Assignment.SIM_COL_PAX_CHOSEN]==Assignment.CHOSEN_NOT_CHOSEN_YET ].copy()
-        num_unchosen  = len(pax_choose_df)
+        # if there's no chosen AND one of the unchosen options is choosable then we can choose
+        num_rejected = (trip_chosen==Assignment.CHOSEN_REJECTED      ).sum()  # everything is rejected
+        num_unchosen = (trip_chosen==Assignment.CHOSEN_NOT_CHOSEN_YET).sum()
+        num_chosen   = num_trips - num_rejected - num_unchosen
 
-        FastTripsLogger.info("          Have %6d total passenger-trips, with %6d chosen paths, %6d fully rejected and %6d needing a choice" % (len(pathset_paths_df_grouped), num_chosen, num_rejected, num_unchosen))
+        FastTripsLogger.info("          Have %6d total passenger-trips, with %6d chosen paths, %6d fully rejected and %6d needing a choice" % (num_trips, num_chosen, num_rejected, num_unchosen))
 
         # If we have nothing to do, return
-        if len(pax_choose_df) == 0:
+        if num_unchosen == 0:
             return (num_chosen, 0, pathset_paths_df, pathset_links_df)
 
-        # flag it
-        pax_choose_df["to_choose"] = 1
-
-        # Choose a random number for them now
+        # Choose a random number for them now, in person_id, person_trip_id, trip_list_id_num order
         # todo: do this differently?
+        choose_trip_idx = numpy.flatnonzero(trip_chosen==Assignment.CHOSEN_NOT_CHOSEN_YET)
+        trip_first_path = path_order[trip_starts[choose_trip_idx]]
+        pax_choose_df   = pandas.DataFrame({Passenger.TRIP_LIST_COLUMN_PERSON_ID       :pathset_paths_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID     ].values[trip_first_path],
+                                            Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID  :pathset_paths_df[Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID].values[trip_first_path],
+                                            Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM:sorted_trip_ids[trip_starts[choose_trip_idx]],
+                                            "trip_idx"                                 :choose_trip_idx})
+        pax_choose_df.sort_values([Passenger.TRIP_LIST_COLUMN_PERSON_ID,
+                                   Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
+                                   Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM], inplace=True)
         numpy.random.seed(iteration*1000 + simulation_iteration)
-        pax_choose_df["rand"] = numpy.random.rand(len(pax_choose_df))
-        # FastTripsLogger.debug("\n%s" % pax_choose_df.head().to_string())
-
-        # add to_choose flag and rand to pathset_paths_df
-        pathset_paths_df = pandas.merge(left =pathset_paths_df,
-                                        right=pax_choose_df[[Passenger.TRIP_LIST_COLUMN_PERSON_ID,Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, "to_choose", "rand"]],
-                                        how  ="left")
-        FastTripsLogger.debug("choose_paths() pathset_paths_df=\n%s" % pathset_paths_df.head().to_string())
-
-        # select out just those pathsets we're choosing, and eligible
-        paths_choose_df = pathset_paths_df.loc[ (pathset_paths_df["to_choose"]==1) &
-                                                (pathset_paths_df[Assignment.SIM_COL_PAX_COST] < PathSet.HUGE_COST) &
-                                                (pathset_paths_df[Assignment.SIM_COL_PAX_CHOSEN] == Assignment.CHOSEN_NOT_CHOSEN_YET) ].copy()
-        FastTripsLogger.debug("choose_paths() paths_choose_df=\n%s" % pathset_paths_df.loc[ (pathset_paths_df["to_choose"]==1) ].head(30).to_string())
-
-        if len(paths_choose_df) == 0:
+        trip_rand = numpy.empty(num_trips, dtype=numpy.float64)
+        trip_rand.fill(numpy.nan)
+        trip_rand[pax_choose_df["trip_idx"].values] = numpy.random.rand(len(pax_choose_df))
+        del pax_choose_df
+
+        # select out just those paths we're choosing from, and eligible
+        probability = pathset_paths_df[Assignment.SIM_COL_PAX_PROBABILITY].values[path_order]
+        eligible    = (trip_chosen[path_trip_idx]==Assignment.CHOSEN_NOT_CHOSEN_YET) & \
+                      (pathset_paths_df[Assignment.SIM_COL_PAX_COST].values[path_order] < PathSet.HUGE_COST) & \
+                      (chosen==Assignment.CHOSEN_NOT_CHOSEN_YET)
+
+        if not eligible.any():
             FastTripsLogger.info("          No choosable paths")
-            pathset_paths_df.drop(["to_choose","rand"], axis=1, inplace=True)
             return (num_chosen, 0, pathset_paths_df, pathset_links_df)
 
-        # Use updated probability -- create cumulative probability
-        paths_choose_df["prob_cum"] = paths_choose_df.groupby([Passenger.TRIP_LIST_COLUMN_PERSON_ID,
-                                                              Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
-                                                               Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM])[Assignment.SIM_COL_PAX_PROBABILITY].cumsum()
-        # verify cumsum is ok
-        # FastTripsLogger.debug("choose_path() paths_choose_df=\n%s\n" % paths_choose_df.head(100).to_string())
-
-        # use it to choose the path based on the cumulative probability
-        paths_choose_df["rand_less"] = False
-        paths_choose_df.loc[paths_choose_df["rand"] < paths_choose_df["prob_cum"], "rand_less"] = True
-        if num_unchosen < 10:
-            FastTripsLogger.debug("choose_path() paths_choose_df=\n%s\n" % paths_choose_df.to_string())
-        else:
-            FastTripsLogger.debug("choose_path() paths_choose_df=\n%s\n" % paths_choose_df.head(100).to_string())
-
-        # this will now be person id, trip list id num, index for chosen path
-        chosen_path_df = paths_choose_df[[Passenger.TRIP_LIST_COLUMN_PERSON_ID,
-                                          Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
-                                          Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
-                                          "rand_less"]].groupby([Passenger.TRIP_LIST_COLUMN_PERSON_ID,
-                                                                 Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
-                                                                 Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM]).idxmax(axis=0).reset_index()
-        chosen_path_df.rename(columns={"rand_less":"chosen_idx"}, inplace=True)
-        FastTripsLogger.debug("choose_path() chosen_path_df=\n%s\n" % chosen_path_df.head(30).to_string())
-        num_chosen += len(chosen_path_df)
+        # Use updated probability -- create cumulative probability over eligible paths within each pathset.
+        # This adds one pathset position at a time so it sums in the same order as a per-pathset cumsum.
+        prob_add = numpy.where(eligible&pandas.notnull(probability), probability, 0.0)
+        prob_cum = prob_add.copy()
+        (pos_paths, pos_starts, pos_counts) = Util.group_positions(path_pos_in_trip, int(trip_counts.max()))
+        for pos in range(1, len(pos_starts)):
+            paths = pos_paths[pos_starts[pos]:pos_starts[pos]+pos_counts[pos]]
+            prob_cum[paths] = prob_cum[paths-1] + prob_add[paths]
+
+        # use it to choose the path: the first eligible path where the random number is less than the cumulative probability.
+        # If there isn't one, choose the first eligible path.
+        NO_PATH       = len(path_order)
+        path_idx      = numpy.arange(len(path_order))
+        # trip_rand is NaN for trips that aren't choosing, so only compare the eligible paths
+        rand_less     = eligible & pandas.notnull(probability)
+        rand_less[rand_less] = (trip_rand[path_trip_idx[rand_less]] < prob_cum[rand_less])
+        chosen_sorted = numpy.minimum.reduceat(numpy.where(rand_less, path_idx, NO_PATH), trip_starts)
+        first_sorted  = numpy.minimum.reduceat(numpy.where(eligible,  path_idx, NO_PATH), trip_starts)
+        chosen_sorted = numpy.where(chosen_sorted==NO_PATH, first_sorted, chosen_sorted)
+        chosen_sorted = chosen_sorted[chosen_sorted < NO_PATH]
+        num_new_chosen = len(chosen_sorted)
+        num_chosen    += num_new_chosen
 
         # mark it as chosen
-        pathset_paths_df = pandas.merge(left=pathset_paths_df, right=chosen_path_df, how="left")
-        pathset_paths_df.loc[pathset_paths_df["chosen_idx"]==pathset_paths_df.index, Assignment.SIM_COL_PAX_CHOSEN] = iteration + (0.01*simulation_iteration)
-        FastTripsLogger.debug("choose_path() pathset_paths_df=\n%s\n" % pathset_paths_df.head(30).to_string())
+        chosen_path_rows = path_order[chosen_sorted]
+        chosen_values    = pathset_paths_df[Assignment.SIM_COL_PAX_CHOSEN].values.astype(numpy.float64)
+        chosen_values[chosen_path_rows] = iteration + (0.01*simulation_iteration)
+        pathset_paths_df[Assignment.SIM_COL_PAX_CHOSEN] = chosen_values
+        if debugDataFrames("choose_paths"):
+            FastTripsLogger.debug("choose_path() chosen paths=\n%s\n" % pathset_paths_df.iloc[chosen_path_rows[:30]].to_string())
 
         FastTripsLogger.info("          Chose %d out of %d paths from the pathsets => total chosen %d" %
-                             (len(chosen_path_df), len(pathset_paths_df_grouped), num_chosen))
-
-        # drop the intermediates
-        pathset_paths_df.drop(["to_choose","rand","chosen_idx"], axis=1, inplace=True)
-        FastTripsLogger.debug("choose_path() pathset_paths_df=\n%s\n" % pathset_paths_df.head(30).to_string())
-
-        # give the chosen index to pathset_links_df
+                             (num_new_chosen, num_trips, num_chosen))
+
+        # give the chosen status to pathset_links_df: look up each link's path row by (trip_list_id_num, pathnum) key
+        link_trip_ids  = pathset_links_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values.astype(numpy.int64)
+        link_path_nums = pathset_links_df[Passenger.PF_COL_PATH_NUM].values.astype(numpy.int64)
+        path_nums      = pathset_paths_df[Passenger.PF_COL_PATH_NUM].values.astype(numpy.int64)
+        key_mult       = max(path_nums.max(), link_path_nums.max() if len(link_path_nums) > 0 else 0) + 1
+        path_keys      = trip_list_id_num.astype(numpy.int64)*key_mult + path_nums
+        path_key_order = numpy.argsort(path_keys, kind="mergesort")
+        link_keys      = link_trip_ids*key_mult + link_path_nums
+        link_key_pos   = numpy.minimum(numpy.searchsorted(path_keys[path_key_order], link_keys), len(path_keys)-1)
+        link_has_path  = (path_keys[path_key_order][link_key_pos] == link_keys)
+
+        link_chosen = numpy.empty(len(pathset_links_df), dtype=numpy.float64)
+        link_chosen.fill(numpy.nan)
+        link_chosen[link_has_path] = chosen_values[path_key_order[link_key_pos[link_has_path]]]
+        # replace the column rather than set it so it goes last, as it did when it was merged on
         if Assignment.SIM_COL_PAX_CHOSEN in list(pathset_links_df.columns.values):
             pathset_links_df.drop(Assignment.SIM_COL_PAX_CHOSEN, axis=1, inplace=True)
+        pathset_links_df[Assignment.SIM_COL_PAX_CHOSEN] = link_chosen
 
-        pathset_links_df = pandas.merge(left=pathset_links_df,
-                                        right=pathset_paths_df[[Passenger.TRIP_LIST_COLUMN_PERSON_ID,
-                                                                Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
-                                                                Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
-                                                                Passenger.PF_COL_PATH_NUM,
-                                                                Assignment.SIM_COL_PAX_CHOSEN]],
-                                        how="left")
-
-        return (num_chosen, len(chosen_path_df), pathset_paths_df, pathset_links_df)
+        return (num_chosen, num_new_chosen, pathset_paths_df, pathset_links_df)
 
 
     @staticmethod
@@ -16,7 +16,7 @@ import collections,datetime,os,string,sys
 import numpy,pandas
 
 from .Error     import NotImplementedError, UnexpectedError
-from .Logger    import FastTripsLogger
+from .Logger    import FastTripsLogger, isDebugEnabled, debugDataFrames
 from .Passenger import Passenger
 from .Route     import Route
 from .TAZ       import TAZ
@@ -39,6 +39,10 @@ class PathSet:
     #: Path times output file
     PATH_TIMES_OUTPUT_FILE          = 'ft_output_passengerTimes.txt'
 
+    #: Number of passenger trips written at a time to :py:attr:`PathSet.PATHS_OUTPUT_FILE` and
+    #: :py:attr:`PathSet.PATH_TIMES_OUTPUT_FILE`
+    WRITE_CHUNK_TRIPS               = 100000
+
     #: Configured functions, indexed by name
     CONFIGURED_FUNCTIONS            = { 'generic_user_class':generic_user_class }
 
@@ -94,6 +98,20 @@ class PathSet:
     #: Weights column: Supply Mode number
     WEIGHTS_COLUMN_SUPPLY_MODE_NUM  = "supply_mode_num"
 
+    #: Weights columns that define a weight group; every link in a weight group is costed with the same weight vector
+    WEIGHT_GROUP_COLUMNS            = [WEIGHTS_COLUMN_USER_CLASS,
+                                       WEIGHTS_COLUMN_PURPOSE,
+                                       WEIGHTS_COLUMN_DEMAND_MODE_TYPE,
+                                       WEIGHTS_COLUMN_DEMAND_MODE,
+                                       WEIGHTS_COLUMN_SUPPLY_MODE]
+
+    #: Weight names for link attributes that depend on the simulated vehicle times and loads.  These are
+    #: evaluated every simulation iteration; the rest of the link cost is calculated once per pathset.
+    DYNAMIC_WEIGHT_NAMES            = ["in_vehicle_time_min",
+                                       "wait_time_min",
+                                       "at_capacity",
+                                       "overcap"]
+
     #: File with weights for c++
     OUTPUT_WEIGHTS_FILE             = "ft_intermediate_weights.txt"
 
@@ -178,6 +196,72 @@ class PathSet:
         """
         return self.direction == PathSet.DIR_OUTBOUND
 
+    @staticmethod
+    def pathdict_from_results(ret_ints, ret_doubles, path_costs, hyperpath):
+        """
+        Converts the pathset arrays returned by the C++ extension (see :py:meth:`Assignment.find_trip_based_pathset`)
+        into a pathdict.
+
+        Returns pathdict, which maps {pathnum:{PATH_KEY_COST:cost, PATH_KEY_PROBABILITY:probability, PATH_KEY_STATES:[state list]}}
+        """
+        pathdict = {}
+        row_num  = 0
+
+        for path_num in range(path_costs.shape[0]):
+
+            pathdict[path_num] = {}
+            pathdict[path_num][PathSet.PATH_KEY_COST       ] = path_costs[path_num, 0]
+            pathdict[path_num][PathSet.PATH_KEY_PROBABILITY] = path_costs[path_num, 1]
+            # List of (stop_id, stop_state)
+            pathdict[path_num][PathSet.PATH_KEY_STATES     ] = []
+
+            # print "path_num %d" % path_num
+
+            # while we have unprocessed rows and the row is still relevant for this path_num
+            while (row_num < ret_ints.shape[0]) and (ret_ints[row_num, 0] == path_num):
+                # print row_num
+
+                mode = ret_ints[row_num,2]
+                # todo
+                if mode == -100:
+                    mode = PathSet.STATE_MODE_ACCESS
+                elif mode == -101:
+                    mode = PathSet.STATE_MODE_EGRESS
+                elif mode == -102:
+                    mode = PathSet.STATE_MODE_TRANSFER
+                elif mode == -103:
+                    mode = Passenger.MODE_GENERIC_TRANSIT_NUM
+
+                if hyperpath:
+                    pathdict[path_num][PathSet.PATH_KEY_STATES].append( (ret_ints[row_num, 1], [
+                        ret_doubles[row_num,0],                                                          # label,
+                        Util.SIMULATION_DAY_START + datetime.timedelta(minutes=ret_doubles[row_num,1]),  # departure/arrival time
+                        mode,                                                                            # departure/arrival mode
+                        ret_ints[row_num,3],                                                             # trip id
+                        ret_ints[row_num,4],                                                             # successor/predecessor
+                        ret_ints[row_num,5],                                                             # sequence
+                        ret_ints[row_num,6],                                                             # sequence succ/pred
+                        datetime.timedelta(minutes=ret_doubles[row_num,2]),                              # link time
+                        ret_doubles[row_num,3],                                                          # cost
+                        Util.SIMULATION_DAY_START + datetime.timedelta(minutes=ret_doubles[row_num,4])   # arrival/departure time
+                    ] ) )
+                else:
+                    pathdict[path_num][PathSet.PATH_KEY_STATES].append( (ret_ints[row_num, 1], [
+                        datetime.timedelta(minutes=ret_doubles[row_num,0]),                              # label,
+                        Util.SIMULATION_DAY_START + datetime.timedelta(minutes=ret_doubles[row_num,1]),  # departure/arrival time
+                        mode,                                                                            # departure/arrival mode
+                        ret_ints[row_num,3],                                                             # trip id
+                        ret_ints[row_num,4],                                                             # successor/predecessor
+                        ret_ints[row_num,5],                                                             # sequence
+                        ret_ints[row_num,6],                                                             # sequence succ/pred
+                        datetime.timedelta(minutes=ret_doubles[row_num,2]),                              # link time
+                        datetime.timedelta(minutes=ret_doubles[row_num,3]),                              # cost
+                        Util.SIMULATION_DAY_START + datetime.timedelta(minutes=ret_doubles[row_num,4])   # arrival/departure time
+                    ] ) )
+                row_num += 1
+
+        return pathdict
+
     @staticmethod
     def set_user_class(trip_list_df, new_colname):
         """
@@ -370,70 +454,78 @@ class PathSet:
         # ret_str += PathSet.states_to_str(self.states, self.direction)
         return ret_str
 
+    @staticmethod
+    def sort_passenger_trips(passengers_df):
+        """
+        Sorts the passenger path links in *passengers_df* by passenger trip (trip_list_id_num), keeping the
+        links of each trip in their order.
+
+        Returns (row order, passenger trip number of each sorted row, first sorted row of each passenger trip,
+        last sorted row of each passenger trip).
+        """
+        trip_list_id_num = passengers_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values
+        order            = numpy.argsort(trip_list_id_num, kind="mergesort")
+        sorted_ids       = trip_list_id_num[order]
+        is_start         = numpy.append(True, sorted_ids[1:] != sorted_ids[:-1]) if len(order) > 0 else numpy.zeros(0, dtype=bool)
+        group_idx        = numpy.cumsum(is_start) - 1
+        group_starts     = numpy.flatnonzero(is_start)
+        group_ends       = numpy.append(group_starts[1:], len(order)) - 1
+        return (order, group_idx, group_starts, group_ends)
+
     @staticmethod
     def write_paths(passengers_df, output_dir):
         """
         Write the assigned paths to the given output file.
 
+        The output strings are joined from the links sorted once by passenger trip, and written
+        :py:attr:`PathSet.WRITE_CHUNK_TRIPS` passenger trips at a time.
+
         :param passengers_df: Passenger paths assignment results
         :type  passengers_df: :py:class:`pandas.DataFrame` instance
         :param output_dir:    Output directory
         :type  output_dir:    string
 
         """
-        # get trip information -- board stops, board trips and alight stops
-        passenger_trips = passengers_df.loc[passengers_df[Passenger.PF_COL_LINK_MODE]==PathSet.STATE_MODE_TRIP].copy()
-        ptrip_group     = passenger_trips.groupby([Passenger.PERSONS_COLUMN_PERSON_ID, Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM])
-        # these are Series
-        board_stops_str = ptrip_group.A_id.apply(lambda x:','.join(x))
-        board_trips_str = ptrip_group.trip_id.apply(lambda x:','.join(x))
-        alight_stops_str= ptrip_group.B_id.apply(lambda x:','.join(x))
-        board_stops_str.name  = 'board_stop_str'
-        board_trips_str.name  = 'board_trip_str'
-        alight_stops_str.name = 'alight_stop_str'
-
-        # get walking times
-        walk_links = passengers_df.loc[(passengers_df[Passenger.PF_COL_LINK_MODE]==PathSet.STATE_MODE_ACCESS  )| \
-                                       (passengers_df[Passenger.PF_COL_LINK_MODE]==PathSet.STATE_MODE_TRANSFER)| \
-                                       (passengers_df[Passenger.PF_COL_LINK_MODE]==PathSet.STATE_MODE_EGRESS  )].copy()
-        walk_links['linktime_str'] = walk_links.pf_linktime.apply(lambda x: "%.2f" % (x/numpy.timedelta64(1,'m')))
-        walklink_group = walk_links[['person_id','trip_list_id_num','linktime_str']].groupby(['person_id','trip_list_id_num'])
-        walktimes_str  = walklink_group.linktime_str.apply(lambda x:','.join(x))
-
-        # aggregate to one line per person_id, trip_list_id
-        print_passengers_df = passengers_df[['person_id','trip_list_id_num','pathmode','A_id','B_id',Passenger.PF_COL_PAX_A_TIME]].groupby(['person_id','trip_list_id_num']).agg(
-           {'pathmode'                  :'first',   # path mode
-            'A_id'                      :'first',   # origin
-            'B_id'                      :'last',    # destination
-            Passenger.PF_COL_PAX_A_TIME :'first'    # start time
-           })
-
-        # put them all together
-        print_passengers_df = pandas.concat([print_passengers_df,
-                                            board_stops_str,
-                                            board_trips_str,
-                                            alight_stops_str,
-                                            walktimes_str], axis=1)
-
-        print_passengers_df.reset_index(inplace=True)
-        print_passengers_df.sort_values(by=['trip_list_id_num'], inplace=True)
-
-        print_passengers_df.rename(columns=
-           {'pathmode'                  :'mode',
-            'A_id'                      :'originTaz',
-            'B_id'                      :'destinationTaz',
-            Passenger.PF_COL_PAX_A_TIME :'startTime_time',
-            'board_stop_str'            :'boardingStops',
-            'board_trip_str'            :'boardingTrips',
-            'alight_stop_str'           :'alightingStops',
-            'linktime_str'              :'walkingTimes'}, inplace=True)
-
-        print_passengers_df['startTime'] = print_passengers_df['startTime_time'].apply(Util.datetime64_formatter)
-
-        print_passengers_df = print_passengers_df[['trip_list_id_num','person_id','mode','originTaz','destinationTaz','startTime',
-                                                   'boardingStops','boardingTrips','alightingStops','walkingTimes']]
-
-        print_passengers_df.to_csv(os.path.join(output_dir, PathSet.PATHS_OUTPUT_FILE), sep="\t", index=False)
+        (order, group_idx, group_starts, group_ends) = PathSet.sort_passenger_trips(passengers_df)
+        num_groups = len(group_starts)
+
+        linkmode   = passengers_df[Passenger.PF_COL_LINK_MODE].values[order]
+        is_trip    = (linkmode==PathSet.STATE_MODE_TRIP)
+        is_walk    = (linkmode==PathSet.STATE_MODE_ACCESS)|(linkmode==PathSet.STATE_MODE_TRANSFER)|(linkmode==PathSet.STATE_MODE_EGRESS)
+        columns    = dict((colname, passengers_df[colname].values[order]) for colname in
+                          ['person_id','trip_list_id_num','pathmode','A_id','B_id','trip_id',Passenger.PF_COL_PAX_A_TIME])
+        walk_min   = (passengers_df[Passenger.PF_COL_LINK_TIME].values[order]/numpy.timedelta64(1,'m')).astype(numpy.float64)
+
+        paths_out  = open(os.path.join(output_dir, PathSet.PATHS_OUTPUT_FILE), 'w')
+        for chunk_start in range(0, max(num_groups,1), PathSet.WRITE_CHUNK_TRIPS):
+            chunk_end   = min(chunk_start + PathSet.WRITE_CHUNK_TRIPS, num_groups)
+            chunk_rows  = slice(group_starts[chunk_start], group_ends[chunk_end-1]+1) if num_groups > 0 else slice(0,0)
+            first_rows  = group_starts[chunk_start:chunk_end]
+            last_rows   = group_ends  [chunk_start:chunk_end]
+            chunk_group = group_idx[chunk_rows] - chunk_start
+            chunk_trip  = is_trip[chunk_rows]
+            chunk_walk  = is_walk[chunk_rows]
+            num_chunk   = chunk_end - chunk_start
+
+            print_passengers_df = pandas.DataFrame(
+                {'trip_list_id_num' :columns['trip_list_id_num'][first_rows],
+                 'person_id'        :columns['person_id'       ][first_rows],
+                 'mode'             :columns['pathmode'        ][first_rows],    # path mode
+                 'originTaz'        :columns['A_id'            ][first_rows],    # origin
+                 'destinationTaz'   :columns['B_id'            ][last_rows ],    # destination
+                 'startTime'        :Util.format_times(columns[Passenger.PF_COL_PAX_A_TIME][first_rows]),
+                 # trip information -- board stops, board trips and alight stops
+                 'boardingStops'    :Util.join_groups(columns['A_id'   ][chunk_rows][chunk_trip], chunk_group[chunk_trip], num_chunk),
+                 'boardingTrips'    :Util.join_groups(columns['trip_id'][chunk_rows][chunk_trip], chunk_group[chunk_trip], num_chunk),
+                 'alightingStops'   :Util.join_groups(columns['B_id'   ][chunk_rows][chunk_trip], chunk_group[chunk_trip], num_chunk),
+                 # walking times
+                 'walkingTimes'     :Util.join_groups(numpy.char.mod("%.2f", walk_min[chunk_rows][chunk_walk]).astype(object),
+                                                      chunk_group[chunk_walk], num_chunk)},
+                columns=['trip_list_id_num','person_id','mode','originTaz','destinationTaz','startTime',
+                         'boardingStops','boardingTrips','alightingStops','walkingTimes'])
+
+            print_passengers_df.to_csv(paths_out, sep="\t", index=False, header=(chunk_start==0))
+        paths_out.close()
         # passengerId mode    originTaz   destinationTaz  startTime   boardingStops   boardingTrips   alightingStops  walkingTimes
 
     @staticmethod
@@ -441,52 +533,20 @@ class PathSet:
         """
         Write the assigned path times to the given output file.
 
+        Like :py:meth:`PathSet.write_paths`, the output is joined from the links sorted once by
+        passenger trip and written :py:attr:`PathSet.WRITE_CHUNK_TRIPS` passenger trips at a time.
+
         :param passengers_df: Passenger path links
         :type  passengers_df: :py:class:`pandas.DataFrame` instance
         :param output_dir:    Output directory
         :type  output_dir:    string
         """
-        passenger_trips = passengers_df.loc[passengers_df[Passenger.PF_COL_LINK_MODE]==PathSet.STATE_MODE_TRIP].copy()
-
-        ######         TODO: this is really catering to output format; an alternative might be more appropriate
         from .Assignment import Assignment
-        passenger_trips.loc[:,  'board_time_str'] = passenger_trips[Assignment.SIM_COL_PAX_BOARD_TIME ].apply(Util.datetime64_formatter)
-        passenger_trips.loc[:,'arrival_time_str'] = passenger_trips[Passenger.PF_COL_PAX_A_TIME].apply(Util.datetime64_formatter)
-        passenger_trips.loc[:, 'alight_time_str'] = passenger_trips[Assignment.SIM_COL_PAX_ALIGHT_TIME].apply(Util.datetime64_formatter)
-
-        # Aggregate (by joining) across each passenger + path
-        ptrip_group = passenger_trips.groupby([Passenger.TRIP_LIST_COLUMN_PERSON_ID,
-                                               Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM])
-        # these are Series
-        board_time_str   = ptrip_group['board_time_str'  ].apply(lambda x:','.join(x))
-        arrival_time_str = ptrip_group['arrival_time_str'].apply(lambda x:','.join(x))
-        alight_time_str  = ptrip_group['alight_time_str' ].apply(lambda x:','.join(x))
-
-        # Aggregate other fields across each passenger + path
-        pax_exp_df = passengers_df.groupby([Passenger.TRIP_LIST_COLUMN_PERSON_ID,
-                                            Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM]).agg(
-            {# 'pathmode'                  :'first',  # path mode
-             'A_id'                      :'first',  # origin
-             'B_id'                      :'last',   # destination
-             Passenger.PF_COL_PAX_A_TIME :'first',  # start time
-             Passenger.PF_COL_PAX_B_TIME :'last',   # end time
-             # TODO: cost needs to be updated for updated dwell & travel time
-             # 'cost'                      :'first',  # total travel cost is calculated for the whole path
-            })
-
-        # Put them together and return
-        assert(len(pax_exp_df) == len(board_time_str))
-        pax_exp_df = pandas.concat([pax_exp_df,
-                                    board_time_str,
-                                    arrival_time_str,
-                                    alight_time_str], axis=1)
-        # print pax_exp_df.to_string(formatters={'A_time':Assignment.datetime64_min_formatter,
-        #                                        'B_time':Assignment.datetime64_min_formatter})
 
         if len(Assignment.TRACE_PERSON_IDS) > 0:
             simulated_person_ids = passengers_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].values
 
-        for trace_pax in Assignment.TRACE_PERSON_IDS:
+        for trace_pax in (Assignment.TRACE_PERSON_IDS if isDebugEnabled() else []):
             if trace_pax not in simulated_person_ids:
                 FastTripsLogger.debug("Passenger %s not in final simulated list" % trace_pax)
             else:
@@ -503,51 +563,49 @@ class PathSet:
                     'B_time_prev'          :Util.datetime64_min_formatter,
                     'A_time_next'          :Util.datetime64_min_formatter,})))
 
-                FastTripsLogger.debug("Passengers experienced times for %s\n%s" % \
-                   (str(trace_pax),
-                    pax_exp_df.loc[trace_pax].to_string(formatters=\
-                   {Passenger.PF_COL_PAX_A_TIME :Util.datetime64_min_formatter,
-                    Passenger.PF_COL_PAX_B_TIME :Util.datetime64_min_formatter})))
-
-        # reset columns
-        print_pax_exp_df = pax_exp_df.reset_index()
-        print_pax_exp_df.sort_values(by=['trip_list_id_num'], inplace=True)
-
-        print_pax_exp_df['A_time_str'] = print_pax_exp_df[Passenger.PF_COL_PAX_A_TIME].apply(Util.datetime64_formatter)
-        print_pax_exp_df['B_time_str'] = print_pax_exp_df[Passenger.PF_COL_PAX_B_TIME].apply(Util.datetime64_formatter)
-
-        # rename columns
-        print_pax_exp_df.rename(columns=
-            {#'pathmode'             :'mode',
-             'A_id'                 :'originTaz',
-             'B_id'                 :'destinationTaz',
-             'A_time_str'           :'startTime',
-             'B_time_str'           :'endTime',
-             'arrival_time_str'     :'arrivalTimes',
-             'board_time_str'       :'boardingTimes',
-             'alight_time_str'      :'alightingTimes',
-             # TODO: cost needs to be updated for updated dwell & travel time
-             # 'cost'                 :'travelCost',
-             }, inplace=True)
-
-        # reorder
-        print_pax_exp_df = print_pax_exp_df[[
-            'trip_list_id_num',
-            'person_id',
-            #'mode',
-            'originTaz',
-            'destinationTaz',
-            'startTime',
-            'endTime',
-            'arrivalTimes',
-            'boardingTimes',
-            'alightingTimes',
-            # 'travelCost',
-            ]]
-
-        times_out = open(os.path.join(output_dir, PathSet.PATH_TIMES_OUTPUT_FILE), 'w')
-        print_pax_exp_df.to_csv(times_out,
-                                sep="\t", float_format="%.2f", index=False)
+        (order, group_idx, group_starts, group_ends) = PathSet.sort_passenger_trips(passengers_df)
+        num_groups = len(group_starts)
+
+        is_trip    = (passengers_df[Passenger.PF_COL_LINK_MODE].values[order]==PathSet.STATE_MODE_TRIP)
+        columns    = dict((colname, passengers_df[colname].values[order]) for colname in
+                          [Passenger.TRIP_LIST_COLUMN_PERSON_ID, Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, 'A_id', 'B_id',
+                           Passenger.PF_COL_PAX_A_TIME, Passenger.PF_COL_PAX_B_TIME,
+                           Assignment.SIM_COL_PAX_BOARD_TIME, Assignment.SIM_COL_PAX_ALIGHT_TIME])
+
+        times_out  = open(os.path.join(output_dir, PathSet.PATH_TIMES_OUTPUT_FILE), 'w')
+        for chunk_start in range(0, max(num_groups,1), PathSet.WRITE_CHUNK_TRIPS):
+            chunk_end   = min(chunk_start + PathSet.WRITE_CHUNK_TRIPS, num_groups)
+            chunk_rows  = slice(group_starts[chunk_start], group_ends[chunk_end-1]+1) if num_groups > 0 else slice(0,0)
+            first_rows  = group_starts[chunk_start:chunk_end]
+            last_rows   = group_ends  [chunk_start:chunk_end]
+            chunk_trip  = is_trip[chunk_rows]
+            trip_group  = group_idx[chunk_rows][chunk_trip] - chunk_start
+            num_chunk   = chunk_end - chunk_start
+
+            # Aggregate (by joining) the transit link times across each passenger + path
+            print_pax_exp_df = pandas.DataFrame(
+                {'trip_list_id_num' :columns[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM][first_rows],
+                 'person_id'        :columns[Passenger.TRIP_LIST_COLUMN_PERSON_ID       ][first_rows],
+                 'originTaz'        :columns['A_id'                                     ][first_rows],   # origin
+                 'destinationTaz'   :columns['B_id'                                     ][last_rows ],   # destination
+                 'startTime'        :Util.format_times(columns[Passenger.PF_COL_PAX_A_TIME][first_rows]),
+                 'endTime'          :Util.format_times(columns[Passenger.PF_COL_PAX_B_TIME][last_rows ]),
+                 'arrivalTimes'     :Util.join_groups(Util.format_times(columns[Passenger.PF_COL_PAX_A_TIME      ][chunk_rows][chunk_trip]), trip_group, num_chunk),
+                 'boardingTimes'    :Util.join_groups(Util.format_times(columns[Assignment.SIM_COL_PAX_BOARD_TIME ][chunk_rows][chunk_trip]), trip_group, num_chunk),
+                 'alightingTimes'   :Util.join_groups(Util.format_times(columns[Assignment.SIM_COL_PAX_ALIGHT_TIME][chunk_rows][chunk_trip]), trip_group, num_chunk),
+                 # TODO: cost needs to be updated for updated dwell & travel time
+                 # 'travelCost'
+                },
+                columns=['trip_list_id_num','person_id','originTaz','destinationTaz','startTime','endTime',
+                         'arrivalTimes','boardingTimes','alightingTimes'])
+
+            for trace_pax in (Assignment.TRACE_PERSON_IDS if isDebugEnabled() else []):
+                trace_df = print_pax_exp_df.loc[print_pax_exp_df['person_id']==trace_pax]
+                if len(trace_df) > 0:
+                    FastTripsLogger.debug("Passengers experienced times for %s\n%s" % (str(trace_pax), trace_df.to_string()))
+
+            print_pax_exp_df.to_csv(times_out, sep="\t", float_format="%.2f", index=False, header=(chunk_start==0))
+        times_out.close()
 
     @staticmethod
     def split_transit_links(pathset_links_df, veh_trips_df, stops):
@@ -560,7 +618,7 @@ class PathSet:
         Note that this does *not* renumber the linknum field.
         """
         from .Assignment import Assignment
-        if len(Assignment.TRACE_PERSON_IDS) > 0:
+        if len(Assignment.TRACE_PERSON_IDS) > 0 and isDebugEnabled():
             FastTripsLogger.debug("split_transit_links: pathset_links_df (%d)\n%s" % (len(pathset_links_df),
                                   pathset_links_df.loc[pathset_links_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS)].to_string()))
             FastTripsLogger.debug("split_transit_links: pathset_links_df columns\n%s" % str(pathset_links_df.dtypes))
@@ -568,7 +626,8 @@ class PathSet:
         veh_links_df = Trip.linkify_vehicle_trips(veh_trips_df, stops)
         veh_links_df["linkmode"] = "transit"
 
-        FastTripsLogger.debug("split_transit_links: veh_links_df\n%s" % veh_links_df.head(20).to_string())
+        if debugDataFrames("split_transit_links"):
+            FastTripsLogger.debug("split_transit_links: veh_links_df\n%s" % veh_links_df.head(20).to_string())
 
         # join the pathset links with the vehicle links
         path2 = pandas.merge(left    =pathset_links_df,
@@ -632,114 +691,305 @@ class PathSet:
         # renumber linknum?  Let's not bother
 
         # trace
-        if len(Assignment.TRACE_PERSON_IDS) > 0:
+        if len(Assignment.TRACE_PERSON_IDS) > 0 and isDebugEnabled():
             FastTripsLogger.debug("split_transit_links: path2 (%d)\n%s" % (len(path2),
                                   path2.loc[path2[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS)].to_string()))
-        FastTripsLogger.debug("split_transit_links: path2 columns\n%s" % str(path2.dtypes))
+        if debugDataFrames("split_transit_links result"):
+            FastTripsLogger.debug("split_transit_links: path2 columns\n%s" % str(path2.dtypes))
         return path2
 
     @staticmethod
-    def calculate_cost(iteration, simulation_iteration, STOCH_DISPERSION, pathset_paths_df, pathset_links_df, trip_list_df, transfers_df, walk_df, drive_df, veh_trips_df, stops):
+    def calculate_path_size(pathset_links_df):
         """
-        This is equivalent to the C++ Path::calculateCost() method.  Would it be faster to do it in C++?
-        It would require us to package up the networks and paths and send back and forth.  :p
-
-        I think if we can do it using vectorized pandas operations, it should be fast, but we can compare/test.
+        Calculates the path size overlap term for each path, using :py:attr:`PathSet.OVERLAP_VARIABLE` to measure
+        link length and :py:attr:`PathSet.OVERLAP_SCALE_PARAMETER` as gamma:
 
-        It's also messier to have this in two places.  Maybe we should delete it from the C++; the overlap calcs are only in here right now.
+        PS_i = SUM_a (l_a/L_i) x 1/(SUM_j (L_i/L_j)^gamma x delta_aj)
 
-        Returns pathset_paths_df with additional column, Assignment.SIM_COL_PAX_COST, Assignment.SIM_COL_PAX_PROBABILITY, Assignment.SIM_COL_PAX_LOGSUM
-        And pathset_links_df with additional column, Assignment.SIM_COL_PAX_COST
+        Links are identified by (A_id_num, B_id_num, mode_num) within a trip, so each trip's pathset is a sparse
+        path x link-segment incidence matrix.  Since (L_i/L_j)^gamma = L_i^gamma x L_j^-gamma, the inner sum is
+        L_i^gamma times the segment total of L_j^-gamma over the links using that segment, which is a product
+        of the incidence matrix with the path lengths.  So every term is a segmented sum over the links and
+        memory is linear in the number of links.
 
+        Returns :py:class:`pandas.DataFrame` with columns person_id, trip_list_id_num, pathnum and
+        :py:attr:`Assignment.SIM_COL_PAX_LNPS`.
         """
         from .Assignment import Assignment
 
-        # if these are here already, remove them since we'll recalculate them
-        if Assignment.SIM_COL_PAX_COST in list(pathset_paths_df.columns.values):
-            pathset_paths_df.drop([Assignment.SIM_COL_PAX_COST,
-                                   Assignment.SIM_COL_PAX_LNPS,
-                                   Assignment.SIM_COL_PAX_PROBABILITY,
-                                   Assignment.SIM_COL_PAX_LOGSUM     ], axis=1, inplace=True)
-            pathset_links_df.drop([Assignment.SIM_COL_PAX_COST       ], axis=1, inplace=True)
+        trip_list_id_num = pathset_links_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values.astype(numpy.int64)
+        pathnum          = pathset_links_df[Passenger.PF_COL_PATH_NUM                 ].values.astype(numpy.int64)
+        num_links        = len(pathset_links_df)
+
+        # link length, l_a
+        if PathSet.OVERLAP_VARIABLE == PathSet.OVERLAP_COUNT:
+            link_len = numpy.ones(num_links, dtype=numpy.float64)
+        elif PathSet.OVERLAP_VARIABLE == PathSet.OVERLAP_TIME:
+            link_len = pathset_links_df[Assignment.SIM_COL_PAX_LINK_TIME].values/numpy.timedelta64(1,'m')
+        elif PathSet.OVERLAP_VARIABLE == PathSet.OVERLAP_DISTANCE:
+            link_len = pathset_links_df[Assignment.SIM_COL_PAX_DISTANCE ].values.astype(numpy.float64)
+
+        # path index for each link
+        path_key = trip_list_id_num*(pathnum.max()+1 if num_links > 0 else 1) + pathnum
+        (path_keys, path_first_pos, path_idx) = numpy.unique(path_key, return_index=True, return_inverse=True)
+        num_paths = len(path_keys)
+
+        # link segment index for each link: unique (trip, A, B, mode) in the trip's pathset
+        seg_cols   = [pathset_links_df[Route.ROUTES_COLUMN_MODE_NUM].values,
+                      pathset_links_df["B_id_num"].values,
+                      pathset_links_df["A_id_num"].values,
+                      trip_list_id_num]
+        seg_order  = numpy.lexsort(seg_cols)
+        seg_start  = numpy.zeros(num_links, dtype=numpy.bool_)
+        seg_start[:1] = True
+        for seg_col in seg_cols:
+            seg_col_sorted = seg_col[seg_order]
+            seg_start[1:] |= (seg_col_sorted[1:] != seg_col_sorted[:-1])
+        seg_idx = numpy.empty(num_links, dtype=numpy.int64)
+        seg_idx[seg_order] = numpy.cumsum(seg_start) - 1
+        num_segs = int(seg_start.sum())
+
+        # path length, L_i, for each link's path
+        path_len      = numpy.bincount(path_idx, weights=link_len, minlength=num_paths)
+        link_path_len = path_len[path_idx]
+
+        # SUM_j L_j^-gamma x delta_aj for each segment, then scale by L_i^gamma for each link
+        seg_sum   = numpy.bincount(seg_idx, weights=numpy.power(link_path_len, -PathSet.OVERLAP_SCALE_PARAMETER), minlength=num_segs)
+        link_denom = numpy.power(link_path_len, PathSet.OVERLAP_SCALE_PARAMETER)*seg_sum[seg_idx]
+
+        # sum (l_a/L_i)/denominator across links in path
+        link_PS = (link_len/link_path_len)/link_denom
+        path_PS = numpy.bincount(path_idx, weights=link_PS, minlength=num_paths)
+
+        if len(Assignment.TRACE_PERSON_IDS) > 0 and isDebugEnabled():
+            trace_links = pathset_links_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS).values
+            trace_df    = pathset_links_df.loc[trace_links, [Passenger.TRIP_LIST_COLUMN_PERSON_ID,
+                                                             Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
+                                                             Passenger.PF_COL_PATH_NUM,
+                                                             Passenger.PF_COL_LINK_NUM,
+                                                             "A_id_num","B_id_num",
+                                                             Route.ROUTES_COLUMN_MODE_NUM]].copy()
+            trace_df["link_len"  ] = link_len[trace_links]
+            trace_df["path_len"  ] = link_path_len[trace_links]
+            trace_df["link_denom"] = link_denom[trace_links]
+            trace_df["link_PS"   ] = link_PS[trace_links]
+            FastTripsLogger.debug("calculate_path_size: links\n%s" % trace_df.to_string())
+
+        # Check all pathsizes are in [0,1]
+        if num_paths > 0:
+            min_PS = path_PS.min()
+            max_PS = path_PS.max()
+            FastTripsLogger.debug("PathSize min=%f max=%f" % (min_PS, max_PS))
+            if min_PS < 0:
+                FastTripsLogger.fatal("Min pathsize = %f < 0:\n%s" % (min_PS, pathset_links_df.iloc[path_first_pos[path_PS==min_PS]].to_string()))
+            if max_PS > 1.0001:
+                FastTripsLogger.fatal("Max pathsize = %f > 1:\n%s" % (max_PS, pathset_links_df.iloc[path_first_pos[path_PS==max_PS]].to_string()))
+
+        overlap_df = pandas.DataFrame({Passenger.TRIP_LIST_COLUMN_PERSON_ID       :pathset_links_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].values[path_first_pos],
+                                       Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM:trip_list_id_num[path_first_pos],
+                                       Passenger.PF_COL_PATH_NUM                  :pathnum[path_first_pos],
+                                       Assignment.SIM_COL_PAX_LNPS                :numpy.log(path_PS)},
+                                      columns=[Passenger.TRIP_LIST_COLUMN_PERSON_ID,
+                                               Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
+                                               Passenger.PF_COL_PATH_NUM,
+                                               Assignment.SIM_COL_PAX_LNPS])
+        FastTripsLogger.debug("calculate_path_size: mem_use=%s for %d links, %d paths and %d link segments" % (Util.get_process_mem_use_str(), num_links, num_paths, num_segs))
+        return overlap_df
 
-            # leaving this in for writing to CSV for debugging but I could take it out
-            pathset_paths_df.drop(["logsum_component"], axis=1, inplace=True)
+    @staticmethod
+    def compile_weights():
+        """
+        Compiles :py:attr:`PathSet.WEIGHTS_DF` into one dense weight vector per weight group, where a weight group
+        is a unique set of :py:attr:`PathSet.WEIGHT_GROUP_COLUMNS` values.
 
+        Returns (weight_groups_df, weight_names, group_name_nums, group_weight_values) where
 
-        if len(Assignment.TRACE_PERSON_IDS) > 0:
-            FastTripsLogger.debug("calculate_cost: pathset_links_df\n%s" % str(pathset_links_df.loc[pathset_links_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS)]))
-            FastTripsLogger.debug("calculate_cost: trip_list_df\n%s" % str(trip_list_df.loc[trip_list_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS)]))
+        * weight_groups_df has columns :py:attr:`PathSet.WEIGHT_GROUP_COLUMNS`, :py:attr:`PathSet.WEIGHTS_COLUMN_SUPPLY_MODE_NUM` and group_num,
+        * weight_names is an array of every weight name; these are the columns of the link attribute matrix,
+        * group_name_nums[group_num] is the array of weight name indices (into weight_names) for the group, and
+        * group_weight_values[group_num] is the array of corresponding weight values.
+        """
+        weights_df = PathSet.WEIGHTS_DF[PathSet.WEIGHT_GROUP_COLUMNS + [PathSet.WEIGHTS_COLUMN_SUPPLY_MODE_NUM,
+                                                                        PathSet.WEIGHTS_COLUMN_WEIGHT_NAME,
+                                                                        PathSet.WEIGHTS_COLUMN_WEIGHT_VALUE]]
+        weight_groups_df = weights_df[PathSet.WEIGHT_GROUP_COLUMNS + [PathSet.WEIGHTS_COLUMN_SUPPLY_MODE_NUM]].drop_duplicates(
+                               subset=PathSet.WEIGHT_GROUP_COLUMNS).reset_index(drop=True)
+        weight_groups_df["group_num"] = numpy.arange(len(weight_groups_df))
+
+        weights_df = pandas.merge(left =weights_df,
+                                  right=weight_groups_df[PathSet.WEIGHT_GROUP_COLUMNS + ["group_num"]],
+                                  how  ="left",
+                                  on   =PathSet.WEIGHT_GROUP_COLUMNS)
+        weight_names  = numpy.unique(weights_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME].values)
+        name_nums     = numpy.searchsorted(weight_names, weights_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME].values)
+        group_nums    = weights_df["group_num"].values
+        weight_values = weights_df[PathSet.WEIGHTS_COLUMN_WEIGHT_VALUE].values.astype(numpy.float64)
+
+        group_name_nums     = []
+        group_weight_values = []
+        for group_num in range(len(weight_groups_df)):
+            group_name_nums.append(    name_nums[group_nums == group_num])
+            group_weight_values.append(weight_values[group_nums == group_num])
+
+        return (weight_groups_df, weight_names, group_name_nums, group_weight_values)
 
-        pathset_links_to_use = pathset_links_df
-        if PathSet.OVERLAP_SPLIT_TRANSIT:
-            pathset_links_to_use = PathSet.split_transit_links(pathset_links_df, veh_trips_df, stops)
+    @staticmethod
+    def evaluate_link_cost(cost_desc, attr_matrix, attr_names, link_group, weight_groups_df, weight_names, group_name_nums, group_weight_values, pathset_links_df):
+        """
+        Evaluates the part of each link's cost coming from the weights named in *attr_names*, which are the
+        columns of the dense link attribute matrix *attr_matrix* (one row per link in *pathset_links_df*).
+        For each weight group, this is the row-wise dot product of the group's attribute columns with its weight vector.
+        See :py:meth:`PathSet.compile_weights` for the remaining arguments.
 
-        # First, we need user class, purpose, and demand modes
-        pathset_links_cost_df = pandas.merge(left =pathset_links_to_use,
-                                             right=trip_list_df[[Passenger.PERSONS_COLUMN_PERSON_ID,
-                                                                 Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
-                                                                 Passenger.TRIP_LIST_COLUMN_USER_CLASS,
-                                                                 Passenger.TRIP_LIST_COLUMN_PURPOSE,
-                                                                 Passenger.TRIP_LIST_COLUMN_ACCESS_MODE,
-                                                                 Passenger.TRIP_LIST_COLUMN_EGRESS_MODE,
-                                                                 Passenger.TRIP_LIST_COLUMN_TRANSIT_MODE
-                                                                ]],
-                                             how  ="left",
-                                             on   =[Passenger.PERSONS_COLUMN_PERSON_ID, Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM])
-        # todo: add Value of time
-        # Passenger.TRIP_LIST_COLUMN_VOT
+        Missing (NaN) attributes are logged and raise :py:exc:`NotImplementedError`.
 
-        # linkmode = demand_mode_type.  Set demand_mode for the links
-        pathset_links_cost_df[PathSet.WEIGHTS_COLUMN_DEMAND_MODE] = None
-        pathset_links_cost_df.loc[ pathset_links_cost_df[Passenger.PF_COL_LINK_MODE]== PathSet.STATE_MODE_ACCESS  , PathSet.WEIGHTS_COLUMN_DEMAND_MODE] = pathset_links_cost_df[Passenger.TRIP_LIST_COLUMN_ACCESS_MODE ]
-        pathset_links_cost_df.loc[ pathset_links_cost_df[Passenger.PF_COL_LINK_MODE]== PathSet.STATE_MODE_EGRESS  , PathSet.WEIGHTS_COLUMN_DEMAND_MODE] = pathset_links_cost_df[Passenger.TRIP_LIST_COLUMN_EGRESS_MODE ]
-        pathset_links_cost_df.loc[ pathset_links_cost_df[Passenger.PF_COL_LINK_MODE]== PathSet.STATE_MODE_TRIP    , PathSet.WEIGHTS_COLUMN_DEMAND_MODE] = pathset_links_cost_df[Passenger.TRIP_LIST_COLUMN_TRANSIT_MODE]
-        pathset_links_cost_df.loc[ pathset_links_cost_df[Passenger.PF_COL_LINK_MODE]== PathSet.STATE_MODE_TRANSFER, PathSet.WEIGHTS_COLUMN_DEMAND_MODE] = "transfer"
-        # Verify that it's set for every link
-        missing_demand_mode = pandas.isnull(pathset_links_cost_df[PathSet.WEIGHTS_COLUMN_DEMAND_MODE]).sum()
-        assert(missing_demand_mode == 0)
+        Returns (link_cost, negative_cost) where link_cost is NaN for links without a weight group, and
+        negative_cost flags links with any negative weighted attribute.
+        """
+        attr_col         = dict([(attr_name, attr_num) for (attr_num, attr_name) in enumerate(attr_names)])
+        name_cols        = numpy.array([attr_col.get(weight_name, -1) for weight_name in weight_names], dtype=numpy.int64)
+        group_mode_types = weight_groups_df[PathSet.WEIGHTS_COLUMN_DEMAND_MODE_TYPE].values
+        (group_link_pos, group_starts, group_counts) = Util.group_positions(link_group, len(weight_groups_df))
+
+        link_cost     = numpy.empty(len(link_group), dtype=numpy.float64)
+        link_cost.fill(numpy.nan)
+        negative_cost = numpy.zeros(len(link_group), dtype=numpy.bool_)
+        total_missing = 0
+
+        # each weight group has a single demand mode type
+        for (link_desc, mode_types) in [("access/egress", [PathSet.STATE_MODE_ACCESS, PathSet.STATE_MODE_EGRESS]),
+                                        ("transit trip",  [PathSet.STATE_MODE_TRIP]),
+                                        ("transfer",      [PathSet.STATE_MODE_TRANSFER])]:
+            num_missing = 0
+            num_values  = 0
+            missing_dfs = []
+            for group_num in numpy.flatnonzero(numpy.in1d(group_mode_types, mode_types)):
+                rows     = group_link_pos[group_starts[group_num]:group_starts[group_num]+group_counts[group_num]]
+                cols     = name_cols[group_name_nums[group_num]]
+                in_attrs = (cols >= 0)
+                cols     = cols[in_attrs]
+                weights  = group_weight_values[group_num][in_attrs]
+
+                link_cost[rows] = 0.0
+                if len(rows) == 0 or len(cols) == 0: continue
+
+                values  = attr_matrix[numpy.ix_(rows, cols)]
+                missing = numpy.isnan(values)
+                num_values += missing.size
+                if missing.any():
+                    num_missing += missing.sum()
+                    (missing_row, missing_col) = numpy.nonzero(missing)
+                    missing_df = pathset_links_df[[Passenger.TRIP_LIST_COLUMN_PERSON_ID,
+                                                   Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
+                                                   Passenger.PF_COL_PATH_NUM,
+                                                   Passenger.PF_COL_LINK_NUM,
+                                                   Passenger.PF_COL_LINK_MODE,
+                                                   Passenger.TRIP_LIST_COLUMN_MODE,
+                                                   "A_id_num","B_id_num"]].iloc[rows[missing_row]].copy()
+                    missing_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] = attr_names[cols[missing_col]]
+                    missing_dfs.append(missing_df)
 
-        # drop the individual mode columns, we have what we need
-        pathset_links_cost_df.drop([Passenger.TRIP_LIST_COLUMN_ACCESS_MODE,
-                                    Passenger.TRIP_LIST_COLUMN_EGRESS_MODE,
-                                    Passenger.TRIP_LIST_COLUMN_TRANSIT_MODE], axis=1, inplace=True)
+                link_cost[rows]     = values.dot(weights)
+                negative_cost[rows] = ((values*weights) < 0).any(axis=1)
 
-        # if this isn't set yet (only simulation_iteration==0) set it
-        if simulation_iteration == 0:
-            pathset_links_cost_df[Assignment.SIM_COL_PAX_BUMP_ITER] = -1
+            error_msg = "Missing %d out of %d %s %s var_value values" % (num_missing, num_values, cost_desc, link_desc)
+            FastTripsLogger.debug(error_msg)
 
-        if len(Assignment.TRACE_PERSON_IDS) > 0:
-            FastTripsLogger.debug("calculate_cost: pathset_links_cost_df\n%s" % str(pathset_links_cost_df.loc[pathset_links_cost_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS)]))
-
-        # Inner join with the weights - now each weight has a row
-        cost_df = pandas.merge(left    =pathset_links_cost_df,
-                               right   =PathSet.WEIGHTS_DF,
-                               # TODO: add purpose
-                               left_on =[Passenger.TRIP_LIST_COLUMN_USER_CLASS,
-                                         Passenger.TRIP_LIST_COLUMN_PURPOSE,
-                                         Passenger.PF_COL_LINK_MODE,
-                                         PathSet.WEIGHTS_COLUMN_DEMAND_MODE,
-                                         Passenger.TRIP_LIST_COLUMN_MODE],
-                               right_on=[Passenger.TRIP_LIST_COLUMN_USER_CLASS,
-                                         Passenger.TRIP_LIST_COLUMN_PURPOSE,
-                                         PathSet.WEIGHTS_COLUMN_DEMAND_MODE_TYPE,
-                                         PathSet.WEIGHTS_COLUMN_DEMAND_MODE,
-                                         PathSet.WEIGHTS_COLUMN_SUPPLY_MODE],
-                               how     ="inner")
+            if num_missing > 0:
+                error_msg += "\n%s" % pandas.concat(missing_dfs).head(10).to_string()
+                FastTripsLogger.fatal(error_msg)
+            total_missing += num_missing
 
-        if len(Assignment.TRACE_PERSON_IDS) > 0:
-            FastTripsLogger.debug("calculate_cost: cost_df\n%s" % str(cost_df.loc[cost_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS)].sort_values([Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,Passenger.PF_COL_PATH_NUM,Passenger.PF_COL_LINK_NUM]).head(20)))
+        # abort here if we're missing anything
+        if total_missing > 0:
+            raise NotImplementedError("Missing var_values; See log")
+
+        return (link_cost, negative_cost)
+
+    @staticmethod
+    def calculate_static_link_cost(pathset_links_df, trip_list_df, transfers_df, walk_df, drive_df):
+        """
+        Calculates the time-invariant part of each pathset link's cost: the cost from every weight except
+        :py:attr:`PathSet.DYNAMIC_WEIGHT_NAMES`.  These come from the access/egress and transfer supply links,
+        the pathfinding link times, and the passenger's preferred times, none of which change within a run.
+
+        Returns (link_group, static_cost), arrays aligned with the rows of *pathset_links_df*.  link_group is the
+        weight group number (see :py:meth:`PathSet.compile_weights`) or -1 for links without configured weights,
+        for which static_cost is NaN.
+        """
+        from .Assignment import Assignment
 
-        # NOW we split it into 3 lists -- access/egress, transit, and transfer
-        # This is because they will each be joined to tables specific to those kinds of mode categories, and so we don't want all the transit nulls on the other tables, etc.
-        cost_columns = list(cost_df.columns.values)
-        cost_df["var_value"] = numpy.nan  # This means unset
-        cost_accegr_df       = cost_df.loc[(cost_df[Passenger.PF_COL_LINK_MODE]==PathSet.STATE_MODE_ACCESS  )|(cost_df[Passenger.PF_COL_LINK_MODE]==PathSet.STATE_MODE_EGRESS)]
-        cost_trip_df         = cost_df.loc[(cost_df[Passenger.PF_COL_LINK_MODE]==PathSet.STATE_MODE_TRIP    )]
-        cost_transfer_df     = cost_df.loc[(cost_df[Passenger.PF_COL_LINK_MODE]==PathSet.STATE_MODE_TRANSFER)]
-        del cost_df
+        num_links = len(pathset_links_df)
+
+        # First, we need user class, purpose, demand modes and time target for each link
+        link_trips_df = pandas.merge(left =pathset_links_df[[Passenger.PERSONS_COLUMN_PERSON_ID,
+                                                             Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM]],
+                                     right=trip_list_df[[Passenger.PERSONS_COLUMN_PERSON_ID,
+                                                         Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
+                                                         Passenger.TRIP_LIST_COLUMN_USER_CLASS,
+                                                         Passenger.TRIP_LIST_COLUMN_PURPOSE,
+                                                         Passenger.TRIP_LIST_COLUMN_ACCESS_MODE,
+                                                         Passenger.TRIP_LIST_COLUMN_EGRESS_MODE,
+                                                         Passenger.TRIP_LIST_COLUMN_TRANSIT_MODE,
+                                                         Passenger.TRIP_LIST_COLUMN_DEPARTURE_TIME,
+                                                         Passenger.TRIP_LIST_COLUMN_ARRIVAL_TIME,
+                                                         Passenger.TRIP_LIST_COLUMN_TIME_TARGET
+                                                        ]],
+                                     how  ="left",
+                                     on   =[Passenger.PERSONS_COLUMN_PERSON_ID, Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM])
+        # todo: add Value of time
+        # Passenger.TRIP_LIST_COLUMN_VOT
 
-        ##################### First, handle Access/Egress link costs
+        linkmode    = pathset_links_df[Passenger.PF_COL_LINK_MODE].values
+        is_access   = (linkmode == PathSet.STATE_MODE_ACCESS  )
+        is_egress   = (linkmode == PathSet.STATE_MODE_EGRESS  )
+        is_trip     = (linkmode == PathSet.STATE_MODE_TRIP    )
+        is_transfer = (linkmode == PathSet.STATE_MODE_TRANSFER)
+
+        # linkmode = demand_mode_type.  Set demand_mode for the links
+        demand_mode = numpy.empty(num_links, dtype=object)
+        demand_mode[is_access  ] = link_trips_df[Passenger.TRIP_LIST_COLUMN_ACCESS_MODE ].values[is_access]
+        demand_mode[is_egress  ] = link_trips_df[Passenger.TRIP_LIST_COLUMN_EGRESS_MODE ].values[is_egress]
+        demand_mode[is_trip    ] = link_trips_df[Passenger.TRIP_LIST_COLUMN_TRANSIT_MODE].values[is_trip]
+        demand_mode[is_transfer] = "transfer"
+        # Verify that it's set for every link
+        missing_demand_mode = pandas.isnull(demand_mode).sum()
+        assert(missing_demand_mode == 0)
+
+        # Find the weight group for each link; links without configured weights get no cost
+        (weight_groups_df, weight_names, group_name_nums, group_weight_values) = PathSet.compile_weights()
+
+        # the trip list strings are categorical; match them to the weights as strings
+        link_group_df = pandas.DataFrame({PathSet.WEIGHTS_COLUMN_USER_CLASS      :numpy.asarray(link_trips_df[Passenger.TRIP_LIST_COLUMN_USER_CLASS].values, dtype=object),
+                                          PathSet.WEIGHTS_COLUMN_PURPOSE         :numpy.asarray(link_trips_df[Passenger.TRIP_LIST_COLUMN_PURPOSE   ].values, dtype=object),
+                                          PathSet.WEIGHTS_COLUMN_DEMAND_MODE_TYPE:linkmode,
+                                          PathSet.WEIGHTS_COLUMN_DEMAND_MODE     :demand_mode,
+                                          PathSet.WEIGHTS_COLUMN_SUPPLY_MODE     :pathset_links_df[Passenger.TRIP_LIST_COLUMN_MODE].values})
+        link_group_df = pandas.merge(left =link_group_df,
+                                     right=weight_groups_df,
+                                     how  ="left",
+                                     on   =PathSet.WEIGHT_GROUP_COLUMNS)
+        link_group           = link_group_df["group_num"].fillna(-1).values.astype(numpy.int64)
+        link_supply_mode_num = link_group_df[PathSet.WEIGHTS_COLUMN_SUPPLY_MODE_NUM].values
+        has_weights          = (link_group >= 0)
+        del link_group_df
+
+        # Dense link attribute matrix: one row per link, one column per time-invariant weight name.  NaN means unset.
+        attr_names    = weight_names[~numpy.in1d(weight_names, PathSet.DYNAMIC_WEIGHT_NAMES)]
+        attr_name_num = dict([(attr_name, attr_num) for (attr_num, attr_name) in enumerate(attr_names)])
+        attr_matrix   = numpy.empty((num_links, len(attr_names)), dtype=numpy.float64)
+        attr_matrix.fill(numpy.nan)
+
+        def set_attribute(attr_name, rows, values):
+            # only attributes that are weighted are relevant
+            if attr_name in attr_name_num:
+                attr_matrix[rows, attr_name_num[attr_name]] = values
+
+        A_id_num = pathset_links_df["A_id_num"].values
+        B_id_num = pathset_links_df["B_id_num"].values
+
+        ##################### First, handle Access/Egress link attributes
+        accegr_pos = numpy.flatnonzero((is_access|is_egress)&has_weights)
 
         for accegr_type in ["walk","bike","drive"]:
 
@@ -755,8 +1005,9 @@ class PathSet:
                 link_df   = drive_df.copy()
                 mode_list = TAZ.DRIVE_MODE_NUMS
 
-            FastTripsLogger.debug("Access/egress link_df %s\n%s" % (accegr_type, link_df.head().to_string()))
-            if len(link_df) == 0:
+            if debugDataFrames("calculate_static_link_cost access/egress"):
+                FastTripsLogger.debug("Access/egress link_df %s\n%s" % (accegr_type, link_df.head().to_string()))
+            if len(link_df) == 0 or len(accegr_pos) == 0:
                 continue
 
             # format these with A & B instead of TAZ and Stop
@@ -770,332 +1021,313 @@ class PathSet:
             link_df.drop([TAZ.WALK_ACCESS_COLUMN_TAZ_NUM, TAZ.WALK_ACCESS_COLUMN_STOP_NUM], axis=1, inplace=True)
             assert(len(link_df.loc[link_df["A_id_num"] < 0]) == 0)
 
-            FastTripsLogger.debug("%s link_df =\n%s" % (accegr_type, link_df.head().to_string()))
-
-            # Merge access/egress with walk|bike|drive access/egress information
-            cost_accegr_df = pandas.merge(left     = cost_accegr_df,
-                                          right    = link_df,
-                                          on       = ["A_id_num",
-                                                      PathSet.WEIGHTS_COLUMN_SUPPLY_MODE_NUM,
-                                                      "B_id_num"],
-                                          how      = "left")
-            # rename new columns so it's clear it's for walk|bike|drive
+            if debugDataFrames("calculate_static_link_cost access/egress links"):
+                FastTripsLogger.debug("%s link_df =\n%s" % (accegr_type, link_df.head().to_string()))
+
+            # Look up access/egress links in walk|bike|drive access/egress information; first match is used
+            accegr_df = pandas.DataFrame({"A_id_num"                            :A_id_num[accegr_pos],
+                                          PathSet.WEIGHTS_COLUMN_SUPPLY_MODE_NUM:link_supply_mode_num[accegr_pos].astype(numpy.int64),
+                                          "B_id_num"                            :B_id_num[accegr_pos],
+                                          "link_pos"                            :accegr_pos})
+            accegr_df = pandas.merge(left     = accegr_df,
+                                     right    = link_df,
+                                     on       = ["A_id_num",
+                                                 PathSet.WEIGHTS_COLUMN_SUPPLY_MODE_NUM,
+                                                 "B_id_num"],
+                                     how      = "left").drop_duplicates(subset=["link_pos"])
+            in_mode_list = numpy.in1d(accegr_df[PathSet.WEIGHTS_COLUMN_SUPPLY_MODE_NUM].values, mode_list)
+            rows         = accegr_df["link_pos"].values[in_mode_list]
+
+            # any numeric column can be used
             for colname in list(link_df.select_dtypes(include=['float64','int64']).columns.values):
                 # don't worry about join columns
                 if colname in ["A_id_num", PathSet.WEIGHTS_COLUMN_SUPPLY_MODE_NUM, "B_id_num"]: continue
-
-                # rename the rest
-                new_colname = "%s %s" % (colname, accegr_type)
-                cost_accegr_df.rename(columns={colname:new_colname}, inplace=True)
-
-                # use it, if relevant
-                cost_accegr_df.loc[ (cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == colname)&
-                                    (cost_accegr_df[PathSet.WEIGHTS_COLUMN_SUPPLY_MODE_NUM].isin(mode_list)), "var_value"] = cost_accegr_df[new_colname]
-
-        # Access/egress needs passenger trip departure, arrival and time_target
-        cost_accegr_df = pandas.merge(left =cost_accegr_df,
-                                      right=trip_list_df[[Passenger.PERSONS_COLUMN_PERSON_ID,
-                                                          Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
-                                                          Passenger.TRIP_LIST_COLUMN_DEPARTURE_TIME,
-                                                          Passenger.TRIP_LIST_COLUMN_ARRIVAL_TIME,
-                                                          Passenger.TRIP_LIST_COLUMN_TIME_TARGET,
-                                                        ]],
-                                      how  ="left",
-                                      on   =[Passenger.PERSONS_COLUMN_PERSON_ID, Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM])
+                set_attribute(colname, rows, accegr_df[colname].values[in_mode_list])
 
         # preferred delay_min - arrival means want to arrive before that time
-        cost_accegr_df.loc[(cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME]     == "preferred_delay_min"    )& \
-                           (cost_accegr_df[Passenger.PF_COL_LINK_MODE]             == PathSet.STATE_MODE_ACCESS)& \
-                           (cost_accegr_df[Passenger.TRIP_LIST_COLUMN_TIME_TARGET] == 'arrival'), "var_value"] = 0.0
-        cost_accegr_df.loc[(cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME]     == "preferred_delay_min"    )& \
-                           (cost_accegr_df[Passenger.PF_COL_LINK_MODE]             == PathSet.STATE_MODE_EGRESS)& \
-                           (cost_accegr_df[Passenger.TRIP_LIST_COLUMN_TIME_TARGET] == 'arrival'), "var_value"] = (cost_accegr_df[Passenger.TRIP_LIST_COLUMN_ARRIVAL_TIME] - cost_accegr_df[Passenger.PF_COL_PAX_B_TIME])/numpy.timedelta64(1,'m')
+        time_target = link_trips_df[Passenger.TRIP_LIST_COLUMN_TIME_TARGET].values
+        rows = numpy.flatnonzero(is_access&(time_target == 'arrival'))
+        set_attribute("preferred_delay_min", rows, 0.0)
+        rows = numpy.flatnonzero(is_egress&(time_target == 'arrival'))
+        set_attribute("preferred_delay_min", rows,
+                      (link_trips_df[Passenger.TRIP_LIST_COLUMN_ARRIVAL_TIME].values[rows] -
+                       pathset_links_df[Passenger.PF_COL_PAX_B_TIME].values[rows])/numpy.timedelta64(1,'m'))
         # preferred delay_min - departure means want to depart after that time
-        cost_accegr_df.loc[(cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME]     == "preferred_delay_min"    )& \
-                           (cost_accegr_df[Passenger.PF_COL_LINK_MODE]             == PathSet.STATE_MODE_ACCESS)& \
-                           (cost_accegr_df[Passenger.TRIP_LIST_COLUMN_TIME_TARGET] == 'departure'), "var_value"] = (cost_accegr_df[Passenger.PF_COL_PAX_A_TIME] - cost_accegr_df[Passenger.TRIP_LIST_COLUMN_DEPARTURE_TIME])/numpy.timedelta64(1,'m')
-        cost_accegr_df.loc[(cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME]     == "preferred_delay_min"    )& \
-                           (cost_accegr_df[Passenger.PF_COL_LINK_MODE]             == PathSet.STATE_MODE_EGRESS)& \
-                           (cost_accegr_df[Passenger.TRIP_LIST_COLUMN_TIME_TARGET] == 'departure'), "var_value"] = 0.0
+        rows = numpy.flatnonzero(is_access&(time_target == 'departure'))
+        set_attribute("preferred_delay_min", rows,
+                      (pathset_links_df[Passenger.PF_COL_PAX_A_TIME].values[rows] -
+                       link_trips_df[Passenger.TRIP_LIST_COLUMN_DEPARTURE_TIME].values[rows])/numpy.timedelta64(1,'m'))
+        rows = numpy.flatnonzero(is_egress&(time_target == 'departure'))
+        set_attribute("preferred_delay_min", rows, 0.0)
+
+        ##################### Next, handle Transfer link attributes
+        transfer_pos = numpy.flatnonzero(is_transfer&has_weights)
+        if debugDataFrames("calculate_static_link_cost transfers"):
+            FastTripsLogger.debug("transfers_df head=\n%s" % transfers_df.head().to_string())
+        set_attribute("walk_time_min", transfer_pos,
+                      pathset_links_df[Passenger.PF_COL_LINK_TIME].values[transfer_pos]/numpy.timedelta64(1,'m'))
+
+        # Look up transfer links in the transfers; first match is used
+        transfer_df = pandas.DataFrame({Transfer.TRANSFERS_COLUMN_FROM_STOP_NUM:A_id_num[transfer_pos],
+                                        Transfer.TRANSFERS_COLUMN_TO_STOP_NUM  :B_id_num[transfer_pos],
+                                        "link_pos"                             :transfer_pos})
+        transfer_df = pandas.merge(left     = transfer_df,
+                                   right    = transfers_df,
+                                   on       = [Transfer.TRANSFERS_COLUMN_FROM_STOP_NUM, Transfer.TRANSFERS_COLUMN_TO_STOP_NUM],
+                                   how      = "left").drop_duplicates(subset=["link_pos"])
 
-        if len(Assignment.TRACE_PERSON_IDS) > 0:
-            FastTripsLogger.debug("cost_accegr_df=\n%s\ndtypes=\n%s" % (cost_accegr_df.loc[cost_accegr_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS)].to_string(), str(cost_accegr_df.dtypes)))
-
-        missing_accegr_costs = cost_accegr_df.loc[ pandas.isnull(cost_accegr_df["var_value"]) ]
-        error_accegr_msg = "Missing %d out of %d access/egress var_value values" % (len(missing_accegr_costs), len(cost_accegr_df))
-        FastTripsLogger.debug(error_accegr_msg)
+        # any numeric column can be used
+        for colname in list(transfers_df.select_dtypes(include=['float64','int64']).columns.values):
+            FastTripsLogger.debug("Using numeric column %s" % colname)
+            set_attribute(colname, transfer_df["link_pos"].values, transfer_df[colname].values)
 
-        if len(missing_accegr_costs) > 0:
-            error_accegr_msg += "\n%s" % missing_accegr_costs.head(10).to_string()
-            FastTripsLogger.fatal(error_accegr_msg)
+        # make zero walk transfers have default var_values 0
+        rows = transfer_pos[A_id_num[transfer_pos] == B_id_num[transfer_pos]]
+        for attr_name in attr_names:
+            if attr_name == "transfer_penalty": continue
+            set_attribute(attr_name, rows, 0.0)
+        # zero walk transfers have a transfer penalty although they're not otherwise configured
+        if "transfer_penalty" in attr_name_num:
+            penalty_col = attr_name_num["transfer_penalty"]
+            rows = transfer_pos[numpy.isnan(attr_matrix[transfer_pos, penalty_col])]
+            attr_matrix[rows, penalty_col] = 1.0
+
+        if len(Assignment.TRACE_PERSON_IDS) > 0 and isDebugEnabled():
+            trace_pos = numpy.flatnonzero(pathset_links_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS).values)
+            trace_df  = pandas.DataFrame(attr_matrix[trace_pos,:], columns=attr_names)
+            for colname in [Passenger.PF_COL_LINK_NUM, Passenger.PF_COL_PATH_NUM, Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, Passenger.TRIP_LIST_COLUMN_PERSON_ID]:
+                trace_df.insert(0, colname, pathset_links_df[colname].values[trace_pos])
+            trace_df["group_num"] = link_group[trace_pos]
+            FastTripsLogger.debug("calculate_static_link_cost: link attributes\n%s" % trace_df.to_string())
+
+        (static_cost, negative_cost) = PathSet.evaluate_link_cost("time-invariant", attr_matrix, attr_names, link_group,
+                                                                  weight_groups_df, weight_names, group_name_nums, group_weight_values,
+                                                                  pathset_links_df)
 
-        ##################### Next, handle Transit Trip link costs
-        if len(Assignment.TRACE_PERSON_IDS) > 0:
-            FastTripsLogger.debug("cost_trip_df=\n%s\ndtypes=\n%s" % (cost_trip_df.loc[cost_trip_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS)].to_string(), str(cost_trip_df.dtypes)))
+        # verify all costs are non-negative
+        if negative_cost.any():
+            negative_df = pathset_links_df.iloc[numpy.flatnonzero(negative_cost)].copy()
+            negative_df[Assignment.SIM_COL_PAX_STATIC_COST] = static_cost[negative_cost]
+            msg = "calculate_static_link_cost: Negative costs found:\n%s" % negative_df.to_string()
+            FastTripsLogger.fatal(msg)
+            raise UnexpectedError(msg)
 
-        # if there's a board time, in_vehicle_time = new_B_time - board_time
-        #               otherwise, in_vehicle_time = B time - A time (for when we split)
-        cost_trip_df.loc[(cost_trip_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == "in_vehicle_time_min")&pandas.notnull(cost_trip_df[Assignment.SIM_COL_PAX_BOARD_TIME]), "var_value"] = \
-            (cost_trip_df[Assignment.SIM_COL_PAX_B_TIME] - cost_trip_df[Assignment.SIM_COL_PAX_BOARD_TIME])/numpy.timedelta64(1,'m')
-        cost_trip_df.loc[(cost_trip_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == "in_vehicle_time_min")& pandas.isnull(cost_trip_df[Assignment.SIM_COL_PAX_BOARD_TIME]), "var_value"] = \
-            (cost_trip_df[Assignment.SIM_COL_PAX_B_TIME] - cost_trip_df[Assignment.SIM_COL_PAX_A_TIME])/numpy.timedelta64(1,'m')
+        return (link_group, static_cost)
 
-        # if in vehicle time is less than 0 then off by 1 day error
-        cost_trip_df.loc[(cost_trip_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == "in_vehicle_time_min")&(cost_trip_df["var_value"]<0), "var_value"] = cost_trip_df["var_value"] + (24*60)
+    @staticmethod
+    def set_static_link_cost(pathset_links_df, trip_list_df, transfers_df, walk_df, drive_df):
+        """
+        Sets :py:attr:`Assignment.SIM_COL_PAX_WEIGHT_GROUP` and :py:attr:`Assignment.SIM_COL_PAX_STATIC_COST` for the
+        pathset links that don't have them yet using :py:meth:`PathSet.calculate_static_link_cost`, so they're
+        calculated once per pathset rather than every simulation iteration.
 
-        # if there's a board time, wait time = board_time - A time
-        #               otherwise, wait time = 0 (for when we split transit links)
-        cost_trip_df.loc[(cost_trip_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == "wait_time_min")&pandas.notnull(cost_trip_df[Assignment.SIM_COL_PAX_BOARD_TIME]), "var_value"] = \
-            (cost_trip_df[Assignment.SIM_COL_PAX_BOARD_TIME] - cost_trip_df[Assignment.SIM_COL_PAX_A_TIME])/numpy.timedelta64(1,'m')
-        cost_trip_df.loc[(cost_trip_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == "wait_time_min")& pandas.isnull(cost_trip_df[Assignment.SIM_COL_PAX_BOARD_TIME]), "var_value"] = 0
+        Returns the updated pathset_links_df.
+        """
+        from .Assignment import Assignment
 
-        # which overcap column to use?
-        overcap_col = Trip.SIM_COL_VEH_OVERCAP
-        if Assignment.MSA_RESULTS and Trip.SIM_COL_VEH_MSA_OVERCAP in list(cost_trip_df.columns.values): overcap_col = Trip.SIM_COL_VEH_MSA_OVERCAP
+        if Assignment.SIM_COL_PAX_WEIGHT_GROUP in list(pathset_links_df.columns.values):
+            new_pos = numpy.flatnonzero(pandas.isnull(pathset_links_df[Assignment.SIM_COL_PAX_WEIGHT_GROUP]).values)
+        else:
+            new_pos = numpy.arange(len(pathset_links_df))
+        if len(new_pos) == 0: return pathset_links_df
 
-        # at cap is a binary, 1 if overcap >= 0 and they're not one of the lucky few that boarded
-        cost_trip_df["at_capacity"] = 0.0
-        if Assignment.SIM_COL_PAX_BUMPSTOP_BOARDED in list(cost_trip_df.columns.values):
-            cost_trip_df.loc[ (cost_trip_df[overcap_col] >= 0)&(cost_trip_df[Assignment.SIM_COL_PAX_BUMPSTOP_BOARDED] != 1), "at_capacity" ] = 1.0
+        FastTripsLogger.debug("set_static_link_cost: calculating for %d out of %d pathset links" % (len(new_pos), len(pathset_links_df)))
+        if len(new_pos) == len(pathset_links_df):
+            (link_group, static_cost) = PathSet.calculate_static_link_cost(pathset_links_df, trip_list_df, transfers_df, walk_df, drive_df)
         else:
-            cost_trip_df.loc[ (cost_trip_df[overcap_col] >= 0)                                                             , "at_capacity" ] = 1.0
+            link_group  = pathset_links_df[Assignment.SIM_COL_PAX_WEIGHT_GROUP].values.copy()
+            static_cost = pathset_links_df[Assignment.SIM_COL_PAX_STATIC_COST ].values.copy()
+            (link_group[new_pos], static_cost[new_pos]) = PathSet.calculate_static_link_cost(pathset_links_df.iloc[new_pos],
+                                                                                              trip_list_df, transfers_df, walk_df, drive_df)
 
-        cost_trip_df.loc[cost_trip_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == "at_capacity"    , "var_value"] = cost_trip_df["at_capacity"]
-        cost_trip_df.loc[cost_trip_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == "overcap"        , "var_value"] = cost_trip_df[overcap_col]
-        # overcap shouldn't be negative
-        cost_trip_df.loc[ (cost_trip_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == "overcap")&(cost_trip_df["var_value"]<0), "var_value"] = 0.0
+        pathset_links_df[Assignment.SIM_COL_PAX_WEIGHT_GROUP] = link_group.astype(numpy.int64)
+        pathset_links_df[Assignment.SIM_COL_PAX_STATIC_COST ] = static_cost
+        return pathset_links_df
 
-        if len(Assignment.TRACE_PERSON_IDS) > 0:
-            FastTripsLogger.debug("cost_trip_df=\n%s\ndtypes=\n%s" % (cost_trip_df.loc[cost_trip_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS)].to_string(), str(cost_trip_df.dtypes)))
+    @staticmethod
+    def drop_static_link_cost(pathset_links_df, inplace=True):
+        """
+        Drops the columns set by :py:meth:`PathSet.set_static_link_cost`.  They stay on the pathset links kept for
+        the next iteration, so they're only dropped from what's written.
+
+        Returns pathset_links_df without them; if not *inplace*, this is a copy.
+        """
+        from .Assignment import Assignment
 
-        missing_trip_costs = cost_trip_df.loc[ pandas.isnull(cost_trip_df["var_value"]) ]
-        error_trip_msg = "Missing %d out of %d transit trip var_value values" % (len(missing_trip_costs), len(cost_trip_df))
-        FastTripsLogger.debug(error_trip_msg)
+        drop_cols = [colname for colname in [Assignment.SIM_COL_PAX_WEIGHT_GROUP, Assignment.SIM_COL_PAX_STATIC_COST]
+                     if colname in list(pathset_links_df.columns.values)]
+        if not inplace:
+            return pathset_links_df.drop(drop_cols, axis=1)
+        pathset_links_df.drop(drop_cols, axis=1, inplace=True)
+        return pathset_links_df
 
-        if len(missing_trip_costs) > 0:
-            error_trip_msg += "\n%s" % missing_trip_costs.head(10).to_string()
-            FastTripsLogger.fatal(error_trip_msg)
+    @staticmethod
+    def calculate_cost(iteration, simulation_iteration, STOCH_DISPERSION, pathset_paths_df, pathset_links_df, trip_list_df, transfers_df, walk_df, drive_df, veh_trips_df, stops):
+        """
+        This is equivalent to the C++ Path::calculateCost() method.  Would it be faster to do it in C++?
+        It would require us to package up the networks and paths and send back and forth.  :p
 
-        ##################### Finally, handle Transfer link costs
-        FastTripsLogger.debug("cost_transfer_df head = \n%s\ntransfers_df head=\n%s" % (cost_transfer_df.head().to_string(), transfers_df.head().to_string()))
-        cost_transfer_df = pandas.merge(left     = cost_transfer_df,
-                                        left_on  = ["A_id_num","B_id_num"],
-                                        right    = transfers_df,
-                                        right_on = [Transfer.TRANSFERS_COLUMN_FROM_STOP_NUM, Transfer.TRANSFERS_COLUMN_TO_STOP_NUM],
-                                        how      = "left")
-        cost_transfer_df.loc[cost_transfer_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == "walk_time_min"   , "var_value"] = cost_transfer_df[Passenger.PF_COL_LINK_TIME]/numpy.timedelta64(1,'m')
+        I think if we can do it using vectorized pandas operations, it should be fast, but we can compare/test.
 
-        # any numeric column can be used
-        for colname in list(transfers_df.select_dtypes(include=['float64','int64']).columns.values):
-            FastTripsLogger.debug("Using numeric column %s" % colname)
-            cost_transfer_df.loc[cost_transfer_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == colname, "var_value"] = cost_transfer_df[colname]
+        It's also messier to have this in two places.  Maybe we should delete it from the C++; the overlap calcs are only in here right now.
 
-        # make zero walk transfers have default var_values 0
-        cost_transfer_df.loc[ (cost_transfer_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] != "transfer_penalty")&
-                              (cost_transfer_df["A_id_num"]==cost_transfer_df["B_id_num"]), "var_value"] = 0.0
-        # zero walk transfers have a transfer penalty although they're not otherwise configured
-        cost_transfer_df.loc[ (cost_transfer_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == "transfer_penalty")&
-                              (pandas.isnull(cost_transfer_df["var_value"])), "var_value"] = 1.0
+        Returns pathset_paths_df with additional column, Assignment.SIM_COL_PAX_COST, Assignment.SIM_COL_PAX_PROBABILITY, Assignment.SIM_COL_PAX_LOGSUM
+        And pathset_links_df with additional column, Assignment.SIM_COL_PAX_COST
+
+        """
+        from .Assignment import Assignment
+
+        # if these are here already, remove them since we'll recalculate them
+        if Assignment.SIM_COL_PAX_COST in list(pathset_paths_df.columns.values):
+            pathset_paths_df.drop([Assignment.SIM_COL_PAX_COST,
+                                   Assignment.SIM_COL_PAX_LNPS,
+                                   Assignment.SIM_COL_PAX_PROBABILITY,
+                                   Assignment.SIM_COL_PAX_LOGSUM     ], axis=1, inplace=True)
+            pathset_links_df.drop([Assignment.SIM_COL_PAX_COST       ], axis=1, inplace=True)
 
-        # FastTripsLogger.debug("cost_transfer_df=\n%s\ndtypes=\n%s" % (cost_transfer_df.head().to_string(), str(cost_transfer_df.dtypes)))
+            # leaving this in for writing to CSV for debugging but I could take it out
+            pathset_paths_df.drop(["logsum_component"], axis=1, inplace=True)
 
-        missing_transfer_costs = cost_transfer_df.loc[ pandas.isnull(cost_transfer_df["var_value"]) ]
-        error_transfer_msg = "Missing %d out of %d transfer var_value values" % (len(missing_transfer_costs), len(cost_transfer_df))
-        FastTripsLogger.debug(error_transfer_msg)
 
-        if len(missing_transfer_costs) > 0:
-            error_transfer_msg += "\n%s" % missing_transfer_costs.head(10).to_string()
-            FastTripsLogger.fatal(error_transfer_msg)
+        if len(Assignment.TRACE_PERSON_IDS) > 0 and isDebugEnabled():
+            FastTripsLogger.debug("calculate_cost: pathset_links_df\n%s" % str(pathset_links_df.loc[pathset_links_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS)]))
+            FastTripsLogger.debug("calculate_cost: trip_list_df\n%s" % str(trip_list_df.loc[trip_list_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS)]))
 
-        # abort here if we're missing anything
-        if len(missing_accegr_costs) + len(missing_trip_costs) + len(missing_transfer_costs) > 0:
-            raise NotImplementedError("Missing var_values; See log")
+        # the time-invariant part of the link costs is calculated once per pathset; this only fills in what's missing
+        pathset_links_df = PathSet.set_static_link_cost(pathset_links_df, trip_list_df, transfers_df, walk_df, drive_df)
+
+        pathset_links_to_use = pathset_links_df
+        if PathSet.OVERLAP_SPLIT_TRANSIT:
+            pathset_links_to_use = PathSet.split_transit_links(pathset_links_df, veh_trips_df, stops)
 
-        ##################### Put them back together into a single dataframe
-        cost_columns = [Passenger.PERSONS_COLUMN_PERSON_ID,
-                        Passenger.TRIP_LIST_COLUMN_USER_CLASS,
-                        Passenger.TRIP_LIST_COLUMN_PURPOSE,
-                        Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
-                        Passenger.PF_COL_PATH_NUM,
-                        Passenger.PF_COL_LINK_NUM,
-                        PathSet.WEIGHTS_COLUMN_DEMAND_MODE_TYPE,
-                        PathSet.WEIGHTS_COLUMN_DEMAND_MODE,
-                        PathSet.WEIGHTS_COLUMN_SUPPLY_MODE,
-                        PathSet.WEIGHTS_COLUMN_SUPPLY_MODE_NUM,
-                        PathSet.WEIGHTS_COLUMN_WEIGHT_NAME,
-                        PathSet.WEIGHTS_COLUMN_WEIGHT_VALUE,
-                        "var_value",
-                        Assignment.SIM_COL_MISSED_XFER,
-                        Assignment.SIM_COL_PAX_BUMP_ITER]
-        cost_accegr_df   = cost_accegr_df[cost_columns]
-        cost_trip_df     = cost_trip_df[cost_columns]
-        cost_transfer_df = cost_transfer_df[cost_columns]
-        cost_df          = pandas.concat([cost_accegr_df, cost_trip_df, cost_transfer_df], axis=0)
-
-        # FastTripsLogger.debug("calculate_cost: cost_df=\n%s\ndtypes=\n%s" % (cost_df.to_string(), str(cost_df.dtypes)))
-
-        # linkcost = weight x variable
-        cost_df[Assignment.SIM_COL_PAX_COST] = cost_df["var_value"]*cost_df[PathSet.WEIGHTS_COLUMN_WEIGHT_VALUE]
+        (weight_groups_df, weight_names, group_name_nums, group_weight_values) = PathSet.compile_weights()
+        link_group = pathset_links_to_use[Assignment.SIM_COL_PAX_WEIGHT_GROUP].values.astype(numpy.int64)
+        num_links  = len(pathset_links_to_use)
+
+        # Dense link attribute matrix for the time-dependent weights: one row per link.  NaN means unset.
+        attr_names    = weight_names[numpy.in1d(weight_names, PathSet.DYNAMIC_WEIGHT_NAMES)]
+        attr_name_num = dict([(attr_name, attr_num) for (attr_num, attr_name) in enumerate(attr_names)])
+        attr_matrix   = numpy.empty((num_links, len(attr_names)), dtype=numpy.float64)
+        attr_matrix.fill(numpy.nan)
+
+        def set_attribute(attr_name, rows, values):
+            # only attributes that are weighted are relevant
+            if attr_name in attr_name_num:
+                attr_matrix[rows, attr_name_num[attr_name]] = values
+
+        ##################### Transit Trip link attributes depend on the simulated vehicle times and loads
+        linkmode   = pathset_links_to_use[Passenger.PF_COL_LINK_MODE].values
+        trip_pos   = numpy.flatnonzero((linkmode == PathSet.STATE_MODE_TRIP)&(link_group >= 0))
+        board_time = pathset_links_to_use[Assignment.SIM_COL_PAX_BOARD_TIME].values[trip_pos].astype("datetime64[ns]")
+        A_time     = pathset_links_to_use[Assignment.SIM_COL_PAX_A_TIME    ].values[trip_pos].astype("datetime64[ns]")
+        B_time     = pathset_links_to_use[Assignment.SIM_COL_PAX_B_TIME    ].values[trip_pos].astype("datetime64[ns]")
+        has_board  = pandas.notnull(board_time)
 
-        # TODO: option: make these more subtle?
-        # missed_xfer has huge cost
-        cost_df.loc[cost_df[Assignment.SIM_COL_MISSED_XFER  ]==1, Assignment.SIM_COL_PAX_COST] = PathSet.HUGE_COST
-        # bump iter means over capacity
-        cost_df.loc[cost_df[Assignment.SIM_COL_PAX_BUMP_ITER]>=0, Assignment.SIM_COL_PAX_COST] = PathSet.HUGE_COST
+        # if there's a board time, in_vehicle_time = new_B_time - board_time
+        #               otherwise, in_vehicle_time = B time - A time (for when we split)
+        in_vehicle_time_min = numpy.where(has_board, (B_time - board_time)/numpy.timedelta64(1,'m'),
+                                                     (B_time - A_time    )/numpy.timedelta64(1,'m'))
+        # if in vehicle time is less than 0 then off by 1 day error
+        in_vehicle_time_min[in_vehicle_time_min < 0] += (24*60)
+        set_attribute("in_vehicle_time_min", trip_pos, in_vehicle_time_min)
+
+        # if there's a board time, wait time = board_time - A time
+        #               otherwise, wait time = 0 (for when we split transit links)
+        set_attribute("wait_time_min", trip_pos, numpy.where(has_board, (board_time - A_time)/numpy.timedelta64(1,'m'), 0.0))
+
+        # which overcap column to use?
+        overcap_col = Trip.SIM_COL_VEH_OVERCAP
+        if Assignment.MSA_RESULTS and Trip.SIM_COL_VEH_MSA_OVERCAP in list(pathset_links_to_use.columns.values): overcap_col = Trip.SIM_COL_VEH_MSA_OVERCAP
+        overcap = pathset_links_to_use[overcap_col].values[trip_pos].astype(numpy.float64)
+
+        # at cap is a binary, 1 if overcap >= 0 and they're not one of the lucky few that boarded
+        at_capacity = (overcap >= 0)
+        if Assignment.SIM_COL_PAX_BUMPSTOP_BOARDED in list(pathset_links_to_use.columns.values):
+            at_capacity = at_capacity&(pathset_links_to_use[Assignment.SIM_COL_PAX_BUMPSTOP_BOARDED].values[trip_pos] != 1)
+        set_attribute("at_capacity", trip_pos, at_capacity.astype(numpy.float64))
+        # overcap shouldn't be negative
+        set_attribute("overcap",     trip_pos, numpy.where(overcap < 0, 0.0, overcap))
 
-        cost_df.sort_values([Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
-                             Passenger.PF_COL_PATH_NUM,
-                             Passenger.PF_COL_LINK_NUM], inplace=True)
-        FastTripsLogger.debug("calculate_cost: cost_df\n%s" % str(cost_df.loc[cost_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS)]))
+        # make zero walk transfers have default var_values 0
+        rows = numpy.flatnonzero((linkmode == PathSet.STATE_MODE_TRANSFER)&(link_group >= 0)&
+                                 (pathset_links_to_use["A_id_num"].values == pathset_links_to_use["B_id_num"].values))
+        attr_matrix[rows,:] = 0.0
+
+        if len(Assignment.TRACE_PERSON_IDS) > 0 and isDebugEnabled():
+            trace_pos = numpy.flatnonzero(pathset_links_to_use[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS).values)
+            trace_df  = pandas.DataFrame(attr_matrix[trace_pos,:], columns=attr_names)
+            for colname in [Passenger.PF_COL_LINK_NUM, Passenger.PF_COL_PATH_NUM, Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, Passenger.TRIP_LIST_COLUMN_PERSON_ID]:
+                trace_df.insert(0, colname, pathset_links_to_use[colname].values[trace_pos])
+            trace_df["group_num"] = link_group[trace_pos]
+            FastTripsLogger.debug("calculate_cost: link attributes\n%s" % trace_df.to_string())
+
+        (dynamic_cost, negative_cost) = PathSet.evaluate_link_cost("time-dependent", attr_matrix, attr_names, link_group,
+                                                                   weight_groups_df, weight_names, group_name_nums, group_weight_values,
+                                                                   pathset_links_to_use)
+
+        # TODO: option: make these more subtle?
+        # missed_xfer and bump iter (over capacity) have huge cost for each weight
+        huge_cost = (pathset_links_to_use[Assignment.SIM_COL_MISSED_XFER].values == 1)
+        # if this isn't set yet (only simulation_iteration==0) it's not bumped
+        if simulation_iteration > 0:
+            huge_cost = huge_cost|(pathset_links_to_use[Assignment.SIM_COL_PAX_BUMP_ITER].fillna(-1).values >= 0)
+        # this applies to each piece of a split transit link, so count them
+        huge_count = (huge_cost&(link_group >= 0)).astype(numpy.int64)
+
+        link_keys = [Passenger.TRIP_LIST_COLUMN_PERSON_ID,
+                     Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
+                     Passenger.PF_COL_PATH_NUM,
+                     Passenger.PF_COL_LINK_NUM]
+        if PathSet.OVERLAP_SPLIT_TRANSIT:
+            # split transit links sum back to the original link
+            dynamic_df = pathset_links_to_use[link_keys].reset_index(drop=True)
+            dynamic_df["dynamic_cost" ] = dynamic_cost
+            dynamic_df["negative_cost"] = negative_cost.astype(numpy.int64)
+            dynamic_df["huge_count"   ] = huge_count
+            dynamic_df = dynamic_df.groupby(link_keys).aggregate('sum').reset_index()
+            dynamic_df = pandas.merge(left =pathset_links_df[link_keys],
+                                      right=dynamic_df,
+                                      how  ="left",
+                                      on   =link_keys)
+            dynamic_cost  = dynamic_df["dynamic_cost" ].values
+            negative_cost = (dynamic_df["negative_cost"].values > 0)
+            huge_count    = dynamic_df["huge_count"   ].fillna(0).values.astype(numpy.int64)
+            del dynamic_df
+
+        ##################### linkcost = time-invariant cost + time-dependent cost
+        pathset_links_df = pathset_links_df.reset_index(drop=True)
+        link_group = pathset_links_df[Assignment.SIM_COL_PAX_WEIGHT_GROUP].values.astype(numpy.int64)
+        link_cost  = pathset_links_df[Assignment.SIM_COL_PAX_STATIC_COST ].values + dynamic_cost
+
+        huge_cost   = (huge_count > 0)&(link_group >= 0)
+        num_weights = numpy.array([len(weight_values) for weight_values in group_weight_values], dtype=numpy.int64)
+        link_cost[huge_cost] = PathSet.HUGE_COST*num_weights[link_group[huge_cost]]*huge_count[huge_cost]
+        pathset_links_df[Assignment.SIM_COL_PAX_COST] = link_cost
 
         # verify all costs are non-negative
-        if cost_df[Assignment.SIM_COL_PAX_COST].min() < 0:
-            msg = "calculate_cost: Negative costs found:\n%s" % cost_df.loc[ cost_df[Assignment.SIM_COL_PAX_COST]<0 ].to_string()
+        negative_cost = negative_cost&(~huge_cost)
+        if negative_cost.any():
+            msg = "calculate_cost: Negative costs found:\n%s" % pathset_links_df.loc[negative_cost].to_string()
             FastTripsLogger.fatal(msg)
             raise UnexpectedError(msg)
 
         ###################### sum linkcost to links
-        cost_link_df = cost_df[[Passenger.TRIP_LIST_COLUMN_PERSON_ID,
-                                Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
-                                Passenger.PF_COL_PATH_NUM,
-                                Passenger.PF_COL_LINK_NUM,
-                                Assignment.SIM_COL_PAX_COST]].groupby(
-                                   [Passenger.TRIP_LIST_COLUMN_PERSON_ID,
-                                    Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
-                                    Passenger.PF_COL_PATH_NUM,
-                                    Passenger.PF_COL_LINK_NUM]).aggregate('sum').reset_index()
-        if len(Assignment.TRACE_PERSON_IDS) > 0:
+        cost_link_df = pathset_links_df.loc[link_group >= 0, link_keys + [Assignment.SIM_COL_PAX_COST]].reset_index(drop=True)
+
+        if len(Assignment.TRACE_PERSON_IDS) > 0 and isDebugEnabled():
             FastTripsLogger.debug("calculate_cost: cost_link_df\n%s" % str(cost_link_df.loc[cost_link_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS)]))
-        # join to pathset_links_df
-        pathset_links_df = pandas.merge(left =pathset_links_df,
-                                        right=cost_link_df,
-                                        how  ="left",
-                                        on   =[Passenger.TRIP_LIST_COLUMN_PERSON_ID,
-                                               Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
-                                               Passenger.PF_COL_PATH_NUM,
-                                               Passenger.PF_COL_LINK_NUM])
-        if len(Assignment.TRACE_PERSON_IDS) > 0:
             FastTripsLogger.debug("calculate_cost: pathset_links_df\n%s" % str(pathset_links_df.loc[pathset_links_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS)]))
 
         ###################### overlap calcs
-        overlap_df = None
         if PathSet.OVERLAP_VARIABLE != PathSet.OVERLAP_NONE:
-
-            # CHUNKING because we run into memory problems
-            # TODO: figure out more sophisticated chunk size
-            CHUNK_SIZE = 1000 # person trips
-            chunk_list = pathset_links_to_use[[Passenger.TRIP_LIST_COLUMN_PERSON_ID,
-                                               Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM]].drop_duplicates().reset_index(drop=True)
-            num_chunks = len(chunk_list)/CHUNK_SIZE + 1
-            chunk_list["chunk_num"] = numpy.floor_divide(chunk_list.index, CHUNK_SIZE)
-            FastTripsLogger.debug("calculate_cost: chunk_list size=%d head=\n%s\ntail=\n%s" % (len(chunk_list), chunk_list.head().to_string(), chunk_list.tail().to_string()))
-            pathset_links_to_use = pandas.merge(left  =pathset_links_to_use,
-                                                right =chunk_list,
-                                                how   ='left')
-            FastTripsLogger.debug("calculate_cost: mem_use=%s pathset_links_to_use has length %d, head=\n%s" % (Util.get_process_mem_use_str(), 
-                                  len(pathset_links_to_use), pathset_links_to_use.head().to_string()))
-            full_overlap_df = pandas.DataFrame()
-
-            for chunk_num in range(num_chunks):
-
-                # get the person trips in the chunk
-                overlap_df = pathset_links_to_use.loc[ pathset_links_to_use["chunk_num"] == chunk_num]
-
-                overlap_df = overlap_df[[Passenger.TRIP_LIST_COLUMN_PERSON_ID,
-                                         Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
-                                         Passenger.PF_COL_PATH_NUM,
-                                         Passenger.PF_COL_LINK_NUM,
-                                         "A_id_num","B_id_num",
-                                         Route.ROUTES_COLUMN_MODE_NUM,
-                                         "new_linktime",
-                                         Assignment.SIM_COL_PAX_DISTANCE]].copy()
-                # sum count, time, dist(TODO) to path and add path sum version to overlap_df -- this is L
-                FastTripsLogger.debug("calculate_cost: mem_use=%s overlap_df has length %d, head=\n%s" % (Util.get_process_mem_use_str(), len(overlap_df), overlap_df.head().to_string()))
-
-                # path aggregate
-                overlap_df["count"] = 1
-                overlap_path_df = overlap_df.groupby([Passenger.TRIP_LIST_COLUMN_PERSON_ID,
-                                                      Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
-                                                      Passenger.PF_COL_PATH_NUM]).aggregate({'count':'sum','new_linktime':'sum',Assignment.SIM_COL_PAX_DISTANCE:'sum'}).reset_index(drop=False)
-                overlap_path_df.rename(columns={"count":"path_count", "new_linktime":"path_time", Assignment.SIM_COL_PAX_DISTANCE:"path_distance"}, inplace=True)
-                overlap_df.drop(["count"], axis=1, inplace=True)
-
-                FastTripsLogger.debug("calculate_cost: mem_use=%s overlap_path_df has length %d, head=\n%s" % (Util.get_process_mem_use_str(), len(overlap_path_df), overlap_path_df.head().to_string()))
-
-                # get the path variables
-                overlap_df = pandas.merge(overlap_df, overlap_path_df, how="left",
-                                          on=[Passenger.TRIP_LIST_COLUMN_PERSON_ID,Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,Passenger.PF_COL_PATH_NUM])
-                del overlap_path_df
-
-                # outer join on trip_list_id_num means when they match, we'll get a cartesian product of the links
-                overlap_df = pandas.merge(overlap_df, overlap_df.copy(), on=[Passenger.TRIP_LIST_COLUMN_PERSON_ID,Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM], how="outer")
-                FastTripsLogger.debug("calculate_cost: mem_use=%s overlap_df has length %d, head=\n%s" % (Util.get_process_mem_use_str(), len(overlap_df), overlap_df.head().to_string()))
-
-                # count matches -- matching A,B,mode
-                overlap_df["match"] = 0
-                overlap_df.loc[ (overlap_df["A_id_num_x"]==overlap_df["A_id_num_y"])&
-                                (overlap_df["B_id_num_x"]==overlap_df["B_id_num_y"])&
-                                (overlap_df["mode_num_x"]==overlap_df["mode_num_y"])  , "match"] = 1
-
-                if PathSet.OVERLAP_VARIABLE == PathSet.OVERLAP_COUNT:
-                    overlap_df["link_prop_x"] = 1.0/overlap_df["path_count_x"]                         # l_a/L_i
-                    overlap_df["pathlen_x_y"] = overlap_df["path_count_x"]/overlap_df["path_count_y"]  # L_i/L_j
-                elif PathSet.OVERLAP_VARIABLE == PathSet.OVERLAP_TIME:
-                    overlap_df["link_prop_x"] = overlap_df["new_linktime_x"]/overlap_df["path_time_x"] # l_a/L_i
-                    overlap_df["pathlen_x_y"] = overlap_df["path_time_x"]/overlap_df["path_time_y"]    # L_i/L_j
-                elif PathSet.OVERLAP_VARIABLE == PathSet.OVERLAP_DISTANCE:
-                    overlap_df["link_prop_x"] = overlap_df["distance_x"]/overlap_df["path_distance_x"] # l_a/L_i
-                    overlap_df["pathlen_x_y"] = overlap_df["path_distance_x"]/overlap_df["path_distance_y"]    # L_i/L_j
-
-                overlap_df["pathlen_x_y_scale"] = overlap_df[["pathlen_x_y"]].pow(PathSet.OVERLAP_SCALE_PARAMETER)  # (L_i/L_j)^gamma
-                # zero it out if it's not a match
-                overlap_df.loc[overlap_df["match"]==0, "pathlen_x_y_scale"] = 0
-                # now pathlen_x_y_scale = (L_i/L_j)^gamma x delta_aj
-
-                if len(Assignment.TRACE_PERSON_IDS) > 0:
-                    FastTripsLogger.debug("calculate_cost: overlap_df\n%s" % str(overlap_df.loc[overlap_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS)]))
-
-                # debug
-                # overlap_df_temp = overlap_df.groupby([Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, "pathnum_x","linknum_x","link_prop_x","pathnum_y"]).aggregate({"match":"sum", "pathlen_x_y_scale":"sum"})
-                # FastTripsLogger.debug("calculate_cost: overlap_df_temp\n%s" % str(overlap_df_temp.head(50)))
-
-                # group by pathnum_x, linknum_x -- so this sums over paths P_j in equation (or pathnum_y here)
-                overlap_df = overlap_df.groupby([Passenger.TRIP_LIST_COLUMN_PERSON_ID,Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, "pathnum_x","linknum_x","link_prop_x"]).aggregate({"pathlen_x_y_scale":"sum"}).reset_index()
-                # now pathlen_x_y_scale = SUM_j (L_i/L_j)^gamma x delta_aj
-                overlap_df["PS"] = overlap_df["link_prop_x"]/overlap_df["pathlen_x_y_scale"]  # l_a/L_i * 1/(SUM_j (L_i/L_j)^gamma x delta_aj)
-                if len(Assignment.TRACE_PERSON_IDS) > 0:
-                    FastTripsLogger.debug("calculate_cost: overlap_df\n%s" % str(overlap_df.loc[overlap_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS)]))
-
-                # sum across link in path
-                overlap_df = overlap_df.groupby([Passenger.TRIP_LIST_COLUMN_PERSON_ID,Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, "pathnum_x"]).aggregate({"PS":"sum"}).reset_index(drop=False)
-
-                # Check all pathsizes are in [0,1]
-                min_PS = overlap_df["PS"].min()
-                max_PS = overlap_df["PS"].max()
-                FastTripsLogger.debug("PathSize min=%f max=%f" % (min_PS, max_PS))
-                if min_PS < 0:
-                    FastTripsLogger.fatal("Min pathsize = %f < 0:\n%s" % (min_PS, overlap_df.loc[overlap_df["PS"]==min_PS].to_string()))
-                if max_PS > 1.0001:
-                    FastTripsLogger.fatal("Max pathsize = %f > 1:\n%s" % (max_PS, overlap_df.loc[overlap_df["PS"]==max_PS].to_string()))
-
-                overlap_df[Assignment.SIM_COL_PAX_LNPS] = numpy.log(overlap_df["PS"])
-                if len(Assignment.TRACE_PERSON_IDS) > 0:
-                    FastTripsLogger.debug("calculate_cost: overlap_df\n%s" % str(overlap_df.loc[overlap_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS)]))
-
-                # rename pathnum_x to pathnum and drop PS.  Now overlap_df has columns trip_list_id_num, pathnum, ln_PS
-                overlap_df.rename(columns={"pathnum_x":Passenger.PF_COL_PATH_NUM}, inplace=True)
-                overlap_df.drop(["PS"], axis=1, inplace=True) # we have ln_PS
-
-                if len(full_overlap_df) == 0:
-                    full_overlap_df = overlap_df
-                else:
-                    full_overlap_df = full_overlap_df.append(overlap_df)
-                FastTripsLogger.debug("calculate_cost: mem_use=%s full_overlap_df has length %d" % (Util.get_process_mem_use_str(), len(full_overlap_df)))
+            full_overlap_df = PathSet.calculate_path_size(pathset_links_to_use)
+            if len(Assignment.TRACE_PERSON_IDS) > 0 and isDebugEnabled():
+                FastTripsLogger.debug("calculate_cost: full_overlap_df\n%s" % str(full_overlap_df.loc[full_overlap_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS)]))
 
         ###################### sum linkcost to paths
         cost_link_df.drop([Passenger.PF_COL_LINK_NUM], axis=1, inplace=True)
         cost_path_df = cost_link_df.groupby([Passenger.TRIP_LIST_COLUMN_PERSON_ID,Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,Passenger.PF_COL_PATH_NUM]).aggregate('sum').reset_index()
-        if len(Assignment.TRACE_PERSON_IDS) > 0:
+        if len(Assignment.TRACE_PERSON_IDS) > 0 and isDebugEnabled():
             FastTripsLogger.debug("calculate_cost: cost_path_df\n%s" % str(cost_path_df.loc[cost_path_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS)]))
         # join to pathset_paths_df
         pathset_paths_df = pandas.merge(left =pathset_paths_df,
@@ -1114,7 +1346,7 @@ class PathSet:
                                             on   =[Passenger.TRIP_LIST_COLUMN_PERSON_ID,
                                                    Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
                                                    Passenger.PF_COL_PATH_NUM])
-        if len(Assignment.TRACE_PERSON_IDS) > 0:
+        if len(Assignment.TRACE_PERSON_IDS) > 0 and isDebugEnabled():
             FastTripsLogger.debug("calculate_cost: pathset_paths_df\n%s" % str(pathset_paths_df.loc[pathset_paths_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS)]))
 
         ###################### logsum and probabilities
@@ -1129,7 +1361,7 @@ class PathSet:
                                         how="left")
         pathset_paths_df[Assignment.SIM_COL_PAX_PROBABILITY] = pathset_paths_df["logsum_component"]/pathset_paths_df["logsum"]
 
-        if len(Assignment.TRACE_PERSON_IDS) > 0:
+        if len(Assignment.TRACE_PERSON_IDS) > 0 and isDebugEnabled():
             FastTripsLogger.debug("calculate_cost: pathset_paths_df\n%s" % str(pathset_paths_df.loc[pathset_paths_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].isin(Assignment.TRACE_PERSON_IDS)]))
 
         # Note: the path finding costs won't match the costs here because missed transfers are already calculated here
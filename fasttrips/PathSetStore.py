@@ -0,0 +1,378 @@
+__copyright__ = "Copyright 2016 Contributing Entities"
+__license__   = """
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import numpy,pandas
+
+from .Logger    import FastTripsLogger
+from .Passenger import Passenger
+from .PathSet   import PathSet
+
+class PathSetStore:
+    """
+    Columnar storage for the path sets of every person trip in the trip list.
+
+    Rather than keeping a :py:class:`PathSet` instance (with its own attribute dictionary and
+    pathdict) per trip, the trip attributes needed for pathfinding are kept in numpy arrays, one
+    element per trip.  String attributes (user class, purpose, modes, person ids) are stored as
+    categorical codes into a small array of unique values.  Pathfinding results are appended to
+    shared int and double buffers, with each trip's offset and count into them, and only decoded
+    into a pathdict on request.
+
+    Individual trips are accessed via :py:class:`PathSetView` instances, which provide the
+    :py:class:`PathSet` attributes and methods used by :py:class:`Assignment` and
+    :py:class:`Passenger`.
+    """
+    #: Categorical (string) attributes stored as codes.  These are the trip list columns.
+    CATEGORICAL_COLUMNS = [Passenger.TRIP_LIST_COLUMN_PERSON_ID,
+                           Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
+                           Passenger.TRIP_LIST_COLUMN_MODE,
+                           Passenger.TRIP_LIST_COLUMN_USER_CLASS,
+                           Passenger.TRIP_LIST_COLUMN_PURPOSE,
+                           Passenger.TRIP_LIST_COLUMN_ACCESS_MODE,
+                           Passenger.TRIP_LIST_COLUMN_TRANSIT_MODE,
+                           Passenger.TRIP_LIST_COLUMN_EGRESS_MODE]
+
+    #: Numeric attributes stored directly, with their numpy dtype.
+    NUMERIC_COLUMNS     = [(Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,        numpy.int64),
+                           (Passenger.PERSONS_COLUMN_PERSON_ID_NUM,             numpy.int64),
+                           (Passenger.TRIP_LIST_COLUMN_ORIGIN_TAZ_ID_NUM,       numpy.int32),
+                           (Passenger.TRIP_LIST_COLUMN_DESTINATION_TAZ_ID_NUM,  numpy.int32)]
+
+    #: Number of columns in the int pathfinding results returned by the extension:
+    #: path_num, stop_id, deparr_mode, trip_id, stop_succpred, seq, seq_succpred
+    RESULT_INT_COLUMNS    = 7
+    #: Number of columns in the double pathfinding results returned by the extension:
+    #: label, deparr_time, link_time, cost, arrdep_time
+    RESULT_DOUBLE_COLUMNS = 5
+    #: Number of columns in the path costs returned by the extension: cost, probability
+    PATH_COST_COLUMNS     = 2
+    #: Minimum number of rows the result buffers grow to
+    MIN_BUFFER_ROWS       = 1024
+
+    #: Attribute name for path direction, one of :py:attr:`PathSet.DIR_OUTBOUND` or :py:attr:`PathSet.DIR_INBOUND`
+    ATTR_DIRECTION      = "direction"
+    #: Attribute name for preferred time, in minutes after midnight
+    ATTR_PREF_TIME_MIN  = "pref_time_min"
+
+    def __init__(self, trip_list_df):
+        """
+        Constructor from the trip list :py:class:`pandas.DataFrame` (e.g. :py:attr:`Passenger.trip_list_df`).
+        """
+        #: Number of trips in the store
+        self.num_trips = len(trip_list_df)
+
+        #: Column name -> numpy array, one element per trip
+        self.columns    = {}
+        #: Column name -> numpy array of unique values for categorical columns
+        self.categories = {}
+
+        for colname in PathSetStore.CATEGORICAL_COLUMNS:
+            categorical = pandas.Categorical(trip_list_df[colname])
+            codes       = numpy.asarray(categorical.codes)
+            self.columns[colname]    = codes.astype(numpy.int32 if len(categorical.categories) > 32767 else numpy.int16)
+            self.categories[colname] = numpy.asarray(categorical.categories, dtype=object)
+
+        for (colname, dtype) in PathSetStore.NUMERIC_COLUMNS:
+            self.columns[colname] = trip_list_df[colname].values.astype(dtype)
+
+        # direction and preferred time follow the time target
+        outbound = (trip_list_df[Passenger.TRIP_LIST_COLUMN_TIME_TARGET] == "arrival").values
+        inbound  = (trip_list_df[Passenger.TRIP_LIST_COLUMN_TIME_TARGET] == "departure").values
+        if (~(outbound|inbound)).any():
+            raise Exception("Don't understand trip_list %s values: %s" %
+                            (Passenger.TRIP_LIST_COLUMN_TIME_TARGET,
+                             str(trip_list_df.loc[~(outbound|inbound), Passenger.TRIP_LIST_COLUMN_TIME_TARGET].unique())))
+
+        self.columns[PathSetStore.ATTR_DIRECTION] = numpy.where(outbound, PathSet.DIR_OUTBOUND, PathSet.DIR_INBOUND).astype(numpy.int8)
+        self.columns[PathSetStore.ATTR_PREF_TIME_MIN] = numpy.where(outbound,
+            trip_list_df[Passenger.TRIP_LIST_COLUMN_ARRIVAL_TIME_MIN  ].values,
+            trip_list_df[Passenger.TRIP_LIST_COLUMN_DEPARTURE_TIME_MIN].values).astype(numpy.float64)
+
+        #: Does the trip go somewhere?  e.g. is the destination different from the origin
+        self.goes_somewhere = (trip_list_df[Passenger.TRIP_LIST_COLUMN_ORIGIN_TAZ_ID     ].values !=
+                               trip_list_df[Passenger.TRIP_LIST_COLUMN_DESTINATION_TAZ_ID].values)
+
+        # trip_list_id_num -> position in the store
+        trip_list_id_nums = self.columns[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM]
+        max_id            = int(trip_list_id_nums.max()) if self.num_trips > 0 else 0
+        #: Dense lookup from trip_list_id_num to store index; -1 if not in the store
+        self.id_to_index  = numpy.empty(max_id+1, dtype=numpy.int32)
+        self.id_to_index.fill(-1)
+        self.id_to_index[trip_list_id_nums] = numpy.arange(self.num_trips, dtype=numpy.int32)
+
+        #: Number of paths found for each trip
+        self.num_paths   = numpy.zeros(self.num_trips, dtype=numpy.int32)
+        #: Was the result for each trip found by hyperpath (stochastic) search?
+        self.hyperpath   = numpy.zeros(self.num_trips, dtype=numpy.bool_)
+        #: Offset of each trip's paths into :py:attr:`PathSetStore.path_costs`; -1 if pathfinding hasn't been done.
+        self.path_offset = numpy.empty(self.num_trips, dtype=numpy.int64)
+        self.path_offset.fill(-1)
+        #: Offset of each trip's rows into :py:attr:`PathSetStore.result_ints` and :py:attr:`PathSetStore.result_doubles`
+        self.link_offset = numpy.zeros(self.num_trips, dtype=numpy.int64)
+        #: Number of result rows (path links) for each trip
+        self.num_links   = numpy.zeros(self.num_trips, dtype=numpy.int32)
+
+        #: Pathfinding results, as returned by the extension, for all trips.  These are buffers which grow as
+        #: results are added; only the first :py:attr:`PathSetStore.links_used` and :py:attr:`PathSetStore.paths_used`
+        #: rows are filled in.
+        self.result_ints    = numpy.empty((0, PathSetStore.RESULT_INT_COLUMNS),    dtype=numpy.int32)
+        self.result_doubles = numpy.empty((0, PathSetStore.RESULT_DOUBLE_COLUMNS), dtype=numpy.float64)
+        self.path_costs     = numpy.empty((0, PathSetStore.PATH_COST_COLUMNS),     dtype=numpy.float64)
+        #: Number of rows of :py:attr:`PathSetStore.result_ints` and :py:attr:`PathSetStore.result_doubles` filled in
+        self.links_used     = 0
+        #: Number of rows of :py:attr:`PathSetStore.path_costs` filled in
+        self.paths_used     = 0
+
+        FastTripsLogger.info("PathSetStore: %s" % self.memory_usage_str())
+
+    def index(self, trip_list_id_num):
+        """
+        Returns the store index for the given trip list ID num.
+        """
+        idx = self.id_to_index[trip_list_id_num]
+        if idx < 0:
+            raise KeyError(trip_list_id_num)
+        return idx
+
+    def indices(self, trip_list_id_nums):
+        """
+        Returns the store indices for the given array of trip list ID nums, dropping those not in the store.
+        """
+        trip_list_id_nums = numpy.asarray(trip_list_id_nums, dtype=numpy.int64)
+        trip_list_id_nums = trip_list_id_nums[trip_list_id_nums < len(self.id_to_index)]
+        idxs              = self.id_to_index[trip_list_id_nums]
+        return idxs[idxs >= 0]
+
+    def get_value(self, idx, colname):
+        """
+        Returns the value of the given attribute for the trip at store index *idx*.
+        """
+        if colname in self.categories:
+            return self.categories[colname][self.columns[colname][idx]]
+        return self.columns[colname][idx].item()
+
+    def get_view(self, trip_list_id_num):
+        """
+        Returns a :py:class:`PathSetView` for the given trip list ID num.
+        """
+        return PathSetView(self, self.index(trip_list_id_num))
+
+    def set_results(self, idx, results, hyperpath):
+        """
+        Sets the pathfinding results for the trip at store index *idx*, replacing any it had.
+        *results* is the tuple (ret_ints, ret_doubles, path_costs) from :py:meth:`Assignment.find_trip_based_pathset`.
+        """
+        (ret_ints, ret_doubles, path_costs) = results
+        num_links = ret_ints.shape[0]
+        num_paths = path_costs.shape[0]
+
+        # the old results for this trip are left unused in the buffers, until they're compacted
+        self.path_offset[idx] = -1
+        self.num_links[idx]   = 0
+        self.num_paths[idx]   = 0
+        self.reserve(num_links, num_paths)
+
+        self.result_ints   [self.links_used:self.links_used+num_links] = ret_ints
+        self.result_doubles[self.links_used:self.links_used+num_links] = ret_doubles
+        self.path_costs    [self.paths_used:self.paths_used+num_paths] = path_costs
+
+        self.link_offset[idx] = self.links_used
+        self.num_links  [idx] = num_links
+        self.path_offset[idx] = self.paths_used
+        self.num_paths  [idx] = num_paths
+        self.hyperpath  [idx] = hyperpath
+        self.links_used += num_links
+        self.paths_used += num_paths
+
+    def get_results(self, idx):
+        """
+        Returns the pathfinding results for the trip at store index *idx* as the tuple (ret_ints, ret_doubles, path_costs),
+        like :py:meth:`Assignment.find_trip_based_pathset` returns them, or None if pathfinding hasn't been done.
+        The arrays are views into the store's buffers, so they're only valid until the next :py:meth:`PathSetStore.set_results`.
+        """
+        if self.path_offset[idx] < 0: return None
+        link_start = self.link_offset[idx]
+        link_end   = link_start + self.num_links[idx]
+        path_start = self.path_offset[idx]
+        path_end   = path_start + self.num_paths[idx]
+        return (self.result_ints   [link_start:link_end],
+                self.result_doubles[link_start:link_end],
+                self.path_costs    [path_start:path_end])
+
+    def reserve(self, num_links, num_paths):
+        """
+        Makes sure the result buffers have room for *num_links* more link rows and *num_paths* more paths.
+        If they don't, they're reallocated to twice what's needed, copying only the results still in use.
+        """
+        if self.links_used + num_links <= self.result_ints.shape[0] and \
+           self.paths_used + num_paths <= self.path_costs.shape[0]:
+            return
+
+        trip_idxs  = numpy.flatnonzero(self.path_offset >= 0)
+        (link_rows, link_offset) = PathSetStore.compacted_rows(self.link_offset[trip_idxs], self.num_links[trip_idxs])
+        (path_rows, path_offset) = PathSetStore.compacted_rows(self.path_offset[trip_idxs], self.num_paths[trip_idxs])
+
+        link_capacity = max(PathSetStore.MIN_BUFFER_ROWS, 2*(len(link_rows) + num_links))
+        path_capacity = max(PathSetStore.MIN_BUFFER_ROWS, 2*(len(path_rows) + num_paths))
+
+        result_ints    = numpy.empty((link_capacity, PathSetStore.RESULT_INT_COLUMNS),    dtype=numpy.int32)
+        result_doubles = numpy.empty((link_capacity, PathSetStore.RESULT_DOUBLE_COLUMNS), dtype=numpy.float64)
+        path_costs     = numpy.empty((path_capacity, PathSetStore.PATH_COST_COLUMNS),     dtype=numpy.float64)
+        result_ints   [:len(link_rows)] = self.result_ints   [link_rows]
+        result_doubles[:len(link_rows)] = self.result_doubles[link_rows]
+        path_costs    [:len(path_rows)] = self.path_costs    [path_rows]
+
+        self.result_ints    = result_ints
+        self.result_doubles = result_doubles
+        self.path_costs     = path_costs
+        self.link_offset[trip_idxs] = link_offset
+        self.path_offset[trip_idxs] = path_offset
+        self.links_used     = len(link_rows)
+        self.paths_used     = len(path_rows)
+
+    @staticmethod
+    def compacted_rows(offsets, counts):
+        """
+        Given the *offsets* and *counts* of some blocks of rows, returns the rows in those blocks, in order,
+        and the offsets of the blocks once those rows are copied next to each other.
+        """
+        new_offsets = numpy.cumsum(counts, dtype=numpy.int64) - counts
+        rows        = numpy.arange(counts.sum(), dtype=numpy.int64) + numpy.repeat(offsets - new_offsets, counts)
+        return (rows, new_offsets)
+
+    def memory_usage(self):
+        """
+        Returns the approximate number of bytes used by the store, including the pathfinding result buffers.
+        """
+        total = self.goes_somewhere.nbytes + self.id_to_index.nbytes
+        total += self.num_paths.nbytes + self.hyperpath.nbytes + self.path_offset.nbytes + self.link_offset.nbytes + self.num_links.nbytes
+        total += self.result_ints.nbytes + self.result_doubles.nbytes + self.path_costs.nbytes
+        for colname,arr in self.columns.iteritems():
+            total += arr.nbytes
+        for colname,arr in self.categories.iteritems():
+            total += arr.nbytes + sum([len(str(val)) for val in arr])
+        return total
+
+    def memory_usage_str(self):
+        """
+        Returns a string describing the memory used by the store, in total and per million trips, and how much
+        of the pathfinding result buffers is in use.
+        """
+        total   = self.memory_usage()
+        buffers = self.result_ints.nbytes + self.result_doubles.nbytes + self.path_costs.nbytes
+        in_use  = self.num_links.sum()*(self.result_ints.itemsize*PathSetStore.RESULT_INT_COLUMNS +
+                                        self.result_doubles.itemsize*PathSetStore.RESULT_DOUBLE_COLUMNS) + \
+                  self.num_paths.sum()*self.path_costs.itemsize*PathSetStore.PATH_COST_COLUMNS
+        return "%d trips using %.2f MB; %.2f MB per million trips; %.2f MB of %.2f MB result buffers in use" % \
+            (self.num_trips, total/1048576.0,
+             (total/1048576.0)*1000000.0/self.num_trips if self.num_trips > 0 else 0.0,
+             in_use/1048576.0, buffers/1048576.0)
+
+
+class PathSetView(object):
+    """
+    Lightweight view of a single trip in a :py:class:`PathSetStore`.
+
+    Provides the attributes (e.g. `person_id`, `user_class`, `o_taz_num`, `pref_time_min`) and
+    methods of a :py:class:`PathSet` by reading from the store.  When pickled (e.g. to send to
+    a pathfinding worker process), only the attribute values for this trip are included.
+    """
+
+    def __init__(self, store, idx):
+        self._store  = store
+        self._idx    = idx
+        self._values = None
+
+    def __getattr__(self, name):
+        # only called when regular attribute lookup fails
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if self._values is not None:
+            if name in self._values: return self._values[name]
+            raise AttributeError(name)
+        if name in self._store.columns:
+            return self._store.get_value(self._idx, name)
+        raise AttributeError(name)
+
+    def __getstate__(self):
+        """
+        Pickle the attribute values only; not the whole store.
+        """
+        values = {}
+        store  = self._store
+        if store is None:
+            values = self._values
+        else:
+            for colname in store.columns.keys():
+                values[colname] = store.get_value(self._idx, colname)
+            values["_goes_somewhere"] = bool(store.goes_somewhere[self._idx])
+        return {"_idx":self._idx, "_values":values}
+
+    def __setstate__(self, state):
+        self._store  = None
+        self._idx    = state["_idx"]
+        self._values = state["_values"]
+
+    def goes_somewhere(self):
+        """
+        Does this path go somewhere?  Does the destination differ from the origin?
+        """
+        if self._store is None: return self._values["_goes_somewhere"]
+        return bool(self._store.goes_somewhere[self._idx])
+
+    def path_found(self):
+        """
+        Was a a transit path found from the origin to the destination with the constraints?
+        """
+        return self.num_paths() > 0
+
+    def num_paths(self):
+        """
+        Number of paths in the PathSet
+        """
+        if self._store is None:
+            results = self._values.get("_results")
+            return 0 if results is None else results[2].shape[0]
+        return int(self._store.num_paths[self._idx])
+
+    def outbound(self):
+        """
+        Quick accessor to see if :py:attr:`PathSet.direction` is :py:attr:`PathSet.DIR_OUTBOUND`.
+        """
+        return self.direction == PathSet.DIR_OUTBOUND
+
+    def set_results(self, results, hyperpath):
+        """
+        Stores the pathfinding results for this trip.  See :py:meth:`PathSetStore.set_results`.
+        A view that's been pickled has no store, so it keeps them itself.
+        """
+        if self._store is None:
+            self._values["_results"]   = results
+            self._values["_hyperpath"] = hyperpath
+            return
+        self._store.set_results(self._idx, results, hyperpath)
+
+    @property
+    def pathdict(self):
+        """
+        The pathdict for this trip, decoded from the stored results.  See :py:meth:`PathSet.pathdict_from_results`.
+        """
+        if self._store is None:
+            results   = self._values.get("_results")
+            hyperpath = self._values.get("_hyperpath")
+        else:
+            results   = self._store.get_results(self._idx)
+            hyperpath = self._store.hyperpath[self._idx]
+        if results is None: return {}
+        return PathSet.pathdict_from_results(results[0], results[1], results[2], hyperpath)
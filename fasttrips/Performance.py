@@ -12,18 +12,26 @@ __license__   = """
     See the License for the specific language governing permissions and
     limitations under the License.
 """
-import datetime, os
-import pandas
+import os
+import numpy,pandas
 
 from .Logger    import FastTripsLogger
 from .Passenger import Passenger
-from .Util      import Util
 
 class Performance:
     """
     Performance class.  Keeps track of performance information
     (time spent, number of labeling iterations, etc) related to pathfinding
     in Fast-Trips.
+
+    The information is recorded into preallocated numpy arrays, one per column, which grow as needed,
+    so recording a trip is just a few array assignments.  Worker processes record their own trips and
+    hand them to the main process in bulk with :py:meth:`Performance.get_records` and
+    :py:meth:`Performance.add_records`.
+
+    Each iteration, :py:meth:`Performance.write` writes summary statistics by process to
+    :py:attr:`Performance.OUTPUT_PERFORMANCE_SUMMARY_FILE` and the information for a sample of the trips
+    (see :py:attr:`Assignment.PERFORMANCE_SAMPLE_FRACTION`) to :py:attr:`Performance.OUTPUT_PERFORMANCE_FILE`.
     """
     #: Performance column: Iteration
     PERFORMANCE_COLUMN_ITERATION              = "iteration"
@@ -54,39 +62,94 @@ class Performance:
     #: Performance column: Private usage in memroy, in bytes
     PERFORMANCE_COLUMN_PRIVATE_USAGE_BYTES    = "private usage bytes"
 
+    #: The recorded columns and their numpy types.  The timedelta columns are derived from the
+    #: milliseconds when the trips are written.
+    PERFORMANCE_RECORD_COLUMNS                = [
+        (PERFORMANCE_COLUMN_ITERATION,              numpy.int32  ),
+        (PERFORMANCE_COLUMN_PERSON_ID,              object       ),
+        (PERFORMANCE_COLUMN_TRIP_LIST_ID_NUM,       numpy.int64  ),
+        (PERFORMANCE_COLUMN_PROCESS_NUM,            numpy.int32  ),
+        (PERFORMANCE_COLUMN_NUM_LABELED_STOPS,      numpy.int64  ),
+        (PERFORMANCE_COLUMN_TRACED,                 numpy.bool_  ),
+        (PERFORMANCE_COLUMN_LABEL_ITERATIONS,       numpy.int64  ),
+        (PERFORMANCE_COLUMN_MAX_STOP_PROCESS_COUNT, numpy.int64  ),
+        (PERFORMANCE_COLUMN_TIME_LABELING_MS,       numpy.float64),
+        (PERFORMANCE_COLUMN_TIME_ENUMERATING_MS,    numpy.float64),
+        (PERFORMANCE_COLUMN_WORKING_SET_BYTES,      numpy.int64  ),
+        (PERFORMANCE_COLUMN_PRIVATE_USAGE_BYTES,    numpy.int64  )
+    ]
+
+    #: Number of trips to allocate room for initially
+    INITIAL_CAPACITY                          = 1024
+
+    #: Summary column: Iteration
+    SUMMARY_COLUMN_ITERATION                  = PERFORMANCE_COLUMN_ITERATION
+    #: Summary column: Process number, or :py:attr:`Performance.SUMMARY_ALL_PROCESSES`
+    SUMMARY_COLUMN_PROCESS_NUM                = PERFORMANCE_COLUMN_PROCESS_NUM
+    #: Summary column: The performance column summarized
+    SUMMARY_COLUMN_MEASURE                    = "measure"
+    #: Summary column: Number of trips
+    SUMMARY_COLUMN_COUNT                      = "count"
+    #: Summary column: Mean
+    SUMMARY_COLUMN_MEAN                       = "mean"
+    #: Summary column: Maximum
+    SUMMARY_COLUMN_MAX                        = "max"
+    #: Summary column: Total
+    SUMMARY_COLUMN_TOTAL                      = "total"
+    #: Percentiles in the summary, each in a column named for it, e.g. *p90*
+    SUMMARY_PERCENTILES                       = [50, 90, 99]
+    #: Process number in the summary for all processes together
+    SUMMARY_ALL_PROCESSES                     = -1
+    #: The performance columns summarized
+    SUMMARY_MEASURES                          = [PERFORMANCE_COLUMN_TIME_LABELING_MS,
+                                                 PERFORMANCE_COLUMN_TIME_ENUMERATING_MS,
+                                                 PERFORMANCE_COLUMN_LABEL_ITERATIONS,
+                                                 PERFORMANCE_COLUMN_NUM_LABELED_STOPS,
+                                                 PERFORMANCE_COLUMN_MAX_STOP_PROCESS_COUNT,
+                                                 PERFORMANCE_COLUMN_WORKING_SET_BYTES,
+                                                 PERFORMANCE_COLUMN_PRIVATE_USAGE_BYTES]
+
     #: File with to write performance results
     OUTPUT_PERFORMANCE_FILE                   = 'ft_output_performance.csv'
+    #: File to write the performance summary for each iteration
+    OUTPUT_PERFORMANCE_SUMMARY_FILE           = 'ft_output_performance_summary.csv'
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        """
+        Constructor.  Allocate room for *capacity* trips.
+        """
+        #: Column name -> numpy array; the first :py:attr:`Performance.num_rows` are filled in
+        self.performance_arrays = {}
+        for (column, dtype) in Performance.PERFORMANCE_RECORD_COLUMNS:
+            self.performance_arrays[column] = numpy.zeros(max(capacity, 1), dtype=dtype)
+        #: Number of trips recorded
+        self.num_rows           = 0
 
-    def __init__(self):
+    def reserve(self, num_rows):
         """
-        Constructor.  Initialize empty dataframe for performance info.
+        Makes sure there's room for *num_rows* more trips, so they can be recorded without reallocating.
         """
-        self.performance_dict = {
-            Performance.PERFORMANCE_COLUMN_ITERATION                :[],
-            Performance.PERFORMANCE_COLUMN_PERSON_ID                :[],
-            Performance.PERFORMANCE_COLUMN_TRIP_LIST_ID_NUM         :[],
-            Performance.PERFORMANCE_COLUMN_PROCESS_NUM              :[],
-            Performance.PERFORMANCE_COLUMN_NUM_LABELED_STOPS        :[],
-            Performance.PERFORMANCE_COLUMN_TRACED                   :[],
-            Performance.PERFORMANCE_COLUMN_LABEL_ITERATIONS         :[],
-            Performance.PERFORMANCE_COLUMN_MAX_STOP_PROCESS_COUNT   :[],
-            Performance.PERFORMANCE_COLUMN_TIME_LABELING            :[],
-            Performance.PERFORMANCE_COLUMN_TIME_LABELING_MS         :[],
-            Performance.PERFORMANCE_COLUMN_TIME_ENUMERATING         :[],
-            Performance.PERFORMANCE_COLUMN_TIME_ENUMERATING_MS      :[],
-            Performance.PERFORMANCE_COLUMN_WORKING_SET_BYTES        :[],
-            Performance.PERFORMANCE_COLUMN_PRIVATE_USAGE_BYTES      :[]
-        }
+        needed   = self.num_rows + num_rows
+        capacity = len(self.performance_arrays[Performance.PERFORMANCE_COLUMN_ITERATION])
+        if needed <= capacity: return
 
+        # at least double it so growing a row at a time is cheap
+        capacity = max(needed, 2*capacity)
+        for (column, dtype) in Performance.PERFORMANCE_RECORD_COLUMNS:
+            new_array = numpy.zeros(capacity, dtype=dtype)
+            new_array[:self.num_rows] = self.performance_arrays[column][:self.num_rows]
+            self.performance_arrays[column] = new_array
 
     def add_info(self, iteration, person_id, trip_list_id_num, perf_dict):
         """
-        Add this row to the performance dict of arrays.
+        Record this trip's performance.
         Assumes time values are in milliseconds.
         """
-        self.performance_dict[Performance.PERFORMANCE_COLUMN_ITERATION].append(iteration)
-        self.performance_dict[Performance.PERFORMANCE_COLUMN_PERSON_ID].append(person_id)
-        self.performance_dict[Performance.PERFORMANCE_COLUMN_TRIP_LIST_ID_NUM].append(trip_list_id_num)
+        self.reserve(1)
+        row = self.num_rows
+        self.performance_arrays[Performance.PERFORMANCE_COLUMN_ITERATION       ][row] = iteration
+        self.performance_arrays[Performance.PERFORMANCE_COLUMN_PERSON_ID       ][row] = person_id
+        self.performance_arrays[Performance.PERFORMANCE_COLUMN_TRIP_LIST_ID_NUM][row] = trip_list_id_num
 
         for key in [Performance.PERFORMANCE_COLUMN_PROCESS_NUM,
                     Performance.PERFORMANCE_COLUMN_LABEL_ITERATIONS,
@@ -97,20 +160,113 @@ class Performance:
                     Performance.PERFORMANCE_COLUMN_TIME_ENUMERATING_MS,
                     Performance.PERFORMANCE_COLUMN_WORKING_SET_BYTES,
                     Performance.PERFORMANCE_COLUMN_PRIVATE_USAGE_BYTES]:
-            self.performance_dict[key].append(perf_dict[key])
+            self.performance_arrays[key][row] = perf_dict[key]
+        self.num_rows += 1
+
+    def get_records(self):
+        """
+        Returns the recorded trips as a dictionary of column name -> numpy array, for
+        :py:meth:`Performance.add_records`.
+        """
+        records = {}
+        for (column, dtype) in Performance.PERFORMANCE_RECORD_COLUMNS:
+            records[column] = self.performance_arrays[column][:self.num_rows].copy()
+        return records
+
+    def add_records(self, records):
+        """
+        Records the trips from :py:meth:`Performance.get_records`, e.g. from a worker process.
+        """
+        num_rows = len(records[Performance.PERFORMANCE_COLUMN_ITERATION])
+        self.reserve(num_rows)
+        for (column, dtype) in Performance.PERFORMANCE_RECORD_COLUMNS:
+            self.performance_arrays[column][self.num_rows:self.num_rows+num_rows] = records[column]
+        self.num_rows += num_rows
+
+    def clear(self):
+        """
+        Forgets the recorded trips, keeping the allocated arrays.
+        """
+        # don't hold on to the person ids
+        self.performance_arrays[Performance.PERFORMANCE_COLUMN_PERSON_ID][:self.num_rows] = None
+        self.num_rows = 0
+
+    def summarize(self, iteration):
+        """
+        Returns a dataframe summarizing the :py:attr:`Performance.SUMMARY_MEASURES` of the recorded trips for each
+        process and for all of them, with their count, mean, :py:attr:`Performance.SUMMARY_PERCENTILES`, max and total.
+        """
+        process_nums = self.performance_arrays[Performance.PERFORMANCE_COLUMN_PROCESS_NUM][:self.num_rows]
+        percentile_columns = ["p%d" % percentile for percentile in Performance.SUMMARY_PERCENTILES]
+
+        summary_rows = []
+        for process_num in [Performance.SUMMARY_ALL_PROCESSES] + sorted(numpy.unique(process_nums).tolist()):
+            if process_num == Performance.SUMMARY_ALL_PROCESSES:
+                process_rows = slice(0, self.num_rows)
+            else:
+                process_rows = (process_nums == process_num)
+
+            for measure in Performance.SUMMARY_MEASURES:
+                values = self.performance_arrays[measure][:self.num_rows][process_rows].astype(numpy.float64)
+                if len(values) == 0: continue
+
+                summary_rows.append([iteration, process_num, measure, len(values), values.mean()] +
+                                    numpy.percentile(values, Performance.SUMMARY_PERCENTILES).tolist() +
+                                    [values.max(), values.sum()])
+
+        return pandas.DataFrame(summary_rows,
+                                columns=[Performance.SUMMARY_COLUMN_ITERATION,
+                                         Performance.SUMMARY_COLUMN_PROCESS_NUM,
+                                         Performance.SUMMARY_COLUMN_MEASURE,
+                                         Performance.SUMMARY_COLUMN_COUNT,
+                                         Performance.SUMMARY_COLUMN_MEAN] +
+                                        percentile_columns +
+                                        [Performance.SUMMARY_COLUMN_MAX,
+                                         Performance.SUMMARY_COLUMN_TOTAL])
+
+    def get_sample(self, sample_fraction):
+        """
+        Returns a dataframe of the recorded trips for about *sample_fraction* of the trips, with the timedelta columns.
+        The sample is by trip list ID num so the same trips are in it every iteration.  Traced trips are always in it.
+        """
+        trip_list_id_nums = self.performance_arrays[Performance.PERFORMANCE_COLUMN_TRIP_LIST_ID_NUM][:self.num_rows]
+        if sample_fraction >= 1.0:
+            sample_rows = numpy.ones(self.num_rows, dtype=bool)
+        else:
+            # multiplicative hash of the trip list id num into [0, 2^32)
+            trip_hash   = (trip_list_id_nums.astype(numpy.uint64)*numpy.uint64(2654435761)) % numpy.uint64(2**32)
+            sample_rows = (trip_hash < numpy.uint64(sample_fraction*(2**32)))
+            sample_rows = sample_rows | self.performance_arrays[Performance.PERFORMANCE_COLUMN_TRACED][:self.num_rows]
+
+        performance_df = pandas.DataFrame()
+        for (column, dtype) in Performance.PERFORMANCE_RECORD_COLUMNS:
+            performance_df[column] = self.performance_arrays[column][:self.num_rows][sample_rows]
 
         # convert milliseconds time to timedeltas
-        self.performance_dict[Performance.PERFORMANCE_COLUMN_TIME_LABELING   ].append(datetime.timedelta(milliseconds=perf_dict[Performance.PERFORMANCE_COLUMN_TIME_LABELING_MS   ]))
-        self.performance_dict[Performance.PERFORMANCE_COLUMN_TIME_ENUMERATING].append(datetime.timedelta(milliseconds=perf_dict[Performance.PERFORMANCE_COLUMN_TIME_ENUMERATING_MS]))
+        performance_df[Performance.PERFORMANCE_COLUMN_TIME_LABELING   ] = pandas.to_timedelta(performance_df[Performance.PERFORMANCE_COLUMN_TIME_LABELING_MS   ], unit='ms')
+        performance_df[Performance.PERFORMANCE_COLUMN_TIME_ENUMERATING] = pandas.to_timedelta(performance_df[Performance.PERFORMANCE_COLUMN_TIME_ENUMERATING_MS], unit='ms')
+        return performance_df
 
     def write(self, output_dir, iteration):
         """
-        Writes the results to OUTPUT_PERFORMANCE_FILE to a tab-delimited file.
+        Writes the summary to :py:attr:`Performance.OUTPUT_PERFORMANCE_SUMMARY_FILE` and the sampled trips to
+        :py:attr:`Performance.OUTPUT_PERFORMANCE_FILE` as csv files, via :py:attr:`Assignment.OUTPUT_WRITER`,
+        and then forgets the recorded trips.
         """
-        performance_df = pandas.DataFrame.from_dict(self.performance_dict)
+        from .Assignment import Assignment
+
+        summary_df = self.summarize(iteration)
+        Assignment.OUTPUT_WRITER.write_dataframe(summary_df, "performance_summary_df", os.path.join(output_dir, Performance.OUTPUT_PERFORMANCE_SUMMARY_FILE), append=(iteration>1))
+
+        all_labeling = summary_df.loc[(summary_df[Performance.SUMMARY_COLUMN_PROCESS_NUM] == Performance.SUMMARY_ALL_PROCESSES)&
+                                      (summary_df[Performance.SUMMARY_COLUMN_MEASURE    ] == Performance.PERFORMANCE_COLUMN_TIME_LABELING_MS)]
+        if len(all_labeling) > 0:
+            FastTripsLogger.info("Pathfinding performance for %d trips: labeling milliseconds median %.1f, 99th percentile %.1f, max %.1f" %
+                                 (all_labeling[Performance.SUMMARY_COLUMN_COUNT].iloc[0], all_labeling["p50"].iloc[0],
+                                  all_labeling["p99"].iloc[0], all_labeling[Performance.SUMMARY_COLUMN_MAX].iloc[0]))
 
-        Util.write_dataframe(performance_df, "performance_df", os.path.join(output_dir, Performance.OUTPUT_PERFORMANCE_FILE), append=(iteration>1))
+        if Assignment.PERFORMANCE_SAMPLE_FRACTION > 0:
+            performance_df = self.get_sample(Assignment.PERFORMANCE_SAMPLE_FRACTION)
+            Assignment.OUTPUT_WRITER.write_dataframe(performance_df, "performance_df", os.path.join(output_dir, Performance.OUTPUT_PERFORMANCE_FILE), append=(iteration>1))
 
-        # reset dict to blank
-        for key in self.performance_dict.keys():
-            self.performance_dict[key] = []
\ No newline at end of file
+        self.clear()
@@ -125,22 +125,15 @@ class Route(object):
     #: File with mode, mode number correspondence
     OUTPUT_MODE_NUM_FILE                        = "ft_intermediate_supply_mode_id.txt"
 
-    def __init__(self, input_dir, output_dir, gtfs_schedule, today):
+    def __init__(self, input_dir, output_dir, gtfs_reader, today):
         """
-        Constructor.  Reads the gtfs data from the transitfeed schedule, and the additional
+        Constructor.  Reads the gtfs data using the :py:class:`GTFSReader`, and the additional
         fast-trips routes data from the input file in *input_dir*.
         """
         self.output_dir         = output_dir
 
-        # Combine all gtfs Route objects to a single pandas DataFrame
-        route_dicts = []
-        for gtfs_route in gtfs_schedule.GetRouteList():
-            route_dict = {}
-            for fieldname in gtfs_route._FIELD_NAMES:
-                if fieldname in gtfs_route.__dict__:
-                    route_dict[fieldname] = gtfs_route.__dict__[fieldname]
-            route_dicts.append(route_dict)
-        self.routes_df = pandas.DataFrame(data=route_dicts)
+        # Read the gtfs routes
+        self.routes_df = gtfs_reader.read_table("routes.txt")
 
         # Read the fast-trips supplemental routes data file
         routes_ft_df = pandas.read_csv(os.path.join(input_dir, Route.INPUT_ROUTES_FILE),
@@ -195,37 +188,14 @@ class Route(object):
                              (len(self.routes_df), "routes", "routes.txt", Route.INPUT_ROUTES_FILE))
 
 
-        agency_dicts = []
-        for gtfs_agency in gtfs_schedule.GetAgencyList():
-            agency_dict = {}
-            for fieldname in gtfs_agency._FIELD_NAMES:
-                if fieldname in gtfs_agency.__dict__:
-                    agency_dict[fieldname] = gtfs_agency.__dict__[fieldname]
-            agency_dicts.append(agency_dict)
-        self.agencies_df = pandas.DataFrame(data=agency_dicts)
+        self.agencies_df = gtfs_reader.read_table("agency.txt")
 
         FastTripsLogger.debug("=========== AGENCIES ===========\n" + str(self.agencies_df.head()))
         FastTripsLogger.debug("\n"+str(self.agencies_df.dtypes))
         FastTripsLogger.info("Read %7d %15s from %25s" %
                              (len(self.agencies_df), "agencies", "agency.txt"))
 
-        fare_attr_dicts = []
-        fare_rule_dicts = []
-        for gtfs_fare_attr in gtfs_schedule.GetFareAttributeList():
-            fare_attr_dict = {}
-            for fieldname in gtfs_fare_attr._FIELD_NAMES:
-                if fieldname in gtfs_fare_attr.__dict__:
-                    fare_attr_dict[fieldname] = gtfs_fare_attr.__dict__[fieldname]
-            fare_attr_dicts.append(fare_attr_dict)
-
-            for gtfs_fare_rule in gtfs_fare_attr.GetFareRuleList():
-                fare_rule_dict = {}
-                for fieldname in gtfs_fare_rule._FIELD_NAMES:
-                    if fieldname in gtfs_fare_rule.__dict__:
-                        fare_rule_dict[fieldname] = gtfs_fare_rule.__dict__[fieldname]
-                fare_rule_dicts.append(fare_rule_dict)
-
-        self.fare_attrs_df = pandas.DataFrame(data=fare_attr_dicts)
+        self.fare_attrs_df = gtfs_reader.read_table("fare_attributes.txt")
 
         FastTripsLogger.debug("=========== FARE ATTRIBUTES ===========\n" + str(self.fare_attrs_df.head()))
         FastTripsLogger.debug("\n"+str(self.fare_attrs_df.dtypes))
@@ -254,7 +224,7 @@ class Route(object):
             self.fare_by_class = False
 
         # Fare rules
-        self.fare_rules_df = pandas.DataFrame(data=fare_rule_dicts)
+        self.fare_rules_df = gtfs_reader.read_table("fare_rules.txt")
 
         if os.path.exists(os.path.join(input_dir, Route.INPUT_FARE_RULES_FILE)):
             fare_rules_ft_df = pandas.read_csv(os.path.join(input_dir, Route.INPUT_FARE_RULES_FILE),
@@ -266,19 +236,17 @@ class Route(object):
             assert(Route.FARE_RULES_COLUMN_START_TIME   in fare_rules_ft_cols)
             assert(Route.FARE_RULES_COLUMN_END_TIME     in fare_rules_ft_cols)
 
-            # datetime version
-            fare_rules_ft_df[Route.FARE_RULES_COLUMN_START_TIME] = \
-                fare_rules_ft_df[Route.FARE_RULES_COLUMN_START_TIME].map(lambda x: Util.read_time(x))
-            fare_rules_ft_df[Route.FARE_RULES_COLUMN_END_TIME] = \
-                fare_rules_ft_df[Route.FARE_RULES_COLUMN_END_TIME].map(lambda x: Util.read_time(x, True))
-
-            # float version
-            fare_rules_ft_df[Route.FARE_RULES_COLUMN_START_TIME_MIN] = \
-                fare_rules_ft_df[Route.FARE_RULES_COLUMN_START_TIME].map(lambda x: \
-                    60*x.time().hour + x.time().minute + x.time().second/60.0 )
-            fare_rules_ft_df[Route.FARE_RULES_COLUMN_END_TIME_MIN] = \
-                fare_rules_ft_df[Route.FARE_RULES_COLUMN_END_TIME].map(lambda x: \
-                    60*x.time().hour + x.time().minute + x.time().second/60.0 )
+            # datetime and float versions; open-ended rules end at the end of the day
+            for (time_colname, time_min_colname, end_of_day) in \
+                [(Route.FARE_RULES_COLUMN_START_TIME, Route.FARE_RULES_COLUMN_START_TIME_MIN, False),
+                 (Route.FARE_RULES_COLUMN_END_TIME,   Route.FARE_RULES_COLUMN_END_TIME_MIN,   True )]:
+                try:
+                    (fare_rules_ft_df[time_colname], fare_rules_ft_df[time_min_colname]) = \
+                        Util.read_times(fare_rules_ft_df[time_colname].values, end_of_day=end_of_day, with_minutes=True)
+                except ValueError as e:
+                    error_msg = "Bad %s in %s: %s" % (time_colname, Route.INPUT_FARE_RULES_FILE, str(e))
+                    FastTripsLogger.fatal(error_msg)
+                    raise NetworkInputError(Route.INPUT_FARE_RULES_FILE, error_msg)
 
             # join to fare rules dataframe
             self.fare_rules_df = pandas.merge(left=self.fare_rules_df, right=fare_rules_ft_df,
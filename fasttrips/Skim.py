@@ -0,0 +1,340 @@
+__copyright__ = "Copyright 2016 Contributing Entities"
+__license__   = """
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import Queue
+import datetime,multiprocessing,os,traceback
+import numpy,pandas
+import _fasttrips
+
+from .Assignment import Assignment
+from .Error      import UnexpectedError
+from .Logger     import FastTripsLogger, setupLogging
+from .Stop       import Stop
+from .TAZ        import TAZ
+from .Util       import Util
+
+class Skim(object):
+    """
+    Skim class.
+
+    Creates transit skims: origin-destination matrices of the lowest cost path attributes for departures at the
+    start of each time slice between :py:attr:`Assignment.SKIM_START_TIME` and :py:attr:`Assignment.SKIM_END_TIME`.
+
+    Rather than finding a path for each origin-destination pair, the C++ extension labels the stops once per
+    origin and time slice and reads the paths to every destination from those labels.  The skims are
+    preallocated as memory-mapped numpy arrays in the output directory, indexed by [time slice, origin, destination],
+    and the origins are split between worker processes which write their rows directly.
+    """
+    #: Skim: Generalized cost of the lowest cost path
+    SKIM_COST                   = "cost"
+    #: Skim: In-vehicle time, in minutes
+    SKIM_IN_VEHICLE_TIME        = "ivt"
+    #: Skim: Wait time at the boarding stops, in minutes
+    SKIM_WAIT_TIME              = "wait"
+    #: Skim: Access, egress and transfer time, in minutes
+    SKIM_WALK_TIME              = "walk"
+    #: Skim: Number of transfers
+    SKIM_NUM_TRANSFERS          = "transfers"
+    #: Skim: Time between the start of the time slice and leaving the origin, in minutes
+    SKIM_DEPART_DELAY           = "depart_delay"
+
+    #: The skims, in the order the C++ extension returns them
+    SKIMS                       = [SKIM_COST,
+                                   SKIM_IN_VEHICLE_TIME,
+                                   SKIM_WAIT_TIME,
+                                   SKIM_WALK_TIME,
+                                   SKIM_NUM_TRANSFERS,
+                                   SKIM_DEPART_DELAY]
+
+    #: Skim output file, with the skim name.  A numpy array indexed by [time slice, origin, destination].
+    OUTPUT_SKIM_FILE            = "skim_%s.npy"
+    #: Skim data type.  Pairs without a path are NaN.
+    SKIM_DTYPE                  = numpy.float32
+
+    #: Skim zones output file: the TAZ for each origin and destination index
+    OUTPUT_ZONES_FILE           = "skim_zones.csv"
+    #: Skim zones column: Index into the skim origins and destinations
+    ZONES_COLUMN_INDEX          = "skim_index"
+    #: Skim zones column: TAZ ID
+    ZONES_COLUMN_TAZ            = TAZ.WALK_ACCESS_COLUMN_TAZ
+    #: Skim zones column: TAZ ID number
+    ZONES_COLUMN_TAZ_NUM        = TAZ.WALK_ACCESS_COLUMN_TAZ_NUM
+
+    #: Skim time slices output file: the departure time for each time slice index
+    OUTPUT_TIME_SLICES_FILE     = "skim_time_slices.csv"
+    #: Skim time slices column: Index into the skim time slices
+    TIME_SLICES_COLUMN_INDEX    = "time_slice"
+    #: Skim time slices column: Departure time, HH:MM:SS
+    TIME_SLICES_COLUMN_TIME     = "departure_time"
+    #: Skim time slices column: Departure time, in minutes after midnight
+    TIME_SLICES_COLUMN_TIME_MIN = "departure_time_min"
+
+    @staticmethod
+    def get_zones(stops):
+        """
+        Returns a :py:class:`pandas.DataFrame` of the TAZs to skim with columns :py:attr:`Skim.ZONES_COLUMN_INDEX`,
+        :py:attr:`Skim.ZONES_COLUMN_TAZ` and :py:attr:`Skim.ZONES_COLUMN_TAZ_NUM`.
+
+        The TAZs are numbered after the stops and drive access points in :py:attr:`Stop.stop_id_df`.
+        """
+        zones_df = stops.stop_id_df.loc[stops.stop_id_df[Stop.STOPS_COLUMN_STOP_ID_NUM] > stops.max_dap_id_num,
+                                        [Stop.STOPS_COLUMN_STOP_ID, Stop.STOPS_COLUMN_STOP_ID_NUM]]
+        zones_df = zones_df.sort_values(by=Stop.STOPS_COLUMN_STOP_ID_NUM).reset_index(drop=True)
+        zones_df.rename(columns={Stop.STOPS_COLUMN_STOP_ID    :Skim.ZONES_COLUMN_TAZ,
+                                 Stop.STOPS_COLUMN_STOP_ID_NUM:Skim.ZONES_COLUMN_TAZ_NUM}, inplace=True)
+        zones_df[Skim.ZONES_COLUMN_TAZ_NUM] = zones_df[Skim.ZONES_COLUMN_TAZ_NUM].astype(numpy.int32)
+        zones_df[Skim.ZONES_COLUMN_INDEX  ] = zones_df.index
+        return zones_df[[Skim.ZONES_COLUMN_INDEX, Skim.ZONES_COLUMN_TAZ, Skim.ZONES_COLUMN_TAZ_NUM]]
+
+    @staticmethod
+    def get_time_slices():
+        """
+        Returns a :py:class:`pandas.DataFrame` of the departure time slices from :py:attr:`Assignment.SKIM_START_TIME`
+        up to :py:attr:`Assignment.SKIM_END_TIME` every :py:attr:`Assignment.SKIM_TIME_SLICE`, with columns
+        :py:attr:`Skim.TIME_SLICES_COLUMN_INDEX`, :py:attr:`Skim.TIME_SLICES_COLUMN_TIME` and
+        :py:attr:`Skim.TIME_SLICES_COLUMN_TIME_MIN`.
+        """
+        start_min = Assignment.SKIM_START_TIME.hour*60.0 + Assignment.SKIM_START_TIME.minute
+        end_min   = Assignment.SKIM_END_TIME.hour*60.0   + Assignment.SKIM_END_TIME.minute
+        slice_min = Assignment.SKIM_TIME_SLICE.total_seconds()/60.0
+
+        time_min  = numpy.arange(start_min, end_min, slice_min)
+        slices_df = pandas.DataFrame({Skim.TIME_SLICES_COLUMN_INDEX   :numpy.arange(len(time_min)),
+                                      Skim.TIME_SLICES_COLUMN_TIME_MIN:time_min})
+        slices_df[Skim.TIME_SLICES_COLUMN_TIME] = Util.format_times(
+            numpy.datetime64(Util.SIMULATION_DAY_START) + (time_min*60).astype("timedelta64[s]"))
+        return slices_df[[Skim.TIME_SLICES_COLUMN_INDEX, Skim.TIME_SLICES_COLUMN_TIME, Skim.TIME_SLICES_COLUMN_TIME_MIN]]
+
+    @staticmethod
+    def create_skims(output_dir, FT):
+        """
+        Creates the skims for the network of the given :py:class:`fasttrips.FastTrips` instance, using the
+        vehicle times in :py:attr:`Trip.stop_times_df`, and writes them to *output_dir*.
+
+        The skim files are created first, filled with NaN, and then each origin's rows are filled by
+        :py:func:`create_skims_process_worker` in :py:attr:`Assignment.NUMBER_OF_PROCESSES` worker
+        processes (or by this process, if that's 1).
+        """
+        FastTripsLogger.info("**************************** CREATING SKIMS ****************************")
+        start_time  = datetime.datetime.now()
+
+        zones_df    = Skim.get_zones(FT.stops)
+        slices_df   = Skim.get_time_slices()
+        num_zones   = len(zones_df)
+        num_slices  = len(slices_df)
+        if num_zones == 0 or num_slices == 0:
+            FastTripsLogger.warn("Nothing to skim: %d zones and %d time slices" % (num_zones, num_slices))
+            return
+
+        zones_df.to_csv(os.path.join(output_dir, Skim.OUTPUT_ZONES_FILE), index=False)
+        slices_df.to_csv(os.path.join(output_dir, Skim.OUTPUT_TIME_SLICES_FILE), index=False)
+
+        # preallocate the skims so the workers can fill in their origins
+        for skim in Skim.SKIMS:
+            skim_array    = numpy.lib.format.open_memmap(os.path.join(output_dir, Skim.OUTPUT_SKIM_FILE % skim), mode="w+",
+                                                         dtype=Skim.SKIM_DTYPE, shape=(num_slices, num_zones, num_zones))
+            skim_array[:] = numpy.nan
+            skim_array.flush()
+            del skim_array
+        FastTripsLogger.info("Skimming %d zones for %d time slices, starting %s every %.1f min" %
+                             (num_zones, num_slices, slices_df[Skim.TIME_SLICES_COLUMN_TIME].iloc[0],
+                              Assignment.SKIM_TIME_SLICE.total_seconds()/60.0))
+
+        taz_nums        = zones_df[Skim.ZONES_COLUMN_TAZ_NUM].values
+        slice_times_min = slices_df[Skim.TIME_SLICES_COLUMN_TIME_MIN].values
+
+        num_processes   = Assignment.NUMBER_OF_PROCESSES
+        if Assignment.NUMBER_OF_PROCESSES < 1:
+            num_processes = multiprocessing.cpu_count()
+        num_processes   = min(num_processes, num_zones)
+
+        info_freq       = max(1, num_zones/10)
+        num_done        = 0
+        label_ms        = 0
+        skim_ms         = 0
+
+        if num_processes <= 1:
+            Assignment.initialize_fasttrips_extension(0, output_dir, FT.trips.stop_times_df)
+            skim_arrays = Skim.open_skims(output_dir)
+            for origin_index in range(num_zones):
+                (origin_label_ms, origin_skim_ms) = Skim.skim_origin(skim_arrays, taz_nums, slice_times_min, origin_index)
+                label_ms += origin_label_ms
+                skim_ms  += origin_skim_ms
+                num_done += 1
+                if num_done % info_freq == 0:
+                    FastTripsLogger.info(" %6d / %6d origins skimmed.  Time elapsed: %s" % (num_done, num_zones, str(datetime.datetime.now() - start_time)))
+            Skim.close_skims(skim_arrays)
+
+        else:
+            # the workers read the configuration from here
+            Assignment.write_configuration(output_dir)
+
+            todo_queue   = multiprocessing.Queue()
+            done_queue   = multiprocessing.Queue()
+            process_dict = {}
+            # a worker forked while the output writer thread holds a lock would hang on it, so
+            # wait for the dataframe being written, but not the rest of the queue
+            Assignment.OUTPUT_WRITER.pause()
+            try:
+                for process_idx in range(1, 1+num_processes):
+                    FastTripsLogger.info("Starting skim worker process %2d" % process_idx)
+                    process_dict[process_idx] = {
+                        "process":multiprocessing.Process(target=create_skims_process_worker,
+                            args=(process_idx, Assignment.INPUT_DEMAND_DIR, output_dir, todo_queue, done_queue,
+                                  FT.trips.stop_times_df, taz_nums, slice_times_min)),
+                        "alive":True,
+                        "done":False
+                    }
+                    process_dict[process_idx]["process"].start()
+            finally:
+                Assignment.OUTPUT_WRITER.resume()
+
+            for origin_index in range(num_zones):
+                todo_queue.put(origin_index)
+            for process_idx in process_dict.keys():
+                todo_queue.put('DONE')
+
+            error_str = None
+            done_procs = 0  # where done means reported done, or not alive with nothing left on the queue
+            while done_procs < len(process_dict):
+                try:
+                    result     = done_queue.get(True, 30)
+                    worker_num = result[0]
+                    if result[1] == "DONE":
+                        FastTripsLogger.debug("Received done from skim process %d" % worker_num)
+                        process_dict[worker_num]["done"] = True
+                    elif result[1] == "COMPLETED":
+                        label_ms += result[3]
+                        skim_ms  += result[4]
+                        num_done += 1
+                        if num_done % info_freq == 0:
+                            FastTripsLogger.info(" %6d / %6d origins skimmed.  Time elapsed: %s" % (num_done, num_zones, str(datetime.datetime.now() - start_time)))
+                    elif result[1] == "EXCEPTION":
+                        error_str = "Skim process %d failed: %s" % (worker_num, result[2])
+                        FastTripsLogger.error(error_str)
+                except Queue.Empty:
+                    # This is normal
+                    pass
+
+                # check if any processes are not alive
+                for process_idx in process_dict.keys():
+                    if process_dict[process_idx]["alive"] and not process_dict[process_idx]["process"].is_alive():
+                        FastTripsLogger.debug("Skim process %d is not alive" % process_idx)
+                        process_dict[process_idx]["alive"] = False
+
+                # workers exit right after reporting done, so a worker that's not alive may still have results
+                # to read.  Check the queue after checking the workers: what a dead worker put on it is there by then.
+                queue_empty = done_queue.empty()
+                done_procs  = len([process_idx for process_idx in process_dict.keys()
+                                   if process_dict[process_idx]["done"] or (not process_dict[process_idx]["alive"] and queue_empty)])
+
+            for process_idx in process_dict.keys():
+                process_dict[process_idx]["process"].join()
+                if not process_dict[process_idx]["done"] and error_str is None:
+                    error_str = "Skim process %d appears to have crashed; see ft_debug_skimworker%02d.log" % (process_idx, process_idx)
+
+            if error_str:
+                raise UnexpectedError(error_str)
+
+        if num_done != num_zones:
+            raise UnexpectedError("Skimmed %d origins but expected %d" % (num_done, num_zones))
+
+        time_elapsed = datetime.datetime.now() - start_time
+        FastTripsLogger.info("Finished skimming %d origins x %d time slices in %s; %.1f sec labeling, %.1f sec reading paths" %
+                             (num_zones, num_slices, str(time_elapsed), label_ms/1000.0, skim_ms/1000.0))
+
+    @staticmethod
+    def open_skims(output_dir):
+        """
+        Opens the preallocated skims in *output_dir* for writing.  Returns a list of memory-mapped arrays
+        in :py:attr:`Skim.SKIMS` order.
+        """
+        return [numpy.lib.format.open_memmap(os.path.join(output_dir, Skim.OUTPUT_SKIM_FILE % skim), mode="r+")
+                for skim in Skim.SKIMS]
+
+    @staticmethod
+    def close_skims(skim_arrays):
+        """
+        Flushes the skims opened by :py:meth:`Skim.open_skims` to disk.
+        """
+        for skim_array in skim_arrays:
+            skim_array.flush()
+        del skim_arrays[:]
+
+    @staticmethod
+    def skim_origin(skim_arrays, taz_nums, slice_times_min, origin_index):
+        """
+        Finds the skims from the origin at *origin_index* into *taz_nums* to all of *taz_nums*, departing
+        at each of *slice_times_min*, and sets them in the *skim_arrays* opened by :py:meth:`Skim.open_skims`.
+        The C++ extension must be initialized.
+
+        Returns (milliseconds spent labeling, milliseconds spent reading paths from the labels).
+        """
+        label_ms = 0
+        skim_ms  = 0
+        for slice_index in range(len(slice_times_min)):
+            (skim_values, process_num, label_iterations, num_labeled_stops, max_process_count,
+             ms_labeling, ms_skimming) = \
+                _fasttrips.find_skims(Assignment.SKIM_USER_CLASS, Assignment.SKIM_PURPOSE, Assignment.SKIM_ACCESS_MODE,
+                                      Assignment.SKIM_TRANSIT_MODE, Assignment.SKIM_EGRESS_MODE,
+                                      int(taz_nums[origin_index]), float(slice_times_min[slice_index]), taz_nums)
+            for skim_num in range(len(Skim.SKIMS)):
+                skim_arrays[skim_num][slice_index, origin_index, :] = skim_values[:, skim_num]
+            label_ms += ms_labeling
+            skim_ms  += ms_skimming
+        return (label_ms, skim_ms)
+
+
+def create_skims_process_worker(worker_num, input_demand_dir, output_dir, todo_queue, done_queue,
+                                stop_times_df, taz_nums, slice_times_min):
+    """
+    Process worker function.  Skims the origin indices in the todo_queue until it gets 'DONE'.
+    """
+    worker_str = "_skimworker%02d" % worker_num
+
+    from .FastTrips import FastTrips
+    setupLogging(infoLogFilename  = None,
+                 debugLogFilename = os.path.join(output_dir, FastTrips.DEBUG_LOG % worker_str),
+                 logToConsole     = False,
+                 append           = False)
+    FastTripsLogger.info("Skim worker %2d starting" % worker_num)
+
+    # the child process doesn't have these set to read them
+    Assignment.read_configuration(override_input_network_dir=output_dir,
+                                  override_input_demand_dir=input_demand_dir,
+                                  config_file=Assignment.CONFIGURATION_OUTPUT_FILE)
+
+    try:
+        Assignment.initialize_fasttrips_extension(worker_num, output_dir, stop_times_df)
+        # the extension has it now, so we're done
+        stop_times_df = None
+
+        skim_arrays = Skim.open_skims(output_dir)
+        while True:
+            todo = todo_queue.get()
+            if todo == 'DONE':
+                Skim.close_skims(skim_arrays)
+                done_queue.put( (worker_num, 'DONE') )
+                FastTripsLogger.debug("Received DONE from the todo_queue")
+                return
+
+            origin_index = todo
+            FastTripsLogger.debug("Skimming origin %d" % taz_nums[origin_index])
+            (label_ms, skim_ms) = Skim.skim_origin(skim_arrays, taz_nums, slice_times_min, origin_index)
+            done_queue.put( (worker_num, "COMPLETED", origin_index, label_ms, skim_ms) )
+    except:
+        FastTripsLogger.exception("Exception")
+        # call it a day
+        done_queue.put( (worker_num, "EXCEPTION", traceback.format_exc()) )
+        return
@@ -0,0 +1,212 @@
+__copyright__ = "Copyright 2016 Contributing Entities"
+__license__   = """
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import contextlib,os,sys,time
+import numpy,pandas
+
+from .Logger import FastTripsLogger
+from .Util   import Util
+
+class StageTimer:
+    """
+    StageTimer class.  Measures the stages of a fast-trips run (reading the inputs, each step of
+    each assignment iteration, creating the skims): wall clock time, CPU time, resident memory
+    and the increase in peak resident memory, and optionally the number of rows processed.
+
+    Stages nest, so a stage run within another is recorded with the path of stage names to it,
+    e.g. ``simulate/calculate cost``.  Usage::
+
+        with StageTimer.stage("calculate cost", num_rows=len(pathset_links_df)):
+            ...
+
+    The stages are kept for the whole run and written to :py:attr:`StageTimer.OUTPUT_STAGE_TIMINGS_FILE`
+    by :py:meth:`StageTimer.write`.  The stages named in :py:attr:`Assignment.PROFILE_STAGES` are also
+    run under :py:mod:`cProfile`, with the statistics written to :py:attr:`StageTimer.OUTPUT_PROFILE_FILE`.
+
+    This is all class state, like :py:class:`Assignment`, so it's available everywhere without passing
+    it around.  Worker processes have their own, which isn't written.
+    """
+    #: Stage timings output file
+    OUTPUT_STAGE_TIMINGS_FILE               = "ft_output_stage_timings.csv"
+
+    #: Profile output file, by stage name (with spaces and slashes replaced by underscores) and sequence
+    #: number.  Read with :py:class:`pstats.Stats`.
+    OUTPUT_PROFILE_FILE                     = "ft_output_profile_%s_%04d.prof"
+
+    #: Stage timings column: Order in which the stage started
+    STAGE_COLUMN_SEQUENCE                   = "sequence"
+    #: Stage timings column: Assignment iteration, or 0 outside of the iterations
+    STAGE_COLUMN_ITERATION                  = "iteration"
+    #: Stage timings column: Stage name
+    STAGE_COLUMN_NAME                       = "name"
+    #: Stage timings column: Path of stage names from the outermost stage, joined by slashes
+    STAGE_COLUMN_STAGE                      = "stage"
+    #: Stage timings column: Nesting depth; 0 for outermost stages
+    STAGE_COLUMN_DEPTH                      = "depth"
+    #: Stage timings column: Wall clock time, in seconds
+    STAGE_COLUMN_WALL_SECONDS               = "wall seconds"
+    #: Stage timings column: CPU (user plus system) time of this process, in seconds
+    STAGE_COLUMN_CPU_SECONDS                = "cpu seconds"
+    #: Stage timings column: Resident memory at the start of the stage, in bytes.  Requires psutil.
+    STAGE_COLUMN_RSS_START_BYTES            = "rss start bytes"
+    #: Stage timings column: Resident memory at the end of the stage, in bytes.  Requires psutil.
+    STAGE_COLUMN_RSS_END_BYTES              = "rss end bytes"
+    #: Stage timings column: How much the peak resident memory of the process increased during the stage, in bytes.
+    #: Requires :py:mod:`resource`, so not on Windows.
+    STAGE_COLUMN_PEAK_RSS_INCREASE_BYTES    = "peak rss increase bytes"
+    #: Stage timings column: Number of rows processed, if the stage says
+    STAGE_COLUMN_NUM_ROWS                   = "num rows"
+
+    #: Stage timings columns, in order
+    STAGE_COLUMNS = [STAGE_COLUMN_SEQUENCE,
+                     STAGE_COLUMN_ITERATION,
+                     STAGE_COLUMN_NAME,
+                     STAGE_COLUMN_STAGE,
+                     STAGE_COLUMN_DEPTH,
+                     STAGE_COLUMN_WALL_SECONDS,
+                     STAGE_COLUMN_CPU_SECONDS,
+                     STAGE_COLUMN_RSS_START_BYTES,
+                     STAGE_COLUMN_RSS_END_BYTES,
+                     STAGE_COLUMN_PEAK_RSS_INCREASE_BYTES,
+                     STAGE_COLUMN_NUM_ROWS]
+
+    #: The assignment iteration, for :py:attr:`StageTimer.STAGE_COLUMN_ITERATION`.  Set by :py:meth:`Assignment.assign_paths`.
+    iteration   = 0
+
+    #: The recorded stages, a list of dicts with keys :py:attr:`StageTimer.STAGE_COLUMNS`.  Each is added when the stage starts.
+    records     = []
+
+    #: The stages currently running, innermost last
+    open_stages = []
+
+    #: The :py:class:`cProfile.Profile` currently running, if any.  Only one runs at a time.
+    profiler    = None
+
+    @staticmethod
+    def reset():
+        """
+        Forgets the recorded stages.
+        """
+        StageTimer.iteration   = 0
+        StageTimer.records     = []
+        StageTimer.open_stages = []
+        StageTimer.profiler    = None
+
+    @staticmethod
+    def get_rss_bytes():
+        """
+        Returns the resident memory of this process in bytes, or NaN if psutil isn't installed.
+        """
+        try:
+            import psutil
+        except ImportError:
+            return numpy.nan
+
+        return psutil.Process().memory_info().rss
+
+    @staticmethod
+    def get_peak_rss_bytes():
+        """
+        Returns the peak resident memory of this process in bytes, or NaN if that's not available on this platform.
+        """
+        try:
+            import resource
+        except ImportError:
+            return numpy.nan
+
+        # ru_maxrss is in kilobytes, except on OS X where it's bytes
+        peak_bytes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform != "darwin":
+            peak_bytes *= 1024
+        return peak_bytes
+
+    @staticmethod
+    def get_cpu_seconds():
+        """
+        Returns the CPU (user plus system) time used by this process so far, in seconds.
+        """
+        times = os.times()
+        return times[0] + times[1]
+
+    @staticmethod
+    def set_num_rows(num_rows):
+        """
+        Sets the number of rows processed by the innermost running stage, for when that's
+        not known until the stage is done.
+        """
+        if len(StageTimer.open_stages) == 0: return
+        StageTimer.open_stages[-1][StageTimer.STAGE_COLUMN_NUM_ROWS] = num_rows
+
+    @staticmethod
+    @contextlib.contextmanager
+    def stage(name, num_rows=None):
+        """
+        Context manager that records the enclosed block as a stage called *name*, nested within
+        any stage already running.  *num_rows* is the number of rows processed, if relevant;
+        it can also be set during the stage with :py:meth:`StageTimer.set_num_rows`.
+
+        If *name* or the stage path is in :py:attr:`Assignment.PROFILE_STAGES` and no other stage is being
+        profiled, the stage is profiled.
+        """
+        from .Assignment import Assignment
+
+        stage_path = "/".join([open_stage[StageTimer.STAGE_COLUMN_NAME] for open_stage in StageTimer.open_stages] + [name])
+        record = {StageTimer.STAGE_COLUMN_SEQUENCE      : len(StageTimer.records),
+                  StageTimer.STAGE_COLUMN_ITERATION     : StageTimer.iteration,
+                  StageTimer.STAGE_COLUMN_NAME          : name,
+                  StageTimer.STAGE_COLUMN_STAGE         : stage_path,
+                  StageTimer.STAGE_COLUMN_DEPTH         : len(StageTimer.open_stages),
+                  StageTimer.STAGE_COLUMN_NUM_ROWS      : num_rows,
+                  StageTimer.STAGE_COLUMN_RSS_START_BYTES: StageTimer.get_rss_bytes()}
+        StageTimer.records.append(record)
+        StageTimer.open_stages.append(record)
+
+        profiler = None
+        if StageTimer.profiler == None and (name in Assignment.PROFILE_STAGES or stage_path in Assignment.PROFILE_STAGES):
+            import cProfile
+            profiler = cProfile.Profile()
+            StageTimer.profiler = profiler
+
+        start_peak_rss = StageTimer.get_peak_rss_bytes()
+        start_cpu      = StageTimer.get_cpu_seconds()
+        start_wall     = time.time()
+        if profiler: profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler: profiler.disable()
+            record[StageTimer.STAGE_COLUMN_WALL_SECONDS         ] = time.time() - start_wall
+            record[StageTimer.STAGE_COLUMN_CPU_SECONDS          ] = StageTimer.get_cpu_seconds() - start_cpu
+            record[StageTimer.STAGE_COLUMN_PEAK_RSS_INCREASE_BYTES] = StageTimer.get_peak_rss_bytes() - start_peak_rss
+            record[StageTimer.STAGE_COLUMN_RSS_END_BYTES        ] = StageTimer.get_rss_bytes()
+            StageTimer.open_stages.pop()
+
+            if profiler:
+                StageTimer.profiler = None
+                profile_file = os.path.join(Assignment.OUTPUT_DIR, StageTimer.OUTPUT_PROFILE_FILE %
+                                            (stage_path.replace(" ","_").replace("/","_"), record[StageTimer.STAGE_COLUMN_SEQUENCE]))
+                profiler.dump_stats(profile_file)
+                FastTripsLogger.info("Wrote profile of stage %s to %s" % (stage_path, profile_file))
+
+    @staticmethod
+    def write(output_dir):
+        """
+        Writes all the stages recorded so far to :py:attr:`StageTimer.OUTPUT_STAGE_TIMINGS_FILE` in *output_dir*,
+        replacing what was written before, so it's up to date if the run stops.  Stages still running have
+        blank times.
+        """
+        if len(StageTimer.records) == 0: return
+
+        stages_df = pandas.DataFrame(StageTimer.records, columns=StageTimer.STAGE_COLUMNS)
+        Util.write_dataframe(stages_df, "stages_df", os.path.join(output_dir, StageTimer.OUTPUT_STAGE_TIMINGS_FILE))
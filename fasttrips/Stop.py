@@ -67,23 +67,16 @@ class Stop:
     #: File with stop ID, stop ID number correspondence
     OUTPUT_STOP_ID_NUM_FILE                   = 'ft_intermediate_stop_id.txt'
 
-    def __init__(self, input_dir, output_dir, gtfs_schedule):
+    def __init__(self, input_dir, output_dir, gtfs_reader):
         """
-        Constructor.  Reads the gtfs data from the transitfeed schedule, and the additional
+        Constructor.  Reads the gtfs data using the :py:class:`GTFSReader`, and the additional
         fast-trips stops data from the input files in *input_dir*.
         """
         # keep this for later
         self.output_dir       = output_dir
 
-        # Combine all gtfs Stop objects to a single pandas DataFrame
-        stop_dicts = []
-        for gtfs_stop in gtfs_schedule.GetStopList():
-            stop_dict = {}
-            for fieldname in gtfs_stop._FIELD_NAMES:
-                if fieldname in gtfs_stop.__dict__:
-                    stop_dict[fieldname] = gtfs_stop.__dict__[fieldname]
-            stop_dicts.append(stop_dict)
-        self.stops_df = pandas.DataFrame(data=stop_dicts)
+        # Read the gtfs stops
+        self.stops_df = gtfs_reader.read_table("stops.txt")
 
         # Read the fast-trips supplemental stops data file. Make sure stop ID is read as a string.
         stops_ft_df = pandas.read_csv(os.path.join(input_dir, Stop.INPUT_STOPS_FILE),
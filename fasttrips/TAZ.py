@@ -16,7 +16,7 @@ import collections,datetime,os,sys
 import pandas
 
 from .Error    import NetworkInputError
-from .Logger   import FastTripsLogger
+from .Logger   import FastTripsLogger, debugDataFrames
 from .Route    import Route
 from .Stop     import Stop
 from .Transfer import Transfer
@@ -304,19 +304,16 @@ class TAZ:
             self.drive_access_df[TAZ.DRIVE_ACCESS_COLUMN_DRIVE_TRAVEL_TIME_MIN] = \
                 self.drive_access_df[TAZ.DRIVE_ACCESS_COLUMN_DRIVE_TRAVEL_TIME]
 
-            # lot open/close time: datetime version
-            self.drive_access_df[TAZ.DRIVE_ACCESS_COLUMN_START_TIME] = \
-                self.drive_access_df[TAZ.DRIVE_ACCESS_COLUMN_START_TIME].map(lambda x: Util.read_time(x))
-            self.drive_access_df[TAZ.DRIVE_ACCESS_COLUMN_END_TIME] = \
-                self.drive_access_df[TAZ.DRIVE_ACCESS_COLUMN_END_TIME].map(lambda x: Util.read_time(x))
-
-            # lot open/close time: float version
-            self.drive_access_df[TAZ.DRIVE_ACCESS_COLUMN_START_TIME_MIN] = \
-                self.drive_access_df[TAZ.DRIVE_ACCESS_COLUMN_START_TIME].map(lambda x: \
-                    60*x.time().hour + x.time().minute + x.time().second/60.0 )
-            self.drive_access_df[TAZ.DRIVE_ACCESS_COLUMN_END_TIME_MIN] = \
-                self.drive_access_df[TAZ.DRIVE_ACCESS_COLUMN_END_TIME].map(lambda x: \
-                    60*x.time().hour + x.time().minute + x.time().second/60.0 )
+            # lot open/close time: datetime and float versions
+            for (time_colname, time_min_colname) in [(TAZ.DRIVE_ACCESS_COLUMN_START_TIME, TAZ.DRIVE_ACCESS_COLUMN_START_TIME_MIN),
+                                                     (TAZ.DRIVE_ACCESS_COLUMN_END_TIME,   TAZ.DRIVE_ACCESS_COLUMN_END_TIME_MIN  )]:
+                try:
+                    (self.drive_access_df[time_colname], self.drive_access_df[time_min_colname]) = \
+                        Util.read_times(self.drive_access_df[time_colname].values, with_minutes=True)
+                except ValueError as e:
+                    error_msg = "Bad %s in %s: %s" % (time_colname, TAZ.INPUT_DRIVE_ACCESS_FILE, str(e))
+                    FastTripsLogger.fatal(error_msg)
+                    raise NetworkInputError(TAZ.INPUT_DRIVE_ACCESS_FILE, error_msg)
 
             # convert time column from number to timedelta
             self.drive_access_df[TAZ.DRIVE_ACCESS_COLUMN_DRIVE_TRAVEL_TIME] = \
@@ -487,7 +484,8 @@ class TAZ:
                        "walk_dist"], axis=1, inplace=True)
 
         ############## drive ##############
-        FastTripsLogger.debug("drive_access_df=\n%s" % self.drive_access_df.head())
+        if debugDataFrames("add_distance"):
+            FastTripsLogger.debug("drive_access_df=\n%s" % self.drive_access_df.head())
         if len(self.drive_access_df) > 0:
             drive_dists = self.drive_access_df[[TAZ.DRIVE_ACCESS_COLUMN_TAZ_NUM,
                                                 TAZ.DRIVE_ACCESS_COLUMN_STOP_NUM,
@@ -521,7 +519,8 @@ class TAZ:
                            TAZ.DRIVE_ACCESS_COLUMN_SUPPLY_MODE_NUM,
                            "drive_total_dist"], axis=1, inplace=True)
 
-            FastTripsLogger.debug("links_df=\n%s" % links_df.head(30).to_string())
+            if debugDataFrames("add_distance result"):
+                FastTripsLogger.debug("links_df=\n%s" % links_df.head(30).to_string())
         return links_df
 
     def warn_on_stops_without_walk_access(self, stops):
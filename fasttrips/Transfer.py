@@ -88,30 +88,26 @@ class Transfer:
     #: initialize_fasttrips_extension() because of the strings involved
     OUTPUT_TRANSFERS_FILE       = "ft_intermediate_transfers.txt"
 
-    def __init__(self, input_dir, output_dir, gtfs_schedule):
+    def __init__(self, input_dir, output_dir, gtfs_reader):
         """
-        Constructor.  Reads the gtfs data from the transitfeed schedule, and the additional
+        Constructor.  Reads the gtfs data using the :py:class:`GTFSReader`, and the additional
         fast-trips transfers data from the input files in *input_dir*.
         """
         self.output_dir       = output_dir
 
-        # Combine all gtfs Transfer objects to a single pandas DataFrame
-        transfer_dicts = []
-        for gtfs_transfer in gtfs_schedule.GetTransferList():
-            transfer_dict = {}
-            for fieldname in gtfs_transfer._FIELD_NAMES:
-                if fieldname in gtfs_transfer.__dict__:
-                    transfer_dict[fieldname] = gtfs_transfer.__dict__[fieldname]
-            transfer_dicts.append(transfer_dict)
-        if len(transfer_dicts) > 0:
-            self.transfers_df = pandas.DataFrame(data=transfer_dicts)
-
-            # these are strings - empty string should mean 0 min transfer time
-            self.transfers_df.replace(to_replace={Transfer.TRANSFERS_COLUMN_MIN_TRANSFER_TIME:{"":"0"}},
-                                      inplace=True)
-            # make it numerical
-            self.transfers_df[Transfer.TRANSFERS_COLUMN_MIN_TRANSFER_TIME] = \
-                self.transfers_df[Transfer.TRANSFERS_COLUMN_MIN_TRANSFER_TIME].astype(float)
+        # Read the gtfs transfers
+        gtfs_transfers_df = gtfs_reader.read_table("transfers.txt")
+        if len(gtfs_transfers_df) > 0:
+            self.transfers_df = gtfs_transfers_df
+
+            # empty transfer type means 0 (recommended transfer point), empty min transfer time means 0 min
+            if Transfer.TRANSFERS_COLUMN_TRANSFER_TYPE not in list(self.transfers_df.columns.values):
+                self.transfers_df[Transfer.TRANSFERS_COLUMN_TRANSFER_TYPE] = 0
+            if Transfer.TRANSFERS_COLUMN_MIN_TRANSFER_TIME not in list(self.transfers_df.columns.values):
+                self.transfers_df[Transfer.TRANSFERS_COLUMN_MIN_TRANSFER_TIME] = 0.0
+            self.transfers_df.fillna(value={Transfer.TRANSFERS_COLUMN_TRANSFER_TYPE    :0,
+                                            Transfer.TRANSFERS_COLUMN_MIN_TRANSFER_TIME:0.0},
+                                     inplace=True)
 
             # make it zero if transfer_type != 2, since that's the only time it applies
             self.transfers_df.loc[self.transfers_df[Transfer.TRANSFERS_COLUMN_TRANSFER_TYPE] != 2, \
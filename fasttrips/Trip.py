@@ -12,10 +12,11 @@ __license__   = """
     See the License for the specific language governing permissions and
     limitations under the License.
 """
-import collections,datetime,os,sys
+import collections,datetime,os,re,sys
 import numpy,pandas
 
-from .Logger import FastTripsLogger
+from .Error  import NetworkInputError
+from .Logger import FastTripsLogger, debugDataFrames
 from .Route  import Route
 from .Util   import Util
 
@@ -198,9 +199,26 @@ class Trip:
     #: Result column name: Number of MSA onboard passengers minus capacity. Float.
     SIM_COL_VEH_MSA_OVERCAP                     = 'msa_overcap'
 
-    def __init__(self, input_dir, output_dir, gtfs_schedule, today, stops, routes, prepend_route_id_to_trip_id):
+    # ========== Dwell formulas ================================================================
+    #: Vehicle load variables a dwell formula may reference as ``[variable]``.  In :py:meth:`Trip.update_trip_times`
+    #: these are bound to the vehicle trip-stop columns of the same name, or to the ``msa_`` versions for MSA results.
+    DWELL_FORMULA_VARIABLES                     = [SIM_COL_VEH_BOARDS,
+                                                   SIM_COL_VEH_ALIGHTS,
+                                                   SIM_COL_VEH_ONBOARD,
+                                                   SIM_COL_VEH_STANDEES,
+                                                   SIM_COL_VEH_FRICTION,
+                                                   SIM_COL_VEH_OVERCAP]
+    #: Functions a dwell formula may call.  They apply elementwise; ``min`` and ``max`` take two or more arguments.
+    DWELL_FORMULA_FUNCTIONS                     = ['abs', 'min', 'max']
+    #: Dwell formula tokens: number, ``[variable]``, operator or parenthesis, function name.
+    DWELL_FORMULA_TOKEN_RE                      = re.compile(r"\s*(?:((?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)|\[\s*(\w+)\s*\]|(\*\*|[-+*/(),])|([A-Za-z_]\w*))")
+    #: Compiled dwell formulas: formula string => (expression tree, list of referenced variables).
+    #: Filled by :py:meth:`Trip.compile_dwell_formula`.
+    DWELL_FORMULAS                              = {}
+
+    def __init__(self, input_dir, output_dir, gtfs_reader, today, stops, routes, prepend_route_id_to_trip_id):
         """
-        Constructor. Read the gtfs data from the transitfeed schedule, and the additional
+        Constructor. Read the gtfs data using the :py:class:`GTFSReader`, and the additional
         fast-trips stops data from the input files in *input_dir*.
         """
         self.output_dir = output_dir
@@ -225,57 +243,19 @@ class Trip:
             self.vehicles_df[Trip.VEHICLES_COLUMN_MAXIMUM_SPEED_FPS] = \
                 self.vehicles_df[Trip.VEHICLES_COLUMN_MAXIMUM_SPEED]*5280.0/(60.0*60.0)
 
+        # parse and validate the dwell formulas once, up front
+        if Trip.VEHICLES_COLUMN_DWELL_FORMULA in vehicle_ft_cols:
+            for dwell_formula in self.vehicles_df[Trip.VEHICLES_COLUMN_DWELL_FORMULA].dropna().unique():
+                Trip.compile_dwell_formula(dwell_formula)
+            FastTripsLogger.debug("Compiled %d dwell formulas" % len(Trip.DWELL_FORMULAS))
+
         FastTripsLogger.debug("=========== VEHICLES ===========\n" + str(self.vehicles_df.head()))
         FastTripsLogger.debug("\n"+str(self.vehicles_df.index.dtype)+"\n"+str(self.vehicles_df.dtypes))
         FastTripsLogger.info("Read %7d %15s from %25s" %
                              (len(self.vehicles_df), "vehicles", self.INPUT_VEHICLES_FILE))
 
-        # Combine all gtfs Trip objects to a single pandas DataFrame
-        trip_dicts      = []
-        stop_time_dicts = []
-        for gtfs_trip in gtfs_schedule.GetTripList():
-            trip_dict = {}
-            for fieldname in gtfs_trip._FIELD_NAMES:
-                if fieldname in gtfs_trip.__dict__:
-                    trip_dict[fieldname] = gtfs_trip.__dict__[fieldname]
-            trip_dicts.append(trip_dict)
-
-            # stop times
-            #   _REQUIRED_FIELD_NAMES = ['trip_id', 'arrival_time', 'departure_time',
-            #                            'stop_id', 'stop_sequence']
-            #   _OPTIONAL_FIELD_NAMES = ['stop_headsign', 'pickup_type',
-            #                            'drop_off_type', 'shape_dist_traveled', 'timepoint']
-            for gtfs_stop_time in gtfs_trip.GetStopTimes():
-                stop_time_dict = {}
-                stop_time_dict[Trip.STOPTIMES_COLUMN_TRIP_ID]         = gtfs_trip.__dict__[Trip.STOPTIMES_COLUMN_TRIP_ID]
-                stop_time_dict[Trip.STOPTIMES_COLUMN_ARRIVAL_TIME]    = gtfs_stop_time.arrival_time
-                stop_time_dict[Trip.STOPTIMES_COLUMN_DEPARTURE_TIME]  = gtfs_stop_time.departure_time
-                stop_time_dict[Trip.STOPTIMES_COLUMN_STOP_ID]         = gtfs_stop_time.stop_id
-                stop_time_dict[Trip.STOPTIMES_COLUMN_STOP_SEQUENCE]   = gtfs_stop_time.stop_sequence
-                # optional fields
-                try:
-                    stop_time_dict[Trip.STOPTIMES_COLUMN_HEADSIGN]            = gtfs_stop_time.stop_headsign
-                except:
-                    pass
-                try:
-                    stop_time_dict[Trip.STOPTIMES_COLUMN_PICKUP_TYPE]         = gtfs_stop_time.pickup_type
-                except:
-                    pass
-                try:
-                    stop_time_dict[Trip.STOPTIMES_COLUMN_DROP_OFF_TYPE]        = gtfs_stop_time.drop_off_type
-                except:
-                    pass
-                try:
-                    stop_time_dict[Trip.STOPTIMES_COLUMN_SHAPE_DIST_TRAVELED] = gtfs_stop_time.shape_dist_traveled
-                except:
-                    pass
-                try:
-                    stop_time_dict[Trip.STOPTIMES_COLUMN_TIMEPOINT]           = gtfs_stop_time.timepoint
-                except:
-                    pass
-                stop_time_dicts.append(stop_time_dict)
-
-        self.trips_df = pandas.DataFrame(data=trip_dicts)
+        # Read the gtfs trips
+        self.trips_df = gtfs_reader.read_table("trips.txt")
 
         # Read the fast-trips supplemental trips data file.  Make sure trip ID is read as a string.
         trips_ft_df = pandas.read_csv(os.path.join(input_dir, Trip.INPUT_TRIPS_FILE),
@@ -322,16 +302,7 @@ class Trip:
         FastTripsLogger.info("Read %7d %15s from %25s, %25s" %
                              (len(self.trips_df), "trips", "trips.txt", self.INPUT_TRIPS_FILE))
 
-        service_dicts = []
-        for gtfs_service in gtfs_schedule.GetServicePeriodList():
-            service_dict = {}
-            service_tuple = gtfs_service.GetCalendarFieldValuesTuple()
-            for fieldnum in range(len(gtfs_service._FIELD_NAMES)):
-                # all required
-                fieldname = gtfs_service._FIELD_NAMES[fieldnum]
-                service_dict[fieldname] = service_tuple[fieldnum]
-            service_dicts.append(service_dict)
-        self.service_df = pandas.DataFrame(data=service_dicts)
+        self.service_df = gtfs_reader.read_table("calendar.txt")
 
         # Rename SERVICE_COLUMN_START_DATE to SERVICE_COLUMN_START_DATE_STR
         self.service_df[Trip.SERVICE_COLUMN_START_DATE_STR] = self.service_df[Trip.SERVICE_COLUMN_START_DATE]
@@ -357,7 +328,13 @@ class Trip:
         FastTripsLogger.info("Read %7d %15s from %25s" %
                              (len(self.service_df), "service periods", "calendar.txt"))
 
-        self.stop_times_df = pandas.DataFrame(data=stop_time_dicts)
+        # Read the gtfs stop times, ordered by trip and stop sequence
+        self.stop_times_df = gtfs_reader.read_table("stop_times.txt")
+        self.stop_times_df["trip_order"] = self.stop_times_df[Trip.STOPTIMES_COLUMN_TRIP_ID].map(
+            pandas.Series(numpy.arange(len(self.trips_df)), index=self.trips_df[Trip.TRIPS_COLUMN_TRIP_ID].values))
+        self.stop_times_df.sort_values(by=["trip_order", Trip.STOPTIMES_COLUMN_STOP_SEQUENCE], inplace=True)
+        self.stop_times_df.drop("trip_order", axis=1, inplace=True)
+        self.stop_times_df.reset_index(drop=True, inplace=True)
 
         # Read the fast-trips supplemental stop times data file
         stop_times_ft_df = pandas.read_csv(os.path.join(input_dir, Trip.INPUT_STOPTIMES_FILE),
@@ -370,7 +347,7 @@ class Trip:
 
         # Join to the trips dataframe
         if len(stop_times_ft_cols) > 2:
-            self.stop_times_df = pandas.merge(left=stop_times_df, right=stop_times_ft_df,
+            self.stop_times_df = pandas.merge(left=self.stop_times_df, right=stop_times_ft_df,
                                               how='left',
                                               on=[Trip.STOPTIMES_COLUMN_TRIP_ID,
                                                   Trip.STOPTIMES_COLUMN_STOP_ID])
@@ -378,19 +355,16 @@ class Trip:
         FastTripsLogger.debug("=========== STOP TIMES ===========\n" + str(self.stop_times_df.head()))
         FastTripsLogger.debug("\n"+str(self.stop_times_df.index.dtype)+"\n"+str(self.stop_times_df.dtypes))
 
-        # datetime version
-        self.stop_times_df[Trip.STOPTIMES_COLUMN_ARRIVAL_TIME] = \
-            self.stop_times_df[Trip.STOPTIMES_COLUMN_ARRIVAL_TIME].map(lambda x: Util.read_time(x))
-        self.stop_times_df[Trip.STOPTIMES_COLUMN_DEPARTURE_TIME] = \
-            self.stop_times_df[Trip.STOPTIMES_COLUMN_DEPARTURE_TIME].map(lambda x: Util.read_time(x))
-
-        # float version
-        self.stop_times_df[Trip.STOPTIMES_COLUMN_ARRIVAL_TIME_MIN] = \
-            self.stop_times_df[Trip.STOPTIMES_COLUMN_ARRIVAL_TIME].map(lambda x: \
-                60*x.time().hour + x.time().minute + x.time().second/60.0 )
-        self.stop_times_df[Trip.STOPTIMES_COLUMN_DEPARTURE_TIME_MIN] = \
-            self.stop_times_df[Trip.STOPTIMES_COLUMN_DEPARTURE_TIME].map(lambda x: \
-                60*x.time().hour + x.time().minute + x.time().second/60.0 )
+        # datetime and float versions
+        for (time_colname, time_min_colname) in [(Trip.STOPTIMES_COLUMN_ARRIVAL_TIME,   Trip.STOPTIMES_COLUMN_ARRIVAL_TIME_MIN),
+                                                 (Trip.STOPTIMES_COLUMN_DEPARTURE_TIME, Trip.STOPTIMES_COLUMN_DEPARTURE_TIME_MIN)]:
+            try:
+                (self.stop_times_df[time_colname], self.stop_times_df[time_min_colname]) = \
+                    Util.read_times(self.stop_times_df[time_colname].values, with_minutes=True)
+            except ValueError as e:
+                error_msg = "Bad %s in stop_times.txt: %s" % (time_colname, str(e))
+                FastTripsLogger.fatal(error_msg)
+                raise NetworkInputError("stop_times.txt", error_msg)
 
         # skipping index setting for now -- it's annoying for joins
         # self.stop_times_df.set_index([Trip.STOPTIMES_COLUMN_TRIP_ID,
@@ -614,7 +588,256 @@ class Trip:
         df[Trip.SIM_COL_VEH_MSA_OVERCAP ] =-1.0 # assume there's room
 
     @staticmethod
-    def update_trip_times(trips_df, MSA_RESULTS):
+    def make_trip_stop_index(trips_df):
+        """
+        Builds a row index for the given vehicle trips table keyed by (trip_id_num, stop_sequence), so that
+        trip-stop quantities can be looked up, accumulated and cumulatively summed by trip with numpy
+        rather than with :py:func:`pandas.merge` and groupby.
+
+        The index is only valid as long as the rows of *trips_df* are not reordered.
+
+        Returns a dictionary with keys:
+
+        * `num_rows`     : number of rows in *trips_df*
+        * `order`        : row positions of *trips_df* sorted by (trip_id_num, stop_sequence)
+        * `seg_start`    : for the sorted rows, True if the row is the first stop of its trip
+        * `seg_first`    : for the sorted rows, the sorted position of the first stop of its trip
+        * `trip_start`   : array indexed by trip_id_num, sorted position of the trip's first stop (or -1)
+        * `trip_min_seq` : array indexed by trip_id_num, the trip's first stop sequence
+        * `trip_len`     : array indexed by trip_id_num, the number of stops in the trip
+        * `contiguous`   : True if stop sequences are consecutive within each trip, so lookups are direct
+        * `sorted_keys`  : if not contiguous, sorted trip_id_num/stop_sequence keys for lookup by search
+        * `seq_factor`   : multiplier for trip_id_num in the keys
+        """
+        trip_id_nums = trips_df[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM  ].values.astype(numpy.int64)
+        stop_seqs    = trips_df[Trip.STOPTIMES_COLUMN_STOP_SEQUENCE].values.astype(numpy.int64)
+        num_rows     = len(trip_id_nums)
+
+        order        = numpy.lexsort((stop_seqs, trip_id_nums))
+        sorted_trips = trip_id_nums[order]
+        sorted_seqs  = stop_seqs[order]
+
+        seg_start     = numpy.ones(num_rows, dtype=numpy.bool_)
+        seg_start[1:] = sorted_trips[1:] != sorted_trips[:-1]
+        starts        = numpy.flatnonzero(seg_start)
+        seg_first     = starts[numpy.cumsum(seg_start) - 1] if num_rows > 0 else numpy.zeros(0, dtype=numpy.int64)
+
+        max_trip_id  = int(sorted_trips.max()) if num_rows > 0 else 0
+        trip_start   = numpy.empty(max_trip_id+1, dtype=numpy.int64)
+        trip_start.fill(-1)
+        trip_min_seq = numpy.zeros(max_trip_id+1, dtype=numpy.int64)
+        trip_len     = numpy.zeros(max_trip_id+1, dtype=numpy.int64)
+        trip_start  [sorted_trips[starts]] = starts
+        trip_min_seq[sorted_trips[starts]] = sorted_seqs[starts]
+        trip_len    [sorted_trips[starts]] = numpy.diff(numpy.append(starts, num_rows))
+
+        # are the stop sequences 1,2,3... (or n,n+1,n+2...) within each trip?
+        contiguous   = bool(numpy.all(sorted_seqs - trip_min_seq[sorted_trips] == numpy.arange(num_rows) - seg_first))
+        seq_factor   = int(sorted_seqs.max()) + 1 if num_rows > 0 else 1
+        sorted_keys  = None
+        if not contiguous:
+            sorted_keys = sorted_trips*seq_factor + sorted_seqs
+
+        return { "num_rows"     : num_rows,
+                 "order"        : order,
+                 "seg_start"    : seg_start,
+                 "seg_first"    : seg_first,
+                 "trip_start"   : trip_start,
+                 "trip_min_seq" : trip_min_seq,
+                 "trip_len"     : trip_len,
+                 "contiguous"   : contiguous,
+                 "sorted_keys"  : sorted_keys,
+                 "seq_factor"   : seq_factor }
+
+    @staticmethod
+    def lookup_trip_stop_rows(trip_stop_index, trip_id_nums, stop_seqs):
+        """
+        Given a trip stop index from :py:meth:`Trip.make_trip_stop_index` and arrays of trip_id_num and stop_sequence,
+        returns an array of the corresponding row positions in the vehicle trips table, or -1 where not found.
+        """
+        trip_id_nums = numpy.asarray(trip_id_nums, dtype=numpy.int64)
+        stop_seqs    = numpy.asarray(stop_seqs,    dtype=numpy.int64)
+        trip_start   = trip_stop_index["trip_start"]
+        num_rows     = trip_stop_index["num_rows"]
+        if num_rows == 0:
+            return numpy.zeros(len(trip_id_nums), dtype=numpy.int64) - 1
+
+        valid        = (trip_id_nums >= 0) & (trip_id_nums < len(trip_start))
+        trips        = numpy.where(valid, trip_id_nums, 0)
+        valid       &= trip_start[trips] >= 0
+
+        if trip_stop_index["contiguous"]:
+            offset   = stop_seqs - trip_stop_index["trip_min_seq"][trips]
+            valid   &= (offset >= 0) & (offset < trip_stop_index["trip_len"][trips])
+            pos      = trip_start[trips] + offset
+        else:
+            keys     = trip_id_nums*trip_stop_index["seq_factor"] + stop_seqs
+            pos      = numpy.searchsorted(trip_stop_index["sorted_keys"], keys)
+            pos      = numpy.minimum(pos, num_rows-1)
+            valid   &= trip_stop_index["sorted_keys"][pos] == keys
+
+        return numpy.where(valid, trip_stop_index["order"][numpy.where(valid, pos, 0)], -1)
+
+    @staticmethod
+    def trip_stop_cumsum(trip_stop_index, values):
+        """
+        Given a trip stop index from :py:meth:`Trip.make_trip_stop_index` and an array of values in vehicle trips table row order,
+        returns the cumulative sum of the values within each trip, by stop sequence, in vehicle trips table row order.
+        """
+        order        = trip_stop_index["order"]
+        sorted_vals  = numpy.asarray(values)[order]
+        cum          = numpy.cumsum(sorted_vals)
+        # subtract the running total from before the first stop of each trip
+        cum          = cum - (cum[trip_stop_index["seg_first"]] - sorted_vals[trip_stop_index["seg_first"]])
+        result       = numpy.empty_like(cum)
+        result[order]= cum
+        return result
+
+    @staticmethod
+    def compile_dwell_formula(dwell_formula):
+        """
+        Parses the given dwell formula (e.g. ``4 + 2*[boards] + 1.5*[alights]``) into an expression tree
+        and caches it in :py:attr:`Trip.DWELL_FORMULAS`.  Formulas are arithmetic (``+``, ``-``, ``*``, ``/``, ``**``
+        and parentheses) over numbers, :py:attr:`Trip.DWELL_FORMULA_VARIABLES` and :py:attr:`Trip.DWELL_FORMULA_FUNCTIONS`;
+        division is always floating point.  Nothing is evaluated as python.
+
+        Tree nodes are tuples: ``("num", value)``, ``("var", name)``, ``("neg", node)``, ``(operator, left, right)``
+        or ``("call", function, [args])``.
+
+        Raises a :py:class:`NetworkInputError` if the formula isn't valid.
+        Returns (expression tree, list of referenced variables).
+        """
+        dwell_formula = str(dwell_formula)
+        if dwell_formula in Trip.DWELL_FORMULAS:
+            return Trip.DWELL_FORMULAS[dwell_formula]
+
+        def formula_error(msg):
+            error_msg = "Invalid %s [%s]: %s" % (Trip.VEHICLES_COLUMN_DWELL_FORMULA, dwell_formula, msg)
+            FastTripsLogger.fatal(error_msg)
+            return NetworkInputError(Trip.INPUT_VEHICLES_FILE, error_msg)
+
+        # tokenize into (type, value)
+        tokens   = []
+        position = 0
+        while dwell_formula[position:].strip():
+            match = Trip.DWELL_FORMULA_TOKEN_RE.match(dwell_formula, position)
+            if not match:
+                raise formula_error("unexpected text at [%s]" % dwell_formula[position:].strip())
+            (number, variable, operator, name) = match.groups()
+            if number is not None:
+                tokens.append(("num", float(number)))
+            elif variable is not None:
+                if variable not in Trip.DWELL_FORMULA_VARIABLES:
+                    raise formula_error("unknown variable [%s]; expected one of %s" % (variable, str(Trip.DWELL_FORMULA_VARIABLES)))
+                tokens.append(("var", variable))
+            elif operator is not None:
+                tokens.append(("op", operator))
+            else:
+                if name not in Trip.DWELL_FORMULA_FUNCTIONS:
+                    raise formula_error("unknown function %s; expected one of %s" % (name, str(Trip.DWELL_FORMULA_FUNCTIONS)))
+                tokens.append(("func", name))
+            position = match.end()
+        tokens.append(("end", None))
+
+        # recursive descent parser; next_token[0] is the position of the next token
+        next_token = [0]
+        def peek():
+            return tokens[next_token[0]]
+        def take(expected=None):
+            token = tokens[next_token[0]]
+            if expected and token != ("op", expected):
+                raise formula_error("expected %s but found %s" % (expected, str(token[1]) if token[0] != "end" else "end of formula"))
+            next_token[0] += 1
+            return token
+        def parse_expression():
+            # expression := term (('+'|'-') term)*
+            node = parse_term()
+            while peek() in [("op","+"), ("op","-")]:
+                node = (take()[1], node, parse_term())
+            return node
+        def parse_term():
+            # term := unary (('*'|'/') unary)*
+            node = parse_unary()
+            while peek() in [("op","*"), ("op","/")]:
+                node = (take()[1], node, parse_unary())
+            return node
+        def parse_unary():
+            # unary := ('+'|'-') unary | power
+            if peek() == ("op","-"):
+                take()
+                return ("neg", parse_unary())
+            if peek() == ("op","+"):
+                take()
+                return parse_unary()
+            # power := atom ('**' unary)?
+            node = parse_atom()
+            if peek() == ("op","**"):
+                take()
+                node = ("**", node, parse_unary())
+            return node
+        def parse_atom():
+            # atom := number | [variable] | function '(' expression (',' expression)* ')' | '(' expression ')'
+            token = take()
+            if token[0] in ["num", "var"]:
+                return token
+            if token[0] == "func":
+                take("(")
+                args = [parse_expression()]
+                while peek() == ("op",","):
+                    take()
+                    args.append(parse_expression())
+                take(")")
+                if (token[1] == "abs" and len(args) != 1) or (token[1] in ["min","max"] and len(args) < 2):
+                    raise formula_error("wrong number of arguments to %s" % token[1])
+                return ("call", token[1], args)
+            if token == ("op","("):
+                node = parse_expression()
+                take(")")
+                return node
+            raise formula_error("unexpected %s" % (str(token[1]) if token[0] != "end" else "end of formula"))
+
+        formula_tree = parse_expression()
+        if peek()[0] != "end":
+            raise formula_error("unexpected %s" % str(peek()[1]))
+
+        variables = sorted(set([token[1] for token in tokens if token[0] == "var"]))
+        Trip.DWELL_FORMULAS[dwell_formula] = (formula_tree, variables)
+        FastTripsLogger.debug("Compiled %s [%s] => %s" % (Trip.VEHICLES_COLUMN_DWELL_FORMULA, dwell_formula, str(formula_tree)))
+        return Trip.DWELL_FORMULAS[dwell_formula]
+
+    @staticmethod
+    def evaluate_dwell_formula(formula_tree, variable_values):
+        """
+        Evaluates the expression tree from :py:meth:`Trip.compile_dwell_formula` with the given
+        dict of variable name => numpy array.  Returns a numpy array, or a float for constant formulas.
+        """
+        node_type = formula_tree[0]
+        if node_type == "num":
+            return formula_tree[1]
+        if node_type == "var":
+            return variable_values[formula_tree[1]]
+        if node_type == "neg":
+            return -Trip.evaluate_dwell_formula(formula_tree[1], variable_values)
+        if node_type == "call":
+            args = [Trip.evaluate_dwell_formula(arg, variable_values) for arg in formula_tree[2]]
+            if formula_tree[1] == "abs":
+                return numpy.abs(args[0])
+            reduce_func = numpy.minimum if formula_tree[1] == "min" else numpy.maximum
+            result = args[0]
+            for arg in args[1:]:
+                result = reduce_func(result, arg)
+            return result
+
+        left  = Trip.evaluate_dwell_formula(formula_tree[1], variable_values)
+        right = Trip.evaluate_dwell_formula(formula_tree[2], variable_values)
+        if node_type == "+": return left + right
+        if node_type == "-": return left - right
+        if node_type == "*": return left * right
+        if node_type == "/": return numpy.true_divide(left, right)
+        return numpy.power(left, right)
+
+    @staticmethod
+    def update_trip_times(trips_df, MSA_RESULTS, changed_trip_stops=False):
         """
         Updates trip times for stops with boards and/or alights.
 
@@ -634,8 +857,15 @@ class Trip:
         - Trip.STOPTIMES_COLUMN_ARRIVAL_TIME
         - Trip.STOPTIMES_COLUMN_DEPARTURE_TIME
 
+        If *changed_trip_stops* is True, returns (trips_df, changed_df) where changed_df has columns
+        Trip.STOPTIMES_COLUMN_TRIP_ID_NUM and Trip.STOPTIMES_COLUMN_STOP_SEQUENCE for the trip-stops whose
+        arrival or departure time moved.  Otherwise, returns trips_df.
         """
         trips_df_len = len(trips_df)
+        if changed_trip_stops:
+            # remember the times going in
+            prev_arrival    = trips_df[Trip.STOPTIMES_COLUMN_ARRIVAL_TIME  ].values.copy()
+            prev_departure  = trips_df[Trip.STOPTIMES_COLUMN_DEPARTURE_TIME].values.copy()
         FastTripsLogger.debug("Trip.update_trip_times() trips_df has %d rows" % len(trips_df))
         # FastTripsLogger.debug("trips_df.dtypes=\n%s\n" % str(trips_df.dtypes))
         trip_cols = list(trips_df.columns.values)
@@ -668,152 +898,134 @@ class Trip:
 
         # Update the dwell time
         if Trip.VEHICLES_COLUMN_DWELL_FORMULA in trip_cols:
-            all_dwell_df   = None
-            all_dwell_init = False
-            # grouppy unique dwell time forumulas
-            dwell_groups = trips_df.groupby(Trip.VEHICLES_COLUMN_DWELL_FORMULA)
-            for dwell_formula, dwell_group in dwell_groups:
-
-                dwell_df = dwell_group.copy()
-                FastTripsLogger.debug("dwell_formula %s has %d rows" % (str(dwell_formula), len(dwell_df)))
-                if isinstance(dwell_formula,str):
-                    if MSA_RESULTS:
-                        # replace [boards], [alights], etc with trip_df['msa_boards'], trip_df['msa_alights'], etc
-                        dwell_formula = dwell_formula.replace("[","dwell_df['msa_")
-                    else:
-                        # replace [boards], [alights], etc with trip_df['boards'], trip_df['alights'], etc
-                        dwell_formula = dwell_formula.replace("[","dwell_df['")
-                    dwell_formula = dwell_formula.replace("]","']")
-
-                    # eval it
-                    dwell_df[Trip.STOPTIMES_COLUMN_DWELL_TIME_SEC] = eval(dwell_formula)
+            # no formula means no dwell time
+            dwell_time_sec = numpy.zeros(trips_df_len, dtype=numpy.float64)
+            # each unique dwell formula is evaluated once, over the load arrays for its trip-stops
+            (formula_codes, dwell_formulas) = pandas.factorize(trips_df[Trip.VEHICLES_COLUMN_DWELL_FORMULA].values)
+            for formula_num in range(len(dwell_formulas)):
+                (formula_tree, variables) = Trip.compile_dwell_formula(dwell_formulas[formula_num])
+                if len(dwell_formulas) == 1 and formula_codes.min() == 0:
+                    rows = slice(None)
                 else:
-                    dwell_df[Trip.STOPTIMES_COLUMN_DWELL_TIME_SEC] = 0.0
+                    rows = numpy.flatnonzero(formula_codes == formula_num)
+                FastTripsLogger.debug("dwell_formula %s has %d rows" % (str(dwell_formulas[formula_num]), len(dwell_time_sec[rows])))
 
-                # FastTripsLogger.debug("\n%s" % dwell_df[["boards","alights","dwell_formula","dwell_time_sec"]].to_string())
-                if all_dwell_init:
-                    all_dwell_df = pandas.concat([all_dwell_df, dwell_df], axis=0)
-                else:
-                    all_dwell_df = dwell_df
-                    all_dwell_init = True
+                # [boards], [alights], etc are trips_df boards, alights, etc, or msa_boards, msa_alights, etc
+                variable_values = {}
+                for variable in variables:
+                    colname = ("msa_" + variable) if MSA_RESULTS else variable
+                    variable_values[variable] = trips_df[colname].values[rows].astype(numpy.float64)
+                dwell_time_sec[rows] = Trip.evaluate_dwell_formula(formula_tree, variable_values)
 
-            # use the new one
-            trips_df = all_dwell_df
+            trips_df[Trip.STOPTIMES_COLUMN_DWELL_TIME_SEC] = dwell_time_sec
 
             # keep the dwell time
-            trips_df[Trip.STOPTIMES_COLUMN_DWELL_TIME] = trips_df[Trip.STOPTIMES_COLUMN_DWELL_TIME_SEC].map(lambda x: datetime.timedelta(seconds=x))
+            trips_df[Trip.STOPTIMES_COLUMN_DWELL_TIME] = Util.seconds_to_timedelta64(trips_df[Trip.STOPTIMES_COLUMN_DWELL_TIME_SEC].values)
+
+        # The rest is arithmetic along each trip, so do it with numpy on the trip offsets from the trip stop index
+        # rather than with merges and groupbys.  prev_row and next_row are the rows for the previous and next stop
+        # sequence in the same trip, or -1.
+        trip_stop_index = Trip.make_trip_stop_index(trips_df)
+        order           = trip_stop_index["order"]
+        stop_seqs       = trips_df[Trip.STOPTIMES_COLUMN_STOP_SEQUENCE ].values.astype(numpy.int64)
+        max_stop_seqs   = trips_df[Trip.TRIPS_COLUMN_MAX_STOP_SEQUENCE].values.astype(numpy.int64)
+        sorted_has_prev = ~trip_stop_index["seg_start"]
+        sorted_has_prev[1:] &= (stop_seqs[order[1:]] - 1 == stop_seqs[order[:-1]])
+        prev_row        = numpy.empty(trips_df_len, dtype=numpy.int64)
+        prev_row.fill(-1)
+        prev_row[order[1:][sorted_has_prev[1:]]] = order[:-1][sorted_has_prev[1:]]
+        next_row        = numpy.empty(trips_df_len, dtype=numpy.int64)
+        next_row.fill(-1)
+        next_row[prev_row[prev_row >= 0]] = numpy.flatnonzero(prev_row >= 0)
+        has_next        = next_row >= 0
 
         # the vehicle stops if someone boards or someone alights or both
-        trips_df["does_stop"] = (trips_df[Trip.SIM_COL_VEH_BOARDS]>0) | (trips_df[Trip.SIM_COL_VEH_ALIGHTS]>0)
-
+        does_stop         = (trips_df[Trip.SIM_COL_VEH_BOARDS].values>0) | (trips_df[Trip.SIM_COL_VEH_ALIGHTS].values>0)
         # we need information about the next stop
-        next_stop_df = trips_df[[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
-                                 Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,
-                                 Trip.TRIPS_COLUMN_MAX_STOP_SEQUENCE,
-                                 "does_stop"]].copy()
-        next_stop_df.loc[:,"is_last_stop"] = next_stop_df[Trip.STOPTIMES_COLUMN_STOP_SEQUENCE] == next_stop_df[Trip.TRIPS_COLUMN_MAX_STOP_SEQUENCE]
-        next_stop_df.loc[:,Trip.STOPTIMES_COLUMN_STOP_SEQUENCE] = next_stop_df[Trip.STOPTIMES_COLUMN_STOP_SEQUENCE]-1
-        next_stop_df.rename(columns={"does_stop"                       :"next_does_stop",
-                                     "is_last_stop"                    :"next_is_last_stop"}, inplace=True)
-        FastTripsLogger.debug("next_stop_df:\n%s\n" % next_stop_df.head().to_string())
-
-        trips_df = pandas.merge(left=trips_df, right=next_stop_df, how='left')
-        assert(trips_df_len==len(trips_df))
+        next_does_stop    = has_next & does_stop[next_row]
+        next_is_last_stop = has_next & (stop_seqs[next_row] == max_stop_seqs[next_row])
 
         # Start with original travel time for the link FROM this stop to the NEXT stop
         trip_cols = list(trips_df.columns.values)
 
         # Add acceleration from stop if there are boards/alights
         # Skip first stop because we assume it's already there, and last since we don't go anywhere
-        trips_df["accel_secs"] = 0.0
+        accel_secs = numpy.zeros(trips_df_len, dtype=numpy.float64)
         if (Trip.VEHICLES_COLUMN_MAXIMUM_SPEED_FPS in trip_cols) and \
            (Trip.VEHICLES_COLUMN_ACCELERATION in trip_cols):
-            trips_df.loc[trips_df["does_stop"] & (trips_df[Trip.STOPTIMES_COLUMN_STOP_SEQUENCE]>1) & \
-                         (trips_df[Trip.STOPTIMES_COLUMN_STOP_SEQUENCE]<trips_df[Trip.TRIPS_COLUMN_MAX_STOP_SEQUENCE]), "accel_secs"] = \
-                            trips_df[Trip.VEHICLES_COLUMN_MAXIMUM_SPEED_FPS]/trips_df[Trip.VEHICLES_COLUMN_ACCELERATION]
+            accel_rows = does_stop & (stop_seqs>1) & (stop_seqs<max_stop_seqs)
+            accel_secs[accel_rows] = trips_df[Trip.VEHICLES_COLUMN_MAXIMUM_SPEED_FPS].values[accel_rows].astype(numpy.float64)/ \
+                                     trips_df[Trip.VEHICLES_COLUMN_ACCELERATION     ].values[accel_rows].astype(numpy.float64)
         # Add deceleration to next stop.
         # Skip stop with next stop = last stop because we assume it's already there
-        trips_df["decel_secs"] = 0.0
+        decel_secs = numpy.zeros(trips_df_len, dtype=numpy.float64)
         if (Trip.VEHICLES_COLUMN_MAXIMUM_SPEED_FPS in trip_cols) and \
            (Trip.VEHICLES_COLUMN_DECELERATION in trip_cols):
-            trips_df.loc[(trips_df["next_does_stop"]) & (trips_df["next_is_last_stop"]==False), "decel_secs"] = \
-                            trips_df[Trip.VEHICLES_COLUMN_MAXIMUM_SPEED_FPS]/trips_df[Trip.VEHICLES_COLUMN_DECELERATION]
+            decel_rows = next_does_stop & (~next_is_last_stop)
+            decel_secs[decel_rows] = trips_df[Trip.VEHICLES_COLUMN_MAXIMUM_SPEED_FPS].values[decel_rows].astype(numpy.float64)/ \
+                                     trips_df[Trip.VEHICLES_COLUMN_DECELERATION     ].values[decel_rows].astype(numpy.float64)
 
         # update the travel time
-        trips_df[Trip.STOPTIMES_COLUMN_TRAVEL_TIME_SEC] = (trips_df[Trip.STOPTIMES_COLUMN_ORIGINAL_TRAVEL_TIME]/numpy.timedelta64(1, 's')) + trips_df["accel_secs"] + trips_df["decel_secs"]
-        trips_df[Trip.STOPTIMES_COLUMN_TRAVEL_TIME    ] = trips_df[Trip.STOPTIMES_COLUMN_TRAVEL_TIME_SEC].map(lambda x: datetime.timedelta(seconds=x))
+        travel_time_sec = (trips_df[Trip.STOPTIMES_COLUMN_ORIGINAL_TRAVEL_TIME].values/numpy.timedelta64(1, 's')) + accel_secs + decel_secs
+        trips_df[Trip.STOPTIMES_COLUMN_TRAVEL_TIME_SEC] = travel_time_sec
+        trips_df[Trip.STOPTIMES_COLUMN_TRAVEL_TIME    ] = Util.seconds_to_timedelta64(travel_time_sec)
 
         # put travel time + dwell together because that's the full time for a link (stop arrival time to next stop arrival time)
-        trips_df["travel_dwell_sec"] = trips_df[Trip.STOPTIMES_COLUMN_TRAVEL_TIME_SEC] + trips_df[Trip.STOPTIMES_COLUMN_DWELL_TIME_SEC]
-        # cumulatively sum it to get arrival times times for the trip
-        trips_df["travel_dwell_sec_cum"] = trips_df.groupby([Trip.STOPTIMES_COLUMN_TRIP_ID_NUM])["travel_dwell_sec"].cumsum()
-        trips_df["travel_dwell_cum"    ] = trips_df["travel_dwell_sec_cum"].map(lambda x: datetime.timedelta(seconds=x) if pandas.notnull(x) else None)
-        # verifying cumsum did as expected
-        # FastTripsLogger.debug("\n"+ trips_df[[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM, Trip.STOPTIMES_COLUMN_STOP_SEQUENCE, "travel_dwell_sec","travel_dwell_sec_cum"]].to_string())
-
-        # move the next arrival time for joining to the next stop
-        next_stop_df = trips_df[[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
-                                 Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,
-                                 Trip.TRIPS_COLUMN_TRIP_DEPARTURE_TIME,
-                                 "travel_dwell_cum"]].copy()
-        # need to start from trip arrival time.  For some reason can't aggregate STOPTIMES_COLUMN_DWELL_TIME, only the seconds version
-        first_dwell_df = trips_df[[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,Trip.STOPTIMES_COLUMN_DWELL_TIME_SEC]]. \
-            groupby([Trip.STOPTIMES_COLUMN_TRIP_ID_NUM]).agg({Trip.STOPTIMES_COLUMN_DWELL_TIME_SEC:'first'}).reset_index()
-        first_dwell_df.rename(columns={Trip.STOPTIMES_COLUMN_DWELL_TIME_SEC:"trip_first_dwell_sec"}, inplace=True)
-        first_dwell_df["trip_first_dwell"] = first_dwell_df["trip_first_dwell_sec"].map(lambda x: datetime.timedelta(seconds=x))
-
-        # verify first dwell is correct
-        # FastTripsLogger.debug("first_dwell:\n%s\n" % first_dwell_df.head().to_string())
-        next_stop_df = pandas.merge(left=next_stop_df, right=first_dwell_df, how='left')
-
-        FastTripsLogger.debug("next_stop_df:\n%s\n" % next_stop_df.head().to_string())
-
-        next_stop_df["trip_arrival_time" ] = next_stop_df[Trip.TRIPS_COLUMN_TRIP_DEPARTURE_TIME] - next_stop_df["trip_first_dwell"]
-        next_stop_df["new_arrival_time"  ] = next_stop_df["trip_arrival_time"] + trips_df["travel_dwell_cum"]
-        next_stop_df.loc[:,Trip.STOPTIMES_COLUMN_STOP_SEQUENCE] += 1
-
-        FastTripsLogger.debug("next_stop_df:\n%s\n" % next_stop_df.head().to_string())
-        trips_df = pandas.merge(left=trips_df,
-                                right=next_stop_df[[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
-                                                    Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,
-                                                    "new_arrival_time"]],
-                                how="left")
-        # the first ones will be NaT but that's perfect -- we don't want to set those anyway
-        trips_df.loc[pandas.notnull(trips_df["new_arrival_time"]),Trip.STOPTIMES_COLUMN_ARRIVAL_TIME] = trips_df["new_arrival_time"]
-        # set the first ones to be departure time minus dwell time
-        trips_df.loc[pandas.isnull( trips_df["new_arrival_time"]),Trip.STOPTIMES_COLUMN_ARRIVAL_TIME] = trips_df[Trip.STOPTIMES_COLUMN_DEPARTURE_TIME] - trips_df[Trip.STOPTIMES_COLUMN_DWELL_TIME]
+        dwell_time_sec       = trips_df[Trip.STOPTIMES_COLUMN_DWELL_TIME_SEC].values.astype(numpy.float64)
+        travel_dwell_sec     = travel_time_sec + dwell_time_sec
+        # cumulatively sum it to get arrival times times for the trip; nulls (the last stop) are skipped
+        travel_dwell_null    = numpy.isnan(travel_dwell_sec)
+        travel_dwell_sec_cum = Trip.trip_stop_cumsum(trip_stop_index, numpy.where(travel_dwell_null, 0.0, travel_dwell_sec))
+        travel_dwell_sec_cum[travel_dwell_null] = numpy.nan
+
+        # need to start from trip arrival time = trip departure time - first stop dwell
+        first_row        = numpy.empty(trips_df_len, dtype=numpy.int64)
+        first_row[order] = order[trip_stop_index["seg_first"]]
+        trip_first_dwell = trips_df[Trip.STOPTIMES_COLUMN_DWELL_TIME].values[first_row]
+        trip_arrival     = trips_df[Trip.TRIPS_COLUMN_TRIP_DEPARTURE_TIME].values.astype("datetime64[ns]") - trip_first_dwell
+
+        # arrival time is the trip arrival time plus the cumulative time through the previous stop
+        has_prev         = prev_row >= 0
+        dwell_time       = trips_df[Trip.STOPTIMES_COLUMN_DWELL_TIME   ].values
+        arrival_time     = trips_df[Trip.STOPTIMES_COLUMN_DEPARTURE_TIME].values.astype("datetime64[ns]") - dwell_time
+        new_arrival_time = trip_arrival[prev_row[has_prev]] + Util.seconds_to_timedelta64(travel_dwell_sec_cum[prev_row[has_prev]])
+        # the first ones are NaT but that's perfect -- we don't want to set those anyway.  They stay departure time minus dwell time
+        arrival_time[has_prev] = numpy.where(pandas.notnull(new_arrival_time), new_arrival_time, arrival_time[has_prev])
         # departure time is arrival time + dwell
-        trips_df.loc[:,Trip.STOPTIMES_COLUMN_DEPARTURE_TIME] = trips_df[Trip.STOPTIMES_COLUMN_ARRIVAL_TIME] + trips_df[Trip.STOPTIMES_COLUMN_DWELL_TIME]
+        departure_time   = arrival_time + dwell_time
 
+        trips_df[Trip.STOPTIMES_COLUMN_ARRIVAL_TIME  ] = arrival_time
+        trips_df[Trip.STOPTIMES_COLUMN_DEPARTURE_TIME] = departure_time
         # float version
-        trips_df[Trip.STOPTIMES_COLUMN_ARRIVAL_TIME_MIN] = \
-            trips_df[Trip.STOPTIMES_COLUMN_ARRIVAL_TIME].map(lambda x: \
-                60*x.time().hour + x.time().minute + x.time().second/60.0 )
-        trips_df[Trip.STOPTIMES_COLUMN_DEPARTURE_TIME_MIN] = \
-            trips_df[Trip.STOPTIMES_COLUMN_DEPARTURE_TIME].map(lambda x: \
-                60*x.time().hour + x.time().minute + x.time().second/60.0 )
-
-        FastTripsLogger.debug("Trips:update_trip_times() trips_df:\n%s\n" % \
-            trips_df.loc[trips_df[Trip.TRIPS_COLUMN_MAX_STOP_SEQUENCE]>1,[Trip.STOPTIMES_COLUMN_TRIP_ID, Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
-                      Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,
-                      Trip.STOPTIMES_COLUMN_ARRIVAL_TIME, Trip.STOPTIMES_COLUMN_DEPARTURE_TIME,
-                      Trip.VEHICLES_COLUMN_MAXIMUM_SPEED_FPS, Trip.VEHICLES_COLUMN_ACCELERATION, Trip.VEHICLES_COLUMN_DECELERATION,
-                      Trip. VEHICLES_COLUMN_SEATED_CAPACITY,
-                      Trip.SIM_COL_VEH_BOARDS, Trip.SIM_COL_VEH_ALIGHTS, Trip.SIM_COL_VEH_ONBOARD, Trip.SIM_COL_VEH_STANDEES, Trip.SIM_COL_VEH_FRICTION,
-                      "does_stop","next_does_stop","next_is_last_stop",
-                      "accel_secs","decel_secs",
-                      Trip.STOPTIMES_COLUMN_DWELL_TIME_SEC,
-                      "travel_dwell_sec","travel_dwell_sec_cum","new_arrival_time"
-                      ]].head(15).to_string())
+        trips_df[Trip.STOPTIMES_COLUMN_ARRIVAL_TIME_MIN  ] = Util.datetime64_to_minutes(arrival_time)
+        trips_df[Trip.STOPTIMES_COLUMN_DEPARTURE_TIME_MIN] = Util.datetime64_to_minutes(departure_time)
 
+        if debugDataFrames("update_trip_times"):
+            debug_rows = numpy.flatnonzero(max_stop_seqs>1)[:15]
+            debug_df   = trips_df.iloc[debug_rows][[Trip.STOPTIMES_COLUMN_TRIP_ID, Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
+                                                    Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,
+                                                    Trip.STOPTIMES_COLUMN_ARRIVAL_TIME, Trip.STOPTIMES_COLUMN_DEPARTURE_TIME,
+                                                    Trip.SIM_COL_VEH_BOARDS, Trip.SIM_COL_VEH_ALIGHTS, Trip.SIM_COL_VEH_ONBOARD, Trip.SIM_COL_VEH_FRICTION,
+                                                    Trip.STOPTIMES_COLUMN_DWELL_TIME_SEC]].copy()
+            debug_df["next_does_stop"      ] = next_does_stop      [debug_rows]
+            debug_df["next_is_last_stop"   ] = next_is_last_stop   [debug_rows]
+            debug_df["accel_secs"          ] = accel_secs          [debug_rows]
+            debug_df["decel_secs"          ] = decel_secs          [debug_rows]
+            debug_df["travel_dwell_sec"    ] = travel_dwell_sec    [debug_rows]
+            debug_df["travel_dwell_sec_cum"] = travel_dwell_sec_cum[debug_rows]
+            FastTripsLogger.debug("Trips:update_trip_times() trips_df:\n%s\n" % debug_df.to_string())
 
         assert(trips_df_len==len(trips_df))
-        # drop all the intermediate columns
-        trips_df.drop(["does_stop","next_does_stop","next_is_last_stop",
-                      "accel_secs","decel_secs",
-                      "travel_dwell_sec","travel_dwell_sec_cum","travel_dwell_cum",
-                      "new_arrival_time"], axis=1, inplace=True)
-        FastTripsLogger.debug("trips_df.dtypes=\n%s\n" % str(trips_df.dtypes))
+        if debugDataFrames("update_trip_times dtypes"):
+            FastTripsLogger.debug("trips_df.dtypes=\n%s\n" % str(trips_df.dtypes))
+
+        if changed_trip_stops:
+            # rows stay in place so the times can be compared directly
+            moved      = (arrival_time   != prev_arrival  ) | \
+                         (departure_time != prev_departure)
+            changed_df = trips_df.loc[moved, [Trip.STOPTIMES_COLUMN_TRIP_ID_NUM, Trip.STOPTIMES_COLUMN_STOP_SEQUENCE]].copy()
+            FastTripsLogger.info("          %d of %d vehicle trip-stops have new times" % (len(changed_df), trips_df_len))
+            return (trips_df, changed_df)
 
         return trips_df
 
@@ -13,7 +13,7 @@ __license__   = """
     limitations under the License.
 """
 
-import csv, datetime, logging, os
+import collections, csv, datetime, glob, json, logging, os, shutil, sys
 
 import numpy
 import pandas
@@ -41,6 +41,29 @@ class Util:
         'new_waittime'      : 'min'
     }
 
+    #: Output format for :py:meth:`Util.write_dataframe`: comma-separated text
+    OUTPUT_FORMAT_CSV               = 'csv'
+    #: Output format for :py:meth:`Util.write_dataframe`: binary numpy arrays, one `.npz` file per partition.
+    #: Read these with :py:meth:`Util.read_dataframe_npz`.
+    OUTPUT_FORMAT_NPZ               = 'npz'
+    #: Valid output formats
+    OUTPUT_FORMATS                  = [OUTPUT_FORMAT_CSV, OUTPUT_FORMAT_NPZ]
+
+    #: Key for the column names in `.npz` output files
+    NPZ_COLUMNS_KEY                 = '__columns__'
+
+    #: Schema file in a directory written by :py:meth:`Util.write_dataframe_columns`
+    COLUMNS_SCHEMA_FILE             = 'schema.json'
+    #: Column kinds for :py:meth:`Util.write_dataframe_columns`: values as is
+    COLUMN_KIND_VALUES              = 'values'
+    #: Column kinds for :py:meth:`Util.write_dataframe_columns`: datetimes or timedeltas as int64
+    COLUMN_KIND_TIMES               = 'times'
+    #: Column kinds for :py:meth:`Util.write_dataframe_columns`: int32 codes into a categories array, -1 for null
+    COLUMN_KIND_CATEGORY            = 'category'
+    #: :py:func:`pandas.api.types.infer_dtype` results for object columns that :py:meth:`Util.write_dataframe_columns`
+    #: stores as numbers
+    NUMERIC_INFERRED_TYPES          = ['integer', 'floating', 'mixed-integer-float']
+
     @staticmethod
     def add_numeric_column(input_df, id_colname, numeric_newcolname):
         """
@@ -145,6 +168,88 @@ class Util:
 
         return input_df
 
+    @staticmethod
+    def concatenate_ranges(starts, lengths):
+        """
+        Returns the concatenation of `numpy.arange(start, start+length)` for each *start*, *length* pair,
+        without a python loop.
+        """
+        starts  = numpy.asarray(starts,  dtype=numpy.int64)
+        lengths = numpy.asarray(lengths, dtype=numpy.int64)
+        keep    = lengths > 0
+        starts  = starts[keep]
+        lengths = lengths[keep]
+        total   = int(lengths.sum())
+        if total == 0:
+            return numpy.zeros(0, dtype=numpy.int64)
+        # offset of each range in the result
+        offsets = numpy.cumsum(lengths) - lengths
+        return numpy.repeat(starts - offsets, lengths) + numpy.arange(total, dtype=numpy.int64)
+
+    @staticmethod
+    def group_positions(keys, num_keys):
+        """
+        Groups the positions of the non-negative integer *keys* (less than *num_keys*) so that the positions for
+        a set of keys can be fetched without scanning *keys* again.  Negative keys are left out.
+
+        Returns (positions, starts, counts) where `positions[starts[k]:starts[k]+counts[k]]` are the
+        positions with key k, in their original order.  See :py:meth:`Util.concatenate_ranges`.
+        """
+        keys      = numpy.asarray(keys, dtype=numpy.int64)
+        valid_pos = numpy.flatnonzero(keys >= 0)
+        positions = valid_pos[numpy.argsort(keys[valid_pos], kind="mergesort")]
+        counts    = numpy.bincount(keys[valid_pos], minlength=num_keys)
+        starts    = numpy.cumsum(counts) - counts
+        return (positions, starts, counts)
+
+    @staticmethod
+    def join_groups(values, group_idx, num_groups, sep=","):
+        """
+        Joins the string *values* with *sep* within each group, where *group_idx* is the non-decreasing group
+        number (less than *num_groups*) of each value.  This is `groupby(...).apply(lambda x: sep.join(x))`
+        without a python call per group.  Values may not contain newlines.
+
+        Returns an object array with the joined string for each group, or NaN for groups without values.
+        """
+        values    = numpy.asarray(values, dtype=object)
+        group_idx = numpy.asarray(group_idx, dtype=numpy.int64)
+        joined    = numpy.empty(num_groups, dtype=object)
+        joined.fill(numpy.nan)
+        if len(values) == 0:
+            return joined
+
+        # follow each value by the separator, or by a newline if it ends its group, and split the whole thing once
+        group_end = numpy.append(group_idx[1:] != group_idx[:-1], True)
+        pieces    = numpy.empty(2*len(values), dtype=object)
+        pieces[0::2] = values
+        pieces[1::2] = numpy.where(group_end, "\n", sep)
+        joined[group_idx[group_end]] = "".join(pieces).split("\n")[:-1]
+        return joined
+
+    @staticmethod
+    def seconds_to_timedelta64(seconds):
+        """
+        Converts an array of float seconds to a :py:class:`numpy.timedelta64` array, rounded to the
+        microsecond like :py:class:`datetime.timedelta` (halves round away from zero).  NaN becomes NaT.
+        """
+        seconds = numpy.asarray(seconds, dtype=numpy.float64)
+        isnull  = numpy.isnan(seconds)
+        micros  = numpy.sign(seconds)*numpy.floor(numpy.abs(seconds)*1000000.0 + 0.5)
+        result  = numpy.where(isnull, 0, micros).astype(numpy.int64)*1000
+        result  = result.view("timedelta64[ns]")
+        result[isnull] = numpy.timedelta64("NaT")
+        return result
+
+    @staticmethod
+    def datetime64_to_minutes(x):
+        """
+        Converts an array of :py:class:`numpy.datetime64` to float minutes after midnight, ignoring
+        fractional seconds, i.e. `60*hour + minute + second/60.0` of each time of day.
+        """
+        seconds = numpy.asarray(x).astype("datetime64[ns]").view(numpy.int64)//1000000000
+        seconds = seconds % (24*60*60)
+        return 60*(seconds//3600) + (seconds//60)%60 + (seconds%60)/60.0
+
     @staticmethod
     def datetime64_formatter(x):
         """
@@ -152,6 +257,31 @@ class Util:
         """
         return pandas.to_datetime(x).strftime('%H:%M:%S') if pandas.notnull(x) else ""
 
+    @staticmethod
+    def format_times(x):
+        """
+        Vectorized version of :py:meth:`Util.datetime64_formatter`.  Converts an array of :py:class:`numpy.datetime64`
+        to an object array of `HH:MM:SS` strings, with blanks for nulls.
+        """
+        times   = numpy.asarray(x).astype("datetime64[ns]")
+        nulls   = pandas.isnull(times)
+        seconds = numpy.where(nulls, 0, times.view(numpy.int64)//1000000000 % (24*60*60))
+
+        # build the characters and view each row of them as a string
+        chars = numpy.empty((len(times), 8), dtype=numpy.uint8)
+        chars[:,0] = seconds//36000
+        chars[:,1] = (seconds//3600)%10
+        chars[:,3] = (seconds//600)%6
+        chars[:,4] = (seconds//60)%10
+        chars[:,6] = (seconds%60)//10
+        chars[:,7] = seconds%10
+        chars     += ord("0")
+        chars[:,[2,5]] = ord(":")
+
+        formatted = chars.view("S8").ravel().astype(str).astype(object)
+        formatted[nulls] = ""
+        return formatted
+
     @staticmethod
     def datetime64_min_formatter(x):
         """
@@ -190,19 +320,78 @@ class Util:
         return datetime.datetime.combine(day, datetime.datetime.strptime(x, '%H:%M:%S').time())
 
     @staticmethod
-    def write_dataframe(df, name, output_file, append=False, keep_duration_columns=False):
+    def read_times(x, end_of_day=False, with_minutes=False):
+        """
+        Vectorized version of :py:meth:`Util.read_time`.  Converts an array of `HH:MM:SS` or `HH:MM` strings to a
+        :py:class:`numpy.datetime64` array on :py:attr:`Util.SIMULATION_DAY`, where hours past 24 are the next day.
+        Null, blank and `default` values are midnight, or 23:59:59 if *end_of_day*.
+
+        If *with_minutes*, returns a tuple of that array and a float array of the minutes after midnight,
+        like :py:meth:`Util.datetime64_to_minutes`.
+
+        Raises a ValueError if any values aren't times.
+        """
+        values  = numpy.asarray(x, dtype=object)
+        hours   = numpy.zeros(len(values), dtype=numpy.int64)
+        minutes = numpy.zeros(len(values), dtype=numpy.int64)
+        seconds = numpy.zeros(len(values), dtype=numpy.int64)
+
+        # most are zero-padded HH:MM:SS, so read those digits straight from the bytes.
+        # Anything else (including nulls, which become "nan" or "None") fails the checks.
+        try:
+            chars = numpy.array(values, dtype="S9").view(numpy.uint8).reshape(-1, 9).astype(numpy.int16) - ord("0")
+            fast  = ((chars[:,[0,1,3,4,6,7]] >= 0) & (chars[:,[0,1,3,4,6,7]] <= 9)).all(axis=1) & \
+                    (chars[:,2] == ord(":")-ord("0")) & (chars[:,5] == ord(":")-ord("0")) & (chars[:,8] == -ord("0"))
+            hours  [fast] = chars[fast,0]*10 + chars[fast,1]
+            minutes[fast] = chars[fast,3]*10 + chars[fast,4]
+            seconds[fast] = chars[fast,6]*10 + chars[fast,7]
+        except UnicodeError:
+            fast  = numpy.zeros(len(values), dtype=bool)
+
+        # the rest get the regular expression
+        slow = ~fast
+        if slow.any():
+            times   = pandas.Series(values[slow]).fillna("").astype(str).str.strip()
+            default = (times == "") | (times.str.lower() == "default")
+            times[default.values] = "23:59:59" if end_of_day else "00:00:00"
+
+            time_parts = times.str.extract(r"^(\d+):(\d{1,2})(?::(\d{1,2}))?$", expand=True)
+            invalid    = pandas.isnull(time_parts[0]).values
+            if invalid.any():
+                raise ValueError("Invalid times (expected HH:MM:SS or HH:MM): %s" % str(list(times[invalid].unique()[:10])))
+            hours  [slow] = time_parts[0].values.astype(numpy.int64)
+            minutes[slow] = time_parts[1].values.astype(numpy.int64)
+            seconds[slow] = time_parts[2].fillna("0").values.astype(numpy.int64)
+
+        invalid    = (minutes >= 60) | (seconds >= 60)
+        if invalid.any():
+            raise ValueError("Invalid times (expected HH:MM:SS or HH:MM): %s" % str(list(pandas.unique(values[invalid])[:10])))
+
+        day_start  = numpy.datetime64(Util.SIMULATION_DAY.strftime("%Y-%m-%d"), "s")
+        datetimes  = (day_start + (hours*3600 + minutes*60 + seconds).astype("timedelta64[s]")).astype("datetime64[ns]")
+        if not with_minutes:
+            return datetimes
+        return (datetimes, 60*(hours % 24) + minutes + seconds/60.0)
+
+    @staticmethod
+    def write_dataframe(df, name, output_file, append=False, keep_duration_columns=False,
+                        output_format=OUTPUT_FORMAT_CSV, partition=None):
         """
         Convenience method to write a dataframe but make some of the fields more usable.
 
         If a column named colname is a timedelta64 fields, instead of writing "0 days 00:12:00.000000000",
          writes colname_min with the minutes.
+
+        If *output_format* is :py:attr:`Util.OUTPUT_FORMAT_NPZ`, the dataframe is written with
+        :py:meth:`Util.write_dataframe_npz` instead, to a file for the given *partition*.  Datetimes
+        are kept as datetimes rather than formatted.
         """
         df_cols = list(df.columns.values)
         df_toprint = df.copy()
 
         # if we're appending, figure out the header row
         header_row = None
-        if append and os.path.exists(output_file):
+        if output_format == Util.OUTPUT_FORMAT_CSV and append and os.path.exists(output_file):
             # get the columns
             df_file = open(output_file, 'rb')
             df_reader = csv.reader(df_file, delimiter=",")
@@ -236,15 +425,19 @@ class Util:
                 else:                               # replace
                     df_cols[col_idx] = new_colname
 
-            elif str(df_toprint.dtypes[col_idx]) == "datetime64[ns]":
+            elif str(df_toprint.dtypes[col_idx]) == "datetime64[ns]" and output_format == Util.OUTPUT_FORMAT_CSV:
                 # print as HH:MM:SS
-                df_toprint[df_cols[col_idx]] = df_toprint[df_cols[col_idx]].apply(Util.datetime64_formatter)
+                df_toprint[df_cols[col_idx]] = Util.format_times(df_toprint[df_cols[col_idx]].values)
 
             # print df_toprint.dtypes[col_idx]
 
         # the cols have new column names instead of old
         df_toprint = df_toprint[df_cols]
 
+        if output_format == Util.OUTPUT_FORMAT_NPZ:
+            Util.write_dataframe_npz(df_toprint, name, output_file, append, partition)
+            return
+
         # append
         if header_row:
             df_file = open(output_file, "a")
@@ -257,6 +450,142 @@ class Util:
             df_toprint.to_csv(output_file, index=False, float_format="%.10f")
             FastTripsLogger.info("Wrote %s dataframe to %s" % (name, output_file))
 
+    @staticmethod
+    def get_npz_filename(output_file, partition=None):
+        """
+        Returns the `.npz` file for the given *output_file* (e.g. `pathset_links.csv`) and *partition*,
+        e.g. `pathset_links.iter001.npz`.
+        """
+        (base, ext) = os.path.splitext(output_file)
+        if partition is None:
+            return "%s.npz" % base
+        return "%s.%s.npz" % (base, partition)
+
+    @staticmethod
+    def write_dataframe_npz(df, name, output_file, append=False, partition=None):
+        """
+        Writes the dataframe to a binary `.npz` file for the given *partition*, with one array per column.
+        See :py:meth:`Util.get_npz_filename`.  Rather than appending to a growing file, each partition
+        (e.g. each iteration) gets its own file.  If not *append*, existing partitions are removed first.
+        """
+        npz_file = Util.get_npz_filename(output_file, partition)
+        if not append:
+            for old_file in [Util.get_npz_filename(output_file)] + glob.glob(Util.get_npz_filename(output_file, "*")):
+                if os.path.exists(old_file): os.remove(old_file)
+
+        # key the columns by position since column names needn't be valid keys
+        df_cols = list(df.columns.values)
+        arrays  = dict(("col%d" % col_idx, numpy.asarray(df[df_cols[col_idx]])) for col_idx in range(len(df_cols)))
+        arrays[Util.NPZ_COLUMNS_KEY] = numpy.array(df_cols, dtype=str)
+        numpy.savez(npz_file, **arrays)
+        FastTripsLogger.info("Wrote %s dataframe to %s" % (name, npz_file))
+
+    @staticmethod
+    def read_dataframe_npz(output_file):
+        """
+        Reads the dataframe written by :py:meth:`Util.write_dataframe_npz` for *output_file*, concatenating
+        all its partitions in order.
+        """
+        npz_files = sorted(glob.glob(Util.get_npz_filename(output_file, "*")))
+        if os.path.exists(Util.get_npz_filename(output_file)):
+            npz_files.insert(0, Util.get_npz_filename(output_file))
+
+        dfs = []
+        for npz_file in npz_files:
+            npz_data = numpy.load(npz_file, allow_pickle=True)
+            df_cols  = list(npz_data[Util.NPZ_COLUMNS_KEY])
+            dfs.append(pandas.DataFrame(dict((df_cols[col_idx], npz_data["col%d" % col_idx]) for col_idx in range(len(df_cols))),
+                                        columns=df_cols))
+            npz_data.close()
+        return pandas.concat(dfs, ignore_index=True)
+
+    @staticmethod
+    def write_dataframe_columns(df, name, output_dir):
+        """
+        Writes the dataframe as a directory of `.npy` files, one per column, plus a
+        :py:attr:`Util.COLUMNS_SCHEMA_FILE`.  Columns are stored as typed binary arrays, so
+        :py:meth:`Util.read_dataframe_columns` can read them back without parsing, and read some of them or memory map them.
+
+        * datetime and timedelta columns are stored as int64 (nanoseconds, usually)
+        * numeric and boolean columns are stored as is, as are object columns holding numbers, converted
+          to the numeric type the csv reader would give them
+        * everything else (strings, categoricals) is stored as int32 codes plus an array of the categories
+
+        The directory is written next to *output_dir* and renamed, so it's complete if it exists.
+        """
+        temp_dir = "%s.tmp%d" % (output_dir, os.getpid())
+        if os.path.exists(temp_dir):
+            shutil.rmtree(temp_dir)
+        os.makedirs(temp_dir)
+
+        schema_columns = []
+        for col_idx in range(len(df.columns)):
+            colname   = df.columns[col_idx]
+            col       = df.iloc[:,col_idx]
+            col_dtype = str(col.dtype)
+            col_file  = "col%d.npy" % col_idx
+            if col_dtype != "category" and col.dtype.kind in "mM":
+                kind = Util.COLUMN_KIND_TIMES
+                numpy.save(os.path.join(temp_dir, col_file), col.values.view(numpy.int64))
+            elif col_dtype != "category" and col.dtype.kind in "biuf":
+                kind = Util.COLUMN_KIND_VALUES
+                numpy.save(os.path.join(temp_dir, col_file), col.values)
+            elif col_dtype == "object" and pandas.api.types.infer_dtype(col.values) in Util.NUMERIC_INFERRED_TYPES and col.notnull().any():
+                # numbers in an object column, e.g. ints mixed with NaN; the csv reader reads these as numbers.
+                # (All-null columns infer as floating too, but they may be string columns with no values.)
+                kind      = Util.COLUMN_KIND_VALUES
+                values    = pandas.to_numeric(col).values
+                col_dtype = str(values.dtype)
+                numpy.save(os.path.join(temp_dir, col_file), values)
+            else:
+                kind = Util.COLUMN_KIND_CATEGORY
+                (codes, categories) = pandas.factorize(numpy.asarray(col, dtype=object))
+                numpy.save(os.path.join(temp_dir, col_file), codes.astype(numpy.int32))
+                numpy.save(os.path.join(temp_dir, "col%d_categories.npy" % col_idx), numpy.asarray(categories, dtype=object))
+            schema_columns.append({"name":colname, "kind":kind, "dtype":col_dtype, "file":col_file})
+
+        # schema last, so it's newer than the columns
+        with open(os.path.join(temp_dir, Util.COLUMNS_SCHEMA_FILE), 'w') as schema_file:
+            json.dump({"name":name, "num_rows":len(df), "columns":schema_columns}, schema_file, indent=1)
+
+        if os.path.exists(output_dir):
+            shutil.rmtree(output_dir)
+        os.rename(temp_dir, output_dir)
+        FastTripsLogger.info("Wrote %s dataframe to %s" % (name, output_dir))
+
+    @staticmethod
+    def read_dataframe_columns(input_dir, columns=None, mmap_mode=None, categorical=False):
+        """
+        Reads a dataframe written by :py:meth:`Util.write_dataframe_columns`.  If *columns* is passed,
+        only those columns are read.  *mmap_mode* is passed to :py:func:`numpy.load` so the column files
+        can be memory mapped rather than read.  String columns are decoded to objects unless *categorical*,
+        in which case they're :py:class:`pandas.Categorical`.
+        """
+        with open(os.path.join(input_dir, Util.COLUMNS_SCHEMA_FILE), 'r') as schema_file:
+            schema = json.load(schema_file)
+
+        schema_columns = [dict((str(k), str(v)) for (k,v) in col_schema.items()) for col_schema in schema["columns"]]
+        if columns is not None:
+            schema_columns = [col_schema for col_schema in schema_columns if col_schema["name"] in columns]
+
+        col_values = collections.OrderedDict()
+        for col_schema in schema_columns:
+            values = numpy.load(os.path.join(input_dir, col_schema["file"]), mmap_mode=mmap_mode)
+            if col_schema["kind"] == Util.COLUMN_KIND_TIMES:
+                values = values.view(col_schema["dtype"])
+            elif col_schema["kind"] == Util.COLUMN_KIND_CATEGORY:
+                categories = numpy.load(os.path.join(input_dir, col_schema["file"].replace(".npy","_categories.npy")), allow_pickle=True)
+                if categorical:
+                    values = pandas.Categorical.from_codes(values, categories)
+                else:
+                    # code -1 (null) picks the NaN on the end
+                    values = numpy.append(categories, numpy.nan).astype(object)[values]
+            col_values[col_schema["name"]] = values
+
+        df = pandas.DataFrame(col_values, columns=list(col_values.keys()))
+        FastTripsLogger.info("Read %s dataframe from %s" % (schema["name"], input_dir))
+        return df
+
     @staticmethod
     def calculate_distance_miles(dataframe, origin_lat, origin_lon, destination_lat, destination_lon, distance_colname):
         """
@@ -297,7 +626,30 @@ class Util:
             return "Uknown; please install python package psutil"
 
         p = psutil.Process()
-        bytes = p.memory_info().rss
+        return Util.bytes_str(p.memory_info().rss)
+
+    @staticmethod
+    def get_process_peak_mem_use_str():
+        """
+        Returns a string representing the peak process memory use.
+        """
+        try:
+            import resource
+
+        except ImportError:
+            return "Unknown; not available on this platform"
+
+        # ru_maxrss is in kilobytes, except on OS X where it's bytes
+        peak_bytes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform != "darwin":
+            peak_bytes *= 1024
+        return Util.bytes_str(peak_bytes)
+
+    @staticmethod
+    def bytes_str(bytes):
+        """
+        Returns a string representing the given number of bytes, e.g. `1.5 GB`
+        """
         if bytes < 1024:
             return "%d bytes" % bytes
         if bytes < 1024*1024:
@@ -15,11 +15,17 @@ __license__   = """
 
 from .Assignment import Assignment
 from .FastTrips import FastTrips
-from .Logger import FastTripsLogger, setupLogging
+from .GTFSReader import GTFSReader
+from .Logger import FastTripsLogger, setupLogging, setDebugLog
+from .NetworkCache import NetworkCache
+from .OutputWriter import OutputWriter
 from .Passenger import Passenger
 from .PathSet import PathSet
+from .PathSetStore import PathSetStore, PathSetView
 from .Performance import Performance
 from .Route import Route
+from .Skim import Skim
+from .StageTimer import StageTimer
 from .Stop import Stop
 from .TAZ import TAZ
 from .Transfer import Transfer
@@ -29,10 +35,16 @@ from .Util import Util
 __all__ = [
     'Event',
     'FastTrips',
-    'FastTripsLogger','setupLogging',
+    'FastTripsLogger','setupLogging','setDebugLog',
+    'GTFSReader',
+    'NetworkCache',
+    'OutputWriter',
     'Passenger',
     'PathSet',
+    'PathSetStore','PathSetView',
     'Route',
+    'Skim',
+    'StageTimer',
     'Stop',
     'TAZ',
     'Trip',
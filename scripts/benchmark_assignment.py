@@ -0,0 +1,230 @@
+import argparse, datetime, json, os, platform, subprocess, sys, time
+import pandas
+
+from create_synthetic_network import create_network, create_demand
+
+USAGE = r"""
+
+  python benchmark_assignment.py [--sizes|-s size ...] [--pathfinding_types|-p type ...] [--iters|-i #iters]
+                                 [--processes #processes] [--debug_log full|sampled|off]
+                                 [--baseline baseline.json] [--tolerance fraction]
+                                 work_dir results.json
+
+  Runs fast-trips assignment on synthetic networks (see create_synthetic_network.py) of the given sizes
+  (from smallest to largest: %s) with each pathfinding type (deterministic, stochastic), each in its own
+  process, and writes the results to results.json: pathfinding paths per second, total time, the time of
+  each stage from ft_output_stage_timings.csv and peak memory.
+
+  The debug_log setting (see the README) is given to every run, so running once with full and once with off
+  measures what the debug logging costs.
+
+  The networks are created in work_dir the first time they're needed, and each run's output is written there.
+
+  If a baseline results file is given, the results are compared to it and the script exits with status 1
+  if any run found paths more slowly or took more time or memory than the baseline by more than the tolerance.
+
+  e.g.
+
+  python scripts\benchmark_assignment.py -s small medium benchmark benchmark\results.json
+  python scripts\benchmark_assignment.py -s small medium --baseline benchmark\results.json benchmark benchmark\results_new.json
+
+"""
+
+#: Synthetic network and demand parameters for each size.  See :py:func:`create_synthetic_network.create_network`.
+SIZES = [
+    ("tiny",   {"grid_size":10, "route_spacing":3, "headway_min":15.0, "num_tazs":20,   "num_pnr_lots":2,  "num_trips":500    }),
+    ("small",  {"grid_size":20, "route_spacing":2, "headway_min":10.0, "num_tazs":100,  "num_pnr_lots":4,  "num_trips":5000   }),
+    ("medium", {"grid_size":40, "route_spacing":3, "headway_min":10.0, "num_tazs":400,  "num_pnr_lots":10, "num_trips":50000  }),
+    ("large",  {"grid_size":80, "route_spacing":3, "headway_min":7.5,  "num_tazs":1600, "num_pnr_lots":40, "num_trips":500000 }),
+]
+SIZE_PARAMS = dict(SIZES)
+
+#: Random seed for the synthetic networks, so they're the same every time
+SEED        = 1
+
+#: Name of the file the single run process writes its results to, in its output directory
+RUN_RESULT_FILE = "benchmark_run.json"
+
+#: Stage (from ft_output_stage_timings.csv) that finds paths
+PATHFINDING_STAGE = "generate pathsets"
+
+def get_peak_memory_bytes(who):
+    """
+    Returns the peak resident memory in bytes for *who*, one of :py:data:`resource.RUSAGE_SELF` or :py:data:`resource.RUSAGE_CHILDREN`,
+    or None if that's not available on this platform.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    # ru_maxrss is in kilobytes, except on OS X where it's bytes
+    peak_bytes = resource.getrusage(getattr(resource, who)).ru_maxrss
+    if sys.platform != "darwin":
+        peak_bytes *= 1024
+    return peak_bytes
+
+def run_one(network_dir, demand_dir, output_dir, pathfinding_type, iters, processes, debug_log):
+    """
+    Runs fast-trips on the given network and demand, like runTest.py, and writes the time taken and
+    the peak memory to :py:data:`RUN_RESULT_FILE` in *output_dir*.  This runs in its own process.
+    """
+    import fasttrips
+
+    start = time.time()
+    ft = fasttrips.FastTrips(network_dir, demand_dir, output_dir)
+    ft.read_configuration()
+
+    fasttrips.Assignment.PATHFINDING_TYPE    = pathfinding_type
+    fasttrips.Assignment.ITERATION_FLAG      = iters
+    fasttrips.Assignment.NUMBER_OF_PROCESSES = processes
+    fasttrips.Assignment.DEBUG_LOG           = debug_log
+    fasttrips.setDebugLog(debug_log)
+
+    ft.read_input_files()
+    ft.run_assignment(output_dir)
+
+    result = {"total_seconds"             : time.time() - start,
+              "peak_memory_bytes"         : get_peak_memory_bytes("RUSAGE_SELF"),
+              "peak_worker_memory_bytes"  : get_peak_memory_bytes("RUSAGE_CHILDREN")}
+    result_file = open(os.path.join(output_dir, RUN_RESULT_FILE), "w")
+    json.dump(result, result_file)
+    result_file.close()
+
+def summarize_run(output_dir):
+    """
+    Reads the outputs of a run in *output_dir* and returns a dict of its benchmark results.
+    """
+    import fasttrips
+    StageTimer  = fasttrips.StageTimer
+    Performance = fasttrips.Performance
+
+    result_file = open(os.path.join(output_dir, RUN_RESULT_FILE))
+    result      = json.load(result_file)
+    result_file.close()
+
+    # time in each stage, summed over iterations
+    stages_df   = pandas.read_csv(os.path.join(output_dir, StageTimer.OUTPUT_STAGE_TIMINGS_FILE))
+    stage_sums  = stages_df.groupby(StageTimer.STAGE_COLUMN_STAGE)[StageTimer.STAGE_COLUMN_WALL_SECONDS].sum()
+    result["stage_seconds"] = dict((stage, float(seconds)) for (stage, seconds) in stage_sums.iteritems())
+
+    # paths found per second of pathfinding
+    pathfinding_df = stages_df.loc[stages_df[StageTimer.STAGE_COLUMN_STAGE] == PATHFINDING_STAGE]
+    result["paths_found"]         = int(pathfinding_df[StageTimer.STAGE_COLUMN_NUM_ROWS].sum())
+    result["pathfinding_seconds"] = float(pathfinding_df[StageTimer.STAGE_COLUMN_WALL_SECONDS].sum())
+    result["paths_per_second"]    = result["paths_found"]/result["pathfinding_seconds"] if result["pathfinding_seconds"] > 0 else None
+
+    # per-trip labeling time, for all processes in the last iteration
+    summary_file = os.path.join(output_dir, Performance.OUTPUT_PERFORMANCE_SUMMARY_FILE)
+    if os.path.exists(summary_file):
+        summary_df = pandas.read_csv(summary_file)
+        summary_df = summary_df.loc[(summary_df[Performance.SUMMARY_COLUMN_ITERATION  ] == summary_df[Performance.SUMMARY_COLUMN_ITERATION].max())&
+                                    (summary_df[Performance.SUMMARY_COLUMN_PROCESS_NUM] == Performance.SUMMARY_ALL_PROCESSES)&
+                                    (summary_df[Performance.SUMMARY_COLUMN_MEASURE    ] == Performance.PERFORMANCE_COLUMN_TIME_LABELING_MS)]
+        if len(summary_df) > 0:
+            for colname in [Performance.SUMMARY_COLUMN_MEAN, "p50", "p99", Performance.SUMMARY_COLUMN_MAX]:
+                result["labeling_ms_%s" % colname] = float(summary_df[colname].iloc[0])
+    return result
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    Prints a comparison of *results* to *baseline* (both as written by this script), by size and pathfinding type.
+    Returns the number of regressions: runs that found paths more slowly, or took more time or memory, by more than *tolerance*.
+    """
+    baseline_runs = dict(((run["size"], run["pathfinding_type"]), run) for run in baseline["runs"])
+    # (result key, True if bigger is better)
+    measures      = [("paths_per_second", True), ("total_seconds", False), ("peak_memory_bytes", False)]
+
+    num_regressions = 0
+    print
+    print "%-8s %-14s %-18s %14s %14s %8s" % ("size", "pathfinding", "measure", "baseline", "result", "change")
+    for run in results["runs"]:
+        key = (run["size"], run["pathfinding_type"])
+        if key not in baseline_runs:
+            print "%-8s %-14s not in baseline" % key
+            continue
+
+        for (measure, bigger_is_better) in measures:
+            if run.get(measure) is None or not baseline_runs[key].get(measure): continue
+            change     = float(run[measure])/baseline_runs[key][measure] - 1.0
+            regression = (change < -tolerance) if bigger_is_better else (change > tolerance)
+            if regression: num_regressions += 1
+            print "%-8s %-14s %-18s %14.2f %14.2f %+7.1f%% %s" % (run["size"], run["pathfinding_type"], measure,
+                                                                  baseline_runs[key][measure], run[measure], 100.0*change,
+                                                                  "REGRESSION" if regression else "")
+    return num_regressions
+
+if __name__ == "__main__":
+
+    # a single run, in its own process so its memory use is its own
+    if len(sys.argv) > 1 and sys.argv[1] == "run_one":
+        (network_dir, demand_dir, output_dir, pathfinding_type, iters, processes, debug_log) = sys.argv[2:9]
+        run_one(network_dir, demand_dir, output_dir, pathfinding_type, int(iters), int(processes), debug_log)
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(usage=USAGE % ", ".join([size for (size, params) in SIZES]))
+    parser.add_argument('-s','--sizes',             nargs='+', choices=SIZE_PARAMS.keys(), default=["tiny","small"], help="Network sizes to run")
+    parser.add_argument('-p','--pathfinding_types', nargs='+', choices=['deterministic','stochastic'],
+                                                    default=['deterministic','stochastic'],   help="Pathfinding types to run")
+    parser.add_argument('-i','--iters',             type=int,   default=1,    help="Number of assignment iterations to run")
+    parser.add_argument('--processes',              type=int,   default=0,    help="Number of pathfinding processes; 0 for the number of CPUs")
+    parser.add_argument('--debug_log',              choices=['full','sampled','off'], default='full', help="Debug log setting for the runs")
+    parser.add_argument('--baseline',               type=str,                 help="Results file to compare to")
+    parser.add_argument('--tolerance',              type=float, default=0.1,  help="Fractional change from the baseline that's a regression")
+    parser.add_argument("work_dir",                 type=str,                 help="Location to write the networks and run outputs")
+    parser.add_argument("results_file",             type=str,                 help="JSON file to write the results to")
+    args = parser.parse_args(sys.argv[1:])
+
+    results = {"created"  : datetime.datetime.now().isoformat(),
+               "platform" : platform.platform(),
+               "python"   : platform.python_version(),
+               "iters"    : args.iters,
+               "processes": args.processes,
+               "debug_log": args.debug_log,
+               "runs"     : []}
+
+    # smallest first
+    sizes = [size for (size, params) in SIZES if size in args.sizes]
+    for size in sizes:
+        params      = SIZE_PARAMS[size]
+        network_dir = os.path.join(args.work_dir, size, "network")
+        demand_dir  = os.path.join(args.work_dir, size, "demand")
+        if not os.path.exists(network_dir) or not os.path.exists(demand_dir):
+            (stops_df, tazs_df, lots_df) = create_network(network_dir, params["grid_size"], params["route_spacing"], params["headway_min"],
+                                                          params["num_tazs"], params["num_pnr_lots"], SEED)
+            create_demand(demand_dir, tazs_df, lots_df, params["num_trips"], SEED)
+
+        for pathfinding_type in args.pathfinding_types:
+            output_dir = os.path.join(args.work_dir, size, "output_%s_iter%d_debug%s" % (pathfinding_type, args.iters, args.debug_log))
+            if not os.path.exists(output_dir): os.makedirs(output_dir)
+
+            print "Running %s %s assignment in %s" % (size, pathfinding_type, output_dir)
+            status = subprocess.call([sys.executable, os.path.abspath(__file__), "run_one",
+                                      network_dir, demand_dir, output_dir, pathfinding_type, str(args.iters), str(args.processes),
+                                      args.debug_log])
+            if status != 0:
+                print "%s %s assignment failed with status %d; see the logs in %s" % (size, pathfinding_type, status, output_dir)
+                sys.exit(2)
+
+            run = summarize_run(output_dir)
+            run.update({"size":size, "pathfinding_type":pathfinding_type})
+            run.update(params)
+            results["runs"].append(run)
+            print "%s %s: %d paths in %.1f sec (%.1f paths/sec); total %.1f sec" % \
+                (size, pathfinding_type, run["paths_found"], run["pathfinding_seconds"], run["paths_per_second"] or 0, run["total_seconds"])
+
+            # write as we go in case we're stopped
+            results_out = open(args.results_file, "w")
+            json.dump(results, results_out, indent=2, sort_keys=True)
+            results_out.close()
+
+    print "Wrote %s" % args.results_file
+
+    if args.baseline:
+        baseline_in = open(args.baseline)
+        baseline    = json.load(baseline_in)
+        baseline_in.close()
+        num_regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if num_regressions > 0:
+            print "%d regressions from %s" % (num_regressions, args.baseline)
+            sys.exit(1)
@@ -0,0 +1,70 @@
+import argparse, sys, time
+import numpy, pandas
+
+from fasttrips import Util
+
+USAGE = r"""
+
+  python benchmark_read_times.py [--num_times|-n #times] [--blank_fraction|-b fraction] [--repeat|-r #]
+
+  Times Util.read_times() against mapping Util.read_time() over a synthetic column of HH:MM:SS strings
+  like the GTFS stop_times arrival and departure times, and checks that both produce the same times.
+
+  e.g.
+
+  python scripts\benchmark_read_times.py -n 1000000 -b 0.1
+
+"""
+
+def make_times(num_times, blank_fraction, seed):
+    """
+    Creates an object array of zero-padded HH:MM:SS strings between 4a and 28:00:00 (4a the next day),
+    with *blank_fraction* of them blank or null.
+    """
+    numpy.random.seed(seed)
+    time_sec = numpy.random.randint(4*60*60, 28*60*60, size=num_times)
+    times    = numpy.array(["%02d:%02d:%02d" % (sec//3600, (sec//60)%60, sec%60) for sec in time_sec], dtype=object)
+
+    blank    = numpy.random.rand(num_times) < blank_fraction
+    times[blank] = numpy.where(numpy.random.rand(blank.sum()) < 0.5, "", None)
+    return times
+
+def time_it(read_func, times, repeat):
+    """
+    Runs *read_func* on *times* *repeat* times.  Returns (best seconds, result).
+    """
+    best = None
+    for rep in range(repeat):
+        start    = time.time()
+        result   = read_func(times)
+        elapsed  = time.time() - start
+        if best is None or elapsed < best: best = elapsed
+    return (best, result)
+
+def legacy_read_times(times):
+    """
+    Reads the times a row at a time, the way the network and demand readers used to.
+    """
+    return pandas.Series(times).map(lambda x: Util.read_time(x if x is not None else "")).values.astype("datetime64[ns]")
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(usage=USAGE)
+    parser.add_argument('-n','--num_times',      type=int,   default=1000000, help="Number of times to read")
+    parser.add_argument('-b','--blank_fraction', type=float, default=0.0,     help="Fraction of the times that are blank or null")
+    parser.add_argument('-r','--repeat',         type=int,   default=3,       help="Number of times to run each, keeping the best")
+    parser.add_argument('--seed',                type=int,   default=1,       help="Random seed for the synthetic times")
+    args = parser.parse_args(sys.argv[1:])
+
+    times = make_times(args.num_times, args.blank_fraction, args.seed)
+    print "Synthetic times: %d with %d blank or null" % (len(times), pandas.isnull(times).sum() + (times == "").sum())
+
+    (legacy_secs,  legacy_times ) = time_it(legacy_read_times, times, args.repeat)
+    (current_secs, current_times) = time_it(Util.read_times,   times, args.repeat)
+
+    million = len(times)/1000000.0
+    print "legacy  map(read_time): %8.3f sec (%8.3f sec per million)" % (legacy_secs,  legacy_secs /million)
+    print "current read_times:     %8.3f sec (%8.3f sec per million, %.1fx)" % (current_secs, current_secs/million, legacy_secs/current_secs)
+    if not numpy.array_equal(legacy_times, current_times):
+        print "Results differ!"
+        sys.exit(1)
@@ -0,0 +1,300 @@
+import argparse, datetime, sys, time
+import numpy, pandas
+
+from fasttrips import FastTripsLogger, Trip, Util
+
+USAGE = r"""
+
+  python benchmark_update_trip_times.py [--num_stop_times|-n #stop_times] [--stops_per_trip|-s #stops] [--msa] [--repeat|-r #]
+
+  Times Trip.update_trip_times() against the previous merge/groupby implementation on a synthetic
+  vehicle trips table, and checks that both produce the same arrival and departure times.
+
+  e.g.
+
+  python scripts\benchmark_update_trip_times.py -n 1000000
+
+"""
+
+def make_vehicle_trips(num_stop_times, stops_per_trip, seed):
+    """
+    Creates a synthetic vehicle trips table like :py:meth:`Trip.get_full_trips` with loads,
+    sorted by trip_id_num and stop_sequence.
+
+    The legacy implementation can't convert a null travel time, so last stops get a zero travel time.
+    """
+    numpy.random.seed(seed)
+    num_trips  = max(1, num_stop_times//stops_per_trip)
+    num_rows   = num_trips*stops_per_trip
+
+    trip_id_num   = numpy.repeat(numpy.arange(1, num_trips+1), stops_per_trip)
+    stop_sequence = numpy.tile(numpy.arange(1, stops_per_trip+1), num_trips)
+
+    # trips start between 5a and 10p, links take 1-4 minutes and scheduled dwells 0-30 seconds
+    trip_start    = numpy.datetime64(str(Util.SIMULATION_DAY)) + \
+                    numpy.random.randint(5*60*60, 22*60*60, size=num_trips).astype("timedelta64[s]")
+    travel_sec    = numpy.random.randint(60, 4*60, size=num_rows).astype(numpy.float64)
+    travel_sec[stop_sequence==stops_per_trip] = 0.0
+    dwell_sec     = numpy.random.randint(0, 30, size=num_rows).astype(numpy.float64)
+    cum_sec       = (travel_sec + dwell_sec).reshape(num_trips, stops_per_trip).cumsum(axis=1)
+    cum_sec       = numpy.hstack([numpy.zeros((num_trips,1)), cum_sec[:,:-1]]).ravel()
+    arrival_time  = numpy.repeat(trip_start, stops_per_trip).astype("datetime64[ns]") + (cum_sec*1000000000).astype("timedelta64[ns]")
+
+    vehicle_name  = numpy.where(numpy.arange(num_trips)%3 == 0, "train", "bus")
+    vehicles_df   = pandas.DataFrame({Trip.VEHICLES_COLUMN_VEHICLE_NAME     :["bus", "train"],
+                                      Trip.VEHICLES_COLUMN_SEATED_CAPACITY  :[30, 120],
+                                      Trip.VEHICLES_COLUMN_MAXIMUM_SPEED_FPS:[40*5280.0/3600.0, 70*5280.0/3600.0],
+                                      Trip.VEHICLES_COLUMN_ACCELERATION     :[3.0, 2.0],
+                                      Trip.VEHICLES_COLUMN_DECELERATION     :[4.0, 2.5],
+                                      Trip.VEHICLES_COLUMN_DWELL_FORMULA    :["4 + 2*[boards] + 1.5*[alights]",
+                                                                              "10 + max([boards],[alights])"]})
+
+    veh_trips_df = pandas.DataFrame({Trip.STOPTIMES_COLUMN_TRIP_ID              :numpy.char.add("trip_", trip_id_num.astype(str)),
+                                     Trip.STOPTIMES_COLUMN_TRIP_ID_NUM          :trip_id_num,
+                                     Trip.STOPTIMES_COLUMN_STOP_SEQUENCE        :stop_sequence,
+                                     Trip.TRIPS_COLUMN_MAX_STOP_SEQUENCE        :stops_per_trip,
+                                     Trip.TRIPS_COLUMN_VEHICLE_NAME             :numpy.repeat(vehicle_name, stops_per_trip),
+                                     Trip.TRIPS_COLUMN_TRIP_DEPARTURE_TIME      :numpy.repeat(trip_start, stops_per_trip).astype("datetime64[ns]") + \
+                                                                                 numpy.repeat(dwell_sec[::stops_per_trip]*1000000000, stops_per_trip).astype("timedelta64[ns]"),
+                                     Trip.STOPTIMES_COLUMN_ARRIVAL_TIME         :arrival_time,
+                                     Trip.STOPTIMES_COLUMN_DEPARTURE_TIME       :arrival_time + (dwell_sec*1000000000).astype("timedelta64[ns]"),
+                                     Trip.STOPTIMES_COLUMN_ORIGINAL_TRAVEL_TIME :(travel_sec*1000000000).astype("timedelta64[ns]"),
+                                     Trip.STOPTIMES_COLUMN_DWELL_TIME           :(dwell_sec*1000000000).astype("timedelta64[ns]"),
+                                     Trip.STOPTIMES_COLUMN_DWELL_TIME_SEC       :dwell_sec})
+    veh_trips_df = pandas.merge(left=veh_trips_df, right=vehicles_df, how="left")
+    Trip.reset_onboard(veh_trips_df)
+
+    # random loads
+    boards  = numpy.random.poisson(1.5, size=num_rows)
+    alights = numpy.random.poisson(1.5, size=num_rows)
+    veh_trips_df[Trip.SIM_COL_VEH_BOARDS      ] = boards
+    veh_trips_df[Trip.SIM_COL_VEH_ALIGHTS     ] = alights
+    veh_trips_df[Trip.SIM_COL_VEH_ONBOARD     ] = numpy.random.poisson(25, size=num_rows)
+    veh_trips_df[Trip.SIM_COL_VEH_MSA_BOARDS  ] = boards *0.9
+    veh_trips_df[Trip.SIM_COL_VEH_MSA_ALIGHTS ] = alights*0.9
+    veh_trips_df[Trip.SIM_COL_VEH_MSA_ONBOARD ] = veh_trips_df[Trip.SIM_COL_VEH_ONBOARD]*0.9
+    return veh_trips_df
+
+def time_it(update_func, veh_trips_df, msa_results, repeat):
+    """
+    Runs *update_func* on a copy of *veh_trips_df* *repeat* times.  Returns (best seconds, result).
+    """
+    best = None
+    for rep in range(repeat):
+        trips_df = veh_trips_df.copy()
+        start    = time.time()
+        result   = update_func(trips_df, msa_results)
+        elapsed  = time.time() - start
+        if best is None or elapsed < best: best = elapsed
+    return (best, result)
+
+def legacy_update_trip_times(trips_df, MSA_RESULTS):
+    """
+    The merge/groupby version of :py:meth:`Trip.update_trip_times`, kept here for comparison.
+    """
+    trips_df_len = len(trips_df)
+    FastTripsLogger.debug("Trip.update_trip_times() trips_df has %d rows" % len(trips_df))
+    # FastTripsLogger.debug("trips_df.dtypes=\n%s\n" % str(trips_df.dtypes))
+    trip_cols = list(trips_df.columns.values)
+
+    # Default to 0
+    trips_df[Trip.SIM_COL_VEH_FRICTION    ] = 0.0
+    trips_df[Trip.SIM_COL_VEH_MSA_FRICTION] = 0.0
+
+    if Trip.VEHICLES_COLUMN_SEATED_CAPACITY in trip_cols:
+
+        # log null seated capacities
+        if pandas.isnull(trips_df[Trip.VEHICLES_COLUMN_SEATED_CAPACITY]).sum() > 0:
+            FastTripsLogger.warn("Trip.update_trip_times(): some [%s] not configured; assuming zero friction for those vehicles" % Trip.VEHICLES_COLUMN_SEATED_CAPACITY)
+            FastTripsLogger.warn("\n%s" % trips_df[[Trip.VEHICLES_COLUMN_VEHICLE_NAME, Trip.VEHICLES_COLUMN_SEATED_CAPACITY]].loc[pandas.isnull(trips_df[Trip.VEHICLES_COLUMN_SEATED_CAPACITY])].drop_duplicates())
+
+        # set standeeds
+        trips_df[Trip.SIM_COL_VEH_STANDEES    ] = trips_df[Trip.SIM_COL_VEH_ONBOARD    ] - trips_df[Trip.VEHICLES_COLUMN_SEATED_CAPACITY]
+        trips_df[Trip.SIM_COL_VEH_MSA_STANDEES] = trips_df[Trip.SIM_COL_VEH_MSA_ONBOARD] - trips_df[Trip.VEHICLES_COLUMN_SEATED_CAPACITY]
+        # it can only be non-negative
+        trips_df.loc[trips_df[Trip.SIM_COL_VEH_STANDEES    ]<0, Trip.SIM_COL_VEH_STANDEES    ] = 0
+        trips_df.loc[trips_df[Trip.SIM_COL_VEH_MSA_STANDEES]<0, Trip.SIM_COL_VEH_MSA_STANDEES] = 0
+        # where it is positive, friction = on+off+standees
+        trips_df.loc[(trips_df[Trip.SIM_COL_VEH_STANDEES    ]>0)&(pandas.notnull(trips_df[Trip.VEHICLES_COLUMN_SEATED_CAPACITY])), Trip.SIM_COL_VEH_FRICTION    ] = \
+            trips_df[Trip.SIM_COL_VEH_BOARDS    ] + trips_df[Trip.SIM_COL_VEH_ALIGHTS    ] + trips_df[Trip.SIM_COL_VEH_STANDEES    ]
+        trips_df.loc[(trips_df[Trip.SIM_COL_VEH_MSA_STANDEES]>0)&(pandas.notnull(trips_df[Trip.VEHICLES_COLUMN_SEATED_CAPACITY])), Trip.SIM_COL_VEH_MSA_FRICTION] = \
+            trips_df[Trip.SIM_COL_VEH_MSA_BOARDS] + trips_df[Trip.SIM_COL_VEH_MSA_ALIGHTS] + trips_df[Trip.SIM_COL_VEH_MSA_STANDEES]
+    else:
+        # log no seated capacities at all
+        FastTripsLogger.warn("Trip.update_trip_times(): Cannot calculate friction because [%s] not configured" % Trip.VEHICLES_COLUMN_SEATED_CAPACITY)
+
+    # Update the dwell time
+    if Trip.VEHICLES_COLUMN_DWELL_FORMULA in trip_cols:
+        # no formula means no dwell time
+        dwell_time_sec = numpy.zeros(trips_df_len, dtype=numpy.float64)
+        # each unique dwell formula is evaluated once, over the load arrays for its trip-stops
+        (formula_codes, dwell_formulas) = pandas.factorize(trips_df[Trip.VEHICLES_COLUMN_DWELL_FORMULA].values)
+        for formula_num in range(len(dwell_formulas)):
+            (formula_tree, variables) = Trip.compile_dwell_formula(dwell_formulas[formula_num])
+            if len(dwell_formulas) == 1 and formula_codes.min() == 0:
+                rows = slice(None)
+            else:
+                rows = numpy.flatnonzero(formula_codes == formula_num)
+            FastTripsLogger.debug("dwell_formula %s has %d rows" % (str(dwell_formulas[formula_num]), len(dwell_time_sec[rows])))
+
+            # [boards], [alights], etc are trips_df boards, alights, etc, or msa_boards, msa_alights, etc
+            variable_values = {}
+            for variable in variables:
+                colname = ("msa_" + variable) if MSA_RESULTS else variable
+                variable_values[variable] = trips_df[colname].values[rows].astype(numpy.float64)
+            dwell_time_sec[rows] = Trip.evaluate_dwell_formula(formula_tree, variable_values)
+
+        trips_df[Trip.STOPTIMES_COLUMN_DWELL_TIME_SEC] = dwell_time_sec
+
+        # keep the dwell time
+        trips_df[Trip.STOPTIMES_COLUMN_DWELL_TIME] = trips_df[Trip.STOPTIMES_COLUMN_DWELL_TIME_SEC].map(lambda x: datetime.timedelta(seconds=x))
+
+    # the vehicle stops if someone boards or someone alights or both
+    trips_df["does_stop"] = (trips_df[Trip.SIM_COL_VEH_BOARDS]>0) | (trips_df[Trip.SIM_COL_VEH_ALIGHTS]>0)
+
+    # we need information about the next stop
+    next_stop_df = trips_df[[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
+                             Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,
+                             Trip.TRIPS_COLUMN_MAX_STOP_SEQUENCE,
+                             "does_stop"]].copy()
+    next_stop_df.loc[:,"is_last_stop"] = next_stop_df[Trip.STOPTIMES_COLUMN_STOP_SEQUENCE] == next_stop_df[Trip.TRIPS_COLUMN_MAX_STOP_SEQUENCE]
+    next_stop_df.loc[:,Trip.STOPTIMES_COLUMN_STOP_SEQUENCE] = next_stop_df[Trip.STOPTIMES_COLUMN_STOP_SEQUENCE]-1
+    next_stop_df.rename(columns={"does_stop"                       :"next_does_stop",
+                                 "is_last_stop"                    :"next_is_last_stop"}, inplace=True)
+    FastTripsLogger.debug("next_stop_df:\n%s\n" % next_stop_df.head().to_string())
+
+    trips_df = pandas.merge(left=trips_df, right=next_stop_df, how='left')
+    assert(trips_df_len==len(trips_df))
+
+    # Start with original travel time for the link FROM this stop to the NEXT stop
+    trip_cols = list(trips_df.columns.values)
+
+    # Add acceleration from stop if there are boards/alights
+    # Skip first stop because we assume it's already there, and last since we don't go anywhere
+    trips_df["accel_secs"] = 0.0
+    if (Trip.VEHICLES_COLUMN_MAXIMUM_SPEED_FPS in trip_cols) and \
+       (Trip.VEHICLES_COLUMN_ACCELERATION in trip_cols):
+        trips_df.loc[trips_df["does_stop"] & (trips_df[Trip.STOPTIMES_COLUMN_STOP_SEQUENCE]>1) & \
+                     (trips_df[Trip.STOPTIMES_COLUMN_STOP_SEQUENCE]<trips_df[Trip.TRIPS_COLUMN_MAX_STOP_SEQUENCE]), "accel_secs"] = \
+                        trips_df[Trip.VEHICLES_COLUMN_MAXIMUM_SPEED_FPS]/trips_df[Trip.VEHICLES_COLUMN_ACCELERATION]
+    # Add deceleration to next stop.
+    # Skip stop with next stop = last stop because we assume it's already there
+    trips_df["decel_secs"] = 0.0
+    if (Trip.VEHICLES_COLUMN_MAXIMUM_SPEED_FPS in trip_cols) and \
+       (Trip.VEHICLES_COLUMN_DECELERATION in trip_cols):
+        trips_df.loc[(trips_df["next_does_stop"]) & (trips_df["next_is_last_stop"]==False), "decel_secs"] = \
+                        trips_df[Trip.VEHICLES_COLUMN_MAXIMUM_SPEED_FPS]/trips_df[Trip.VEHICLES_COLUMN_DECELERATION]
+
+    # update the travel time
+    trips_df[Trip.STOPTIMES_COLUMN_TRAVEL_TIME_SEC] = (trips_df[Trip.STOPTIMES_COLUMN_ORIGINAL_TRAVEL_TIME]/numpy.timedelta64(1, 's')) + trips_df["accel_secs"] + trips_df["decel_secs"]
+    trips_df[Trip.STOPTIMES_COLUMN_TRAVEL_TIME    ] = trips_df[Trip.STOPTIMES_COLUMN_TRAVEL_TIME_SEC].map(lambda x: datetime.timedelta(seconds=x))
+
+    # put travel time + dwell together because that's the full time for a link (stop arrival time to next stop arrival time)
+    trips_df["travel_dwell_sec"] = trips_df[Trip.STOPTIMES_COLUMN_TRAVEL_TIME_SEC] + trips_df[Trip.STOPTIMES_COLUMN_DWELL_TIME_SEC]
+    # cumulatively sum it to get arrival times times for the trip
+    trips_df["travel_dwell_sec_cum"] = trips_df.groupby([Trip.STOPTIMES_COLUMN_TRIP_ID_NUM])["travel_dwell_sec"].cumsum()
+    trips_df["travel_dwell_cum"    ] = trips_df["travel_dwell_sec_cum"].map(lambda x: datetime.timedelta(seconds=x) if pandas.notnull(x) else None)
+    # verifying cumsum did as expected
+    # FastTripsLogger.debug("\n"+ trips_df[[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM, Trip.STOPTIMES_COLUMN_STOP_SEQUENCE, "travel_dwell_sec","travel_dwell_sec_cum"]].to_string())
+
+    # move the next arrival time for joining to the next stop
+    next_stop_df = trips_df[[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
+                             Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,
+                             Trip.TRIPS_COLUMN_TRIP_DEPARTURE_TIME,
+                             "travel_dwell_cum"]].copy()
+    # need to start from trip arrival time.  For some reason can't aggregate STOPTIMES_COLUMN_DWELL_TIME, only the seconds version
+    first_dwell_df = trips_df[[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,Trip.STOPTIMES_COLUMN_DWELL_TIME_SEC]]. \
+        groupby([Trip.STOPTIMES_COLUMN_TRIP_ID_NUM]).agg({Trip.STOPTIMES_COLUMN_DWELL_TIME_SEC:'first'}).reset_index()
+    first_dwell_df.rename(columns={Trip.STOPTIMES_COLUMN_DWELL_TIME_SEC:"trip_first_dwell_sec"}, inplace=True)
+    first_dwell_df["trip_first_dwell"] = first_dwell_df["trip_first_dwell_sec"].map(lambda x: datetime.timedelta(seconds=x))
+
+    # verify first dwell is correct
+    # FastTripsLogger.debug("first_dwell:\n%s\n" % first_dwell_df.head().to_string())
+    next_stop_df = pandas.merge(left=next_stop_df, right=first_dwell_df, how='left')
+
+    FastTripsLogger.debug("next_stop_df:\n%s\n" % next_stop_df.head().to_string())
+
+    next_stop_df["trip_arrival_time" ] = next_stop_df[Trip.TRIPS_COLUMN_TRIP_DEPARTURE_TIME] - next_stop_df["trip_first_dwell"]
+    next_stop_df["new_arrival_time"  ] = next_stop_df["trip_arrival_time"] + trips_df["travel_dwell_cum"]
+    next_stop_df.loc[:,Trip.STOPTIMES_COLUMN_STOP_SEQUENCE] += 1
+
+    FastTripsLogger.debug("next_stop_df:\n%s\n" % next_stop_df.head().to_string())
+    trips_df = pandas.merge(left=trips_df,
+                            right=next_stop_df[[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
+                                                Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,
+                                                "new_arrival_time"]],
+                            how="left")
+    # the first ones will be NaT but that's perfect -- we don't want to set those anyway
+    trips_df.loc[pandas.notnull(trips_df["new_arrival_time"]),Trip.STOPTIMES_COLUMN_ARRIVAL_TIME] = trips_df["new_arrival_time"]
+    # set the first ones to be departure time minus dwell time
+    trips_df.loc[pandas.isnull( trips_df["new_arrival_time"]),Trip.STOPTIMES_COLUMN_ARRIVAL_TIME] = trips_df[Trip.STOPTIMES_COLUMN_DEPARTURE_TIME] - trips_df[Trip.STOPTIMES_COLUMN_DWELL_TIME]
+    # departure time is arrival time + dwell
+    trips_df.loc[:,Trip.STOPTIMES_COLUMN_DEPARTURE_TIME] = trips_df[Trip.STOPTIMES_COLUMN_ARRIVAL_TIME] + trips_df[Trip.STOPTIMES_COLUMN_DWELL_TIME]
+
+    # float version
+    trips_df[Trip.STOPTIMES_COLUMN_ARRIVAL_TIME_MIN] = \
+        trips_df[Trip.STOPTIMES_COLUMN_ARRIVAL_TIME].map(lambda x: \
+            60*x.time().hour + x.time().minute + x.time().second/60.0 )
+    trips_df[Trip.STOPTIMES_COLUMN_DEPARTURE_TIME_MIN] = \
+        trips_df[Trip.STOPTIMES_COLUMN_DEPARTURE_TIME].map(lambda x: \
+            60*x.time().hour + x.time().minute + x.time().second/60.0 )
+
+    FastTripsLogger.debug("Trips:update_trip_times() trips_df:\n%s\n" % \
+        trips_df.loc[trips_df[Trip.TRIPS_COLUMN_MAX_STOP_SEQUENCE]>1,[Trip.STOPTIMES_COLUMN_TRIP_ID, Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
+                  Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,
+                  Trip.STOPTIMES_COLUMN_ARRIVAL_TIME, Trip.STOPTIMES_COLUMN_DEPARTURE_TIME,
+                  Trip.VEHICLES_COLUMN_MAXIMUM_SPEED_FPS, Trip.VEHICLES_COLUMN_ACCELERATION, Trip.VEHICLES_COLUMN_DECELERATION,
+                  Trip. VEHICLES_COLUMN_SEATED_CAPACITY,
+                  Trip.SIM_COL_VEH_BOARDS, Trip.SIM_COL_VEH_ALIGHTS, Trip.SIM_COL_VEH_ONBOARD, Trip.SIM_COL_VEH_STANDEES, Trip.SIM_COL_VEH_FRICTION,
+                  "does_stop","next_does_stop","next_is_last_stop",
+                  "accel_secs","decel_secs",
+                  Trip.STOPTIMES_COLUMN_DWELL_TIME_SEC,
+                  "travel_dwell_sec","travel_dwell_sec_cum","new_arrival_time"
+                  ]].head(15).to_string())
+
+
+    assert(trips_df_len==len(trips_df))
+    # drop all the intermediate columns
+    trips_df.drop(["does_stop","next_does_stop","next_is_last_stop",
+                  "accel_secs","decel_secs",
+                  "travel_dwell_sec","travel_dwell_sec_cum","travel_dwell_cum",
+                  "new_arrival_time"], axis=1, inplace=True)
+    FastTripsLogger.debug("trips_df.dtypes=\n%s\n" % str(trips_df.dtypes))
+
+    return trips_df
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(usage=USAGE)
+    parser.add_argument('-n','--num_stop_times', type=int, default=1000000, help="Number of vehicle trip-stops")
+    parser.add_argument('-s','--stops_per_trip', type=int, default=40,      help="Number of stops on each vehicle trip")
+    parser.add_argument('-r','--repeat',         type=int, default=3,       help="Number of times to run each, keeping the best")
+    parser.add_argument('--msa',                 action='store_true',       help="Use MSA results for dwell times")
+    parser.add_argument('--seed',                type=int, default=1,       help="Random seed for the synthetic loads")
+    args = parser.parse_args(sys.argv[1:])
+
+    veh_trips_df = make_vehicle_trips(args.num_stop_times, args.stops_per_trip, args.seed)
+    for dwell_formula in veh_trips_df[Trip.VEHICLES_COLUMN_DWELL_FORMULA].unique():
+        Trip.compile_dwell_formula(dwell_formula)
+    print "Synthetic vehicle trips: %d trip-stops on %d trips" % (len(veh_trips_df), veh_trips_df[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM].nunique())
+
+    (legacy_secs,  legacy_df ) = time_it(legacy_update_trip_times, veh_trips_df, args.msa, args.repeat)
+    (current_secs, current_df) = time_it(Trip.update_trip_times,   veh_trips_df, args.msa, args.repeat)
+
+    # compare by trip-stop since the legacy implementation reorders rows
+    keys       = [Trip.STOPTIMES_COLUMN_TRIP_ID_NUM, Trip.STOPTIMES_COLUMN_STOP_SEQUENCE]
+    compare_df = pandas.merge(left =legacy_df [keys + [Trip.STOPTIMES_COLUMN_ARRIVAL_TIME, Trip.STOPTIMES_COLUMN_DEPARTURE_TIME, Trip.STOPTIMES_COLUMN_DEPARTURE_TIME_MIN]],
+                              right=current_df[keys + [Trip.STOPTIMES_COLUMN_ARRIVAL_TIME, Trip.STOPTIMES_COLUMN_DEPARTURE_TIME, Trip.STOPTIMES_COLUMN_DEPARTURE_TIME_MIN]],
+                              on=keys, how="outer", suffixes=("_legacy",""))
+    max_diff_sec = 0.0
+    for colname in [Trip.STOPTIMES_COLUMN_ARRIVAL_TIME, Trip.STOPTIMES_COLUMN_DEPARTURE_TIME]:
+        diff_sec     = numpy.abs((compare_df[colname] - compare_df["%s_legacy" % colname])/numpy.timedelta64(1,'s'))
+        max_diff_sec = max(max_diff_sec, diff_sec.max())
+    max_diff_min = numpy.abs(compare_df[Trip.STOPTIMES_COLUMN_DEPARTURE_TIME_MIN] - compare_df["%s_legacy" % Trip.STOPTIMES_COLUMN_DEPARTURE_TIME_MIN]).max()
+
+    print "legacy  update_trip_times: %8.3f sec" % legacy_secs
+    print "current update_trip_times: %8.3f sec (%.1fx)" % (current_secs, legacy_secs/current_secs)
+    print "max arrival/departure difference: %g sec; max departure minutes difference: %g" % (max_diff_sec, max_diff_min)
+    if len(compare_df) != len(veh_trips_df) or max_diff_sec > 0.000001:
+        print "Results differ!"
+        sys.exit(1)
@@ -52,8 +52,8 @@ def compare_file(dir1, dir2, filename):
 
     # startTime needs to be read as a time
     if 'startTime' in df1.columns.values:
-        df1['startTime'] = df1['startTime'].map(lambda x: fasttrips.Util.read_time(x))
-        df2['startTime'] = df2['startTime'].map(lambda x: fasttrips.Util.read_time(x))
+        df1['startTime'] = fasttrips.Util.read_times(df1['startTime'].values)
+        df2['startTime'] = fasttrips.Util.read_times(df2['startTime'].values)
 
     # split the columns that have multiple items in them
     split_cols = SPLIT_COLS[filename]
@@ -69,8 +69,8 @@ def compare_file(dir1, dir2, filename):
         if col.endswith('Times'):
             # these are formatted 11:12:13
             if filename=='ft_output_passengerTimes.txt':
-                split_df1 = split_df1.applymap(lambda x: fasttrips.Util.read_time(x))
-                split_df2 = split_df2.applymap(lambda x: fasttrips.Util.read_time(x))
+                split_df1 = split_df1.apply(lambda split_col: fasttrips.Util.read_times(split_col.values))
+                split_df2 = split_df2.apply(lambda split_col: fasttrips.Util.read_times(split_col.values))
             else:
                 split_df1 = split_df1.astype('float')
                 split_df2 = split_df2.astype('float')
@@ -0,0 +1,357 @@
+import argparse, math, os, sys
+import numpy, pandas
+
+USAGE = r"""
+
+  python create_synthetic_network.py [--grid_size|-g #stops] [--route_spacing|-r #stops] [--headway #min]
+                                     [--num_tazs|-z #tazs] [--num_trips|-n #trips] [--num_pnr_lots #lots]
+                                     [--seed #] network_dir demand_dir
+
+  Writes a synthetic fast-trips network (GTFS-plus) to network_dir and demand (trip list and path weights)
+  to demand_dir, for testing fast-trips at scale.
+
+  The network is a square grid of grid_size x grid_size nodes, a quarter mile apart.  Every route_spacing'th
+  row and column is a bidirectional local bus route running every headway minutes from 5a to 11p, with a stop
+  at each node, so routes cross at shared stops.  TAZs are placed randomly over the grid with walk access to
+  the stops within half a mile, and walk transfers connect neighboring stops.  Park-and-ride lots are placed
+  at random stops, with drive access from the TAZs within three miles.
+
+  The trip list has num_trips trips between random TAZs, mostly in the morning and evening peaks, a tenth
+  of them by park-and-ride.
+
+  e.g.
+
+  python scripts\create_synthetic_network.py -g 60 -r 3 -z 800 -n 200000 Examples\synthetic\network Examples\synthetic\demand
+
+"""
+
+#: Distance between grid nodes, in miles
+GRID_SPACING_MILES      = 0.25
+#: Latitude and longitude of the grid's southwest corner
+GRID_ORIGIN_LAT_LON     = (37.70, -122.50)
+#: Bus speed between stops, in miles per hour
+BUS_SPEED_MPH           = 12.0
+#: Service hours
+SERVICE_START_HOUR      = 5
+SERVICE_END_HOUR        = 23
+#: TAZs have walk access to the stops within this distance, in miles
+WALK_ACCESS_MILES       = 0.5
+#: Stops within this distance of each other are connected by walk transfers, in miles
+TRANSFER_MILES          = GRID_SPACING_MILES
+#: TAZs have drive access to the lots within this distance, in miles
+DRIVE_ACCESS_MILES      = 3.0
+#: Drive speed, in miles per hour
+DRIVE_SPEED_MPH         = 25.0
+#: Fraction of trips that are park-and-ride, if there are lots
+PNR_FRACTION            = 0.1
+
+#: Configuration written with the network
+SYNTHETIC_CONFIG        = """# configuration for fasttrips
+[fasttrips]
+iterations                    = 1
+simulation                    = True
+output_passenger_trajectories = True
+create_skims                  = False
+capacity_constraint           = False
+number_of_processes           = 0
+bump_buffer                   = 5
+trace_person_ids              = []
+
+[pathfinding]
+pathfinding_type                  = deterministic
+stochastic_dispersion             = 0.8
+stochastic_max_stop_process_count = 1
+stochastic_pathset_size           = 1000
+time_window                       = 30
+"""
+
+def miles_to_lat_lon(x_miles, y_miles):
+    """
+    Returns the (latitude, longitude) for the given point on the grid, in miles east and north of the origin.
+    """
+    lat = GRID_ORIGIN_LAT_LON[0] + y_miles/69.0
+    lon = GRID_ORIGIN_LAT_LON[1] + x_miles/(69.0*math.cos(math.radians(GRID_ORIGIN_LAT_LON[0])))
+    return (lat, lon)
+
+def format_times(seconds):
+    """
+    Formats the given array of seconds after midnight as HH:MM:SS strings.
+    """
+    seconds = numpy.asarray(seconds).astype(numpy.int64)
+    return ["%02d:%02d:%02d" % (sec//3600, (sec//60)%60, sec%60) for sec in seconds]
+
+def write_csv(df, output_dir, filename):
+    """
+    Writes the given :py:class:`pandas.DataFrame` to *filename* in *output_dir*.
+    """
+    df.to_csv(os.path.join(output_dir, filename), index=False)
+    print "Wrote %8d rows to %s" % (len(df), os.path.join(output_dir, filename))
+
+def create_network(network_dir, grid_size, route_spacing, headway_min, num_tazs, num_pnr_lots, seed):
+    """
+    Writes the synthetic network to *network_dir*.  See :py:data:`USAGE`.
+
+    Returns (stops_df, tazs_df, lots_df), with the coordinates of each in miles in columns x and y.
+    """
+    numpy.random.seed(seed)
+    if not os.path.exists(network_dir): os.makedirs(network_dir)
+
+    # routes run along every route_spacing'th row and column
+    route_lines = range(0, grid_size, route_spacing)
+
+    # stops at the nodes on a route
+    stop_rows   = []
+    for row in range(grid_size):
+        for col in range(grid_size):
+            if row in route_lines or col in route_lines:
+                stop_rows.append(("S%d_%d" % (row, col), row, col))
+    stops_df        = pandas.DataFrame(stop_rows, columns=["stop_id","row","col"])
+    stops_df["x"]   = stops_df["col"]*GRID_SPACING_MILES
+    stops_df["y"]   = stops_df["row"]*GRID_SPACING_MILES
+    (stops_df["stop_lat"], stops_df["stop_lon"]) = miles_to_lat_lon(stops_df["x"], stops_df["y"])
+    stops_df["stop_name"] = stops_df["stop_id"]
+
+    # routes, each with the nodes it visits in direction 0
+    route_rows  = []
+    route_nodes = {}
+    for line in route_lines:
+        route_rows.append(("EW%d" % line, "East-West %d" % line))
+        route_nodes["EW%d" % line] = [(line, col) for col in range(grid_size)]
+        route_rows.append(("NS%d" % line, "North-South %d" % line))
+        route_nodes["NS%d" % line] = [(row, line) for row in range(grid_size)]
+    routes_df   = pandas.DataFrame(route_rows, columns=["route_id","route_long_name"])
+    routes_df["route_short_name"] = routes_df["route_id"]
+    routes_df["route_type"]       = 3
+    routes_df["mode"]             = "local_bus"
+    routes_df["fare_class"]       = "local_fare_class"
+    routes_df["proof_of_payment"] = "FALSE"
+
+    # trips in both directions every headway, starting at a random offset
+    link_sec        = int(round(GRID_SPACING_MILES*3600.0/BUS_SPEED_MPH))
+    stop_offset_sec = numpy.arange(grid_size)*link_sec
+    trip_rows       = []
+    stop_time_parts = []
+    for route_id in routes_df["route_id"]:
+        for direction_id in [0, 1]:
+            nodes = route_nodes[route_id] if direction_id == 0 else route_nodes[route_id][::-1]
+            node_stop_ids = ["S%d_%d" % node for node in nodes]
+            start_sec = SERVICE_START_HOUR*3600 + numpy.random.randint(0, int(headway_min*60))
+            for trip_start_sec in range(start_sec, SERVICE_END_HOUR*3600, int(headway_min*60)):
+                trip_id = "%s_%d_%d" % (route_id, direction_id, trip_start_sec)
+                trip_rows.append((trip_id, route_id, direction_id))
+                stop_time_parts.append(pandas.DataFrame({"trip_id"       :trip_id,
+                                                         "stop_id"       :node_stop_ids,
+                                                         "stop_sequence" :numpy.arange(1, grid_size+1),
+                                                         "time_sec"      :trip_start_sec + stop_offset_sec}))
+    trips_df                    = pandas.DataFrame(trip_rows, columns=["trip_id","route_id","direction_id"])
+    trips_df["service_id"]      = "weekday"
+    trips_df["vehicle_name"]    = "bus"
+    stop_times_df               = pandas.concat(stop_time_parts, ignore_index=True)
+    stop_times_df["arrival_time"]   = format_times(stop_times_df["time_sec"])
+    stop_times_df["departure_time"] = stop_times_df["arrival_time"]
+
+    # TAZs at random points on the grid
+    grid_miles      = (grid_size-1)*GRID_SPACING_MILES
+    tazs_df         = pandas.DataFrame({"taz":["Z%d" % taz_num for taz_num in range(1, num_tazs+1)],
+                                        "x"  :numpy.random.uniform(0, grid_miles, size=num_tazs),
+                                        "y"  :numpy.random.uniform(0, grid_miles, size=num_tazs)})
+    (tazs_df["lat"], tazs_df["lon"]) = miles_to_lat_lon(tazs_df["x"], tazs_df["y"])
+
+    # walk access to the stops within WALK_ACCESS_MILES (manhattan distance), at least the nearest
+    walk_parts = []
+    for taz_row in tazs_df.itertuples():
+        dist = numpy.abs(stops_df["x"].values - taz_row.x) + numpy.abs(stops_df["y"].values - taz_row.y)
+        near = numpy.flatnonzero(dist <= WALK_ACCESS_MILES)
+        if len(near) == 0: near = [numpy.argmin(dist)]
+        walk_parts.append(pandas.DataFrame({"taz"    :taz_row.taz,
+                                            "stop_id":stops_df["stop_id"].values[near],
+                                            "dist"   :numpy.round(dist[near], 3)}))
+    walk_access_df = pandas.concat(walk_parts, ignore_index=True)
+
+    # walk transfers between neighboring stops (shared stops need no transfer link)
+    stop_xy     = stops_df[["stop_id","x","y"]]
+    transfer_parts = []
+    for (dx, dy) in [(GRID_SPACING_MILES,0), (-GRID_SPACING_MILES,0), (0,GRID_SPACING_MILES), (0,-GRID_SPACING_MILES)]:
+        to_xy = stop_xy.copy()
+        to_xy["x"] = numpy.round(to_xy["x"] - dx, 6)
+        to_xy["y"] = numpy.round(to_xy["y"] - dy, 6)
+        from_xy = stop_xy.copy()
+        from_xy["x"] = numpy.round(from_xy["x"], 6)
+        from_xy["y"] = numpy.round(from_xy["y"], 6)
+        transfer_parts.append(pandas.merge(left=from_xy, right=to_xy, on=["x","y"], suffixes=("_from","_to")))
+    transfers_df = pandas.concat(transfer_parts, ignore_index=True)
+    transfers_df = transfers_df.rename(columns={"stop_id_from":"from_stop_id", "stop_id_to":"to_stop_id"})
+    transfers_df["dist"] = TRANSFER_MILES
+
+    # park-and-ride lots at random stops, with zero-distance transfers to and from them
+    lot_stops   = stops_df.iloc[numpy.random.choice(len(stops_df), size=min(num_pnr_lots, len(stops_df)), replace=False)]
+    lots_df     = pandas.DataFrame({"lot_id"  :["P%d" % lot_num for lot_num in range(1, len(lot_stops)+1)],
+                                    "stop_id" :lot_stops["stop_id"].values,
+                                    "x"       :lot_stops["x"].values,
+                                    "y"       :lot_stops["y"].values,
+                                    "lot_lat" :lot_stops["stop_lat"].values,
+                                    "lot_lon" :lot_stops["stop_lon"].values,
+                                    "drop_off":True,
+                                    "capacity":500})
+    transfers_df = pandas.concat([transfers_df[["from_stop_id","to_stop_id","dist"]],
+                                  pandas.DataFrame({"from_stop_id":lots_df["lot_id"], "to_stop_id":lots_df["stop_id"], "dist":0.0}),
+                                  pandas.DataFrame({"from_stop_id":lots_df["stop_id"], "to_stop_id":lots_df["lot_id"], "dist":0.0})],
+                                 ignore_index=True)
+    transfers_df["from_route_id"]       = ""
+    transfers_df["to_route_id"]         = ""
+    transfers_df["elevation_gain"]      = 0
+    transfers_df["schedule_precedence"] = "to"
+
+    # drive access from the TAZs to the lots within DRIVE_ACCESS_MILES
+    drive_parts = []
+    if len(lots_df) > 0:
+        for taz_row in tazs_df.itertuples():
+            dist = numpy.abs(lots_df["x"].values - taz_row.x) + numpy.abs(lots_df["y"].values - taz_row.y)
+            near = numpy.flatnonzero(dist <= DRIVE_ACCESS_MILES)
+            for direction in ["access","egress"]:
+                drive_parts.append(pandas.DataFrame({"taz"        :taz_row.taz,
+                                                     "lot_id"     :lots_df["lot_id"].values[near],
+                                                     "direction"  :direction,
+                                                     "dist"       :numpy.round(dist[near], 3),
+                                                     "cost"       :0,
+                                                     "travel_time":numpy.round(dist[near]*60.0/DRIVE_SPEED_MPH, 2),
+                                                     "start_time" :"00:00:00",
+                                                     "end_time"   :"23:59:59"}))
+    drive_access_cols = ["taz","lot_id","direction","dist","cost","travel_time","start_time","end_time"]
+    drive_access_df   = pandas.concat(drive_parts, ignore_index=True) if len(drive_parts) > 0 else pandas.DataFrame(columns=drive_access_cols)
+
+    # write the GTFS
+    write_csv(pandas.DataFrame({"agency_id":["SYN"], "agency_name":["Synthetic Transit"], "agency_url":["http://fast-trips.mtc.ca.gov/"],
+                                "agency_timezone":["US/Pacific"]}), network_dir, "agency.txt")
+    write_csv(pandas.DataFrame({"service_id":["weekday"], "monday":[1], "tuesday":[1], "wednesday":[1], "thursday":[1], "friday":[1],
+                                "saturday":[1], "sunday":[1], "start_date":[20150101], "end_date":[20251231]},
+                               columns=["service_id","monday","tuesday","wednesday","thursday","friday","saturday","sunday","start_date","end_date"]),
+              network_dir, "calendar.txt")
+    write_csv(stops_df[["stop_id","stop_name","stop_lat","stop_lon"]],                  network_dir, "stops.txt")
+    write_csv(routes_df[["route_id","route_short_name","route_long_name","route_type"]],  network_dir, "routes.txt")
+    write_csv(trips_df[["trip_id","route_id","service_id","direction_id"]],              network_dir, "trips.txt")
+    write_csv(stop_times_df[["trip_id","arrival_time","departure_time","stop_id","stop_sequence"]], network_dir, "stop_times.txt")
+    write_csv(pandas.DataFrame({"fare_id":["local_fare"], "price":[2.0], "currency_type":["USD"], "payment_method":[0], "transfers":[0]},
+                               columns=["fare_id","price","currency_type","payment_method","transfers"]),
+              network_dir, "fare_attributes.txt")
+    write_csv(pandas.DataFrame({"fare_id":"local_fare", "route_id":routes_df["route_id"]}, columns=["fare_id","route_id"]),
+              network_dir, "fare_rules.txt")
+    # the lots aren't gtfs stops, so their transfers are only in transfers_ft.txt
+    stop_transfers_df = transfers_df.loc[transfers_df["from_stop_id"].isin(stops_df["stop_id"])&
+                                         transfers_df["to_stop_id"  ].isin(stops_df["stop_id"]), ["from_stop_id","to_stop_id"]].copy()
+    stop_transfers_df["transfer_type"]     = 0
+    stop_transfers_df["min_transfer_time"] = ""
+    write_csv(stop_transfers_df,                                                          network_dir, "transfers.txt")
+
+    # and the fast-trips extensions
+    write_csv(stops_df[["stop_id"]],                                                      network_dir, "stops_ft.txt")
+    write_csv(routes_df[["route_id","mode","fare_class","proof_of_payment"]],             network_dir, "routes_ft.txt")
+    write_csv(trips_df[["trip_id","vehicle_name"]],                                       network_dir, "trips_ft.txt")
+    write_csv(stop_times_df[["trip_id","stop_id"]],                                       network_dir, "stop_times_ft.txt")
+    write_csv(pandas.DataFrame({"vehicle_name":["bus"], "seated_capacity":[40], "standing_capacity":[20], "max_speed":[35],
+                                "acceleration":[3.4], "deceleration":[4.0],
+                                "dwell_formula":["3.323 + 2.343*[boards] + 1.619*[alights] + 0.093*[friction]"]},
+                               columns=["vehicle_name","seated_capacity","standing_capacity","max_speed","acceleration","deceleration","dwell_formula"]),
+              network_dir, "vehicles_ft.txt")
+    write_csv(pandas.DataFrame({"fare_class":["local_fare_class"], "price":[2.0], "currency_type":["USD"], "payment_method":[0], "transfers":[0]},
+                               columns=["fare_class","price","currency_type","payment_method","transfers"]),
+              network_dir, "fare_attributes_ft.txt")
+    write_csv(pandas.DataFrame({"fare_id":["local_fare"], "fare_class":["local_fare_class"], "start_time":["00:00:00"], "end_time":["23:59:59"]},
+                               columns=["fare_id","fare_class","start_time","end_time"]),
+              network_dir, "fare_rules_ft.txt")
+    write_csv(transfers_df[["from_stop_id","to_stop_id","dist","from_route_id","to_route_id","elevation_gain","schedule_precedence"]],
+              network_dir, "transfers_ft.txt")
+    write_csv(walk_access_df[["taz","stop_id","dist"]],                                   network_dir, "walk_access_ft.txt")
+    write_csv(lots_df[["lot_id","lot_lat","lot_lon","drop_off","capacity"]],              network_dir, "drive_access_points_ft.txt")
+    write_csv(drive_access_df[drive_access_cols],                                         network_dir, "drive_access_ft.txt")
+    write_csv(tazs_df[["taz","lat","lon"]],                                               network_dir, "taz_coords.txt")
+
+    config_file = os.path.join(network_dir, "config_ft.txt")
+    config_out  = open(config_file, "w")
+    config_out.write(SYNTHETIC_CONFIG)
+    config_out.close()
+    print "Wrote %s" % config_file
+
+    print "Synthetic network: %d stops, %d routes, %d trips, %d stop times, %d TAZs, %d lots" % \
+        (len(stops_df), len(routes_df), len(trips_df), len(stop_times_df), len(tazs_df), len(lots_df))
+    return (stops_df, tazs_df, lots_df)
+
+def create_demand(demand_dir, tazs_df, lots_df, num_trips, seed):
+    """
+    Writes the synthetic trip list and path weights to *demand_dir*.  See :py:data:`USAGE`.
+    """
+    numpy.random.seed(seed)
+    if not os.path.exists(demand_dir): os.makedirs(demand_dir)
+
+    # random origin and destination, different from each other
+    o_taz_idx   = numpy.random.randint(0, len(tazs_df), size=num_trips)
+    d_taz_idx   = (o_taz_idx + numpy.random.randint(1, max(2, len(tazs_df)), size=num_trips)) % len(tazs_df)
+
+    # departures around the morning and evening peaks, or through the day
+    peak        = numpy.random.randint(0, 3, size=num_trips)
+    depart_sec  = numpy.where(peak == 0, numpy.random.normal(8*3600,  3600, size=num_trips),
+                  numpy.where(peak == 1, numpy.random.normal(17*3600, 3600, size=num_trips),
+                                         numpy.random.uniform(6*3600, 21*3600, size=num_trips)))
+    depart_sec  = numpy.clip(depart_sec, 6*3600, 21*3600).astype(numpy.int64)
+    arrive_sec  = depart_sec + 60*60
+
+    mode        = numpy.where(numpy.random.uniform(size=num_trips) < (PNR_FRACTION if len(lots_df) > 0 else 0),
+                              "PNR-transit-walk", "walk-transit-walk")
+    trip_list_df = pandas.DataFrame({"person_id"     :"0",
+                                     "person_trip_id":numpy.arange(1, num_trips+1),
+                                     "o_taz"         :tazs_df["taz"].values[o_taz_idx],
+                                     "d_taz"         :tazs_df["taz"].values[d_taz_idx],
+                                     "mode"          :mode,
+                                     "purpose"       :numpy.where(peak < 2, "work", "other"),
+                                     "departure_time":format_times(depart_sec),
+                                     "arrival_time"  :format_times(arrive_sec),
+                                     "time_target"   :numpy.where(numpy.random.uniform(size=num_trips) < 0.5, "departure", "arrival"),
+                                     "vot"           :numpy.round(numpy.random.lognormal(2.5, 0.5, size=num_trips), 2)},
+                                    columns=["person_id","person_trip_id","o_taz","d_taz","mode","purpose",
+                                             "departure_time","arrival_time","time_target","vot"])
+    write_csv(trip_list_df, demand_dir, "trip_list.txt")
+
+    # path weights, like the test network's
+    weight_rows = []
+    for purpose in ["work","other"]:
+        weight_rows.extend([
+            ("all", purpose, "transfer", "transfer",  "transfer",    "walk_time_min",         3.93),
+            ("all", purpose, "transfer", "transfer",  "transfer",    "transfer_penalty",      47.73),
+            ("all", purpose, "access",   "walk",      "walk_access", "time_min",              3.93),
+            ("all", purpose, "access",   "PNR",       "PNR_access",  "walk_time_min",         3.93),
+            ("all", purpose, "access",   "PNR",       "PNR_access",  "drive_time_min",        1.5),
+            ("all", purpose, "egress",   "walk",      "walk_egress", "time_min",              3.93),
+            ("all", purpose, "transit",  "transit",   "local_bus",   "in_vehicle_time_min",   1.0),
+            ("all", purpose, "transit",  "transit",   "local_bus",   "wait_time_min",         1.77),
+            ("all", purpose, "transit",  "transit",   "local_bus",   "overcap",               0.5)])
+    weights_df = pandas.DataFrame(weight_rows, columns=["user_class","purpose","demand_mode_type","demand_mode",
+                                                        "supply_mode","weight_name","weight_value"])
+    # this is read as fixed width, so line up the columns
+    weights_df["weight_value"] = weights_df["weight_value"].map(str)
+    col_widths   = [max(len(colname), weights_df[colname].str.len().max())+2 for colname in weights_df.columns]
+    weights_file = os.path.join(demand_dir, "pathweight_ft.txt")
+    weights_out  = open(weights_file, "w")
+    for row in [list(weights_df.columns)] + weights_df.values.tolist():
+        weights_out.write("".join([value.ljust(width) for (value, width) in zip(row, col_widths)]).rstrip() + "\n")
+    weights_out.close()
+    print "Wrote %8d rows to %s" % (len(weights_df), weights_file)
+
+    print "Synthetic demand: %d trips, %d park-and-ride" % (len(trip_list_df), (mode != "walk-transit-walk").sum())
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(usage=USAGE)
+    parser.add_argument('-g','--grid_size',     type=int,   default=20,   help="Number of grid nodes on each side")
+    parser.add_argument('-r','--route_spacing', type=int,   default=2,    help="Run a route along every this many rows and columns")
+    parser.add_argument('--headway',            type=float, default=10.0, help="Minutes between trips on each route and direction")
+    parser.add_argument('-z','--num_tazs',      type=int,   default=100,  help="Number of TAZs")
+    parser.add_argument('-n','--num_trips',     type=int,   default=10000,help="Number of person trips")
+    parser.add_argument('--num_pnr_lots',       type=int,   default=4,    help="Number of park-and-ride lots")
+    parser.add_argument('--seed',               type=int,   default=1,    help="Random seed")
+    parser.add_argument("network_dir",          type=str,                 help="Location to write the network")
+    parser.add_argument("demand_dir",           type=str,                 help="Location to write the demand")
+    args = parser.parse_args(sys.argv[1:])
+
+    (stops_df, tazs_df, lots_df) = create_network(args.network_dir, args.grid_size, args.route_spacing, args.headway,
+                                                  args.num_tazs, args.num_pnr_lots, args.seed)
+    create_demand(args.demand_dir, tazs_df, lots_df, args.num_trips, args.seed)
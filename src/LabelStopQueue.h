@@ -62,16 +62,24 @@ namespace fasttrips {
 
         int valid_count_;
 
+        // operation counts, for performance information
+        long num_pushes_;       ///< number of calls to push()
+        long num_queued_;       ///< number of pushes that went into labelstop_priority_queue_
+        long num_pops_;         ///< number of valid LabelStops returned by pop_top()
+        long num_stale_pops_;   ///< number of invalid LabelStops popped and skipped by pop_top()
+
     public:
-        LabelStopQueue() : valid_count_(0) {}
+        LabelStopQueue() : valid_count_(0), num_pushes_(0), num_queued_(0), num_pops_(0), num_stale_pops_(0) {}
         ~LabelStopQueue() {}
 
         void push(const LabelStop& val) {
+            num_pushes_++;
             // if the stop is not in here, no problem!
             std::pair<int,bool> full_stop_id = std::make_pair(val.stop_id_, val.is_trip_);
 
             if (labelstop_map_.find(full_stop_id) == labelstop_map_.end()) {
                 labelstop_priority_queue_.push(val);
+                num_queued_++;
                 LabelCount lc = { val.label_, true, 1 };
                 labelstop_map_[full_stop_id] = lc;
                 valid_count_++;
@@ -81,6 +89,7 @@ namespace fasttrips {
             // if not valid in the queue, then we've popped out all valid instances from the priority queue so it's like it's not here
             if (!labelstop_map_[full_stop_id].valid_) {
                 labelstop_priority_queue_.push(val);
+                num_queued_++;
                 labelstop_map_[full_stop_id].label_     = val.label_;
                 labelstop_map_[full_stop_id].valid_     = true;
                 labelstop_map_[full_stop_id].count_    += 1;
@@ -92,6 +101,7 @@ namespace fasttrips {
             // If the label is smaller, add this one and invalidate the other
             if (val.label_ < labelstop_map_[full_stop_id].label_) {
                 labelstop_priority_queue_.push(val);
+                num_queued_++;
                 labelstop_map_[full_stop_id].label_ = val.label_;
                 labelstop_map_[full_stop_id].count_ += 1;
                 // no additional valid counts
@@ -137,6 +147,7 @@ namespace fasttrips {
                     }
                     ls_iter->second.count_ -= 1;
                     labelstop_priority_queue_.pop();
+                    num_stale_pops_++;
                     continue;
                 }
 
@@ -153,6 +164,7 @@ namespace fasttrips {
                     }
                     ls_iter->second.count_ -= 1;
                     labelstop_priority_queue_.pop();
+                    num_stale_pops_++;
                     continue;
                 }
 
@@ -171,6 +183,7 @@ namespace fasttrips {
                 ls_iter->second.valid_  = false; // not valid any longer
                 ls_iter->second.count_ -= 1;     // decrement count
                 valid_count_ -= 1;
+                num_pops_++;
                 return to_ret;
 
             }
@@ -183,6 +196,15 @@ namespace fasttrips {
         bool empty() const {
             return (valid_count_ == 0);
         }
+
+        /// Number of calls to push(), including those ignored because the stop is already queued with a lower label
+        long numPushes() const { return num_pushes_; }
+        /// Number of pushes that were added to the underlying priority queue
+        long numQueued() const { return num_queued_; }
+        /// Number of valid LabelStops returned by pop_top()
+        long numPops() const { return num_pops_; }
+        /// Number of superseded LabelStops popped from the underlying priority queue and skipped by pop_top()
+        long numStalePops() const { return num_stale_pops_; }
     };
 
 };
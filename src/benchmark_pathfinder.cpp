@@ -0,0 +1,459 @@
+/**
+ * \file benchmark_pathfinder.cpp
+ *
+ * Standalone micro-benchmark for fasttrips::PathFinder, without Python.
+ *
+ * Loads the supply recorded by a fast-trips run with record_pathfinder_benchmark set (the intermediate files
+ * plus ft_benchmark_stop_times.txt and ft_benchmark_parameters.txt in the run's output directory) once, then
+ * replays the path specifications in ft_benchmark_path_specs.txt through PathFinder::findPathSet, deterministic
+ * and/or hyperpath, and reports the time in each phase (initialize, label, enumerate, finalize), the label stop
+ * queue operations and the memory allocations per path specification.
+ *
+ * The pathsets found can be written to a golden file and compared to it later, bit-for-bit, to catch changes
+ * in behavior.
+ *
+ * Build from the src directory, e.g.
+ *
+ *     g++ -std=gnu++98 -O2 -DNDEBUG -o benchmark_pathfinder benchmark_pathfinder.cpp pathfinder.cpp path.cpp hyperlink.cpp
+ *
+ * or with Visual Studio
+ *
+ *     cl /O2 /EHsc /DNDEBUG benchmark_pathfinder.cpp pathfinder.cpp path.cpp hyperlink.cpp psapi.lib
+ *
+ * Usage:
+ *
+ *     benchmark_pathfinder output_dir [--mode recorded|deterministic|hyperpath|both] [--repeat N] [--max_specs N]
+ *                                     [--write_golden golden.txt] [--golden golden.txt] [--csv results.csv]
+ *
+ * Exits with status 1 if the pathsets differ from the golden file.
+ */
+#include "pathfinder.h"
+
+#ifndef _WIN32
+#include <sys/resource.h>
+#endif
+
+#include <algorithm>
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <fstream>
+#include <iostream>
+#include <map>
+#include <new>
+#include <sstream>
+#include <string>
+#include <vector>
+
+const char kPathSeparator =
+#ifdef _WIN32
+                            '\\';
+#else
+                            '/';
+#endif
+
+// Count every allocation made by this process, e.g. by the PathFinder for its stop states and paths.
+static long long num_allocations  = 0;
+static long long bytes_allocated  = 0;
+
+void* operator new(std::size_t size)
+{
+    num_allocations += 1;
+    bytes_allocated += size;
+    void* p = std::malloc(size > 0 ? size : 1);
+    if (!p) { throw std::bad_alloc(); }
+    return p;
+}
+void* operator new[](std::size_t size)
+{
+    return operator new(size);
+}
+void operator delete(void* p)
+{
+    std::free(p);
+}
+void operator delete[](void* p)
+{
+    std::free(p);
+}
+
+/// The measurements for one call to PathFinder::findPathSet.
+typedef struct {
+    int                         spec_num_;          ///< Index into the recorded path specifications
+    bool                        hyperpath_;         ///< Was this a hyperpath search?
+    int                         num_paths_;         ///< Number of paths in the pathset found
+    fasttrips::PerformanceInfo  performance_info_;  ///< From PathFinder::findPathSet
+    long long                   num_allocations_;   ///< Number of allocations made by PathFinder::findPathSet
+    long long                   bytes_allocated_;   ///< Bytes allocated by PathFinder::findPathSet
+} BenchmarkResult;
+
+/// Opens the given file in the output directory and reads past its header line, or exits if that fails.
+static void openWithHeader(const std::string& output_dir, const char* filename, std::ifstream& infile)
+{
+    std::string path = output_dir + kPathSeparator + filename;
+    infile.open(path.c_str(), std::ios_base::in);
+    if (!infile.is_open()) {
+        std::cerr << "Couldn't open " << path << "; run fast-trips with record_pathfinder_benchmark = True" << std::endl;
+        exit(2);
+    }
+    std::string header;
+    std::getline(infile, header);
+}
+
+/// Reads the stop times recorded in ft_benchmark_stop_times.txt, in the form PathFinder::initializeSupply takes them.
+static int readStopTimes(const std::string& output_dir, std::vector<int>& stoptime_index, std::vector<double>& stoptime_times)
+{
+    std::ifstream infile;
+    openWithHeader(output_dir, "ft_benchmark_stop_times.txt", infile);
+
+    int    trip_id_num, stop_seq, stop_id_num;
+    double arrival_time, departure_time, overcap;
+    while (infile >> trip_id_num >> stop_seq >> stop_id_num >> arrival_time >> departure_time >> overcap) {
+        stoptime_index.push_back(trip_id_num);
+        stoptime_index.push_back(stop_seq);
+        stoptime_index.push_back(stop_id_num);
+        stoptime_times.push_back(arrival_time);
+        stoptime_times.push_back(departure_time);
+        stoptime_times.push_back(overcap);
+    }
+    return (int)(stoptime_index.size()/3);
+}
+
+/// Reads the parameters recorded in ft_benchmark_parameters.txt and passes them to PathFinder::initializeParameters.
+static void readParameters(const std::string& output_dir, fasttrips::PathFinder& pathfinder)
+{
+    std::ifstream infile;
+    openWithHeader(output_dir, "ft_benchmark_parameters.txt", infile);
+
+    std::map<std::string, double> params;
+    std::string name;
+    double      value;
+    while (infile >> name >> value) { params[name] = value; }
+
+    pathfinder.initializeParameters(params["time_window"],
+                                    params["bump_buffer"],
+                                    (int)params["stoch_pathset_size"],
+                                    params["stoch_dispersion"],
+                                    (int)params["stoch_max_stop_process_count"],
+                                    (int)params["max_num_paths"],
+                                    params["min_path_probability"]);
+}
+
+/// Reads the path specifications recorded in ft_benchmark_path_specs.txt.
+static void readPathSpecs(const std::string& output_dir, std::vector<fasttrips::PathSpecification>& path_specs)
+{
+    std::ifstream infile;
+    openWithHeader(output_dir, "ft_benchmark_path_specs.txt", infile);
+
+    fasttrips::PathSpecification path_spec;
+    path_spec.iteration_ = 1;
+    path_spec.trace_     = false;
+    int hyperpath_i, outbound_i;
+    while (infile >> path_spec.passenger_id_ >> path_spec.path_id_ >> hyperpath_i
+                  >> path_spec.user_class_ >> path_spec.purpose_
+                  >> path_spec.access_mode_ >> path_spec.transit_mode_ >> path_spec.egress_mode_
+                  >> path_spec.origin_taz_id_ >> path_spec.destination_taz_id_ >> outbound_i >> path_spec.preferred_time_) {
+        path_spec.hyperpath_ = (hyperpath_i != 0);
+        path_spec.outbound_  = (outbound_i  != 0);
+        path_specs.push_back(path_spec);
+    }
+}
+
+/// Writes the bits of the given double as hex, so it can be compared exactly.
+static void writeBits(std::ostream& out, double value)
+{
+    unsigned long long bits;
+    std::memcpy(&bits, &value, sizeof(bits));
+    char buf[32];
+    sprintf(buf, " %016llx", bits);
+    out << buf;
+}
+
+/**
+ * Writes the pathset as the lines of the golden file: one for the path specification, one per path
+ * and one per link, with the fields fasttrips.cpp returns to Python.  Doubles are written as bits.
+ */
+static std::string pathsetToString(const fasttrips::PathSpecification& path_spec, const fasttrips::PathSet& pathset)
+{
+    std::ostringstream ss;
+    ss << "pathspec " << path_spec.path_id_ << " " << (path_spec.hyperpath_ ? "hyperpath" : "deterministic");
+    ss << " num_paths " << pathset.size() << std::endl;
+
+    int path_num = 0;
+    for (fasttrips::PathSet::const_iterator psi = pathset.begin(); psi != pathset.end(); ++psi) {
+        const fasttrips::Path& path = psi->first;
+        ss << "path " << path_num << " " << psi->second.count_;
+        writeBits(ss, path.cost());
+        writeBits(ss, psi->second.probability_);
+        ss << std::endl;
+
+        for (int link_num = 0; link_num < (int)path.size(); ++link_num) {
+            const fasttrips::StopState& ss_link = path[link_num].second;
+            ss << "link " << path_num << " " << link_num << " " << path[link_num].first << " " << ss_link.deparr_mode_;
+            ss << " " << ss_link.trip_id_ << " " << ss_link.stop_succpred_ << " " << ss_link.seq_ << " " << ss_link.seq_succpred_;
+            writeBits(ss, ss_link.deparr_time_);
+            writeBits(ss, ss_link.link_time_);
+            writeBits(ss, ss_link.cost_);
+            writeBits(ss, ss_link.arrdep_time_);
+            ss << std::endl;
+        }
+        path_num += 1;
+    }
+    return ss.str();
+}
+
+/// Reads a golden file written by this program into a map of (path id, hyperpath) => lines for that pathset.
+static void readGolden(const char* filename, std::map<std::pair<int,bool>, std::string>& golden)
+{
+    std::ifstream infile(filename);
+    if (!infile.is_open()) {
+        std::cerr << "Couldn't open golden file " << filename << std::endl;
+        exit(2);
+    }
+    std::string line;
+    std::pair<int,bool> key(-1, false);
+    while (std::getline(infile, line)) {
+        if (line.compare(0, 9, "pathspec ") == 0) {
+            std::istringstream iss(line.substr(9));
+            std::string mode;
+            iss >> key.first >> mode;
+            key.second = (mode == "hyperpath");
+        }
+        golden[key] += line + "\n";
+    }
+}
+
+/// Returns the first line that differs between two pathsets written by pathsetToString().
+static std::string firstDifference(const std::string& expected, const std::string& actual)
+{
+    std::istringstream exp_ss(expected), act_ss(actual);
+    std::string exp_line, act_line;
+    while (true) {
+        bool exp_ok = (bool)std::getline(exp_ss, exp_line);
+        bool act_ok = (bool)std::getline(act_ss, act_line);
+        if (!exp_ok && !act_ok) { return ""; }
+        if (!exp_ok) { exp_line = "(none)"; }
+        if (!act_ok) { act_line = "(none)"; }
+        if (exp_line != act_line) { return "  expected: " + exp_line + "\n  actual:   " + act_line; }
+    }
+}
+
+/// Returns the peak resident memory of this process in bytes, or 0 if that's not available.
+static long long peakMemoryBytes()
+{
+#ifdef _WIN32
+    return 0;
+#else
+    struct rusage usage;
+    getrusage(RUSAGE_SELF, &usage);
+#ifdef __APPLE__
+    return usage.ru_maxrss;
+#else
+    return (long long)usage.ru_maxrss*1024;
+#endif
+#endif
+}
+
+/// Prints the mean, median, 99th percentile, max and total of the given values.
+static void printDistribution(const char* measure, std::vector<double> values)
+{
+    if (values.size() == 0) { return; }
+    std::sort(values.begin(), values.end());
+    double total = 0;
+    for (size_t i = 0; i < values.size(); ++i) { total += values[i]; }
+    printf("  %-26s %12.1f %12.1f %12.1f %12.1f %16.0f\n", measure, total/values.size(),
+           values[values.size()/2], values[(size_t)(0.99*(values.size()-1))], values.back(), total);
+}
+
+/// Prints the summary of the results for deterministic or hyperpath searches.
+static void printSummary(const std::vector<BenchmarkResult>& results, bool hyperpath)
+{
+    std::vector<double> init_us, label_us, enum_us, final_us, total_us;
+    std::vector<double> label_iters, labeled_stops, pushes, queued, pops, stale_pops, allocs, alloc_bytes, num_paths;
+    for (size_t i = 0; i < results.size(); ++i) {
+        if (results[i].hyperpath_ != hyperpath) { continue; }
+        const fasttrips::PerformanceInfo& pi = results[i].performance_info_;
+        init_us.push_back(pi.microseconds_initializing_);
+        label_us.push_back(pi.microseconds_labeling_);
+        enum_us.push_back(pi.microseconds_enumerating_);
+        final_us.push_back(pi.microseconds_finalizing_);
+        total_us.push_back(pi.microseconds_initializing_ + pi.microseconds_labeling_ + pi.microseconds_enumerating_ + pi.microseconds_finalizing_);
+        label_iters.push_back(pi.label_iterations_);
+        labeled_stops.push_back(pi.num_labeled_stops_);
+        pushes.push_back(pi.queue_pushes_);
+        queued.push_back(pi.queue_queued_);
+        pops.push_back(pi.queue_pops_);
+        stale_pops.push_back(pi.queue_stale_pops_);
+        allocs.push_back((double)results[i].num_allocations_);
+        alloc_bytes.push_back((double)results[i].bytes_allocated_);
+        num_paths.push_back(results[i].num_paths_);
+    }
+    if (total_us.size() == 0) { return; }
+
+    double total_sec = 0;
+    for (size_t i = 0; i < total_us.size(); ++i) { total_sec += 0.000001*total_us[i]; }
+
+    printf("\n%s: %d searches in %.3f sec (%.1f per sec)\n", hyperpath ? "hyperpath" : "deterministic",
+           (int)total_us.size(), total_sec, total_sec > 0 ? total_us.size()/total_sec : 0.0);
+    printf("  %-26s %12s %12s %12s %12s %16s\n", "per search", "mean", "p50", "p99", "max", "total");
+    printDistribution("initialize microseconds", init_us);
+    printDistribution("label microseconds",      label_us);
+    printDistribution("enumerate microseconds",  enum_us);
+    printDistribution("finalize microseconds",   final_us);
+    printDistribution("total microseconds",      total_us);
+    printDistribution("label iterations",        label_iters);
+    printDistribution("labeled stops",           labeled_stops);
+    printDistribution("queue pushes",            pushes);
+    printDistribution("queue pushes queued",     queued);
+    printDistribution("queue pops",              pops);
+    printDistribution("queue stale pops",        stale_pops);
+    printDistribution("allocations",             allocs);
+    printDistribution("bytes allocated",         alloc_bytes);
+    printDistribution("paths found",             num_paths);
+}
+
+/// Writes a row for each search to a CSV file.
+static void writeCSV(const char* filename, const std::vector<BenchmarkResult>& results, const std::vector<fasttrips::PathSpecification>& path_specs)
+{
+    std::ofstream out(filename);
+    out << "passenger_id_num,trip_list_id_num,hyperpath,num_paths,label_iterations,num_labeled_stops,max_process_count,";
+    out << "initialize_us,label_us,enumerate_us,finalize_us,queue_pushes,queue_queued,queue_pops,queue_stale_pops,";
+    out << "allocations,bytes_allocated" << std::endl;
+    for (size_t i = 0; i < results.size(); ++i) {
+        const BenchmarkResult&            result = results[i];
+        const fasttrips::PerformanceInfo& pi     = result.performance_info_;
+        out << path_specs[result.spec_num_].passenger_id_ << "," << path_specs[result.spec_num_].path_id_ << ",";
+        out << (result.hyperpath_ ? 1 : 0) << "," << result.num_paths_ << ",";
+        out << pi.label_iterations_ << "," << pi.num_labeled_stops_ << "," << pi.max_process_count_ << ",";
+        out << pi.microseconds_initializing_ << "," << pi.microseconds_labeling_ << ",";
+        out << pi.microseconds_enumerating_ << "," << pi.microseconds_finalizing_ << ",";
+        out << pi.queue_pushes_ << "," << pi.queue_queued_ << "," << pi.queue_pops_ << "," << pi.queue_stale_pops_ << ",";
+        out << result.num_allocations_ << "," << result.bytes_allocated_ << std::endl;
+    }
+    out.close();
+    std::cout << "Wrote " << filename << std::endl;
+}
+
+static void usage()
+{
+    std::cerr << "Usage: benchmark_pathfinder output_dir [--mode recorded|deterministic|hyperpath|both] [--repeat N] [--max_specs N]" << std::endl;
+    std::cerr << "                                       [--write_golden golden.txt] [--golden golden.txt] [--csv results.csv]" << std::endl;
+    exit(2);
+}
+
+int main(int argc, char* argv[])
+{
+    if (argc < 2) { usage(); }
+
+    std::string  output_dir   = argv[1];
+    std::string  mode         = "both";
+    int          repeat       = 1;
+    int          max_specs    = -1;
+    const char*  write_golden = NULL;
+    const char*  golden       = NULL;
+    const char*  csv          = NULL;
+    for (int argn = 2; argn < argc; ++argn) {
+        std::string arg = argv[argn];
+        if (argn + 1 >= argc) { usage(); }
+        if      (arg == "--mode"        ) { mode         = argv[++argn];       }
+        else if (arg == "--repeat"      ) { repeat       = atoi(argv[++argn]); }
+        else if (arg == "--max_specs"   ) { max_specs    = atoi(argv[++argn]); }
+        else if (arg == "--write_golden") { write_golden = argv[++argn];       }
+        else if (arg == "--golden"      ) { golden       = argv[++argn];       }
+        else if (arg == "--csv"         ) { csv          = argv[++argn];       }
+        else { usage(); }
+    }
+    if (mode != "recorded" && mode != "deterministic" && mode != "hyperpath" && mode != "both") { usage(); }
+
+    // load the supply once
+    std::vector<int>    stoptime_index;
+    std::vector<double> stoptime_times;
+    clock_t load_start = clock();
+    int num_stoptimes = readStopTimes(output_dir, stoptime_index, stoptime_times);
+
+    fasttrips::PathFinder pathfinder;
+    readParameters(output_dir, pathfinder);
+    pathfinder.initializeSupply(output_dir.c_str(), 0, &stoptime_index[0], &stoptime_times[0], num_stoptimes);
+
+    std::vector<fasttrips::PathSpecification> path_specs;
+    readPathSpecs(output_dir, path_specs);
+    if (max_specs >= 0 && (int)path_specs.size() > max_specs) { path_specs.resize(max_specs); }
+
+    printf("Loaded supply with %d stop times and %d path specifications from %s in %.3f sec\n",
+           num_stoptimes, (int)path_specs.size(), output_dir.c_str(), double(clock() - load_start)/CLOCKS_PER_SEC);
+
+    // which searches to run
+    std::vector<bool> hyperpaths;
+    if (mode == "deterministic" || mode == "both") { hyperpaths.push_back(false); }
+    if (mode == "hyperpath"     || mode == "both") { hyperpaths.push_back(true);  }
+
+    std::map<std::pair<int,bool>, std::string> golden_pathsets;
+    if (golden) { readGolden(golden, golden_pathsets); }
+
+    std::ofstream golden_out;
+    if (write_golden) { golden_out.open(write_golden); }
+
+    std::vector<BenchmarkResult> results;
+    results.reserve(repeat*path_specs.size()*2);
+    int num_compared = 0, num_differ = 0, num_missing = 0;
+
+    for (int rep = 0; rep < repeat; ++rep) {
+        for (int spec_num = 0; spec_num < (int)path_specs.size(); ++spec_num) {
+            fasttrips::PathSpecification path_spec = path_specs[spec_num];
+
+            size_t num_modes = (mode == "recorded") ? 1 : hyperpaths.size();
+            for (size_t mode_num = 0; mode_num < num_modes; ++mode_num) {
+                if (mode != "recorded") { path_spec.hyperpath_ = hyperpaths[mode_num]; }
+
+                BenchmarkResult result;
+                std::memset(&result.performance_info_, 0, sizeof(result.performance_info_));
+                result.spec_num_  = spec_num;
+                result.hyperpath_ = path_spec.hyperpath_;
+
+                fasttrips::PathSet pathset;
+                long long allocations_before = num_allocations;
+                long long bytes_before       = bytes_allocated;
+                pathfinder.findPathSet(path_spec, pathset, result.performance_info_);
+                result.num_allocations_ = num_allocations - allocations_before;
+                result.bytes_allocated_ = bytes_allocated - bytes_before;
+                result.num_paths_       = (int)pathset.size();
+                results.push_back(result);
+
+                // check the results the first time through
+                if (rep > 0) { continue; }
+                if (write_golden || golden) {
+                    std::string pathset_str = pathsetToString(path_spec, pathset);
+                    if (write_golden) { golden_out << pathset_str; }
+                    if (golden) {
+                        std::map<std::pair<int,bool>, std::string>::const_iterator gi =
+                            golden_pathsets.find(std::make_pair(path_spec.path_id_, path_spec.hyperpath_));
+                        if (gi == golden_pathsets.end()) { num_missing += 1; continue; }
+                        num_compared += 1;
+                        if (gi->second != pathset_str) {
+                            num_differ += 1;
+                            if (num_differ <= 10) {
+                                printf("Pathset for path id %d (%s) differs from the golden file\n%s\n", path_spec.path_id_,
+                                       path_spec.hyperpath_ ? "hyperpath" : "deterministic", firstDifference(gi->second, pathset_str).c_str());
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    }
+
+    printSummary(results, false);
+    printSummary(results, true);
+    printf("\npeak memory: %.1f MB\n", peakMemoryBytes()/(1024.0*1024.0));
+
+    if (csv) { writeCSV(csv, results, path_specs); }
+    if (write_golden) {
+        golden_out.close();
+        std::cout << "Wrote " << write_golden << std::endl;
+    }
+    if (golden) {
+        printf("%d of %d pathsets differ from %s; %d not in it\n", num_differ, num_compared, golden, num_missing);
+        if (num_differ > 0) { return 1; }
+    }
+    return 0;
+}
@@ -182,11 +182,58 @@ _fasttrips_find_pathset(PyObject *self, PyObject *args)
     return returnobj;
 }
 
+static PyObject *
+_fasttrips_find_skims(PyObject *self, PyObject *args)
+{
+    PyArrayObject *pyo;
+    PyObject *input8;
+    fasttrips::PathSpecification path_spec;
+    char *user_class, *purpose, *access_mode, *transit_mode, *egress_mode;
+    if (!PyArg_ParseTuple(args, "sssssidO", &user_class, &purpose, &access_mode, &transit_mode, &egress_mode,
+                          &path_spec.origin_taz_id_, &path_spec.preferred_time_, &input8)) {
+        return NULL;
+    }
+    path_spec.iteration_          = 0;
+    path_spec.passenger_id_       = 0;
+    path_spec.path_id_            = 0;
+    path_spec.hyperpath_          = false;
+    path_spec.outbound_           = false;
+    path_spec.trace_              = false;
+    path_spec.destination_taz_id_ = 0;
+    path_spec.user_class_         = user_class;
+    path_spec.purpose_            = purpose;
+    path_spec.access_mode_        = access_mode;
+    path_spec.transit_mode_       = transit_mode;
+    path_spec.egress_mode_        = egress_mode;
+
+    // destination taz ids
+    pyo                 = (PyArrayObject*)PyArray_ContiguousFromObject(input8, NPY_INT32, 1, 1);
+    if (pyo == NULL) return NULL;
+    int* dest_taz_ids   = (int*)PyArray_DATA(pyo);
+    int num_dest_tazs   = PyArray_DIMS(pyo)[0];
+
+    // skim values: one row per destination
+    npy_intp dims_skims[2];
+    dims_skims[0] = num_dest_tazs;
+    dims_skims[1] = fasttrips::NUM_SKIM_VALUES;
+    PyArrayObject *ret_skims = (PyArrayObject *)PyArray_SimpleNew(2, dims_skims, NPY_DOUBLE);
+
+    fasttrips::PerformanceInfo perf_info = { 0, 0, 0, 0, 0, 0};
+    pathfinder.findSkims(path_spec, dest_taz_ids, num_dest_tazs, (double*)PyArray_DATA(ret_skims), perf_info);
+    Py_DECREF(pyo);
+
+    PyObject *returnobj = Py_BuildValue("(Niiiill)", ret_skims, pathfinder.processNumber(),
+                                        perf_info.label_iterations_, perf_info.num_labeled_stops_, perf_info.max_process_count_,
+                                        perf_info.milliseconds_labeling_, perf_info.milliseconds_enumerating_);
+    return returnobj;
+}
+
 static PyMethodDef fasttripsMethods[] = {
     {"initialize_parameters",   _fasttrips_initialize_parameters, METH_VARARGS, "Initialize path finding parameters" },
     {"initialize_supply",       _fasttrips_initialize_supply,     METH_VARARGS, "Initialize network supply" },
     {"set_bump_wait",           _fasttrips_set_bump_wait,         METH_VARARGS, "Update bump wait"          },
     {"find_pathset",            _fasttrips_find_pathset,          METH_VARARGS, "Find trip-based path set"  },
+    {"find_skims",              _fasttrips_find_skims,            METH_VARARGS, "Find skims from one origin"},
     {NULL, NULL, 0, NULL}        /* Sentinel */
 };
 
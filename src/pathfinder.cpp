@@ -17,6 +17,7 @@
 #include <string>
 #include <math.h>
 #include <algorithm>
+#include <limits>
 
 const char kPathSeparator =
 #ifdef _WIN32
@@ -30,6 +31,24 @@ const char kPathSeparator =
 static std::ofstream label_file;
 static std::ofstream stopids_file;
 
+/// Returns a clock reading in microseconds, for timing the phases of PathFinder::findPathSet.
+static long long clockMicroseconds()
+{
+#ifdef _WIN32
+    // QueryPerformanceFrequency reference: https://msdn.microsoft.com/en-us/library/windows/desktop/dn553408(v=vs.85).aspx
+    // To guard against loss-of-precision, we convert to microseconds *before* dividing by ticks-per-second.
+    LARGE_INTEGER frequency, now;
+    QueryPerformanceFrequency(&frequency);
+    QueryPerformanceCounter(&now);
+    return (now.QuadPart*1000000)/frequency.QuadPart;
+#else
+    // using gettimeofday() since std::chrono is only c++11
+    struct timeval now;
+    gettimeofday(&now, NULL);
+    return (long long)now.tv_sec*1000000 + now.tv_usec;
+#endif
+}
+
 namespace fasttrips {
 
     // access this through getTransferAttributes()
@@ -518,18 +537,7 @@ namespace fasttrips {
         StopStates           stop_states;
         LabelStopQueue       label_stop_queue;
 
-#ifdef _WIN32
-        // QueryPerformanceFrequency reference: https://msdn.microsoft.com/en-us/library/windows/desktop/dn553408(v=vs.85).aspx
-        LARGE_INTEGER        frequency;
-        LARGE_INTEGER        labeling_start_time, labeling_end_time, pathfind_end_time;
-        LARGE_INTEGER        label_elapsed, pathfind_elapsed;
-        QueryPerformanceFrequency(&frequency);
-        QueryPerformanceCounter(&labeling_start_time);
-#else
-        // using gettimeofday() since std::chrono is only c++11
-        struct timeval       labeling_start_time, labeling_end_time, pathfind_end_time;
-        gettimeofday(&labeling_start_time, NULL);
-#endif
+        long long initialize_start_time = clockMicroseconds();
 
         // todo: handle failure
         bool success = initializeStopStates(path_spec, trace_file, stop_states, label_stop_queue);
@@ -538,59 +546,44 @@ namespace fasttrips {
         std::map<int, int> reachable_final_stops;
         success = setReachableFinalStops(path_spec, trace_file, reachable_final_stops);
 
+        long long labeling_start_time = clockMicroseconds();
+
         performance_info.label_iterations_ = labelStops(path_spec, trace_file, reachable_final_stops,
                                                         stop_states, label_stop_queue, performance_info.max_process_count_);
         performance_info.num_labeled_stops_ = stop_states.size();
 
-#ifdef _WIN32
-        QueryPerformanceCounter(&labeling_end_time);
-#else
-        gettimeofday(&labeling_end_time, NULL);
-#endif
+        long long labeling_end_time = clockMicroseconds();
 
         getPathSet(path_spec, trace_file, stop_states, pathset);
 
-#ifdef _WIN32
-        QueryPerformanceCounter(&pathfind_end_time);
+        long long pathfind_end_time = clockMicroseconds();
 
-        label_elapsed.QuadPart                = labeling_end_time.QuadPart - labeling_start_time.QuadPart;
-        pathfind_elapsed.QuadPart             = pathfind_end_time.QuadPart - labeling_end_time.QuadPart;
+        // clear stop states since they have path pointers
+        stop_states.clear();
 
-        // We now have the elapsed number of ticks, along with the
-        // number of ticks-per-second. We use these values
-        // to convert to the number of elapsed milliseconds.
-        // To guard against loss-of-precision, we convert
-        // to microseconds *before* dividing by ticks-per-second.
-        label_elapsed.QuadPart    *= 1000;
-        label_elapsed.QuadPart    /= frequency.QuadPart;
-        pathfind_elapsed.QuadPart *= 1000;
-        pathfind_elapsed.QuadPart /= frequency.QuadPart;
+        long long finalize_end_time = clockMicroseconds();
 
-        performance_info.milliseconds_labeling_    = (long)label_elapsed.QuadPart;
-        performance_info.milliseconds_enumerating_ = (long)pathfind_elapsed.QuadPart;
+        // labeling includes initializing, as it always has
+        performance_info.milliseconds_labeling_     = (long)((labeling_end_time - initialize_start_time)/1000);
+        performance_info.milliseconds_enumerating_  = (long)((pathfind_end_time - labeling_end_time    )/1000);
+        performance_info.microseconds_initializing_ = (long)(labeling_start_time - initialize_start_time);
+        performance_info.microseconds_labeling_     = (long)(labeling_end_time   - labeling_start_time  );
+        performance_info.microseconds_enumerating_  = (long)(pathfind_end_time   - labeling_end_time    );
+        performance_info.microseconds_finalizing_   = (long)(finalize_end_time   - pathfind_end_time    );
+        performance_info.queue_pushes_              = label_stop_queue.numPushes();
+        performance_info.queue_queued_              = label_stop_queue.numQueued();
+        performance_info.queue_pops_                = label_stop_queue.numPops();
+        performance_info.queue_stale_pops_          = label_stop_queue.numStalePops();
 
+#ifdef _WIN32
         PROCESS_MEMORY_COUNTERS_EX pmc;
         if ( GetProcessMemoryInfo(GetCurrentProcess(), (PROCESS_MEMORY_COUNTERS*)&pmc, sizeof(pmc)) )
         {
             performance_info.workingset_bytes_   = pmc.WorkingSetSize;
             performance_info.privateusage_bytes_ = pmc.PrivateUsage;
         }
-#else
-        gettimeofday(&pathfind_end_time, NULL);
-
-        // microseconds
-        long int diff = (labeling_end_time.tv_usec   + 1000000*labeling_end_time.tv_sec) -
-                        (labeling_start_time.tv_usec + 1000000*labeling_start_time.tv_sec);
-        performance_info.milliseconds_labeling_ = 0.001*diff;
-
-        diff = (pathfind_end_time.tv_usec   + 1000000*pathfind_end_time.tv_sec) -
-               (labeling_end_time.tv_usec   + 1000000*labeling_end_time.tv_sec);
-        performance_info.milliseconds_enumerating_ = 0.001*diff;
 #endif
 
-        // clear stop states since they have path pointers
-        stop_states.clear();
-
         if (path_spec.trace_) {
 
             trace_file << "        label iterations: " << performance_info.label_iterations_    << std::endl;
@@ -1529,8 +1522,8 @@ namespace fasttrips {
         return (reachable_final_stops.size() > 0);
     }
 
-    // This is currently not being used because it has been replaced with updateStopStatesForFinalLinks() but
-    // it may come back for skimming so let's leave it in for now.
+    // Pathfinding uses updateStopStatesForFinalLinks() instead of this, but skimming uses it to
+    // reach each destination from the stops labeled from the origin.
     bool PathFinder::finalizeTazState(
         const PathSpecification& path_spec,
         std::ofstream& trace_file,
@@ -1673,6 +1666,8 @@ namespace fasttrips {
 
             } // end iteration through links for the given supply mode
         } // end iteration through valid supply modes
+
+        return (stop_states.count(end_taz_id) > 0);
     }
 
 
@@ -1949,6 +1944,124 @@ namespace fasttrips {
         }
     }
 
+    void PathFinder::findSkims(
+        PathSpecification path_spec,
+        const int*        dest_taz_ids,
+        int               num_dest_tazs,
+        double*           skim_values,
+        PerformanceInfo   &performance_info) const
+    {
+        // skims are for a departure time so label forwards from the origin, and they're for the lowest cost path
+        path_spec.outbound_     = false;
+        path_spec.hyperpath_    = false;
+        path_spec.trace_        = false;
+
+        for (int ind = 0; ind < num_dest_tazs*NUM_SKIM_VALUES; ++ind) {
+            skim_values[ind] = std::numeric_limits<double>::quiet_NaN();
+        }
+
+        std::ofstream        trace_file;
+        StopStates           stop_states;
+        LabelStopQueue       label_stop_queue;
+
+#ifdef _WIN32
+        LARGE_INTEGER        frequency;
+        LARGE_INTEGER        labeling_start_time, labeling_end_time, skim_end_time;
+        LARGE_INTEGER        label_elapsed, skim_elapsed;
+        QueryPerformanceFrequency(&frequency);
+        QueryPerformanceCounter(&labeling_start_time);
+#else
+        struct timeval       labeling_start_time, labeling_end_time, skim_end_time;
+        gettimeofday(&labeling_start_time, NULL);
+#endif
+
+        // no access links from the origin => no paths
+        if (!initializeStopStates(path_spec, trace_file, stop_states, label_stop_queue)) { return; }
+
+        // With no reachable final stops, labeling doesn't stop early for a destination so the whole
+        // network reachable from the origin is labeled
+        std::map<int, int> no_final_stops;
+        performance_info.label_iterations_  = labelStops(path_spec, trace_file, no_final_stops,
+                                                         stop_states, label_stop_queue, performance_info.max_process_count_);
+        performance_info.num_labeled_stops_ = stop_states.size();
+
+#ifdef _WIN32
+        QueryPerformanceCounter(&labeling_end_time);
+#else
+        gettimeofday(&labeling_end_time, NULL);
+#endif
+
+        for (int dest_num = 0; dest_num < num_dest_tazs; ++dest_num)
+        {
+            path_spec.destination_taz_id_ = dest_taz_ids[dest_num];
+            if (path_spec.destination_taz_id_ == path_spec.origin_taz_id_) { continue; }
+
+            // The destination TAZs don't affect the labeled stops, so they can all be added to the same stop states
+            if (!finalizeTazState(path_spec, trace_file, stop_states, label_stop_queue, performance_info.label_iterations_)) { continue; }
+
+            PathSet pathset;
+            if (!getPathSet(path_spec, trace_file, stop_states, pathset)) { continue; }
+            const Path& path = pathset.begin()->first;
+
+            double* dest_skim_values = skim_values + dest_num*NUM_SKIM_VALUES;
+            double  in_vehicle_time  = 0;
+            double  wait_time        = 0;
+            double  walk_time        = 0;
+            double  depart_delay     = 0;
+            int     num_trips        = 0;
+            for (size_t link_num = 0; link_num < path.size(); ++link_num)
+            {
+                const StopState& stop_state = path[link_num].second;
+                if (isTrip(stop_state.deparr_mode_)) {
+                    // inbound: deparr_time_ is the vehicle arrival, arrdep_time_ is the vehicle departure
+                    double trip_ivt_min = stop_state.deparr_time_ - stop_state.arrdep_time_;
+                    in_vehicle_time    += trip_ivt_min;
+                    wait_time          += stop_state.link_time_ - trip_ivt_min;
+                    num_trips          += 1;
+                } else {
+                    walk_time          += stop_state.link_time_;
+                    if (stop_state.deparr_mode_ == MODE_ACCESS) {
+                        depart_delay    = stop_state.deparr_time_ - stop_state.link_time_ - path_spec.preferred_time_;
+                    }
+                }
+            }
+            dest_skim_values[SKIM_COST           ] = path.cost();
+            dest_skim_values[SKIM_IN_VEHICLE_TIME] = in_vehicle_time;
+            dest_skim_values[SKIM_WAIT_TIME      ] = wait_time;
+            dest_skim_values[SKIM_WALK_TIME      ] = walk_time;
+            dest_skim_values[SKIM_NUM_TRANSFERS  ] = std::max(num_trips - 1, 0);
+            dest_skim_values[SKIM_DEPART_DELAY   ] = depart_delay;
+        }
+
+#ifdef _WIN32
+        QueryPerformanceCounter(&skim_end_time);
+
+        label_elapsed.QuadPart    = labeling_end_time.QuadPart - labeling_start_time.QuadPart;
+        skim_elapsed.QuadPart     = skim_end_time.QuadPart     - labeling_end_time.QuadPart;
+        label_elapsed.QuadPart   *= 1000;
+        label_elapsed.QuadPart   /= frequency.QuadPart;
+        skim_elapsed.QuadPart    *= 1000;
+        skim_elapsed.QuadPart    /= frequency.QuadPart;
+
+        performance_info.milliseconds_labeling_    = (long)label_elapsed.QuadPart;
+        performance_info.milliseconds_enumerating_ = (long)skim_elapsed.QuadPart;
+#else
+        gettimeofday(&skim_end_time, NULL);
+
+        // microseconds
+        long int diff = (labeling_end_time.tv_usec   + 1000000*labeling_end_time.tv_sec) -
+                        (labeling_start_time.tv_usec + 1000000*labeling_start_time.tv_sec);
+        performance_info.milliseconds_labeling_ = 0.001*diff;
+
+        diff = (skim_end_time.tv_usec     + 1000000*skim_end_time.tv_sec) -
+               (labeling_end_time.tv_usec + 1000000*labeling_end_time.tv_sec);
+        performance_info.milliseconds_enumerating_ = 0.001*diff;
+#endif
+
+        // clear stop states since they have path pointers
+        stop_states.clear();
+    }
+
     /**
      * Returns the departure time for the transit vehicle from the given stop/seq for the given trip.
      * Returns -1 on failure.
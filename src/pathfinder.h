@@ -124,8 +124,28 @@ namespace fasttrips {
         long    milliseconds_enumerating_;      ///< Number of seconds spent in enumerating
         long    workingset_bytes_;              ///< Working set size, in bytes
         long    privateusage_bytes_;            ///< Private memory usage, in bytes
+        // The rest are only set by PathFinder::findPathSet
+        long    microseconds_initializing_;     ///< Microseconds spent initializing the stop states (also in milliseconds_labeling_)
+        long    microseconds_labeling_;         ///< Microseconds spent labeling stops
+        long    microseconds_enumerating_;      ///< Microseconds spent enumerating the path set
+        long    microseconds_finalizing_;       ///< Microseconds spent clearing the stop states after enumerating
+        long    queue_pushes_;                  ///< Number of pushes onto the fasttrips::LabelStopQueue
+        long    queue_queued_;                  ///< Number of those pushes that were queued, rather than ignored for a lower label
+        long    queue_pops_;                    ///< Number of valid stops popped from the fasttrips::LabelStopQueue
+        long    queue_stale_pops_;              ///< Number of superseded stops popped and skipped by the fasttrips::LabelStopQueue
     } PerformanceInfo;
 
+    /** Skim values found for each destination by PathFinder::findSkims, in this order. */
+    enum SkimValue {
+        SKIM_COST               = 0,        ///< Generalized cost of the lowest cost path
+        SKIM_IN_VEHICLE_TIME    = 1,        ///< In-vehicle time, in minutes
+        SKIM_WAIT_TIME          = 2,        ///< Wait time at the boarding stops, in minutes
+        SKIM_WALK_TIME          = 3,        ///< Access, egress and transfer link time, in minutes
+        SKIM_NUM_TRANSFERS      = 4,        ///< Number of transfers
+        SKIM_DEPART_DELAY       = 5,        ///< Time from the preferred departure time to leaving the origin, in minutes
+        NUM_SKIM_VALUES         = 6
+    };
+
     /**
     * This is the class that does all the work.  Setup the network supply first.
     */
@@ -439,6 +459,27 @@ namespace fasttrips {
             PathSet           &pathset,
             PerformanceInfo   &performance_info) const;
 
+        /**
+         * Find the skims from one origin to many destinations.  This labels the stops once from
+         * the origin TAZ at the preferred departure time with the deterministic search, without stopping
+         * at any destination, and then finds the lowest cost path to each destination TAZ from
+         * the labeled stops.
+         *
+         * @param path_spec         The origin, preferred departure time, user class, purpose and demand modes.
+         *                          The destination, direction and hyperpath settings are ignored.
+         * @param dest_taz_ids      The destination TAZ ids
+         * @param num_dest_tazs     The number of destination TAZ ids
+         * @param skim_values       Return array of num_dest_tazs x fasttrips::NUM_SKIM_VALUES, ordered as
+         *                          fasttrips::SkimValue.  NaN where no path was found.
+         * @param performance_info  For returning performance information
+         */
+        void findSkims(
+            PathSpecification path_spec,
+            const int*        dest_taz_ids,
+            int               num_dest_tazs,
+            double*           skim_values,
+            PerformanceInfo   &performance_info) const;
+
         double getScheduledDeparture(int trip_id, int stop_id, int sequence) const;
 
         void printTimeDuration(std::ostream& ostr, const double& timedur) const;
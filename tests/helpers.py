@@ -0,0 +1,57 @@
+import os,shutil,subprocess,sys
+
+FT_DIR          = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUN_TEST        = os.path.join(FT_DIR, "scripts", "runTest.py")
+INPUT_NETWORK   = os.path.join(FT_DIR, "Examples", "test_network", "input")
+INPUT_DEMAND    = os.path.join(FT_DIR, "Examples", "test_network", "demand_reg")
+
+def make_demand_dir(output_loc, name, **config_overrides):
+    """
+    Copies the test network demand to demand_*name* in *output_loc*, with the *config_overrides* set in the
+    fasttrips section of its config_ft.txt, and returns its location.
+    """
+    demand_dir = os.path.join(output_loc, "demand_%s" % name)
+    shutil.copytree(INPUT_DEMAND, demand_dir)
+
+    config_file  = os.path.join(demand_dir, "config_ft.txt")
+    config_lines = open(config_file).readlines()
+    with open(config_file, "w") as config:
+        for config_line in config_lines:
+            option_name = config_line.split("=")[0].strip()
+            if option_name in config_overrides:
+                continue
+            config.write(config_line)
+            if config_line.startswith("[fasttrips]"):
+                for option_name in sorted(config_overrides.keys()):
+                    config.write("%-30s= %s\n" % (option_name, str(config_overrides[option_name])))
+    return demand_dir
+
+def run_test_network(output_loc, output_dir, demand_dir, pathfinding_type="deterministic", iters=2):
+    """
+    Runs assignment with capacity on the test network with the demand in *demand_dir*, in its own process like
+    runTest.py, writing to *output_dir* in *output_loc*.  Returns the full output directory.
+    """
+    # use this fasttrips, built in place, even if it's not installed
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([FT_DIR] + ([env["PYTHONPATH"]] if "PYTHONPATH" in env else []))
+    subprocess.check_call([sys.executable, RUN_TEST, "--capacity", "-o", output_dir,
+                           pathfinding_type, str(iters), INPUT_NETWORK, demand_dir, output_loc], cwd=FT_DIR, env=env)
+    return os.path.join(output_loc, output_dir)
+
+def setup_test_network(output_loc, output_dir, demand_dir, pathfinding_type="deterministic", iters=2):
+    """
+    Sets up assignment with capacity on the test network with the demand in *demand_dir*, in this process,
+    writing to *output_dir* in *output_loc*.  Returns the :py:class:`fasttrips.FastTrips` instance, for
+    reading the inputs and running the assignment, and the full output directory.
+    """
+    import fasttrips
+
+    full_output_dir = os.path.join(output_loc, output_dir)
+    os.mkdir(full_output_dir)
+
+    ft = fasttrips.FastTrips(INPUT_NETWORK, demand_dir, full_output_dir)
+    ft.read_configuration()
+    fasttrips.Assignment.PATHFINDING_TYPE    = pathfinding_type
+    fasttrips.Assignment.ITERATION_FLAG      = iters
+    fasttrips.Assignment.CAPACITY_CONSTRAINT = True
+    return (ft, full_output_dir)
@@ -0,0 +1,41 @@
+import os,shutil,tempfile,unittest
+import pandas
+import pandas.util.testing
+
+from fasttrips import Passenger, Util
+
+from helpers import make_demand_dir, run_test_network
+
+class TestCheckpoint(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.output_loc = tempfile.mkdtemp()
+        demand_dir     = make_demand_dir(cls.output_loc, "checkpoint")
+        cls.output_dir = run_test_network(cls.output_loc, "checkpoint", demand_dir, iters=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.output_loc)
+
+    def test_checkpoint_matches_csv(self):
+        """
+        The file pathfinding type reads the pathfinding results from the checkpoint if it's current, and from
+        the csv files otherwise.  Both should give the same pathsets, with the same dtypes.
+        """
+        self.assertTrue(Passenger.pathset_checkpoint_is_current(self.output_dir))
+        (checkpoint_paths_df, checkpoint_links_df) = Passenger.read_passenger_pathsets(self.output_dir, include_asgn=False)
+
+        # make the csv files newer so they're read instead
+        schema_mtime = os.path.getmtime(os.path.join(self.output_dir, Passenger.PF_LINKS_CHECKPOINT, Util.COLUMNS_SCHEMA_FILE))
+        for csv_file in [Passenger.PF_PATHS_CSV, Passenger.PF_LINKS_CSV]:
+            os.utime(os.path.join(self.output_dir, csv_file), (schema_mtime+10, schema_mtime+10))
+        self.assertFalse(Passenger.pathset_checkpoint_is_current(self.output_dir))
+        (csv_paths_df, csv_links_df) = Passenger.read_passenger_pathsets(self.output_dir, include_asgn=False)
+
+        self.assertGreater(len(csv_links_df), 0)
+        pandas.util.testing.assert_frame_equal(checkpoint_paths_df, csv_paths_df)
+        pandas.util.testing.assert_frame_equal(checkpoint_links_df, csv_links_df)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import os,shutil,sys,tempfile,unittest
+import pandas
+
+import fasttrips
+from fasttrips.Logger import DEBUG_LOG_OFF
+
+from helpers import make_demand_dir, setup_test_network
+
+FASTTRIPS_DIR   = os.path.dirname(os.path.abspath(fasttrips.__file__))
+PANDAS_DIR      = os.path.dirname(os.path.abspath(pandas.__file__))
+
+#: pandas methods that format a dataframe or series with to_string
+FORMAT_METHODS  = ["to_string", "__str__", "__bytes__", "__unicode__", "__repr__"]
+
+def count_to_string_calls(output_loc, output_dir, debug_log):
+    """
+    Runs two iterations of deterministic assignment with capacity on the test network, in this process,
+    with the given *debug_log* setting.  Returns the places where fasttrips formatted a dataframe or series
+    (printing them goes through to_string, too) while reading the inputs, and those during the assignment.
+    """
+    demand_dir = make_demand_dir(output_loc, output_dir, debug_log=debug_log)
+    (ft, full_output_dir) = setup_test_network(output_loc, output_dir, demand_dir)
+
+    calls = []
+    def counted(to_string):
+        def counted_to_string(*args, **kwargs):
+            # pandas formats some things itself, e.g. the key for a failed index lookup; count only the
+            # formatting fasttrips asked for, directly or by printing
+            frame = sys._getframe(1)
+            while os.path.abspath(frame.f_code.co_filename).startswith(PANDAS_DIR) and frame.f_code.co_name in FORMAT_METHODS:
+                frame = frame.f_back
+            if os.path.abspath(frame.f_code.co_filename).startswith(FASTTRIPS_DIR):
+                calls.append("%s:%d" % (os.path.basename(frame.f_code.co_filename), frame.f_lineno))
+            return to_string(*args, **kwargs)
+        return counted_to_string
+
+    patched = [(cls, cls.__dict__["to_string"]) for cls in [pandas.DataFrame, pandas.Series]]
+    try:
+        for (cls, to_string) in patched:
+            cls.to_string = counted(to_string)
+        ft.read_input_files()
+        read_calls = len(calls)
+        ft.run_assignment(full_output_dir)
+    finally:
+        for (cls, to_string) in patched:
+            cls.to_string = to_string
+    return (calls[:read_calls], calls[read_calls:])
+
+class TestDebugLog(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.output_loc = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.output_loc)
+
+    def test_off_formats_nothing(self):
+        """
+        With debug_log off, no dataframe should be formatted in the assignment.  The one-time dumps made
+        while reading the inputs are still formatted, which shows the calls are counted.
+        """
+        (read_calls, assignment_calls) = count_to_string_calls(self.output_loc, "debug_off", DEBUG_LOG_OFF)
+        self.assertGreater(len(read_calls), 0)
+        self.assertEqual(assignment_calls, [])
+
+if __name__ == "__main__":
+    unittest.main()
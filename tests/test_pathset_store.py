@@ -0,0 +1,81 @@
+import pickle,unittest
+import numpy,pandas
+
+from fasttrips import Passenger, PathSetStore
+
+NUM_TRIPS = 20
+
+def make_store():
+    """
+    Returns a :py:class:`fasttrips.PathSetStore` for a small made-up trip list.
+    """
+    trip_list_df = pandas.DataFrame({
+        Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM       : numpy.arange(1, NUM_TRIPS+1),
+        Passenger.PERSONS_COLUMN_PERSON_ID_NUM            : numpy.arange(1, NUM_TRIPS+1),
+        Passenger.TRIP_LIST_COLUMN_ORIGIN_TAZ_ID          : ["o%d" % (trip % 3) for trip in range(NUM_TRIPS)],
+        Passenger.TRIP_LIST_COLUMN_DESTINATION_TAZ_ID     : ["d%d" % (trip % 4) for trip in range(NUM_TRIPS)],
+        Passenger.TRIP_LIST_COLUMN_ORIGIN_TAZ_ID_NUM      : numpy.arange(NUM_TRIPS) % 3,
+        Passenger.TRIP_LIST_COLUMN_DESTINATION_TAZ_ID_NUM : numpy.arange(NUM_TRIPS) % 4,
+        Passenger.TRIP_LIST_COLUMN_TIME_TARGET            : ["arrival","departure"]*(NUM_TRIPS/2),
+        Passenger.TRIP_LIST_COLUMN_ARRIVAL_TIME_MIN       : 480.0,
+        Passenger.TRIP_LIST_COLUMN_DEPARTURE_TIME_MIN     : 450.0})
+    for colname in PathSetStore.CATEGORICAL_COLUMNS:
+        trip_list_df[colname] = "%s_value" % colname
+    return PathSetStore(trip_list_df)
+
+def make_results(random_state):
+    """
+    Returns made-up pathfinding results, like :py:meth:`fasttrips.Assignment.find_trip_based_pathset` returns.
+    """
+    num_paths = random_state.randint(0, 4)
+    num_links = random_state.randint(0, 10) if num_paths > 0 else 0
+    return (random_state.randint(0, 100, (num_links, PathSetStore.RESULT_INT_COLUMNS)).astype(numpy.int32),
+            random_state.rand(num_links, PathSetStore.RESULT_DOUBLE_COLUMNS),
+            random_state.rand(num_paths, PathSetStore.PATH_COST_COLUMNS))
+
+class TestPathSetStore(unittest.TestCase):
+
+    def assertResultsEqual(self, results, expected):
+        self.assertEqual(len(results), len(expected))
+        for (result_arr, expected_arr) in zip(results, expected):
+            numpy.testing.assert_array_equal(result_arr, expected_arr)
+
+    def test_results_replaced(self):
+        """
+        Setting results many times over, so the buffers grow and are compacted, keeps the latest for each trip.
+        """
+        store        = make_store()
+        random_state = numpy.random.RandomState(0)
+        expected     = {}
+        for trip in range(1000):
+            idx           = random_state.randint(NUM_TRIPS)
+            expected[idx] = make_results(random_state)
+            store.set_results(idx, expected[idx], False)
+
+        for idx in range(NUM_TRIPS):
+            if idx not in expected:
+                self.assertIsNone(store.get_results(idx))
+                continue
+            self.assertResultsEqual(store.get_results(idx), expected[idx])
+            self.assertEqual(store.num_paths[idx], expected[idx][2].shape[0])
+        # the compacted buffers don't keep all the replaced results
+        self.assertLess(store.result_ints.shape[0], 2*sum([results[0].shape[0] for results in expected.values()]) + PathSetStore.MIN_BUFFER_ROWS)
+
+    def test_pickled_view(self):
+        """
+        A pickled view, as sent to a pathfinding worker, has the trip's attributes and keeps its own results.
+        """
+        store = make_store()
+        view  = pickle.loads(pickle.dumps(store.get_view(4)))
+        self.assertEqual(view.trip_list_id_num, 4)
+        self.assertEqual(view.d_taz_num, 3)
+        self.assertFalse(view.path_found())
+        self.assertEqual(view.pathdict, {})
+
+        results = make_results(numpy.random.RandomState(1))
+        view.set_results(results, False)
+        self.assertEqual(view.num_paths(), results[2].shape[0])
+        self.assertEqual(len(view.pathdict), results[2].shape[0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import os,shutil,tempfile,unittest
+import pandas
+
+from helpers import INPUT_DEMAND, make_demand_dir, run_test_network
+
+def read_performance(output_loc, output_dir, num_processes):
+    """
+    Runs two iterations of deterministic assignment with capacity on the test network with *num_processes*
+    pathfinding processes and returns the performance records read from the output.
+    """
+    demand_dir = make_demand_dir(output_loc, output_dir, number_of_processes=num_processes)
+    full_output_dir = run_test_network(output_loc, output_dir, demand_dir)
+    return pandas.read_csv(os.path.join(full_output_dir, "ft_output_performance.csv"))
+
+class TestPerformance(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.output_loc = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.output_loc)
+
+    def test_multiprocess_records(self):
+        """
+        The worker processes send their performance records with DONE, and they exit right after; none of
+        them should be dropped.
+        """
+        num_trips = len(pandas.read_csv(os.path.join(INPUT_DEMAND, "trip_list.txt")))
+
+        single_df = read_performance(self.output_loc, "single_process", 1)
+        multi_df  = read_performance(self.output_loc, "multi_process",  2)
+
+        single_counts = single_df.groupby("iteration").size()
+        multi_counts  = multi_df.groupby("iteration").size()
+        self.assertEqual(single_counts.loc[1], num_trips)
+        self.assertEqual(multi_counts.to_dict(), single_counts.to_dict())
+
+        # and they came from the workers
+        self.assertEqual(sorted(multi_df["process number"].unique().tolist()), [1,2])
+
+if __name__ == "__main__":
+    unittest.main()